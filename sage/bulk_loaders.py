@@ -0,0 +1,408 @@
+"""
+Carga masiva de DataFrames en bases de datos
+
+Cada motor tiene una lista de estrategias ordenadas de la más rápida a la más
+compatible; si una no está disponible en el servidor o el driver (p.ej. MySQL con
+local_infile desactivado) se deshace la transacción y se prueba la siguiente:
+
+- PostgreSQL: COPY FROM STDIN con el CSV generado por bloques
+- MySQL: LOAD DATA LOCAL INFILE desde un archivo temporal
+- SQL Server: INSERT con varias filas por sentencia
+- DuckDB: INSERT ... SELECT desde una tabla Arrow registrada en la conexión
+- Todos: executemany por lotes; un lote con errores se divide hasta aislar las filas inválidas
+"""
+import io
+import os
+import datetime
+import decimal
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Tamaño de lote para executemany (aumentado de 1000 a 50000 para inserciones masivas)
+# y filas por bloque al generar los CSV de COPY / LOAD DATA
+DATABASE_BATCH_SIZE = 50000
+CSV_CHUNK_ROWS = 100000
+
+# Marca de NULL en los CSV de COPY y LOAD DATA
+NULL_MARKER = '\\N'
+
+# Tipos que los drivers adaptan sin conversión
+_DRIVER_TYPES = (type(None), int, float, str, bool, datetime.datetime, datetime.date, datetime.time,
+                 decimal.Decimal, bytes)
+
+
+def _driver_value(value: Any) -> Any:
+    """Convierte un valor suelto de una columna object a un tipo que el driver sabe adaptar"""
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, _DRIVER_TYPES):
+        return value
+    return str(value)
+
+
+class BulkLoadUnsupported(Exception):
+    """La estrategia de carga no está disponible para esta conexión"""
+
+
+def column_values(series: pd.Series) -> list:
+    """
+    Valores de una columna listos para el driver, convertidos según su dtype
+
+    NaN, NaT y pd.NA pasan a None, los enteros y flotantes de numpy a int/float de
+    Python, Timestamp a datetime y Timedelta a texto. Solo las columnas object se
+    revisan valor a valor, y únicamente si contienen tipos que el driver no adapta.
+    """
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # El código -1 (NULL) apunta al None agregado al final de las categorías
+        categories = np.array(column_values(pd.Series(dtype.categories)) + [None], dtype=object)
+        return categories[series.cat.codes.to_numpy()].tolist()
+    if isinstance(dtype, pd.DatetimeTZDtype) or (isinstance(dtype, np.dtype) and dtype.kind == 'M'):
+        values = series.array.to_pydatetime()
+        values[series.isna().to_numpy()] = None
+        return values.tolist()
+    if isinstance(dtype, np.dtype) and dtype.kind == 'm':
+        return [None if missing else value for value, missing in zip(series.astype(str).tolist(), series.isna())]
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biu':
+        return series.tolist()
+    if isinstance(dtype, np.dtype) and dtype.kind == 'f':
+        values = series.to_numpy().astype(object)
+        values[np.isnan(series.to_numpy())] = None
+        return values.tolist()
+    if not isinstance(dtype, np.dtype):
+        # Tipos nullable de pandas (Int64, boolean, string, Float64, Arrow)
+        values = series.to_numpy(dtype=object, na_value=None)
+    else:
+        values = series.to_numpy(dtype=object, copy=True)
+        values[pd.isna(values)] = None
+    if all(issubclass(kind, _DRIVER_TYPES) and not issubclass(kind, pd.Timestamp)
+           for kind in set(map(type, values))):
+        return values.tolist()
+    return [_driver_value(value) for value in values]
+
+
+def dataframe_rows(df: pd.DataFrame, start: int = 0, stop: Optional[int] = None) -> List[Tuple]:
+    """Filas df[start:stop] como tuplas listas para el driver (conversión por columnas)"""
+    chunk = df.iloc[start:stop]
+    return list(zip(*(column_values(chunk.iloc[:, position]) for position in range(chunk.shape[1]))))
+
+
+def pandas_csv_chunks(df: pd.DataFrame, chunk_rows: int = CSV_CHUNK_ROWS, **csv_options) -> Iterator[str]:
+    """CSV del DataFrame por bloques de filas, generado con pandas"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=False, **csv_options)
+
+
+def arrow_csv_chunks(table, chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    CSV de una tabla Arrow por bloques de filas
+
+    Arrow escribe los NULL como campos vacíos sin comillas y todos los textos entre
+    comillas, que es la convención del formato CSV de COPY por defecto.
+    """
+    import pyarrow.csv as pa_csv
+
+    options = pa_csv.WriteOptions(include_header=False)
+    for batch in table.to_batches(max_chunksize=chunk_rows):
+        buffer = io.BytesIO()
+        pa_csv.write_csv(batch, buffer, options)
+        yield buffer.getvalue()
+
+
+class CSVStream:
+    """
+    Archivo de solo lectura sobre bloques de CSV generados bajo demanda
+
+    Permite pasar el DataFrame a COPY sin construir el CSV completo en memoria.
+    """
+
+    def __init__(self, chunks: Iterable[Union[str, bytes]]):
+        self._chunks = iter(chunks)
+        self._buffer = None
+        self._position = 0
+
+    def read(self, size: int = -1) -> Union[str, bytes]:
+        parts = []
+        while size != 0:
+            if self._buffer is None or self._position >= len(self._buffer):
+                self._buffer = next(self._chunks, None)
+                self._position = 0
+                if self._buffer is None:
+                    break
+            end = len(self._buffer) if size < 0 else self._position + size
+            part = self._buffer[self._position:end]
+            self._position += len(part)
+            parts.append(part)
+            if size > 0:
+                size -= len(part)
+        return parts[0][:0].join(parts) if parts else ''
+
+
+class BulkLoader:
+    """
+    Estrategia de carga: inserta las filas de df en una tabla existente
+
+    Las subclases redefinen load(); quote() y placeholder dependen del motor.
+    """
+
+    name = 'executemany'
+    placeholder = '%s'
+
+    def __init__(self, logger, batch_size: int = DATABASE_BATCH_SIZE):
+        self.logger = logger
+        self.batch_size = batch_size
+
+    def quote(self, identifier: str) -> str:
+        return f'"{identifier}"'
+
+    def columns_sql(self, df: pd.DataFrame) -> str:
+        return ", ".join(self.quote(column) for column in df.columns)
+
+    def load(self, conn, df: pd.DataFrame, table: str) -> int:
+        """Inserta df en table (nombre ya calificado y entre comillas) con executemany por lotes"""
+        insert_sql = (f"INSERT INTO {table} ({self.columns_sql(df)}) "
+                      f"VALUES ({', '.join([self.placeholder] * len(df.columns))})")
+        return self.executemany(conn, insert_sql, df)
+
+    def executemany(self, conn, sql: str, df: pd.DataFrame) -> int:
+        """
+        Ejecuta sql (INSERT o UPSERT con un placeholder por columna) para cada fila de df
+
+        Cada lote se confirma por separado. Si un lote falla se divide en mitades
+        hasta aislar las filas con error, que se omiten y se registran en el log.
+
+        Returns:
+            int: Filas procesadas sin error
+        """
+        cursor = conn.cursor()
+        total_batches = (len(df) + self.batch_size - 1) // self.batch_size
+        processed = 0
+        for number, start in enumerate(range(0, len(df), self.batch_size), 1):
+            batch = dataframe_rows(df, start, start + self.batch_size)
+            processed += self._execute_rows(conn, cursor, sql, batch, start)
+            self.logger.message(f"Procesado lote {number} de {total_batches}")
+        return processed
+
+    def _execute_rows(self, conn, cursor, sql: str, rows: List[Tuple], first_row: int) -> int:
+        try:
+            cursor.executemany(sql, rows)
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            _rollback(conn)
+            if len(rows) == 1:
+                self.logger.error(f"Error insertando fila {first_row} (valores: {rows[0]}): {str(e)}")
+                return 0
+            self.logger.warning(f"Error en el lote de filas {first_row} a {first_row + len(rows) - 1}: "
+                                f"{str(e)}; se divide para aislar las filas con error")
+        middle = len(rows) // 2
+        return (self._execute_rows(conn, cursor, sql, rows[:middle], first_row)
+                + self._execute_rows(conn, cursor, sql, rows[middle:], first_row + middle))
+
+
+class PostgresCopyLoader(BulkLoader):
+    """COPY FROM STDIN en una sola transacción"""
+
+    name = 'copy'
+
+    def load(self, conn, df: pd.DataFrame, table: str) -> int:
+        try:
+            import pyarrow as pa
+            chunks, null_marker = arrow_csv_chunks(pa.Table.from_pandas(df, preserve_index=False)), ''
+        except Exception as e:
+            # Columnas con tipos mezclados que Arrow no convierte: CSV con pandas
+            self.logger.message(f"CSV generado con pandas ({str(e)})")
+            chunks = pandas_csv_chunks(df, na_rep=NULL_MARKER, lineterminator='\n')
+            null_marker = NULL_MARKER
+
+        copy_sql = (f"COPY {table} ({self.columns_sql(df)}) FROM STDIN "
+                    f"WITH (FORMAT csv, NULL '{null_marker}')")
+        stream = CSVStream(chunks)
+        with conn.cursor() as cursor:
+            cursor.copy_expert(copy_sql, stream, size=1024 * 1024)
+        conn.commit()
+        return len(df)
+
+
+class MySQLLoadDataLoader(BulkLoader):
+    """LOAD DATA LOCAL INFILE desde un CSV temporal (requiere local_infile en cliente y servidor)"""
+
+    name = 'load_data'
+
+    # Errores de MySQL cuando LOAD DATA LOCAL está desactivado
+    DISABLED_ERRORS = (1148, 2068, 3948)
+
+    def quote(self, identifier: str) -> str:
+        return f"`{identifier}`"
+
+    def load(self, conn, df: pd.DataFrame, table: str) -> int:
+        data = df.copy(deep=False)
+        for column in data.columns:
+            if data[column].dtype == bool:
+                data[column] = data[column].astype(int)
+            elif data[column].dtype == object:
+                # La barra invertida es el carácter de escape de LOAD DATA
+                has_backslash = data[column].map(lambda value: isinstance(value, str) and '\\' in value)
+                if has_backslash.any():
+                    data[column] = data[column].map(
+                        lambda value: value.replace('\\', '\\\\') if isinstance(value, str) else value
+                    )
+
+        fd, path = tempfile.mkstemp(suffix='.csv', prefix='sage_load_')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as spool:
+                for chunk in pandas_csv_chunks(data, na_rep=NULL_MARKER, lineterminator='\n'):
+                    spool.write(chunk)
+
+            load_sql = (f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                        f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' "
+                        f"LINES TERMINATED BY '\\n' ({self.columns_sql(df)})")
+            cursor = conn.cursor()
+            try:
+                cursor.execute(load_sql, (path,))
+            except Exception as e:
+                if e.args and e.args[0] in self.DISABLED_ERRORS:
+                    raise BulkLoadUnsupported(f"LOAD DATA LOCAL no está habilitado: {e}")
+                raise
+            conn.commit()
+            return len(df)
+        finally:
+            os.unlink(path)
+
+
+class MSSQLValuesLoader(BulkLoader):
+    """INSERT con hasta 1000 filas por sentencia (límite de SQL Server para VALUES)"""
+
+    name = 'multi_row_insert'
+    ROWS_PER_STATEMENT = 1000
+
+    def quote(self, identifier: str) -> str:
+        return f"[{identifier}]"
+
+    def load(self, conn, df: pd.DataFrame, table: str) -> int:
+        row_sql = f"({', '.join([self.placeholder] * len(df.columns))})"
+        prefix = f"INSERT INTO {table} ({self.columns_sql(df)}) VALUES "
+        cursor = conn.cursor()
+        # Una sola transacción: si falla, la estrategia siguiente parte de la tabla sin cambios
+        _set_autocommit(conn, False)
+        try:
+            for start in range(0, len(df), self.batch_size):
+                rows = dataframe_rows(df, start, start + self.batch_size)
+                for offset in range(0, len(rows), self.ROWS_PER_STATEMENT):
+                    statement_rows = rows[offset:offset + self.ROWS_PER_STATEMENT]
+                    cursor.execute(prefix + ", ".join([row_sql] * len(statement_rows)),
+                                   tuple(value for row in statement_rows for value in row))
+            conn.commit()
+        except Exception:
+            _rollback(conn)
+            raise
+        finally:
+            _set_autocommit(conn, True)
+        return len(df)
+
+
+class DuckDBArrowLoader(BulkLoader):
+    """INSERT ... SELECT desde el DataFrame registrado como tabla Arrow (sin copiar filas en Python)"""
+
+    name = 'arrow'
+    SOURCE = 'sage_bulk_source'
+
+    def __init__(self, logger, batch_size: int = DATABASE_BATCH_SIZE, replace: bool = False):
+        super().__init__(logger, batch_size)
+        self.replace = replace
+
+    def load(self, conn, df: pd.DataFrame, table: str) -> int:
+        if not hasattr(conn, 'register'):
+            raise BulkLoadUnsupported("La conexión no es una conexión nativa de DuckDB")
+        import pyarrow as pa
+
+        columns = self.columns_sql(df)
+        conn.register(self.SOURCE, pa.Table.from_pandas(df, preserve_index=False))
+        try:
+            if self.replace:
+                conn.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT {columns} FROM {self.SOURCE}")
+            else:
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT {columns} FROM {self.SOURCE} LIMIT 0")
+                conn.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {self.SOURCE}")
+        finally:
+            conn.unregister(self.SOURCE)
+        return len(df)
+
+
+class MySQLExecutemanyLoader(BulkLoader):
+    def quote(self, identifier: str) -> str:
+        return f"`{identifier}`"
+
+
+class MSSQLExecutemanyLoader(BulkLoader):
+    def quote(self, identifier: str) -> str:
+        return f"[{identifier}]"
+
+    def executemany(self, conn, sql: str, df: pd.DataFrame) -> int:
+        # pymssql ejecuta fila a fila: sin autocommit, un lote fallido se deshace completo antes de dividirlo
+        _set_autocommit(conn, False)
+        try:
+            return super().executemany(conn, sql, df)
+        finally:
+            _set_autocommit(conn, True)
+
+
+# Estrategias por motor, de la más rápida a la más compatible
+LOADERS: Dict[str, List[type]] = {
+    'postgresql': [PostgresCopyLoader, BulkLoader],
+    'mysql': [MySQLLoadDataLoader, MySQLExecutemanyLoader],
+    'mssql': [MSSQLValuesLoader, MSSQLExecutemanyLoader],
+    'duckdb': [DuckDBArrowLoader],
+}
+
+
+def bulk_load(db_type: str, conn, df: pd.DataFrame, table: str, logger,
+              loaders: Optional[Iterable[BulkLoader]] = None) -> Tuple[int, str]:
+    """
+    Carga df en table con la estrategia más rápida disponible para db_type
+
+    Args:
+        db_type: 'postgresql', 'mysql', 'mssql' o 'duckdb'
+        conn: Conexión DB-API del driver nativo (psycopg2, pymysql, pymssql o duckdb)
+        table: Nombre de la tabla ya calificado y entre comillas según el motor
+        loaders: Estrategias a usar en lugar de las de LOADERS
+
+    Returns:
+        Tuple: (filas insertadas, nombre de la estrategia usada)
+    """
+    strategies = list(loaders) if loaders is not None else [cls(logger) for cls in LOADERS[db_type]]
+    for position, loader in enumerate(strategies):
+        is_last = position == len(strategies) - 1
+        try:
+            logger.message(f"Cargando {len(df)} filas en {table} con estrategia '{loader.name}'")
+            return loader.load(conn, df, table), loader.name
+        except BulkLoadUnsupported as e:
+            if is_last:
+                raise
+            logger.message(f"Estrategia '{loader.name}' no disponible: {str(e)}")
+        except Exception as e:
+            if is_last:
+                raise
+            logger.warning(f"Error en la carga con '{loader.name}': {str(e)}; se usa la estrategia siguiente")
+        _rollback(conn)
+
+
+def _rollback(conn) -> None:
+    try:
+        conn.rollback()
+    except Exception:
+        pass
+
+
+def _set_autocommit(conn, value: bool) -> None:
+    # pymssql expone autocommit como método; otros drivers como atributo
+    autocommit = getattr(conn, 'autocommit', None)
+    if callable(autocommit):
+        autocommit(value)
+    elif autocommit is not None:
+        conn.autocommit = value
@@ -0,0 +1,410 @@
+"""
+UPSERT por tabla de staging
+
+Los datos se cargan primero en una tabla temporal con la estrategia de carga
+masiva del motor (bulk_loaders) y después se aplican a la tabla destino con una
+sola sentencia:
+
+- PostgreSQL: INSERT ... SELECT ... ON CONFLICT DO UPDATE
+- MySQL: INSERT ... SELECT ... ON DUPLICATE KEY UPDATE
+- SQL Server: MERGE
+- DuckDB: INSERT ... SELECT ... ON CONFLICT DO UPDATE
+
+La clave de upsert debe estar respaldada por un índice único en la tabla destino;
+si no existe se crea antes de cargar los datos.
+"""
+import hashlib
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from .bulk_loaders import DuckDBArrowLoader, bulk_load
+
+
+class UpsertDialect:
+    """Sentencias de staging, índice y MERGE de un motor"""
+
+    db_type = None
+    # Sin índice único ON CONFLICT / ON DUPLICATE KEY no detectan los registros existentes
+    requires_unique_key = True
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    @staticmethod
+    def adjust_schema(schema: Optional[str]) -> Optional[str]:
+        return schema
+
+    def quote(self, identifier: str) -> str:
+        return f'"{identifier}"'
+
+    def qualify(self, schema: Optional[str], table: str) -> str:
+        return f"{self.quote(schema)}.{self.quote(table)}" if schema else self.quote(table)
+
+    def column_list(self, columns: List[str], alias: str = '') -> str:
+        prefix = f"{alias}." if alias else ''
+        return ", ".join(f"{prefix}{self.quote(column)}" for column in columns)
+
+    def key_condition(self, keys: List[str], left: str, right: str) -> str:
+        return " AND ".join(f"{left}.{self.quote(key)} = {right}.{self.quote(key)}" for key in keys)
+
+    def staging_name(self) -> str:
+        return f"sage_stage_{uuid.uuid4().hex[:12]}"
+
+    def index_name(self, table: str, keys: List[str]) -> str:
+        digest = hashlib.md5("|".join(keys).encode('utf-8')).hexdigest()[:8]
+        return f"ux_{table[:40]}_{digest}"
+
+    def cursor(self, conn):
+        return conn.cursor()
+
+    def commit(self, conn) -> None:
+        conn.commit()
+
+    def rollback(self, conn) -> None:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+    def unique_keys(self, cursor, schema: Optional[str], table: str, target: str) -> List[Set[str]]:
+        """Conjuntos de columnas con índice o restricción única en la tabla destino"""
+        raise NotImplementedError
+
+    def create_unique_index(self, cursor, table: str, target: str, keys: List[str]) -> None:
+        cursor.execute(f"CREATE UNIQUE INDEX {self.quote(self.index_name(table, keys))} "
+                       f"ON {target} ({self.column_list(keys)})")
+
+    def create_staging(self, cursor, staging: str, target: str, columns: List[str]) -> None:
+        raise NotImplementedError
+
+    def load_staging(self, conn, df: pd.DataFrame, staging: str) -> int:
+        """Carga df en la tabla de staging; devuelve las filas cargadas"""
+        rows, _ = bulk_load(self.db_type, conn, df, staging, self.logger)
+        return rows
+
+    def drop_staging(self, cursor, staging: str) -> None:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+
+    def count_matches(self, cursor, staging: str, target: str, keys: List[str]) -> int:
+        """Filas de staging que ya existen en la tabla destino"""
+        cursor.execute(f"SELECT COUNT(*) FROM {staging} s WHERE EXISTS "
+                       f"(SELECT 1 FROM {target} t WHERE {self.key_condition(keys, 't', 's')})")
+        return cursor.fetchone()[0]
+
+    def merge(self, cursor, staging: str, target: str, columns: List[str], keys: List[str]) -> Tuple[int, int]:
+        """Aplica staging sobre target; devuelve (insertadas, actualizadas)"""
+        raise NotImplementedError
+
+    def delete(self, cursor, staging: str, target: str, keys: List[str]) -> int:
+        """Elimina de target las claves presentes en staging; devuelve las filas eliminadas"""
+        cursor.execute(f"DELETE FROM {target} WHERE EXISTS "
+                       f"(SELECT 1 FROM {staging} s WHERE {self.key_condition(keys, target, 's')})")
+        return cursor.rowcount
+
+
+class PostgresUpsert(UpsertDialect):
+    db_type = 'postgresql'
+
+    def unique_keys(self, cursor, schema, table, target):
+        cursor.execute("""
+            SELECT array_agg(a.attname::text)
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass AND i.indisunique AND i.indpred IS NULL
+            GROUP BY i.indexrelid
+        """, (target,))
+        return [set(row[0]) for row in cursor.fetchall()]
+
+    def create_staging(self, cursor, staging, target, columns):
+        # Las tablas temporales no escriben WAL y desaparecen al cerrar la sesión
+        cursor.execute(f"CREATE TEMP TABLE {staging} AS SELECT {self.column_list(columns)} FROM {target} WITH NO DATA")
+
+    def merge(self, cursor, staging, target, columns, keys):
+        updates = [column for column in columns if column not in keys]
+        action = ("DO UPDATE SET " + ", ".join(f"{self.quote(c)} = EXCLUDED.{self.quote(c)}" for c in updates)
+                  if updates else "DO NOTHING")
+        # xmax = 0 solo en las filas recién insertadas
+        cursor.execute(f"""
+            WITH upserted AS (
+                INSERT INTO {target} ({self.column_list(columns)})
+                SELECT {self.column_list(columns)} FROM {staging}
+                ON CONFLICT ({self.column_list(keys)}) {action}
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM upserted
+        """)
+        inserted, updated = cursor.fetchone()
+        return inserted, updated
+
+
+class MySQLUpsert(UpsertDialect):
+    db_type = 'mysql'
+
+    @staticmethod
+    def adjust_schema(schema):
+        # En MySQL 'public' no es un esquema válido
+        return None if schema and schema.lower() == 'public' else schema
+
+    def quote(self, identifier):
+        return f"`{identifier}`"
+
+    def unique_keys(self, cursor, schema, table, target):
+        cursor.execute(f"SHOW INDEX FROM {target} WHERE Non_unique = 0")
+        indexes: Dict[str, Set[str]] = {}
+        for row in cursor.fetchall():
+            indexes.setdefault(row[2], set()).add(row[4])  # Key_name, Column_name
+        return list(indexes.values())
+
+    def create_staging(self, cursor, staging, target, columns):
+        cursor.execute(f"CREATE TEMPORARY TABLE {staging} AS SELECT {self.column_list(columns)} FROM {target} LIMIT 0")
+
+    def drop_staging(self, cursor, staging):
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+
+    def merge(self, cursor, staging, target, columns, keys):
+        matched = self.count_matches(cursor, staging, target, keys)
+        updates = [column for column in columns if column not in keys] or keys[:1]
+        cursor.execute(f"""
+            INSERT INTO {target} ({self.column_list(columns)})
+            SELECT {self.column_list(columns, 's')} FROM {staging} AS s
+            ON DUPLICATE KEY UPDATE {", ".join(f"{self.quote(c)} = s.{self.quote(c)}" for c in updates)}
+        """)
+        cursor.execute(f"SELECT COUNT(*) FROM {staging}")
+        total = cursor.fetchone()[0]
+        return total - matched, matched
+
+
+class MSSQLUpsert(UpsertDialect):
+    db_type = 'mssql'
+    # MERGE no necesita el índice; si se puede crear, acelera el join con staging
+    requires_unique_key = False
+
+    @staticmethod
+    def adjust_schema(schema):
+        # SQL Server no usa 'public' como esquema por defecto
+        return 'dbo' if schema == 'public' else schema
+
+    def quote(self, identifier):
+        return f"[{identifier}]"
+
+    def staging_name(self):
+        return f"#{super().staging_name()}"
+
+    def unique_keys(self, cursor, schema, table, target):
+        cursor.execute("""
+            SELECT i.index_id, c.name
+            FROM sys.indexes i
+            JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+                                     AND ic.is_included_column = 0
+            JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+            WHERE i.object_id = OBJECT_ID(%s) AND i.is_unique = 1
+        """, (target,))
+        indexes: Dict[int, Set[str]] = {}
+        for index_id, column in cursor.fetchall():
+            indexes.setdefault(index_id, set()).add(column)
+        return list(indexes.values())
+
+    def create_staging(self, cursor, staging, target, columns):
+        cursor.execute(f"SELECT TOP 0 {self.column_list(columns)} INTO {staging} FROM {target}")
+
+    def drop_staging(self, cursor, staging):
+        cursor.execute(f"IF OBJECT_ID('tempdb..{staging}') IS NOT NULL DROP TABLE {staging}")
+
+    def merge(self, cursor, staging, target, columns, keys):
+        updates = [column for column in columns if column not in keys]
+        matched = ("WHEN MATCHED THEN UPDATE SET "
+                   + ", ".join(f"t.{self.quote(c)} = s.{self.quote(c)}" for c in updates)) if updates else ""
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            DECLARE @acciones TABLE (accion NVARCHAR(10));
+            MERGE {target} WITH (HOLDLOCK) AS t
+            USING {staging} AS s
+            ON {self.key_condition(keys, 't', 's')}
+            {matched}
+            WHEN NOT MATCHED THEN
+                INSERT ({self.column_list(columns)}) VALUES ({self.column_list(columns, 's')})
+            OUTPUT $action INTO @acciones;
+            SELECT COALESCE(SUM(CASE WHEN accion = 'INSERT' THEN 1 ELSE 0 END), 0),
+                   COALESCE(SUM(CASE WHEN accion = 'UPDATE' THEN 1 ELSE 0 END), 0)
+            FROM @acciones;
+        """)
+        inserted, updated = cursor.fetchone()
+        return inserted, updated
+
+
+class DuckDBUpsert(UpsertDialect):
+    db_type = 'duckdb'
+
+    @staticmethod
+    def adjust_schema(schema):
+        # DuckDB usa 'main' como esquema por defecto
+        return None if schema == 'main' else schema
+
+    def cursor(self, conn):
+        # cursor() en DuckDB abre otra conexión; se trabaja sobre la conexión nativa
+        return conn
+
+    def commit(self, conn):
+        pass
+
+    def unique_keys(self, cursor, schema, table, target):
+        cursor.execute("""
+            SELECT constraint_column_names FROM duckdb_constraints()
+            WHERE table_name = ? AND schema_name = ? AND constraint_type IN ('PRIMARY KEY', 'UNIQUE')
+        """, (table, schema or 'main'))
+        keys = [set(row[0]) for row in cursor.fetchall()]
+        # Los índices únicos no aparecen como restricciones; expressions viene como "[a, '"B c"']"
+        cursor.execute("""
+            SELECT expressions FROM duckdb_indexes()
+            WHERE table_name = ? AND schema_name = ? AND is_unique
+        """, (table, schema or 'main'))
+        for (expressions,) in cursor.fetchall():
+            keys.append({column.strip().strip("'").strip('"') for column in expressions.strip('[]').split(',')})
+        return keys
+
+    def create_unique_index(self, cursor, table, target, keys):
+        cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {self.quote(self.index_name(table, keys))} "
+                       f"ON {target} ({self.column_list(keys)})")
+
+    def create_staging(self, cursor, staging, target, columns):
+        # La tabla de staging la crea la carga Arrow con los tipos del DataFrame
+        pass
+
+    def load_staging(self, conn, df, staging):
+        rows, _ = bulk_load(self.db_type, conn, df, staging, self.logger,
+                            loaders=[DuckDBArrowLoader(self.logger, replace=True)])
+        return rows
+
+    def merge(self, cursor, staging, target, columns, keys):
+        updates = [column for column in columns if column not in keys]
+        action = ("DO UPDATE SET " + ", ".join(f"{self.quote(c)} = EXCLUDED.{self.quote(c)}" for c in updates)
+                  if updates else "DO NOTHING")
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            matched = self.count_matches(cursor, staging, target, keys)
+            cursor.execute(f"""
+                INSERT INTO {target} ({self.column_list(columns)})
+                SELECT {self.column_list(columns)} FROM {staging}
+                ON CONFLICT ({self.column_list(keys)}) {action}
+            """)
+            cursor.execute(f"SELECT COUNT(*) FROM {staging}")
+            total = cursor.fetchone()[0]
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        return total - matched, matched
+
+    def delete(self, cursor, staging, target, keys):
+        # DuckDB no informa rowcount; el DELETE devuelve el número de filas como resultado
+        cursor.execute(f"DELETE FROM {target} WHERE EXISTS "
+                       f"(SELECT 1 FROM {staging} s WHERE {self.key_condition(keys, target, 's')})")
+        return cursor.fetchone()[0]
+
+
+UPSERT_DIALECTS: Dict[str, type] = {
+    'postgresql': PostgresUpsert,
+    'mysql': MySQLUpsert,
+    'mssql': MSSQLUpsert,
+    'duckdb': DuckDBUpsert,
+}
+
+
+@contextmanager
+def _staging(dialect: UpsertDialect, conn, cursor, df: pd.DataFrame, target: str):
+    """Crea y carga la tabla de staging con df; la elimina al salir"""
+    staging = dialect.staging_name()
+    try:
+        dialect.create_staging(cursor, staging, target, list(df.columns))
+        dialect.commit(conn)
+        dialect.logger.message(f"Cargando {len(df)} filas en la tabla de staging {staging}")
+        loaded = dialect.load_staging(conn, df, staging)
+        # La carga fila a fila descarta las filas rechazadas sin fallar; aplicar un staging
+        # incompleto dejaría el destino sin esas filas y la huella incremental como si estuvieran
+        if loaded < len(df):
+            raise ValueError(f"Solo se cargaron {loaded} de {len(df)} filas en la tabla de staging {staging}")
+        yield staging
+        dialect.commit(conn)
+    except Exception:
+        dialect.rollback(conn)
+        raise
+    finally:
+        try:
+            dialect.drop_staging(cursor, staging)
+            dialect.commit(conn)
+        except Exception as e:
+            dialect.logger.warning(f"No se pudo eliminar la tabla de staging {staging}: {str(e)}")
+
+
+def _dialect_for(db_type: str, df: pd.DataFrame, keys: List[str], logger) -> UpsertDialect:
+    if db_type not in UPSERT_DIALECTS:
+        raise ValueError(f"Operación upsert no soportada para {db_type}")
+    missing = [key for key in keys if key not in df.columns]
+    if missing:
+        raise ValueError(f"Las columnas de la clave primaria no existen en los datos: {', '.join(missing)}")
+    return UPSERT_DIALECTS[db_type](logger)
+
+
+def staged_upsert(db_type: str, conn, df: pd.DataFrame, schema: Optional[str], table: str,
+                  keys: List[str], logger) -> Tuple[int, int]:
+    """
+    Inserta o actualiza df en schema.table según las columnas keys
+
+    Args:
+        db_type: 'postgresql', 'mysql', 'mssql' o 'duckdb'
+        conn: Conexión DB-API nativa del motor
+        schema: Esquema ya adaptado al motor (ver adjust_schema) o None
+        table: Tabla destino, que debe existir con las columnas de df
+
+    Returns:
+        Tuple: (filas insertadas, filas actualizadas)
+    """
+    dialect = _dialect_for(db_type, df, keys, logger)
+    target = dialect.qualify(schema, table)
+
+    # ON CONFLICT y MERGE fallan si una misma clave aparece dos veces en los datos
+    unique_df = df.drop_duplicates(subset=keys, keep='last')
+    if len(unique_df) < len(df):
+        logger.warning(f"Se descartaron {len(df) - len(unique_df)} filas con clave repetida (se conserva la última)")
+
+    cursor = dialect.cursor(conn)
+    if not any(set(keys) == existing for existing in dialect.unique_keys(cursor, schema, table, target)):
+        logger.message(f"Creando índice único sobre ({', '.join(keys)}) en {target}")
+        try:
+            dialect.create_unique_index(cursor, table, target, keys)
+            dialect.commit(conn)
+        except Exception as e:
+            dialect.rollback(conn)
+            if dialect.requires_unique_key:
+                raise ValueError(f"No se pudo crear el índice único sobre ({', '.join(keys)}) en {target}, "
+                                 f"necesario para el upsert: {str(e)}")
+            logger.warning(f"No se pudo crear el índice único en {target}: {str(e)}")
+
+    with _staging(dialect, conn, cursor, unique_df, target) as staging:
+        inserted, updated = dialect.merge(cursor, staging, target, list(unique_df.columns), keys)
+
+    logger.message(f"Upsert en {target}: {inserted} filas insertadas, {updated} actualizadas")
+    return inserted, updated
+
+
+def staged_delete(db_type: str, conn, keys_df: pd.DataFrame, schema: Optional[str], table: str,
+                  logger) -> int:
+    """
+    Elimina de schema.table las filas cuyas claves están en keys_df
+
+    Las claves se cargan en una tabla de staging y se borran con un solo DELETE.
+
+    Returns:
+        int: Filas eliminadas
+    """
+    keys = list(keys_df.columns)
+    dialect = _dialect_for(db_type, keys_df, keys, logger)
+    target = dialect.qualify(schema, table)
+    cursor = dialect.cursor(conn)
+    with _staging(dialect, conn, cursor, keys_df.drop_duplicates(), target) as staging:
+        deleted = dialect.delete(cursor, staging, target, keys)
+    logger.message(f"Se eliminaron {deleted} filas de {target}")
+    return deleted
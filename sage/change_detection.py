@@ -0,0 +1,146 @@
+"""
+Detección de cambios para materializaciones incrementales
+
+Por cada materialización se guarda una huella de la última carga: las columnas de
+la clave primaria, un hash de la clave y un hash de la fila completa. En la
+siguiente ejecución se comparan los hashes (calculados con
+pandas.util.hash_pandas_object, sin recorrer filas en Python) y solo se envían al
+destino las filas nuevas, las modificadas y las claves que ya no aparecen.
+
+Pensado para emisores que reenvían cada día una foto casi idéntica del catálogo.
+"""
+import os
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .constraints import KeyIndex, key_hashes
+
+# Directorio de las huellas; se puede ajustar con SAGE_MATERIALIZATION_STATE_DIR
+DEFAULT_STATE_DIR = "materialization_state"
+
+KEY_HASH = '_sage_key_hash'
+ROW_HASH = '_sage_row_hash'
+# Columna que indica el tipo de cambio en los archivos delta de destinos cloud
+CHANGE_COLUMN = '_sage_operacion'
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hash de 64 bits de cada fila
+
+    Las columnas numéricas se normalizan igual que en constraints.key_hashes, así
+    un cambio de dtype entre cargas (int64 a float64 por un nulo) no altera el hash.
+    """
+    return key_hashes(df, list(df.columns)).to_numpy()
+
+
+def fingerprint(df: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """Huella de df: columnas clave, hash de la clave y hash de la fila"""
+    state = df[keys].reset_index(drop=True)
+    state[KEY_HASH] = key_hashes(df, keys).to_numpy()
+    state[ROW_HASH] = row_hashes(df)
+    return state
+
+
+class ChangeSet:
+    """Diferencias entre la carga anterior y los datos actuales"""
+
+    def __init__(self, inserts: pd.DataFrame, updates: pd.DataFrame, deletes: pd.DataFrame, state: pd.DataFrame):
+        self.inserts = inserts
+        self.updates = updates
+        self.deletes = deletes  # Solo columnas clave
+        self.state = state  # Huella a guardar si la carga termina bien
+
+    @property
+    def changed(self) -> pd.DataFrame:
+        """Filas a insertar o actualizar"""
+        return pd.concat([self.inserts, self.updates], ignore_index=True)
+
+    @property
+    def empty(self) -> bool:
+        return self.inserts.empty and self.updates.empty and self.deletes.empty
+
+    def to_delta_frame(self) -> pd.DataFrame:
+        """Filas cambiadas con la columna _sage_operacion ('insert', 'update' o 'delete')"""
+        return pd.concat([
+            self.inserts.assign(**{CHANGE_COLUMN: 'insert'}),
+            self.updates.assign(**{CHANGE_COLUMN: 'update'}),
+            self.deletes.assign(**{CHANGE_COLUMN: 'delete'}),
+        ], ignore_index=True)
+
+    def summary(self) -> str:
+        return f"{len(self.inserts)} nuevas, {len(self.updates)} modificadas, {len(self.deletes)} eliminadas"
+
+
+def detect_changes(df: pd.DataFrame, keys: List[str], previous: Optional[pd.DataFrame],
+                   include_deletes: bool = True) -> ChangeSet:
+    """
+    Compara df con la huella de la carga anterior
+
+    Args:
+        df: Datos actuales ya preparados para el destino
+        keys: Columnas de la clave primaria
+        previous: Huella guardada (None en la primera carga: todo se considera nuevo)
+        include_deletes: Si las claves ausentes en df se informan como eliminadas
+
+    Returns:
+        ChangeSet: Inserciones, actualizaciones y eliminaciones
+    """
+    missing = [key for key in keys if key not in df.columns]
+    if missing:
+        raise ValueError(f"Las columnas de la clave primaria no existen en los datos: {', '.join(missing)}")
+
+    current = df.drop_duplicates(subset=keys, keep='last').reset_index(drop=True)
+    state = fingerprint(current, keys)
+    if previous is None or previous.empty:
+        return ChangeSet(current, current.iloc[0:0], current[keys].iloc[0:0], state)
+
+    # Posición de cada clave actual en la huella anterior (-1 si es nueva)
+    positions = pd.Index(previous[KEY_HASH].to_numpy()).get_indexer(state[KEY_HASH].to_numpy())
+    is_new = positions < 0
+    previous_hashes = previous[ROW_HASH].to_numpy()[np.where(is_new, 0, positions)]
+    is_changed = ~is_new & (previous_hashes != state[ROW_HASH].to_numpy())
+
+    if include_deletes:
+        gone = ~previous[KEY_HASH].isin(state[KEY_HASH]).to_numpy()
+        deletes = previous.loc[gone, keys]
+        if not deletes.empty:
+            # Un hash distinto no basta: nunca se elimina una clave que sigue en los datos
+            deletes = deletes[KeyIndex(current, keys).missing_mask(deletes, keys)]
+        deletes = deletes.reset_index(drop=True)
+    else:
+        deletes = current[keys].iloc[0:0]
+
+    return ChangeSet(current[is_new].reset_index(drop=True), current[is_changed].reset_index(drop=True),
+                     deletes, state)
+
+
+class FingerprintStore:
+    """Huellas por materialización en archivos Parquet locales"""
+
+    def __init__(self, state_dir: Optional[str] = None):
+        self.state_dir = state_dir or os.environ.get('SAGE_MATERIALIZATION_STATE_DIR', DEFAULT_STATE_DIR)
+
+    def _path(self, materialization_id: int) -> str:
+        return os.path.join(self.state_dir, f"{materialization_id}.parquet")
+
+    def load(self, materialization_id: int) -> Optional[pd.DataFrame]:
+        path = self._path(materialization_id)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)
+
+    def save(self, materialization_id: int, state: pd.DataFrame) -> None:
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._path(materialization_id)
+        # Escritura atómica: una huella a medio escribir haría perder cambios en la siguiente carga
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        state.to_parquet(temp_path, index=False)
+        os.replace(temp_path, path)
+
+    def clear(self, materialization_id: int) -> None:
+        path = self._path(materialization_id)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,172 @@
+"""Verificación en una sola pasada de campos requeridos y claves únicas para SAGE"""
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+
+def _column_codes(series: pd.Series) -> np.ndarray:
+    """
+    Códigos enteros por valor distinto de la columna (-1 para los nulos)
+
+    pd.factorize recorre la columna una sola vez con una tabla hash sobre el array
+    subyacente, sin crear objetos intermedios por fila.
+    """
+    codes, _ = pd.factorize(series, use_na_sentinel=True)
+    return codes
+
+
+def _combine_codes(codes: List[np.ndarray]) -> np.ndarray:
+    """Combina los códigos de varias columnas en un único código por combinación de valores"""
+    combined = codes[0].astype(np.int64) + 1
+    for column_codes in codes[1:]:
+        combined = combined * (int(column_codes.max(initial=-1)) + 2) + (column_codes + 1)
+        # Volver a compactar los códigos para que el producto nunca desborde int64
+        combined, _ = pd.factorize(combined)
+    return combined
+
+
+def _duplicated(codes: np.ndarray) -> np.ndarray:
+    """Marca todas las apariciones de cada código salvo la primera"""
+    return pd.Series(codes, copy=False).duplicated().to_numpy()
+
+
+def check_constraints(df: pd.DataFrame, required: Iterable[str],
+                      unique_keys: Iterable[Sequence[str]]) -> Dict[Tuple[str, Tuple[str, ...]], np.ndarray]:
+    """
+    Calcula los nulos y duplicados de todas las columnas con restricciones a la vez
+
+    Cada columna se factoriza una sola vez y sus códigos se reutilizan para la
+    verificación de requeridos, de únicos y de las claves únicas compuestas que la
+    incluyan. Solo se devuelven máscaras booleanas: el DataFrame no se copia.
+
+    Args:
+        df: DataFrame a verificar
+        required: Columnas que no pueden tener nulos
+        unique_keys: Claves únicas; cada una es una secuencia de una o más columnas
+
+    Returns:
+        Dict: {('requerido', (columna,)): máscara de nulos,
+               ('unico', columnas): máscara de filas duplicadas}
+    """
+    codes = {}
+
+    def get_codes(column: str) -> np.ndarray:
+        if column not in codes:
+            codes[column] = _column_codes(df[column])
+        return codes[column]
+
+    results = {}
+    for column in required:
+        results[('requerido', (column,))] = get_codes(column) == -1
+
+    for key in unique_keys:
+        key = tuple(key)
+        key_codes = [get_codes(column) for column in key]
+        # Con una sola columna los nulos cuentan como un valor más, igual que Series.duplicated
+        combined = key_codes[0] if len(key_codes) == 1 else _combine_codes(key_codes)
+        results[('unico', key)] = _duplicated(combined)
+
+    return results
+
+
+def key_hashes(df: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    """
+    Hash de 64 bits por fila de la combinación de valores de columns
+
+    Las columnas numéricas se normalizan a float para que 1 y 1.0 coincidan aunque
+    el dtype varíe entre bloques (modo streaming).
+    """
+    normalized = {}
+    for column in columns:
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            series = series.astype('float64')
+        normalized[column] = series
+
+    if len(columns) == 1:
+        return pd.util.hash_pandas_object(normalized[columns[0]], index=False)
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized, index=df.index), index=False)
+
+
+class KeyIndex:
+    """
+    Índice hash de las claves existentes en un catálogo referenciado
+
+    Se construye una sola vez por catálogo y columnas de clave y se reutiliza para
+    todas las claves foráneas que lo referencian.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Sequence[str]):
+        self.columns = tuple(columns)
+        keys = df[list(self.columns)].dropna()
+        if len(self.columns) == 1:
+            self.index = pd.Index(pd.unique(keys[self.columns[0]]))
+        else:
+            self.index = pd.MultiIndex.from_frame(keys.drop_duplicates())
+        # Forzar ahora la construcción de la tabla hash del índice
+        self.index.get_indexer(self.index[:1])
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def missing_mask(self, df: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+        """
+        Marca las filas de df cuya clave no existe en el índice
+
+        Las filas con algún valor nulo en la clave no se consideran huérfanas.
+        """
+        keys = df[list(columns)]
+        present = keys.notna().all(axis=1).to_numpy()
+        missing = np.zeros(len(df), dtype=bool)
+        if not present.any():
+            return missing
+
+        if len(columns) == 1:
+            lookup = keys.iloc[present, 0]
+        else:
+            lookup = pd.MultiIndex.from_frame(keys[present])
+        missing[present] = self.index.get_indexer(lookup) == -1
+        return missing
+
+
+class HashSet:
+    """
+    Conjunto creciente de hashes de 64 bits para comparar claves entre bloques
+
+    Los hashes se guardan en arrays uint64 ordenados de tamaños decrecientes; al añadir
+    un bloque se fusionan los arrays de tamaño parecido (como un contador binario), de
+    modo que cada hash se copia O(log n) veces y una búsqueda recorre O(log n) arrays
+    con np.searchsorted, sin crear un objeto Python por clave.
+    """
+
+    def __init__(self):
+        self.runs: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Marca los hashes que ya están en el conjunto"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        # Buscar los hashes ya ordenados recorre cada array en orden y aprovecha la caché
+        order = np.argsort(hashes)
+        needles = hashes[order]
+        found_sorted = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            positions = np.searchsorted(run, needles)
+            positions[positions == len(run)] = 0
+            found_sorted |= run[positions] == needles
+        found = np.empty(len(hashes), dtype=bool)
+        found[order] = found_sorted
+        return found
+
+    def add(self, hashes: np.ndarray) -> None:
+        """Añade hashes que aún no están en el conjunto (contains() debe devolver False para todos)"""
+        run = np.unique(np.asarray(hashes, dtype=np.uint64))
+        if not len(run):
+            return
+        while self.runs and len(self.runs[-1]) <= 2 * len(run):
+            # Dos arrays ya ordenados: la ordenación estable (timsort) solo los intercala
+            run = np.concatenate([self.runs.pop(), run])
+            run.sort(kind='stable')
+        self.runs.append(run)
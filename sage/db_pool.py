@@ -0,0 +1,125 @@
+"""Pool de conexiones PostgreSQL compartido por todo el proceso"""
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+import psycopg2
+from psycopg2 import pool
+
+logger = logging.getLogger(__name__)
+
+# Máximo de conexiones abiertas por pool (una por DSN); se puede ajustar con SAGE_DB_POOL_SIZE
+DEFAULT_POOL_SIZE = 10
+
+_pools: Dict[str, pool.ThreadedConnectionPool] = {}
+_leases: Dict[int, Optional[str]] = {}  # id(conexión) -> DSN del pool (None si no es del pool)
+_lock = threading.Lock()
+_pid = os.getpid()
+_inherited = []  # Pools heredados de un fork: se conservan para que no cierren las conexiones del padre
+
+
+def _resolve_dsn(dsn: Optional[str]) -> str:
+    dsn = dsn or os.environ.get('DATABASE_URL')
+    if not dsn:
+        raise ValueError("No se ha configurado DATABASE_URL")
+    return dsn
+
+
+def get_pool(dsn: Optional[str] = None) -> pool.ThreadedConnectionPool:
+    """
+    Devuelve el pool del proceso para dsn (por defecto DATABASE_URL), creándolo la primera vez
+
+    Tras un fork el proceso hijo crea sus propios pools: las conexiones heredadas
+    del padre no se reutilizan.
+    """
+    global _pid
+    dsn = _resolve_dsn(dsn)
+    with _lock:
+        if os.getpid() != _pid:
+            _inherited.extend(_pools.values())
+            _pools.clear()
+            _leases.clear()
+            _pid = os.getpid()
+
+        connection_pool = _pools.get(dsn)
+        if connection_pool is None or connection_pool.closed:
+            size = max(1, int(os.environ.get('SAGE_DB_POOL_SIZE', DEFAULT_POOL_SIZE)))
+            connection_pool = _pools[dsn] = pool.ThreadedConnectionPool(1, size, dsn)
+        return connection_pool
+
+
+def acquire(dsn: Optional[str] = None):
+    """
+    Toma una conexión del pool; debe devolverse con release()
+
+    Pensado para objetos que mantienen una conexión durante su vida. Si el pool está
+    agotado se abre una conexión directa, que release() cierra en lugar de devolver.
+    """
+    dsn = _resolve_dsn(dsn)
+    connection_pool = get_pool(dsn)
+    for _ in range(2):
+        try:
+            conn = connection_pool.getconn()
+        except pool.PoolError:
+            logger.warning("Pool de conexiones agotado; se abre una conexión directa")
+            conn = psycopg2.connect(dsn)
+            with _lock:
+                _leases[id(conn)] = None
+            return conn
+
+        if not conn.closed:
+            with _lock:
+                _leases[id(conn)] = dsn
+            return conn
+        # Conexión cerrada por el servidor: descartarla y pedir otra
+        connection_pool.putconn(conn, close=True)
+
+    raise psycopg2.OperationalError("No se pudo obtener una conexión válida del pool")
+
+
+def release(conn, discard: bool = False) -> None:
+    """Devuelve al pool una conexión obtenida con acquire() (discard=True la cierra)"""
+    if conn is None:
+        return
+    with _lock:
+        dsn = _leases.pop(id(conn), None)
+        connection_pool = _pools.get(dsn) if dsn is not None else None
+
+    if connection_pool is None or connection_pool.closed:
+        # Conexión directa o de un pool ya cerrado
+        if not conn.closed:
+            conn.close()
+        return
+    connection_pool.putconn(conn, close=discard or bool(conn.closed))
+
+
+@contextmanager
+def connection(dsn: Optional[str] = None):
+    """
+    Conexión del pool para un bloque; al salir se devuelve al pool
+
+    Las transacciones no confirmadas con commit() se deshacen al devolver la conexión.
+    """
+    conn = acquire(dsn)
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        release(conn, discard=broken)
+
+
+def close_all() -> None:
+    """Cierra todos los pools del proceso"""
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _leases.clear()
+    for connection_pool in pools:
+        try:
+            connection_pool.closeall()
+        except Exception:
+            pass
@@ -0,0 +1,97 @@
+"""Almacén acotado de eventos del logger con volcado a disco en JSON Lines"""
+import json
+import os
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+from .report_writer import json_default
+
+
+class EventStore:
+    """
+    Lista de eventos con memoria acotada
+
+    En memoria solo se guardan contadores por severidad y por regla y una muestra
+    con los primeros sample_size eventos. Cada evento completo se escribe en el
+    archivo spill_path (un objeto JSON por línea), desde donde se puede recorrer
+    la lista completa sin cargarla en memoria.
+    """
+
+    def __init__(self, spill_path: str, sample_size: int = 1000):
+        self.spill_path = spill_path
+        self.sample_size = sample_size
+        self.sample: List[Dict[str, Any]] = []
+        self.by_severity = Counter()
+        self.by_rule = Counter()  # Fallos por regla (usa 'total' en los eventos por lote)
+        self._count = 0
+        self._file = None
+        self._spilled = False
+
+    def append(self, event: Dict[str, Any]) -> None:
+        """Registra un evento: actualiza los contadores, la muestra y el archivo en disco"""
+        self._count += 1
+        self.by_severity[event.get('severity')] += 1
+        details = event.get('details', event)
+        rule = details.get('rule')
+        if rule is not None:
+            self.by_rule[str(rule)] += details.get('total') or 1
+
+        if len(self.sample) < self.sample_size:
+            self.sample.append(event)
+
+        if self._file is None:
+            # Truncar solo la primera vez; tras close() se sigue anexando
+            mode = "a" if self._spilled else "w"
+            self._file = open(self.spill_path, mode, encoding="utf-8", buffering=256 * 1024)
+            self._spilled = True
+        self._file.write(json.dumps(event, ensure_ascii=False, default=json_default, separators=(",", ":")))
+        self._file.write("\n")
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def truncated(self) -> bool:
+        """Indica si la muestra en memoria no contiene todos los eventos"""
+        return self._count > len(self.sample)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Recorre todos los eventos; si la muestra está completa no se lee el disco"""
+        if not self.truncated:
+            yield from list(self.sample)
+            return
+
+        self.flush()
+        with open(self.spill_path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def iter_json(self) -> Iterator[str]:
+        """Recorre todos los eventos ya serializados (una cadena JSON por evento)"""
+        if not self._spilled:
+            return
+        self.flush()
+        with open(self.spill_path, encoding="utf-8") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+    def counters(self) -> Dict[str, Dict[str, int]]:
+        """Contadores compactos para el reporte"""
+        return {
+            "total": self._count,
+            "by_severity": {str(severity): count for severity, count in self.by_severity.items()},
+            "by_rule": dict(self.by_rule.most_common())
+        }
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def file_name(self) -> Optional[str]:
+        """Nombre del archivo con el detalle completo (None si no hubo eventos)"""
+        return os.path.basename(self.spill_path) if self._count else None
@@ -67,6 +67,10 @@ class FileProcessingError(SAGEError):
         
         return result
 
+class ValidationBudgetExceeded(FileProcessingError):
+    """Raised when a file is rejected early because a sample of it exceeds the validation budget"""
+    pass
+
 class ConfigurationError(SAGEError):
     """Raised when configuration is invalid"""
     pass
@@ -0,0 +1,210 @@
+"""Registro de ejecuciones en ejecuciones_yaml (opcionalmente por lotes) y caché de casillas/emisores"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import psycopg2
+from psycopg2 import errors as psycopg2_errors
+from psycopg2.extras import execute_values
+from . import db_pool
+
+logger = logging.getLogger(__name__)
+
+# Segundos durante los que se reutiliza el resultado de comprobar si existe una casilla o un emisor
+REFERENCE_CACHE_TTL = 300
+
+# Errores de conexión: las filas se conservan; cualquier otro error se atribuye a los datos
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+_reference_cache: Dict[Tuple[str, int], float] = {}
+_reference_lock = threading.Lock()
+
+
+def reference_exists(table: str, record_id: int) -> bool:
+    """
+    Indica si existe el registro record_id en table ('casillas' o 'emisores')
+
+    Los registros encontrados se guardan en caché REFERENCE_CACHE_TTL segundos para no
+    consultar la base de datos en cada ejecución; los que no existen se vuelven a
+    consultar, porque pueden darse de alta en cualquier momento.
+    """
+    if table not in ('casillas', 'emisores'):
+        raise ValueError(f"Tabla no soportada: {table}")
+
+    key = (table, record_id)
+    now = time.monotonic()
+    with _reference_lock:
+        cached_at = _reference_cache.get(key)
+    if cached_at is not None and now - cached_at < REFERENCE_CACHE_TTL:
+        return True
+
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT 1 FROM {table} WHERE id = %s", (record_id,))
+            exists = cur.fetchone() is not None
+
+    if exists:
+        with _reference_lock:
+            _reference_cache[key] = now
+    return exists
+
+
+class ExecutionRecorder:
+    """
+    Cola de filas de ejecuciones_yaml
+
+    Por defecto (batch_size 1) cada fila se inserta en el momento en que se agrega y
+    un error se propaga al llamador, que lo informa en el log de la ejecución. Con
+    SAGE_DB_BATCH_SIZE mayor que 1 (cargas masivas por línea de comandos) las filas
+    se insertan al llegar a batch_size, flush_interval segundos después de la primera
+    fila pendiente y al terminar el proceso. Si no hay conexión con la base de datos,
+    las filas se conservan (hasta MAX_PENDING) para reintentarlas en la siguiente
+    inserción; las filas que la base de datos rechaza se descartan y se registran en
+    el log para que no bloqueen las siguientes.
+    """
+
+    COLUMNS = ('nombre_yaml', 'archivo_datos', 'estado', 'errores_detectados', 'warnings_detectados',
+               'ruta_directorio', 'casilla_id', 'emisor_id', 'metodo_envio', 'metricas')
+    MAX_PENDING = 1000
+
+    def __init__(self, batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.batch_size = max(1, batch_size or int(os.environ.get('SAGE_DB_BATCH_SIZE', 1)))
+        self.flush_interval = flush_interval if flush_interval is not None else \
+            float(os.environ.get('SAGE_DB_BATCH_INTERVAL', 2.0))
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._has_metricas = True  # Se desactiva si la columna aún no existe (migración pendiente)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """
+        Encola una ejecución; row usa los nombres de COLUMNS
+
+        Si la fila completa un lote se inserta de inmediato y un error de la base de
+        datos se propaga (sin conexión la fila queda pendiente para reintentarla).
+        """
+        with self._lock:
+            self._pending.append(row)
+            pending = len(self._pending)
+            if pending < self.batch_size and self._timer is None and self.flush_interval > 0:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if pending >= self.batch_size or self.flush_interval <= 0:
+            self.flush(raise_errors=True)
+
+    def flush(self, raise_errors: bool = False) -> int:
+        """
+        Inserta las filas pendientes; devuelve el número de filas insertadas
+
+        Args:
+            raise_errors: Propagar el error de la inserción en lugar de solo registrarlo
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not rows:
+                return 0
+
+            inserted, rejected = 0, None
+            try:
+                with db_pool.connection() as conn:
+                    try:
+                        self._insert(conn, rows)
+                        conn.commit()
+                        return len(rows)
+                    except CONNECTION_ERRORS:
+                        raise
+                    except Exception as e:
+                        # Un error de datos deshace todo el lote: se reintenta fila a fila para
+                        # descartar solo las filas que la base de datos rechaza
+                        conn.rollback()
+                        rejected = e
+                        if len(rows) == 1:
+                            self._discard(rows.pop(), e)
+                    while rows:
+                        try:
+                            self._insert(conn, rows[:1])
+                            conn.commit()
+                            inserted += 1
+                        except CONNECTION_ERRORS:
+                            raise
+                        except Exception as e:
+                            conn.rollback()
+                            rejected = e
+                            self._discard(rows[0], e)
+                        rows = rows[1:]
+            except Exception as e:
+                # Sin conexión las filas se conservan para reintentarlas
+                logger.warning(f"No se pudieron registrar {len(rows)} ejecuciones: {e}")
+                with self._lock:
+                    self._pending = (rows + self._pending)[-self.MAX_PENDING:]
+                if raise_errors:
+                    raise
+                return inserted
+            if rejected is not None and raise_errors:
+                raise rejected
+            return inserted
+
+    @staticmethod
+    def _discard(row: Dict[str, Any], error: Exception) -> None:
+        logger.error(f"Se descarta la ejecución de {row.get('nombre_yaml')} ({row.get('archivo_datos')}) "
+                     f"rechazada por la base de datos: {error}")
+
+    def _insert(self, conn, rows: List[Dict[str, Any]]) -> None:
+        with conn.cursor() as cur:
+            if self._has_metricas:
+                cur.execute("SAVEPOINT registrar_metricas")
+                try:
+                    self._execute(cur, self.COLUMNS, rows)
+                    return
+                except psycopg2_errors.UndefinedColumn:
+                    # Falta sql/migrations/add_metricas_to_ejecuciones_yaml.sql: registrar sin métricas
+                    cur.execute("ROLLBACK TO SAVEPOINT registrar_metricas")
+                    self._has_metricas = False
+            self._execute(cur, self.COLUMNS[:-1], rows)
+
+    def _execute(self, cur, columns: Tuple[str, ...], rows: List[Dict[str, Any]]) -> None:
+        values = [
+            tuple(json.dumps(row.get(column)) if column == 'metricas' else row.get(column) for column in columns)
+            for row in rows
+        ]
+        execute_values(
+            cur,
+            f"INSERT INTO ejecuciones_yaml ({', '.join(columns)}) VALUES %s",
+            values
+        )
+
+
+_recorder: Optional[ExecutionRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> ExecutionRecorder:
+    """Cola de ejecuciones compartida por el proceso"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = ExecutionRecorder()
+        return _recorder
+
+
+def record_execution(row: Dict[str, Any]) -> None:
+    """Encola una fila para ejecuciones_yaml (ver ExecutionRecorder)"""
+    get_recorder().add(row)
+
+
+def flush_executions() -> int:
+    """Inserta de inmediato las ejecuciones pendientes"""
+    return _recorder.flush() if _recorder is not None else 0
+
+
+atexit.register(flush_executions)
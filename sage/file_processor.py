@@ -1,26 +1,43 @@
 """File processing functionality for SAGE"""
 import os
+import io
+import pickle
+import time
 import zipfile
-import tempfile
+from contextlib import contextmanager
+import multiprocessing
+import posixpath
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Tuple, Optional, Set, Union
 from .models import SageConfig, Catalog, Package, ValidationRule, Severity
 from .logger import SageLogger
-from .exceptions import FileProcessingError
+from .metrics import ExecutionMetrics
+from .exceptions import FileProcessingError, ValidationBudgetExceeded
+from .rule_compiler import compile_rule
+from .constraints import HashSet, KeyIndex, check_constraints, key_hashes
+from .type_coercion import integer_mask, invalid_boolean_mask, parse_dates
+from .zip_member import ZipMember
+
+def open_binary(file_path):
+    """Abre en modo binario una ruta en disco o un miembro de un paquete ZIP"""
+    if isinstance(file_path, ZipMember):
+        return file_path.open()
+    return open(file_path, 'rb')
 
 def detect_bom(file_path):
     """
     Detecta si un archivo tiene BOM (Byte Order Mark)
 
     Args:
-        file_path: Ruta al archivo a comprobar
+        file_path: Ruta al archivo a comprobar (o miembro de un ZIP)
 
     Returns:
         bool: True si el archivo tiene BOM, False en caso contrario
     """
     try:
-        with open(file_path, 'rb') as f:
+        with open_binary(file_path) as f:
             # BOM UTF-8: EF BB BF
             return f.read(3) == b'\xef\xbb\xbf'
     except Exception:
@@ -51,6 +68,18 @@ class FileProcessor:
     MAX_ERRORS_PER_RULE = 10       # Máximo número de errores a mostrar por regla
     SMALL_FILE_THRESHOLD = 30      # Número de filas bajo el cual un archivo se considera "pequeño"
 
+    # Avisos con el total de fallos cuando solo se detallan los primeros MAX_ERRORS_PER_RULE
+    CONSTRAINT_SUMMARIES = {
+        'tipo': "Se encontraron {count} errores de tipo para el campo '{field}'. ",
+        'requerido': "Se encontraron {count} valores nulos para el campo requerido '{field}'. ",
+        'unico': "Se encontraron {count} valores duplicados para el campo único '{field}'. "
+    }
+
+    # Límites para los archivos contenidos en un paquete ZIP
+    MAX_ZIP_MEMBER_SIZE = 4 * 1024 ** 3   # Tamaño descomprimido máximo por archivo (4 GiB)
+    MAX_ZIP_COMPRESSION_RATIO = 1000      # Relación descomprimido/comprimido máxima
+    ZIP_RATIO_MIN_SIZE = 10 * 1024 ** 2   # La relación solo se comprueba a partir de 10 MiB
+
     # Mapeo de tipos SAGE a tipos pandas
     TYPE_MAPPING = {
         'texto': str,
@@ -60,9 +89,12 @@ class FileProcessor:
         'booleano': bool
     }
 
-    def __init__(self, config: SageConfig, logger: SageLogger):
+    def __init__(self, config: SageConfig, logger: SageLogger, chunksize: Optional[int] = None,
+                 workers: Optional[int] = None):
         self.config = config
         self.logger = logger
+        self.chunksize = chunksize  # Si se indica, fuerza el modo streaming para todos los catálogos CSV
+        self.workers = workers  # Procesos para validar catálogos de un ZIP en paralelo (0 = todos los núcleos)
         self.error_count = 0
         self.warning_count = 0
         self.dataframes = {}  # Store DataFrames for cross-catalog validation
@@ -71,8 +103,13 @@ class FileProcessor:
         self.field_rules_skipped = {}   # {field_name: {rule_name: error_count}}
         self.row_rules_skipped = {}     # {catalog_name: {rule_name: error_count}}
         self.catalog_rules_skipped = {} # {catalog_name: {rule_name: error_count}}
+        self.rule_failure_counts = {}   # {(tipo, archivo, [campo,] regla): fallos acumulados}
 
-    def _validate_data_types(self, df: pd.DataFrame, catalog: Catalog) -> pd.DataFrame:
+        # Tiempos por etapa y contadores; se comparten con el logger para incluirlos en el reporte
+        self.metrics = getattr(logger, 'metrics', None) or ExecutionMetrics()
+
+    def _validate_data_types(self, df: pd.DataFrame, catalog: Catalog,
+                             stream_state: Optional[Dict] = None) -> pd.DataFrame:
         """Validate and convert data types according to field specifications"""
         for field in catalog.fields:
             if field.type not in self.TYPE_MAPPING:
@@ -85,14 +122,20 @@ class FileProcessor:
                 # Intentar convertir al tipo especificado
                 target_type = self.TYPE_MAPPING[field.type]
 
+                # Con el motor pyarrow el texto se mantiene en memoria de Arrow. Los nulos se
+                # convierten en 'None', igual que astype(str) en el lector de pandas
+                if field.type == 'texto' and catalog.file_format.engine == 'pyarrow':
+                    df[field.name] = df[field.name].astype('string[pyarrow]').fillna('None')
+                    continue
+
                 # Para campos de texto, reemplazar NaN por None antes de convertir
                 if field.type == 'texto':
                     df[field.name] = df[field.name].replace({np.nan: None})
 
                 # Convertir la columna al tipo especificado
                 if field.type == 'fecha':
-                    # Para fechas, usar pd.to_datetime en lugar de astype
-                    df[field.name] = pd.to_datetime(df[field.name], errors='coerce')
+                    # Para fechas, usar pd.to_datetime en lugar de astype (con el formato del campo si se definió)
+                    df[field.name] = parse_dates(df[field.name], field.date_format)
                 elif field.type in ['entero', 'decimal'] and not field.required:
                     # Para campos numéricos opcionales, usar pd.to_numeric con coerce
                     # para convertir a numéricos pero preservar NaN donde corresponda
@@ -101,7 +144,7 @@ class FileProcessor:
                     # Si es campo entero, convertir a entero los números sin decimales
                     if field.type == 'entero':
                         # Verificar si cada valor es efectivamente un entero
-                        mask = df[field.name].notna() & df[field.name].apply(lambda x: float(x).is_integer() if pd.notnull(x) and not isinstance(x, bool) else False)
+                        mask = integer_mask(df[field.name], coerce=True)
                         if mask.any():
                             df.loc[mask, field.name] = df.loc[mask, field.name].astype('Int64')
                 elif field.type == 'entero':
@@ -109,7 +152,7 @@ class FileProcessor:
                     mask = df[field.name].notna()
                     if mask.any():
                         # Convertir solo valores numéricos que son enteros
-                        numeric_mask = mask & df[field.name].apply(lambda x: isinstance(x, (int, float)) and float(x).is_integer())
+                        numeric_mask = mask & integer_mask(df[field.name], bools=True)
                         if numeric_mask.any():
                             df.loc[numeric_mask, field.name] = df.loc[numeric_mask, field.name].astype('int64')
                 else:
@@ -132,30 +175,22 @@ class FileProcessor:
                     else:
                         # Si el campo es requerido, cualquier NaN o valor no numérico es inválido
                         invalid_mask = pd.to_numeric(df[field.name], errors='coerce').isna()
-
-                    invalid_rows = df[invalid_mask]
                 elif field.type == 'fecha':
                     # Para fechas, usar pd.to_datetime con coerce para detectar valores inválidos
-                    invalid_mask = pd.to_datetime(df[field.name], errors='coerce').isna()
-                    invalid_rows = df[invalid_mask]
+                    invalid_mask = parse_dates(df[field.name], field.date_format).isna()
                 elif field.type == 'texto':
                     # Para texto, verificar los valores que no son str o son NaN
                     invalid_mask = df[field.name].apply(lambda x: x is not None and not isinstance(x, str))
-                    invalid_rows = df[invalid_mask]
                 elif field.type == 'booleano':
                     # Para booleanos, permitir valores "verdaderos": True, 1, "1", "true", "True", etc.
                     # y valores "falsos": False, 0, "0", "false", "False", etc.
                     # Todo lo demás se considera inválido
-                    invalid_mask = df[field.name].apply(lambda x: not isinstance(x, bool) and
-                                                     not (isinstance(x, (int, float)) and (x == 0 or x == 1)) and
-                                                     not (isinstance(x, str) and x.lower() in ["true", "false", "1", "0"]))
-                    invalid_rows = df[invalid_mask]
+                    invalid_mask = invalid_boolean_mask(df[field.name])
                 else:
                     # Para cualquier otro tipo, intentar una conversión forzada y capturar errores
-                    invalid_rows = pd.DataFrame()  # DataFrame vacío por defecto
+                    invalid_mask = None  # Sin máscara no se reporta ningún valor
                     try:
                         invalid_mask = df[field.name].apply(lambda x: not isinstance(x, target_type))
-                        invalid_rows = df[invalid_mask]
                     except TypeError:
                         # Si hay error en la conversión, reportar que no se puede validar este tipo
                         self.logger.warning(
@@ -165,25 +200,26 @@ class FileProcessor:
                         )
 
                 # Para archivos grandes, limitar el número de errores de tipo a reportar
-                is_large_file = len(df) > self.SMALL_FILE_THRESHOLD
-                error_count = 0
-
-                for idx, row in invalid_rows.iterrows():
-                    self.error_count += 1
-                    error_count += 1
-
-                    # Solo registrar los primeros MAX_ERRORS_PER_RULE errores para archivos grandes
-                    if not is_large_file or error_count <= self.MAX_ERRORS_PER_RULE:
-                        self.logger.error(
-                            f"Error de tipo de dato: el valor '{row[field.name]}' no es del tipo {field.type}",
-                            file=catalog.filename,
-                            line=idx + 2,
-                            field=field.name,
-                            value=row[field.name]
-                        )
+                is_large_file = stream_state is not None or len(df) > self.SMALL_FILE_THRESHOLD
+                stream_key = ('tipo', catalog.filename, field.name)
+                error_count = self._get_stream_error_count(stream_state, stream_key)
+
+                if invalid_mask is not None:
+                    # Solo se detallan los primeros MAX_ERRORS_PER_RULE errores para archivos grandes
+                    error_count += self._report_failures(
+                        df, invalid_mask, Severity.ERROR,
+                        f"Error de tipo de dato: valores que no son del tipo {field.type}",
+                        limit=self._detail_limit(is_large_file, error_count),
+                        value_column=field.name,
+                        file=catalog.filename,
+                        field=field.name
+                    )
 
+                # En modo streaming el aviso se emite una sola vez al terminar el archivo
+                if stream_state is not None:
+                    stream_state['error_counts'][stream_key] = error_count
                 # Si hay más errores de los que mostramos, indicarlo
-                if is_large_file and error_count > self.MAX_ERRORS_PER_RULE:
+                elif is_large_file and error_count > self.MAX_ERRORS_PER_RULE:
                     self.logger.warning(
                         f"Se encontraron {error_count} errores de tipo para el campo '{field.name}'. "
                         f"Solo se mostraron los primeros {self.MAX_ERRORS_PER_RULE} para mejorar el rendimiento.",
@@ -216,75 +252,19 @@ class FileProcessor:
             )
 
         try:
-            if file_type == 'CSV':
-                # Detectar BOM en el archivo CSV
-                has_bom = detect_bom(file_path)
-                encoding = 'utf-8-sig' if has_bom else 'utf-8'
-
-                # Para archivos sin encabezado, necesitamos crear nombres de columnas personalizados
-                if not catalog.file_format.header:
-                    # Primero determinar el número de columnas
-                    try:
-                        df_temp = pd.read_csv(
-                            file_path, 
-                            delimiter=catalog.file_format.delimiter, 
-                            header=None, 
-                            encoding=encoding, 
-                            nrows=1
-                        )
-                    except UnicodeDecodeError:
-                        # Si falla, intentar con latin1
-                        df_temp = pd.read_csv(
-                            file_path, 
-                            delimiter=catalog.file_format.delimiter, 
-                            header=None, 
-                            encoding='latin1', 
-                            nrows=1
-                        )
-                        encoding = 'latin1'
-
-                    # Obtener el número de columnas y crear los nombres
-                    n_columns = len(df_temp.columns)
-                    column_names = create_column_names(n_columns)
-
-                    # Cargar el CSV completo con los nombres de columnas personalizados
-                    try:
-                        df = pd.read_csv(
-                            file_path,
-                            delimiter=catalog.file_format.delimiter,
-                            header=None,
-                            encoding=encoding,
-                            names=column_names
-                        )
-                    except Exception:
-                        # Si falla, intentar con latin1
-                        df = pd.read_csv(
-                            file_path,
-                            delimiter=catalog.file_format.delimiter,
-                            header=None,
-                            encoding='latin1',
-                            names=column_names
-                        )
-                else:
-                    # Con encabezado, usar el método estándar
-                    try:
-                        df = pd.read_csv(
-                            file_path,
-                            delimiter=catalog.file_format.delimiter,
-                            header=0,
-                            encoding=encoding
-                        )
-                    except UnicodeDecodeError:
-                        # Si falla, intentar con latin1
-                        df = pd.read_csv(
-                            file_path,
-                            delimiter=catalog.file_format.delimiter,
-                            header=0,
-                            encoding='latin1'
-                        )
+            if file_type == 'CSV' and catalog.file_format.engine == 'pyarrow':
+                df = self._read_csv_arrow(file_path, catalog)
+                if df is None:
+                    self.logger.message(
+                        f"{os.path.basename(file_path)} tiene filas con un número de columnas distinto "
+                        f"al encabezado: se lee con el motor pandas"
+                    )
+                    df = self._read_csv_pandas(file_path, catalog)
+            elif file_type == 'CSV':
+                df = self._read_csv_pandas(file_path, catalog)
             elif file_type == 'EXCEL':
                 df = pd.read_excel(
-                    file_path,
+                    file_path.read_buffer() if isinstance(file_path, ZipMember) else file_path,
                     header=0 if catalog.file_format.header else None,
                     engine='openpyxl'  # Especificar el engine explícitamente
                 )
@@ -295,20 +275,452 @@ class FileProcessor:
                     column_names = create_column_names(n_columns)
                     df.columns = column_names
 
-            # Preprocesar campos numéricos antes de validación
-            for field in catalog.fields:
-                if field.type == 'entero':
-                    # Detectar y convertir números que son efectivamente enteros
-                    mask = df[field.name].notna()
-                    if mask.any():
-                        df.loc[mask, field.name] = pd.to_numeric(df.loc[mask, field.name], downcast='integer')
+            with self.metrics.stage('type_conversion'):
+                df = self._adapt_to_catalog_schema(df, catalog, file_path)
+
+                # Validar y convertir tipos de datos
+                df = self._validate_data_types(df, catalog)
+            return df
+
+        except Exception as e:
+            raise FileProcessingError(
+                f"Error al leer el archivo {os.path.basename(file_path)}: {str(e)}\n"
+                "Asegúrate de que el archivo tenga el formato correcto y no esté dañado."
+            )
 
-            # Nuevo código: Adaptar dataframe al esquema del catálogo
-            # Obtener los nombres de campos definidos en el YAML
-            yaml_field_names = [field.name for field in catalog.fields]
+    def _read_csv_pandas(self, file_path: str, catalog: Catalog) -> pd.DataFrame:
+        """Lee un CSV completo con el lector de pandas (UTF-8 o, si falla, latin1)"""
+        # Detectar BOM en el archivo CSV
+        has_bom = detect_bom(file_path)
+        encoding = 'utf-8-sig' if has_bom else 'utf-8'
+
+        # Para archivos sin encabezado, necesitamos crear nombres de columnas personalizados
+        if not catalog.file_format.header:
+            # Primero determinar el número de columnas
+            try:
+                df_temp = self._read_csv(
+                    file_path, 
+                    delimiter=catalog.file_format.delimiter, 
+                    header=None, 
+                    encoding=encoding, 
+                    nrows=1
+                )
+            except UnicodeDecodeError:
+                # Si falla, intentar con latin1
+                df_temp = self._read_csv(
+                    file_path, 
+                    delimiter=catalog.file_format.delimiter, 
+                    header=None, 
+                    encoding='latin1', 
+                    nrows=1
+                )
+                encoding = 'latin1'
+
+            # Obtener el número de columnas y crear los nombres
+            n_columns = len(df_temp.columns)
+            column_names = create_column_names(n_columns)
+
+            # Cargar el CSV completo con los nombres de columnas personalizados
+            try:
+                df = self._read_csv(
+                    file_path,
+                    delimiter=catalog.file_format.delimiter,
+                    header=None,
+                    encoding=encoding,
+                    names=column_names
+                )
+            except Exception:
+                # Si falla, intentar con latin1
+                df = self._read_csv(
+                    file_path,
+                    delimiter=catalog.file_format.delimiter,
+                    header=None,
+                    encoding='latin1',
+                    names=column_names
+                )
+        else:
+            # Con encabezado, usar el método estándar
+            try:
+                df = self._read_csv(
+                    file_path,
+                    delimiter=catalog.file_format.delimiter,
+                    header=0,
+                    encoding=encoding
+                )
+            except UnicodeDecodeError:
+                # Si falla, intentar con latin1
+                df = self._read_csv(
+                    file_path,
+                    delimiter=catalog.file_format.delimiter,
+                    header=0,
+                    encoding='latin1'
+                )
+        return df
 
-            # Verificar si hay más columnas en el CSV que en el YAML
-            if len(df.columns) > len(yaml_field_names):
+    def _read_file_measured(self, file_path: str, catalog: Catalog) -> pd.DataFrame:
+        """_read_file registrando el tiempo de lectura, las filas y los bytes leídos"""
+        with self.metrics.stage('read'):
+            df = self._read_file(file_path, catalog)
+        self.metrics.count('rows_read', len(df))
+        self.metrics.count('bytes_read', self._file_size(file_path))
+        return df
+
+    def _file_size(self, file_path: str) -> int:
+        """Tamaño en bytes del archivo (descomprimido en el caso de un miembro de ZIP)"""
+        if isinstance(file_path, ZipMember):
+            return file_path.file_size
+        try:
+            return os.path.getsize(file_path)
+        except OSError:
+            return 0
+
+    def _read_csv(self, file_path: str, **kwargs) -> pd.DataFrame:
+        """pd.read_csv que también acepta miembros de un ZIP, leídos como flujo sin extraerlos"""
+        if isinstance(file_path, ZipMember):
+            with file_path.open() as f:
+                return pd.read_csv(f, **kwargs)
+        return pd.read_csv(file_path, **kwargs)
+
+    def _read_csv_arrow(self, file_path: str, catalog: Catalog) -> Optional[pd.DataFrame]:
+        """
+        Lee un CSV completo con el lector multihilo de Apache Arrow (engine: pyarrow)
+
+        Las columnas de los campos texto se leen directamente como cadenas respaldadas
+        por Arrow (string[pyarrow]), sin crear un objeto Python por celda. El resto de
+        columnas se convierten a los mismos tipos NumPy que produce el lector de pandas,
+        con los mismos marcadores de nulo, y las fechas se dejan como texto igual que pandas.
+
+        Returns:
+            pd.DataFrame, o None si alguna fila tiene un número de columnas distinto al
+            encabezado: pandas rellena las filas cortas con nulos y Arrow las rechaza, así
+            que esos archivos se leen con el motor pandas para obtener el mismo resultado
+        """
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+        from pandas._libs.parsers import STR_NA_VALUES
+
+        def column_name(i: int, field) -> str:
+            # Sin encabezado Arrow nombra las columnas f0, f1, ... por posición
+            return field.name if catalog.file_format.header else f"f{i}"
+
+        column_types = {}
+        for i, field in enumerate(catalog.fields):
+            if field.type == 'texto':
+                # large_string solo identifica las columnas de texto al convertir a pandas
+                column_types[column_name(i, field)] = pa.large_string()
+            elif field.type == 'fecha':
+                # pandas no infiere fechas al leer: se convierten después con parse_dates
+                column_types[column_name(i, field)] = pa.string()
+
+        invalid_rows = []
+
+        def on_invalid_row(row):
+            invalid_rows.append(row.number)
+            return 'error'
+
+        def read(encoding: str):
+            with open_binary(file_path) as f:
+                return pa_csv.read_csv(
+                    f,
+                    read_options=pa_csv.ReadOptions(
+                        encoding=encoding,
+                        use_threads=True,
+                        autogenerate_column_names=not catalog.file_format.header
+                    ),
+                    parse_options=pa_csv.ParseOptions(
+                        delimiter=catalog.file_format.delimiter or ',',
+                        invalid_row_handler=on_invalid_row
+                    ),
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types=column_types,
+                        null_values=sorted(STR_NA_VALUES),
+                        strings_can_be_null=True
+                    )
+                )
+
+        try:
+            table = read('utf8')
+        except pa.ArrowInvalid:
+            if invalid_rows:
+                return None
+            # Si el archivo no es UTF-8 válido, intentar con latin1
+            try:
+                table = read('latin1')
+            except pa.ArrowInvalid:
+                if invalid_rows:
+                    return None
+                raise
+
+        if not catalog.file_format.header:
+            table = table.rename_columns(create_column_names(table.num_columns))
+
+        return table.to_pandas(types_mapper={pa.large_string(): pd.StringDtype('pyarrow')}.get)
+
+    def _get_chunksize(self, catalog: Catalog) -> Optional[int]:
+        """Tamaño de bloque para validar el catálogo en modo streaming (None = lectura completa)"""
+        if catalog.file_format.type != 'CSV':
+            return None
+        chunksize = self.chunksize or catalog.file_format.chunksize
+        if chunksize and catalog.catalog_validation:
+            # Las reglas de catálogo son agregados sobre el archivo completo (len(df), sumas...):
+            # evaluadas por bloque darían otro resultado, así que el catálogo se lee completo
+            self.logger.warning(
+                f"El catálogo '{catalog.name}' tiene reglas de catálogo: se valida completo en memoria "
+                f"en lugar de en modo streaming",
+                file=catalog.filename
+            )
+            return None
+        return chunksize
+
+    def _new_stream_state(self) -> Dict:
+        """Crea el estado mínimo que se conserva entre bloques en modo streaming"""
+        return {
+            'unique_seen': {},   # {field_name: HashSet} claves ya vistas en campos únicos
+            'error_counts': {},  # {(tipo, archivo, campo): errores acumulados}
+        }
+
+    def _get_stream_error_count(self, stream_state: Optional[Dict], key: Tuple) -> int:
+        """Devuelve los errores ya acumulados en bloques anteriores para una verificación"""
+        if stream_state is None:
+            return 0
+        return stream_state['error_counts'].get(key, 0)
+
+    def _duplicated_across_chunks(self, df: pd.DataFrame, columns: Tuple[str, ...], stream_state: Dict,
+                                  key_name: str) -> pd.Series:
+        """
+        Marca las claves duplicadas dentro del bloque o ya vistas en bloques anteriores
+
+        Solo se conserva un hash de 64 bits por clave distinta, no los valores originales.
+        """
+        hashes = key_hashes(df, columns)
+        seen = stream_state['unique_seen'].setdefault(key_name, HashSet())
+        duplicated = hashes.duplicated().to_numpy()
+        values = hashes.to_numpy()
+        duplicated |= seen.contains(values)
+        seen.add(values[~duplicated])
+        return pd.Series(duplicated, index=df.index)
+
+    @contextmanager
+    def _open_csv_stream(self, file_path: str, encoding: Optional[str]):
+        """
+        Abre un CSV para leerlo por bloques y devuelve (flujo binario, codificación para pandas)
+
+        Sin codificación explícita el archivo no se recorre antes para detectarla: se lee
+        como UTF-8 y, si aparece un byte inválido, el resto se decodifica como latin1.
+        """
+        with open_binary(file_path) as f:
+            if encoding:
+                yield f, encoding
+            else:
+                yield _Utf8OrLatin1Stream(f), 'utf-8-sig' if detect_bom(file_path) else 'utf-8'
+
+    def _iter_csv_chunks(self, file_path: str, catalog: Catalog, chunksize: int, encoding: Optional[str] = None):
+        """
+        Lee un CSV por bloques de chunksize filas
+
+        El índice de cada bloque continúa el del anterior, por lo que idx + 2 sigue
+        siendo el número de línea real dentro del archivo.
+        """
+        read_kwargs = {
+            'delimiter': catalog.file_format.delimiter,
+            'chunksize': chunksize
+        }
+
+        if catalog.file_format.header:
+            read_kwargs['header'] = 0
+        else:
+            # Determinar el número de columnas a partir de la primera fila
+            with self._open_csv_stream(file_path, encoding) as (f, file_encoding):
+                df_temp = pd.read_csv(
+                    f,
+                    delimiter=catalog.file_format.delimiter,
+                    header=None,
+                    encoding=file_encoding,
+                    nrows=1
+                )
+            read_kwargs['header'] = None
+            read_kwargs['names'] = create_column_names(len(df_temp.columns))
+
+        with self._open_csv_stream(file_path, encoding) as (f, read_kwargs['encoding']), \
+                pd.read_csv(f, **read_kwargs) as reader:
+            yield from reader
+
+    def _read_sample(self, file_path: str, catalog: Catalog, rows: int) -> Optional[pd.DataFrame]:
+        """
+        Lee solo las primeras `rows` filas del archivo, adaptadas al catálogo y con sus tipos convertidos
+
+        Returns:
+            pd.DataFrame con la muestra, o None si el archivo está vacío
+        """
+        try:
+            if catalog.file_format.type == 'CSV':
+                # Solo se lee el principio del archivo: sin recorrerlo entero para detectar la codificación
+                encoding = 'utf-8-sig' if detect_bom(file_path) else 'utf-8'
+                for attempt in (encoding, 'latin1'):
+                    chunks = self._iter_csv_chunks(file_path, catalog, rows, encoding=attempt)
+                    try:
+                        df = next(chunks, None)
+                        break
+                    except UnicodeDecodeError:
+                        if attempt == 'latin1':
+                            raise
+                    finally:
+                        chunks.close()
+            else:
+                df = pd.read_excel(
+                    file_path.read_buffer() if isinstance(file_path, ZipMember) else file_path,
+                    header=0 if catalog.file_format.header else None,
+                    nrows=rows,
+                    engine='openpyxl'
+                )
+                if not catalog.file_format.header:
+                    df.columns = create_column_names(len(df.columns))
+
+            if df is None or df.empty:
+                return None
+            df = self._adapt_to_catalog_schema(df, catalog, file_path)
+            return self._validate_data_types(df, catalog)
+        except FileProcessingError:
+            raise
+        except Exception as e:
+            raise FileProcessingError(
+                f"Error al leer el archivo {os.path.basename(file_path)}: {str(e)}\n"
+                "Asegúrate de que el archivo tenga el formato correcto y no esté dañado."
+            )
+
+    def _check_validation_budget(self, file_path: str, catalog: Catalog) -> None:
+        """
+        Valida una muestra del archivo y lo rechaza si supera el presupuesto del catálogo
+
+        La muestra se valida con un procesador aparte cuyos eventos no llegan al log, así
+        que un archivo aceptado se valida y reporta después exactamente igual que sin presupuesto.
+
+        Raises:
+            ValidationBudgetExceeded: Si la muestra supera alguno de los límites configurados
+        """
+        budget = catalog.validation_budget
+        if budget is None or self._get_file_type(file_path) != catalog.file_format.type:
+            return
+
+        probe = FileProcessor(self.config, _RecordingLogger())
+        sample = probe._read_sample(file_path, catalog, budget.sample_rows)
+        if sample is None:
+            return
+        probe.validate_catalog(sample, catalog)
+
+        error_ratio = probe.error_count / len(sample)
+        failing_checks = len(probe.logger.failing_checks())
+
+        reasons = []
+        if budget.max_error_ratio is not None and error_ratio > budget.max_error_ratio:
+            reasons.append(
+                f"{probe.error_count} errores en las primeras {len(sample)} filas "
+                f"({error_ratio:.0%}, máximo {budget.max_error_ratio:.0%})"
+            )
+        if budget.max_failing_checks is not None and failing_checks > budget.max_failing_checks:
+            reasons.append(
+                f"{failing_checks} verificaciones con errores en las primeras {len(sample)} filas "
+                f"(máximo {budget.max_failing_checks})"
+            )
+
+        if reasons:
+            raise ValidationBudgetExceeded(
+                f"Archivo rechazado anticipadamente: {'; '.join(reasons)}. "
+                "El archivo no se validó completo; revisa el delimitador y el orden de las columnas."
+            )
+
+    def _validate_catalog_streaming(self, file_path: str, catalog: Catalog) -> int:
+        """
+        Valida un CSV bloque a bloque sin cargarlo completo en memoria
+
+        Las conversiones de tipo y las validaciones de campo, fila, requeridos y únicos se
+        aplican a cada bloque. Los catálogos con reglas de catálogo nunca llegan aquí
+        (ver _get_chunksize): esas reglas necesitan el archivo completo.
+
+        Returns:
+            int: Número total de registros leídos
+        """
+        file_type = self._get_file_type(file_path)
+        if file_type != catalog.file_format.type:
+            raise FileProcessingError(
+                f"El tipo de archivo {file_type} ({os.path.basename(file_path)}) "
+                f"no coincide con la configuración del catálogo que espera {catalog.file_format.type}"
+            )
+
+        chunksize = self._get_chunksize(catalog)
+        self.logger.message(
+            f"Validando {os.path.basename(file_path)} en modo streaming (bloques de {chunksize} filas)"
+        )
+
+        # Sin el archivo completo en memoria no queda DataFrame para las materializaciones
+        self.logger.warning(
+            f"{os.path.basename(file_path)} se valida en modo streaming: sus datos no quedarán "
+            f"disponibles para las materializaciones del catálogo '{catalog.name}'",
+            file=catalog.filename
+        )
+
+        stream_state = self._new_stream_state()
+        total_records = 0
+        try:
+            self.metrics.count('bytes_read', self._file_size(file_path))
+            for chunk_number, chunk in enumerate(self._iter_csv_chunks(file_path, catalog, chunksize)):
+                self.metrics.count('rows_read', len(chunk))
+                with self.metrics.stage('type_conversion'):
+                    chunk = self._adapt_to_catalog_schema(chunk, catalog, file_path, report=chunk_number == 0)
+                    chunk = self._validate_data_types(chunk, catalog, stream_state)
+                self.validate_catalog(chunk, catalog, stream_state=stream_state)
+                total_records += len(chunk)
+        except FileProcessingError:
+            raise
+        except Exception as e:
+            raise FileProcessingError(
+                f"Error al leer el archivo {os.path.basename(file_path)}: {str(e)}\n"
+                "Asegúrate de que el archivo tenga el formato correcto y no esté dañado."
+            )
+
+        self._finalize_stream_state(catalog, stream_state)
+        return total_records
+
+    def _finalize_stream_state(self, catalog: Catalog, stream_state: Dict) -> None:
+        """Emite los avisos acumulados durante la validación en streaming"""
+        for (kind, filename, field_name), count in stream_state['error_counts'].items():
+            if count > self.MAX_ERRORS_PER_RULE:
+                self.logger.warning(
+                    self.CONSTRAINT_SUMMARIES[kind].format(count=count, field=field_name) +
+                    f"Solo se mostraron los primeros {self.MAX_ERRORS_PER_RULE} para mejorar el rendimiento.",
+                    file=filename,
+                    field=field_name
+                )
+
+    def _adapt_to_catalog_schema(self, df: pd.DataFrame, catalog: Catalog, file_path: str,
+                                 report: bool = True) -> pd.DataFrame:
+        """
+        Adapta un DataFrame recién leído al esquema definido en el catálogo
+
+        Args:
+            df: DataFrame leído del archivo (completo o un bloque en modo streaming)
+            catalog: Catálogo con la definición de campos
+            file_path: Ruta del archivo de origen (para los mensajes)
+            report: Si es False no se registran los errores de estructura (bloques posteriores al primero)
+
+        Returns:
+            pd.DataFrame: DataFrame con las columnas del catálogo
+        """
+        # Preprocesar campos numéricos antes de validación
+        for field in catalog.fields:
+            if field.type == 'entero':
+                # Detectar y convertir números que son efectivamente enteros
+                mask = df[field.name].notna()
+                if mask.any():
+                    df.loc[mask, field.name] = pd.to_numeric(df.loc[mask, field.name], downcast='integer')
+
+        # Nuevo código: Adaptar dataframe al esquema del catálogo
+        # Obtener los nombres de campos definidos en el YAML
+        yaml_field_names = [field.name for field in catalog.fields]
+
+        # Verificar si hay más columnas en el CSV que en el YAML
+        if len(df.columns) > len(yaml_field_names):
+            if report:
                 # Comportamiento por defecto: reportar error pero continuar
                 error_msg = (f"Error de estructura en el archivo {os.path.basename(file_path)}: "
                             f"El archivo tiene {len(df.columns)} columnas pero la definición YAML tiene {len(yaml_field_names)} campos. "
@@ -324,20 +736,21 @@ class FileProcessor:
                     found=f"{len(df.columns)} columnas"
                 )
 
-                # Continuar con el proceso seleccionando solo las columnas que necesitamos
-                if not catalog.file_format.header:
-                    # Para archivos sin encabezado, seleccionar las primeras N columnas
-                    df = df.iloc[:, :len(yaml_field_names)]
-                    # Renombrar las columnas según los nombres del YAML
-                    df.columns = yaml_field_names
-                else:
-                    # Si tiene encabezado, seleccionar las columnas por los nombres del YAML que existan
-                    # y descartar las demás
-                    existing_fields = [field for field in yaml_field_names if field in df.columns]
-                    df = df[existing_fields]
-
-            # Si hay menos columnas en el CSV que en el YAML
-            if len(df.columns) < len(yaml_field_names):
+            # Continuar con el proceso seleccionando solo las columnas que necesitamos
+            if not catalog.file_format.header:
+                # Para archivos sin encabezado, seleccionar las primeras N columnas
+                df = df.iloc[:, :len(yaml_field_names)]
+                # Renombrar las columnas según los nombres del YAML
+                df.columns = yaml_field_names
+            else:
+                # Si tiene encabezado, seleccionar las columnas por los nombres del YAML que existan
+                # y descartar las demás
+                existing_fields = [field for field in yaml_field_names if field in df.columns]
+                df = df[existing_fields]
+
+        # Si hay menos columnas en el CSV que en el YAML
+        if len(df.columns) < len(yaml_field_names):
+            if report:
                 # Comportamiento por defecto: reportar error pero continuar
                 error_msg = (f"Error de estructura en el archivo {os.path.basename(file_path)}: "
                             f"El archivo tiene {len(df.columns)} columnas pero la definición YAML tiene {len(yaml_field_names)} campos. "
@@ -353,26 +766,57 @@ class FileProcessor:
                     found=f"{len(df.columns)} columnas"
                 )
 
-                # Continuar con el proceso añadiendo columnas faltantes con valores null
-                for field_name in yaml_field_names:
-                    if field_name not in df.columns:
-                        df[field_name] = None
+            # Continuar con el proceso añadiendo columnas faltantes con valores null
+            for field_name in yaml_field_names:
+                if field_name not in df.columns:
+                    df[field_name] = None
 
-            # Si el archivo no tiene encabezado, renombrar las columnas con los nombres definidos en el YAML
-            if not catalog.file_format.header:
-                # Asegurarnos de que tengamos la misma cantidad de columnas
-                if len(df.columns) == len(yaml_field_names):
-                    df.columns = yaml_field_names
+        # Si el archivo no tiene encabezado, renombrar las columnas con los nombres definidos en el YAML
+        if not catalog.file_format.header:
+            # Asegurarnos de que tengamos la misma cantidad de columnas
+            if len(df.columns) == len(yaml_field_names):
+                df.columns = yaml_field_names
 
-            # Validar y convertir tipos de datos
-            df = self._validate_data_types(df, catalog)
-            return df
+        return df
 
+    def _evaluate_rule(self, rule: ValidationRule, data, kind: str, scope: Optional[str],
+                       field_name: Optional[str] = None):
+        """
+        Evalúa una regla sobre data (DataFrame del catálogo o diccionario de DataFrames del paquete)
+
+        Registra en las métricas de la ejecución el tiempo y las filas evaluadas por la
+        regla, identificada por su tipo ('campo', 'fila', 'catalogo' o 'paquete'), el
+        catálogo o paquete (scope) y el campo.
+        """
+        # Usamos eval() regular en lugar de pd.eval() para permitir acceso a métodos completos de pandas
+        # Crear un entorno de ejecución con acceso a pandas, numpy y str
+        eval_globals = {
+            'df': data,
+            'np': np,
+            'pd': pd,
+            'str': str  # Añadir str explícitamente para que esté disponible
+        }
+        start = time.perf_counter()
+        try:
+            return eval(self._get_rule_code(rule), eval_globals, {})
+        except NameError as e:
+            # Capturar errores específicos de nombres no definidos para dar mejor feedback
+            raise NameError(f"Error evaluando regla {rule.name}: {str(e)}")
         except Exception as e:
-            raise FileProcessingError(
-                f"Error al leer el archivo {os.path.basename(file_path)}: {str(e)}\n"
-                "Asegúrate de que el archivo tenga el formato correcto y no esté dañado."
-            )
+            # Otras excepciones durante la evaluación
+            raise Exception(f"Error evaluando regla {rule.name}: {str(e)}")
+        finally:
+            elapsed = time.perf_counter() - start
+            rows = sum(len(df) for df in data.values()) if isinstance(data, dict) else len(data)
+            self.metrics.count('rules_evaluated')
+            self.metrics.count('rule_seconds', elapsed)
+            self.metrics.record_rule(kind, scope, field_name, rule.name, rule.rule, elapsed, rows)
+
+    def _get_rule_code(self, rule: ValidationRule):
+        """Devuelve el código compilado de la regla, usando la caché de proceso si no viene precompilado"""
+        if rule.compiled is not None:
+            return rule.compiled
+        return compile_rule(rule.rule)
 
     def _handle_series_result(self, result: Union[pd.Series, bool], df: pd.DataFrame) -> pd.DataFrame:
         """Maneja resultados que pueden ser Series o booleanos"""
@@ -385,320 +829,390 @@ class FileProcessor:
         else:
             raise ValueError(f"Resultado de validación no soportado: {type(result)}")
 
+    def _get_invalid_mask(self, result: Union[pd.Series, bool], df: pd.DataFrame) -> np.ndarray:
+        """
+        Convierte el resultado de una regla en una máscara booleana de filas inválidas
+
+        Equivale a _handle_series_result pero sin materializar el sub-DataFrame.
+        Los valores nulos en el resultado no se consideran fallos.
+        """
+        if isinstance(result, pd.Series):
+            if not result.index.equals(df.index):
+                result = result.reindex(df.index)
+            valid = result.to_numpy(dtype=bool, na_value=True)
+            return ~valid
+        elif isinstance(result, bool):
+            return np.full(len(df), not result, dtype=bool)
+        else:
+            raise ValueError(f"Resultado de validación no soportado: {type(result)}")
+
+    def _detail_limit(self, is_large_file: bool, already_reported: int) -> Optional[int]:
+        """Número de fallos que aún se pueden detallar para una verificación (None = sin límite)"""
+        if not is_large_file:
+            return None
+        return max(0, self.MAX_ERRORS_PER_RULE - already_reported)
+
+    def _sample_values(self, series: pd.Series, positions: np.ndarray) -> List:
+        """Valores de series en las posiciones dadas, convertidos a tipos serializables"""
+        return [
+            v if v is None or isinstance(v, (str, int, float, bool)) else str(v)
+            for v in series.to_numpy()[positions].tolist()
+        ]
+
+    def _report_failures(self, df: pd.DataFrame, invalid_mask, severity: Severity, message: str,
+                         limit: Optional[int] = None, value_column: Union[str, List[str], None] = None,
+                         **kwargs) -> int:
+        """
+        Contabiliza y reporta en bloque las filas de df marcadas en invalid_mask
+
+        El total se obtiene sumando la máscara y solo se extraen las primeras `limit`
+        líneas y valores, que se envían al logger como un único evento por regla.
+
+        Returns:
+            int: Número total de filas que fallaron
+        """
+        if isinstance(invalid_mask, pd.Series):
+            flags = invalid_mask.to_numpy(dtype=bool, na_value=False)
+        else:
+            flags = np.asarray(invalid_mask, dtype=bool)
+
+        total = int(flags.sum())
+        if total == 0 or severity not in (Severity.ERROR, Severity.WARNING):
+            return 0
+
+        if severity == Severity.ERROR:
+            self.error_count += total
+        else:
+            self.warning_count += total
+
+        if limit is None or limit > 0:
+            positions = np.flatnonzero(flags)
+            if limit is not None:
+                positions = positions[:limit]
+            lines = (df.index.to_numpy()[positions] + 2).tolist()  # +2 for header and 0-based index
+            values = None
+            if isinstance(value_column, (list, tuple)):
+                # Clave compuesta: un valor por columna en cada fila
+                columns = [self._sample_values(df[column], positions) for column in value_column]
+                values = [list(row) for row in zip(*columns)]
+            elif value_column is not None:
+                values = self._sample_values(df[value_column], positions)
+            self.logger.log_batch(message, severity.value, lines=lines, values=values, total=total, **kwargs)
+
+        return total
+
+    def _report_rule_failures(self, df: pd.DataFrame, invalid_mask, validation_rule: ValidationRule, message: str,
+                              is_large_file: bool, key: Tuple, skipped: Dict[str, Dict[str, int]],
+                              skipped_scope: str, skipped_warning: str,
+                              value_column: Optional[str] = None, **kwargs) -> None:
+        """
+        Reporta los fallos de una regla de campo o de fila acumulando el total entre llamadas
+
+        Cuando una regla de error supera MAX_ERRORS_PER_RULE en un archivo grande se anota
+        en skipped[skipped_scope] con el total acumulado y se avisa una sola vez.
+        """
+        previous = self.rule_failure_counts.get(key, 0)
+        failed = self._report_failures(
+            df, invalid_mask, validation_rule.severity, message,
+            limit=self._detail_limit(is_large_file, previous),
+            value_column=value_column,
+            **kwargs
+        )
+        total = previous + failed
+        self.rule_failure_counts[key] = total
+
+        if is_large_file and validation_rule.severity == Severity.ERROR and total > self.MAX_ERRORS_PER_RULE:
+            skipped.setdefault(skipped_scope, {})[validation_rule.name] = total
+            if previous <= self.MAX_ERRORS_PER_RULE:
+                self.logger.warning(skipped_warning.format(count=total), file=kwargs.get('file'), rule=validation_rule.name)
+
     def validate_field(self, df: pd.DataFrame, field_name: str, rules: List[ValidationRule],
-                       catalog_name: str) -> None:
+                       catalog_name: str, is_large_file: Optional[bool] = None) -> None:
         """Validate a single field according to its rules"""
-        is_large_file = len(df) > self.SMALL_FILE_THRESHOLD
+        # En streaming lo decide validate_catalog: el último bloque puede tener menos filas que el umbral
+        if is_large_file is None:
+            is_large_file = len(df) > self.SMALL_FILE_THRESHOLD
 
         # Inicializar el diccionario para este campo si aún no existe
         if is_large_file and field_name not in self.field_rules_skipped:
             self.field_rules_skipped[field_name] = {}
 
-        for rule in rules:
-            # Verificar si la regla ya ha sido descartada por exceso de errores
-            if is_large_file and rule.name in self.field_rules_skipped.get(field_name, {}):
-                continue
+        # Filtrar el DataFrame para excluir filas con valores NaN en este campo
+        # Esto evita que se apliquen reglas de validación a campos opcionales vacíos
+        df_filtered = df.dropna(subset=[field_name]) if rules else df
 
+        # Si todas las filas tienen NaN en este campo, no hay nada que validar
+        if len(df_filtered) == 0:
+            return
+
+        for rule in rules:
             try:
-                # Contador de errores para esta regla específica
-                rule_error_count = 0
 
-                # Filtrar el DataFrame para excluir filas con valores NaN en este campo
-                # Esto evita que se apliquen reglas de validación a campos opcionales vacíos
-                df_filtered = df.dropna(subset=[field_name])
+                result = self._evaluate_rule(rule, df_filtered, 'campo', catalog_name, field_name)
+
+                invalid_mask = self._get_invalid_mask(result, df_filtered)
+
+                # Para archivos grandes, limitar el número de errores detallados por regla
+                self._report_rule_failures(
+                    df_filtered, invalid_mask, rule,
+                    f"Field validation {'failed' if rule.severity == Severity.ERROR else 'warning'}: {rule.description}",
+                    is_large_file,
+                    key=('campo', catalog_name, field_name, rule.name),
+                    skipped=self.field_rules_skipped,
+                    skipped_scope=field_name,
+                    skipped_warning=(
+                        f"Se encontraron al menos {{count}} errores para la regla '{rule.name}' en '{field_name}'. "
+                        f"Se omitieron errores adicionales para mejorar el rendimiento."
+                    ),
+                    value_column=field_name,
+                    file=catalog_name,
+                    field=field_name,
+                    rule=rule.rule
+                )
+            except Exception as e:
+                raise FileProcessingError(f"Error evaluating rule {rule.name}: {str(e)}")
 
-                # Si todas las filas tienen NaN en este campo, no hay nada que validar
-                if len(df_filtered) == 0:
-                    continue
+    def _report_constraint(self, df: pd.DataFrame, catalog: Catalog, mask: np.ndarray, kind: str, field_label: str,
+                           message: str, is_large_file: bool, stream_state: Optional[Dict],
+                           value_column: Union[str, List[str], None] = None) -> None:
+        """
+        Reporta las filas que incumplen una restricción de requerido o único
 
-                # Usamos eval() regular en lugar de pd.eval() para permitir acceso a métodos completos de pandas
-                try:
-                    # Crear un entorno de ejecución con acceso a pandas, numpy y str
-                    eval_globals = {
-                        'df': df_filtered,  # Usar el DataFrame filtrado sin NaNs
-                        'np': np,
-                        'pd': pd,
-                        'str': str  # Añadir str explícitamente para que esté disponible
-                    }
-                    result = eval(rule.rule, eval_globals, {})
-                except NameError as e:
-                    # Capturar errores específicos de nombres no definidos para dar mejor feedback
-                    raise NameError(f"Error evaluando regla {rule.name}: {str(e)}")
-                except Exception as e:
-                    # Otras excepciones durante la evaluación
-                    raise Exception(f"Error evaluando regla {rule.name}: {str(e)}")
-
-                invalid_rows = self._handle_series_result(result, df_filtered)
+        Para archivos grandes solo se detallan los primeros MAX_ERRORS_PER_RULE fallos y
+        se avisa del total; en modo streaming el aviso se emite al terminar el archivo.
+        """
+        if not mask.any():
+            return
 
-                if len(invalid_rows) > 0:
-                    for idx, row in invalid_rows.iterrows():
-                        value = row[field_name]
+        stream_key = (kind, catalog.filename, field_label)
+        error_count = self._get_stream_error_count(stream_state, stream_key)
+        extra = {'file': catalog.filename}
+        if isinstance(value_column, list):
+            extra['field'] = field_label
+
+        error_count += self._report_failures(
+            df, mask, Severity.ERROR, message,
+            limit=self._detail_limit(is_large_file, error_count),
+            value_column=value_column,
+            **extra
+        )
 
-                        if rule.severity == Severity.ERROR:
-                            self.error_count += 1
-                            rule_error_count += 1
-                            self.logger.error(
-                                f"Field validation failed: {rule.description}",
-                                file=catalog_name,
-                                line=idx + 2,  # +2 for header and 0-based index
-                                value=value,
-                                rule=rule.rule
-                            )
-                        elif rule.severity == Severity.WARNING:
-                            self.warning_count += 1
-                            self.logger.warning(
-                                f"Field validation warning: {rule.description}",
-                                file=catalog_name,
-                                line=idx + 2,
-                                value=value,
-                                rule=rule.rule
-                            )
+        if stream_state is not None:
+            stream_state['error_counts'][stream_key] = error_count
+        # Si hay más errores de los que mostramos, indicarlo
+        elif is_large_file and error_count > self.MAX_ERRORS_PER_RULE:
+            summary = self.CONSTRAINT_SUMMARIES[kind].format(count=error_count, field=field_label)
+            self.logger.warning(
+                summary + f"Solo se mostraron los primeros {self.MAX_ERRORS_PER_RULE} para mejorar el rendimiento.",
+                file=catalog.filename,
+                field=field_label
+            )
 
-                        # Para archivos grandes, limitar el número de errores por regla
-                        if is_large_file and rule.severity == Severity.ERROR and rule_error_count >= self.MAX_ERRORS_PER_RULE:
-                            # Registrar esta regla como descartada
-                            self.field_rules_skipped[field_name][rule.name] = rule_error_count
+    def validate_catalog(self, df: pd.DataFrame, catalog: Catalog, stream_state: Optional[Dict] = None) -> None:
+        """
+        Validate an entire catalog
 
-                            # Registrar un aviso de que se omitieron errores adicionales
-                            self.logger.warning(
-                                f"Se encontraron al menos {rule_error_count} errores para la regla '{rule.name}' en '{field_name}'. "
-                                f"Se omitieron errores adicionales para mejorar el rendimiento.",
-                                file=catalog_name,
-                                rule=rule.name,
-                                field=field_name
-                            )
-                            break
-            except Exception as e:
-                raise FileProcessingError(f"Error evaluating rule {rule.name}: {str(e)}")
+        Cuando se recibe stream_state, df es solo un bloque del archivo: las claves únicas
+        y los contadores de errores se acumulan en stream_state entre bloques.
+        """
+        is_large_file = stream_state is not None or len(df) > self.SMALL_FILE_THRESHOLD
 
-    def validate_catalog(self, df: pd.DataFrame, catalog: Catalog) -> None:
-        """Validate an entire catalog"""
-        # Validate required fields
-        is_large_file = len(df) > self.SMALL_FILE_THRESHOLD
+        # Pre-procesar campos numéricos antes de la validación
+        with self.metrics.stage('type_conversion'):
+            for field in catalog.fields:
+                if field.type == 'entero':
+                    # Detectar y convertir números que son efectivamente enteros
+                    mask = integer_mask(df[field.name], bools=True, coerce=True)
+                    df.loc[mask, field.name] = df.loc[mask, field.name].astype('Int64')  # Usar Int64 para permitir NaN
+
+        # Requeridos y únicos (simples y compuestos) se calculan juntos en una sola pasada.
+        # En modo streaming los únicos se comparan además con los hashes de bloques anteriores
+        with self.metrics.stage('constraints'):
+            unique_keys = [(field.name,) for field in catalog.fields if field.unique] + \
+                [tuple(key) for key in catalog.unique_keys]
+            constraints = check_constraints(
+                df,
+                required=[field.name for field in catalog.fields if field.required],
+                unique_keys=unique_keys if stream_state is None else []
+            )
+            if stream_state is not None:
+                for key in unique_keys:
+                    constraints[('unico', key)] = self._duplicated_across_chunks(
+                        df, key, stream_state, ', '.join(key)
+                    ).to_numpy()
 
         for field in catalog.fields:
-            # Pre-procesar campos numéricos antes de la validación
-            if field.type == 'entero':
-                # Detectar y convertir números que son efectivamente enteros
-                mask = df[field.name].notna() & df[field.name].apply(lambda x: float(x).is_integer() if pd.notnull(x) and not isinstance(x, bool) else True)
-                df.loc[mask, field.name] = df.loc[mask, field.name].astype('Int64')  # Usar Int64 para permitir NaN
-
+            # Validate required fields
             if field.required:
-                mask = df[field.name].isnull()
-                missing = df[mask]
-                if not missing.empty:
-                    error_count = 0
-
-                    for idx, row in missing.iterrows():
-                        self.error_count += 1
-                        error_count += 1
-
-                        # Solo registrar los primeros MAX_ERRORS_PER_RULE errores para archivos grandes
-                        if not is_large_file or error_count <= self.MAX_ERRORS_PER_RULE:
-                            self.logger.error(
-                                f"Required field '{field.name}' is missing",
-                                file=catalog.filename,
-                                line=idx + 2
-                            )
-
-                    # Si hay más errores de los que mostramos, indicarlo
-                    if is_large_file and error_count > self.MAX_ERRORS_PER_RULE:
-                        self.logger.warning(
-                            f"Se encontraron {error_count} valores nulos para el campo requerido '{field.name}'. "
-                            f"Solo se mostraron los primeros {self.MAX_ERRORS_PER_RULE} para mejorar el rendimiento.",
-                            file=catalog.filename,
-                            field=field.name
-                        )
+                self._report_constraint(
+                    df, catalog, constraints[('requerido', (field.name,))], 'requerido', field.name,
+                    f"Required field '{field.name}' is missing",
+                    is_large_file, stream_state
+                )
 
             # Validate unique fields
             if field.unique:
-                duplicates = df[df[field.name].duplicated()]
-                if not duplicates.empty:
-                    error_count = 0
-
-                    for idx, row in duplicates.iterrows():
-                        self.error_count += 1
-                        error_count += 1
-
-                        # Solo registrar los primeros MAX_ERRORS_PER_RULE errores para archivos grandes
-                        if not is_large_file or error_count <= self.MAX_ERRORS_PER_RULE:
-                            self.logger.error(
-                                f"Field '{field.name}' must be unique",
-                                file=catalog.filename,
-                                line=idx + 2,
-                                value=row[field.name]
-                            )
-
-                    # Si hay más errores de los que mostramos, indicarlo
-                    if is_large_file and error_count > self.MAX_ERRORS_PER_RULE:
-                        self.logger.warning(
-                            f"Se encontraron {error_count} valores duplicados para el campo único '{field.name}'. "
-                            f"Solo se mostraron los primeros {self.MAX_ERRORS_PER_RULE} para mejorar el rendimiento.",
-                            file=catalog.filename,
-                            field=field.name
-                        )
+                self._report_constraint(
+                    df, catalog, constraints[('unico', (field.name,))], 'unico', field.name,
+                    f"Field '{field.name}' must be unique",
+                    is_large_file, stream_state,
+                    value_column=field.name
+                )
 
             # Apply field validation rules
-            self.validate_field(df, field.name, field.validation_rules, catalog.filename)
+            with self.metrics.stage('field_validation'):
+                self.validate_field(df, field.name, field.validation_rules, catalog.filename, is_large_file)
+
+        # Claves únicas compuestas definidas a nivel de catálogo
+        for key in catalog.unique_keys:
+            key = tuple(key)
+            self._report_constraint(
+                df, catalog, constraints[('unico', key)], 'unico', ', '.join(key),
+                f"Fields ({', '.join(key)}) must be unique together",
+                is_large_file, stream_state,
+                value_column=list(key)
+            )
 
         # Apply row validations
-        is_large_file = len(df) > self.SMALL_FILE_THRESHOLD
+        is_large_file = stream_state is not None or len(df) > self.SMALL_FILE_THRESHOLD
 
         # Inicializar el diccionario para este catálogo si aún no existe
         if is_large_file and catalog.filename not in self.row_rules_skipped:
             self.row_rules_skipped[catalog.filename] = {}
 
-        for rule in catalog.row_validation:
-            # Verificar si la regla ya ha sido descartada por exceso de errores
-            if is_large_file and rule.name in self.row_rules_skipped.get(catalog.filename, {}):
-                continue
-
-            try:
-                # Contador de errores para esta regla específica
-                rule_error_count = 0
-
-                # Usamos eval() regular en lugar de pd.eval() para permitir acceso a métodos completos de pandas
+        with self.metrics.stage('row_validation'):
+            for rule in catalog.row_validation:
                 try:
-                    # Crear un entorno de ejecución con acceso a pandas, numpy y str
-                    eval_globals = {
-                        'df': df,
-                        'np': np,
-                        'pd': pd,
-                        'str': str  # Añadir str explícitamente para que esté disponible
-                    }
-                    result = eval(rule.rule, eval_globals, {})
-                except NameError as e:
-                    # Capturar errores específicos de nombres no definidos para dar mejor feedback
-                    raise NameError(f"Error evaluando regla {rule.name}: {str(e)}")
+                    result = self._evaluate_rule(rule, df, 'fila', catalog.filename)
+
+                    invalid_mask = self._get_invalid_mask(result, df)
+
+                    # Para archivos grandes, limitar el número de errores detallados por regla
+                    self._report_rule_failures(
+                        df, invalid_mask, rule,
+                        f"Row validation {'failed' if rule.severity == Severity.ERROR else 'warning'}: {rule.description}",
+                        is_large_file,
+                        key=('fila', catalog.filename, rule.name),
+                        skipped=self.row_rules_skipped,
+                        skipped_scope=catalog.filename,
+                        skipped_warning=(
+                            f"Se encontraron al menos {{count}} errores para la regla de fila '{rule.name}'. "
+                            f"Se omitieron errores adicionales para mejorar el rendimiento."
+                        ),
+                        file=catalog.filename,
+                        rule=rule.rule
+                    )
                 except Exception as e:
-                    # Otras excepciones durante la evaluación
-                    raise Exception(f"Error evaluando regla {rule.name}: {str(e)}")
-
-                invalid_rows = self._handle_series_result(result, df)
-
-                for idx, row in invalid_rows.iterrows():
-                    if rule.severity == Severity.ERROR:
-                        self.error_count += 1
-                        rule_error_count += 1
-                        self.logger.error(
-                            f"Row validation failed: {rule.description}",
-                            file=catalog.filename,
-                            line=idx + 2,
-                            rule=rule.rule
-                        )
-                    elif rule.severity == Severity.WARNING:
-                        self.warning_count += 1
-                        self.logger.warning(
-                            f"Row validation warning: {rule.description}",
-                            file=catalog.filename,
-                            line=idx + 2,
-                            rule=rule.rule
-                        )
-
-                    # Para archivos grandes, limitar el número de errores por regla
-                    if is_large_file and rule.severity == Severity.ERROR and rule_error_count >= self.MAX_ERRORS_PER_RULE:
-                        # Registrar esta regla como descartada
-                        self.row_rules_skipped[catalog.filename][rule.name] = rule_error_count
-
-                        # Registrar un aviso de que se omitieron errores adicionales
-                        self.logger.warning(
-                            f"Se encontraron al menos {rule_error_count} errores para la regla de fila '{rule.name}'. "
-                            f"Se omitieron errores adicionales para mejorar el rendimiento.",
-                            file=catalog.filename,
-                            rule=rule.name
-                        )
-                        break
-            except Exception as e:
-                raise FileProcessingError(f"Error evaluating row rule {rule.name}: {str(e)}")
+                    raise FileProcessingError(f"Error evaluating row rule {rule.name}: {str(e)}")
 
         # Apply catalog validations
         # Inicializar el diccionario para este catálogo si aún no existe
         if is_large_file and catalog.filename not in self.catalog_rules_skipped:
             self.catalog_rules_skipped[catalog.filename] = {}
 
-        for rule in catalog.catalog_validation:
-            # Verificar si la regla ya ha sido descartada por exceso de errores
-            if is_large_file and rule.name in self.catalog_rules_skipped.get(catalog.filename, {}):
-                continue
-
-            try:
-                # Contador de errores para esta regla específica
-                rule_error_count = 0
+        with self.metrics.stage('catalog_validation'):
+            for rule in catalog.catalog_validation:
+                # Verificar si la regla ya ha sido descartada por exceso de errores
+                if is_large_file and rule.name in self.catalog_rules_skipped.get(catalog.filename, {}):
+                    continue
 
-                # Usamos eval() regular en lugar de pd.eval() para permitir acceso a métodos completos de pandas
                 try:
-                    # Crear un entorno de ejecución con acceso a pandas, numpy y str
-                    eval_globals = {
-                        'df': df,
-                        'np': np,
-                        'pd': pd,
-                        'str': str  # Añadir str explícitamente para que esté disponible
-                    }
-                    result = eval(rule.rule, eval_globals, {})
-                except NameError as e:
-                    # Capturar errores específicos de nombres no definidos para dar mejor feedback
-                    raise NameError(f"Error evaluando regla {rule.name}: {str(e)}")
-                except Exception as e:
-                    # Otras excepciones durante la evaluación
-                    raise Exception(f"Error evaluando regla {rule.name}: {str(e)}")
+                    # Contador de errores para esta regla específica
+                    rule_error_count = 0
 
-                invalid_rows = self._handle_series_result(result, df)
+                    result = self._evaluate_rule(rule, df, 'catalogo', catalog.filename)
 
-                if len(invalid_rows) > 0:
-                    if rule.severity == Severity.ERROR:
-                        self.error_count += 1
-                        rule_error_count += 1
-                        self.logger.error(
-                            f"Catalog validation failed: {rule.description}",
-                            file=catalog.filename,
-                            rule=rule.rule
-                        )
+                    if self._get_invalid_mask(result, df).any():
+                        if rule.severity == Severity.ERROR:
+                            self.error_count += 1
+                            rule_error_count += 1
+                            self.logger.error(
+                                f"Catalog validation failed: {rule.description}",
+                                file=catalog.filename,
+                                rule=rule.rule
+                            )
 
-                        # Para archivos grandes, limitar el número de errores para reglas de catálogo
-                        # Nota: Esto aplica principalmente cuando hay múltiples reglas de catálogo
-                        if is_large_file and rule_error_count >= self.MAX_ERRORS_PER_RULE:
-                            self.catalog_rules_skipped[catalog.filename][rule.name] = rule_error_count
+                            # Para archivos grandes, limitar el número de errores para reglas de catálogo
+                            # Nota: Esto aplica principalmente cuando hay múltiples reglas de catálogo
+                            if is_large_file and rule_error_count >= self.MAX_ERRORS_PER_RULE:
+                                self.catalog_rules_skipped[catalog.filename][rule.name] = rule_error_count
+                                self.logger.warning(
+                                    f"Se omitieron evaluaciones adicionales para la regla de catálogo '{rule.name}'.",
+                                    file=catalog.filename,
+                                    rule=rule.name
+                                )
+                        elif rule.severity == Severity.WARNING:
+                            self.warning_count += 1
                             self.logger.warning(
-                                f"Se omitieron evaluaciones adicionales para la regla de catálogo '{rule.name}'.",
+                                f"Catalog validation warning: {rule.description}",
                                 file=catalog.filename,
-                                rule=rule.name
+                                rule=rule.rule
                             )
-                    elif rule.severity == Severity.WARNING:
-                        self.warning_count += 1
-                        self.logger.warning(
-                            f"Catalog validation warning: {rule.description}",
-                            file=catalog.filename,
-                            rule=rule.rule
-                        )
-            except Exception as e:
-                # Añadir más detalles sobre el error
-                rule_name = getattr(rule, 'name', 'unknown')
-                rule_rule = getattr(rule, 'rule', 'unknown')
-                if hasattr(df, 'columns'):
-                    cols_count = len(df.columns)
-                    self.logger.error(f"DEBUG - Evaluando regla '{rule_name}' con {cols_count} columnas. Regla: '{rule_rule}'")
-                raise FileProcessingError(f"Error evaluating catalog rule {rule_name}: {str(e)}")
+                except Exception as e:
+                    # Añadir más detalles sobre el error
+                    rule_name = getattr(rule, 'name', 'unknown')
+                    rule_rule = getattr(rule, 'rule', 'unknown')
+                    if hasattr(df, 'columns'):
+                        cols_count = len(df.columns)
+                        self.logger.error(f"DEBUG - Evaluando regla '{rule_name}' con {cols_count} columnas. Regla: '{rule_rule}'")
+                    raise FileProcessingError(f"Error evaluating catalog rule {rule_name}: {str(e)}")
+
+    def validate_foreign_keys(self, package: Package) -> None:
+        """
+        Verifica la integridad referencial entre los catálogos del paquete
+
+        Se construye un único índice hash por catálogo y columnas referenciadas, que se
+        reutiliza en todas las claves foráneas que apuntan a él. Las filas huérfanas se
+        reportan en bloque con su número de línea.
+        """
+        indexes = {}
+        for fk in package.foreign_keys:
+            if fk.catalog not in self.dataframes or fk.ref_catalog not in self.dataframes:
+                self.logger.warning(
+                    f"No se pudo verificar la clave foránea '{fk.name}': "
+                    f"falta el catálogo '{fk.catalog if fk.catalog not in self.dataframes else fk.ref_catalog}'",
+                    rule=fk.name
+                )
+                continue
+
+            index_key = (fk.ref_catalog, tuple(fk.ref_fields))
+            if index_key not in indexes:
+                indexes[index_key] = KeyIndex(self.dataframes[fk.ref_catalog], fk.ref_fields)
+
+            df = self.dataframes[fk.catalog]
+            catalog = self.config.catalogs[fk.catalog]
+            orphans = indexes[index_key].missing_mask(df, fk.fields)
+            is_large_file = len(df) > self.SMALL_FILE_THRESHOLD
+
+            description = fk.description or (
+                f"{fk.catalog}({', '.join(fk.fields)}) sin correspondencia en "
+                f"{fk.ref_catalog}({', '.join(fk.ref_fields)})"
+            )
+            total = self._report_failures(
+                df, orphans, fk.severity,
+                f"Foreign key validation failed: {description}",
+                limit=self._detail_limit(is_large_file, 0),
+                value_column=fk.fields[0] if len(fk.fields) == 1 else list(fk.fields),
+                file=catalog.filename,
+                rule=fk.name
+            )
+
+            if is_large_file and total > self.MAX_ERRORS_PER_RULE:
+                self.logger.warning(
+                    f"Se encontraron {total} filas sin correspondencia para la clave foránea '{fk.name}'. "
+                    f"Solo se mostraron las primeras {self.MAX_ERRORS_PER_RULE} para mejorar el rendimiento.",
+                    file=catalog.filename,
+                    rule=fk.name
+                )
 
     def validate_package(self, package: Package) -> None:
         """Apply package-level validations"""
+        with self.metrics.stage('foreign_keys'):
+            self.validate_foreign_keys(package)
+
         for rule in package.package_validation:
             try:
-                # Usamos eval() regular en lugar de pd.eval() para permitir acceso a métodos completos de pandas
-                try:
-                    # Crear un entorno de ejecución con acceso a pandas, numpy y str
-                    eval_globals = {
-                        'df': self.dataframes,
-                        'np': np,
-                        'pd': pd,
-                        'str': str  # Añadir str explícitamente para que esté disponible
-                    }
-                    result = eval(rule.rule, eval_globals, {})
-                except NameError as e:
-                    # Capturar errores específicos de nombres no definidos para dar mejor feedback
-                    raise NameError(f"Error evaluando regla {rule.name}: {str(e)}")
-                except Exception as e:
-                    # Otras excepciones durante la evaluación
-                    raise Exception(f"Error evaluando regla {rule.name}: {str(e)}")
+                result = self._evaluate_rule(rule, self.dataframes, 'paquete', package.name)
 
                 # Para Series, procesamos cada valor que no cumple
                 if isinstance(result, pd.Series):
@@ -753,151 +1267,290 @@ class FileProcessor:
         # Lista para almacenar las estadísticas de cada archivo para el DataFrame resumen
         files_summary_data = []
         
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Extract ZIP contents
+        # Leer solo el índice del ZIP: cada catálogo se lee después directamente desde
+        # su miembro, sin extraer el paquete a disco
+        try:
+            members = self._index_zip_members(zip_path)
+        except Exception as e:
+            raise FileProcessingError(f"Error reading ZIP file: {str(e)}")
+
+        # Las reglas de paquete y las claves foráneas necesitan los DataFrames completos,
+        # así que el modo streaming solo se usa en paquetes que no las definen
+        stream_catalogs = not package.package_validation and not package.foreign_keys
+
+        # Con varios procesos, los catálogos presentes se validan en paralelo y sus
+        # resultados se integran después en el orden del paquete
+        executor, futures = self._submit_catalog_validations(package, members, stream_catalogs)
+
+        # Process each catalog in the package
+        for catalog_name in package.catalogs:
+            catalog = self.config.catalogs.get(catalog_name)
+            if not catalog:
+                if executor:
+                    executor.shutdown(cancel_futures=True)
+                raise FileProcessingError(f"Catalog '{catalog_name}' not found in configuration")
+
+            file_path = members.get(self._zip_member_key(catalog.filename))
+            if file_path is None:
+                # Registrar el archivo faltante en el logger
+                self.logger.register_missing_file(catalog.filename, package_name)
+                # Lanzar la excepción pero continuar con otros archivos
+                self.error_count += 1
+                self.logger.error(
+                    f"Required file '{catalog.filename}' not found in ZIP package",
+                    file=catalog.filename,
+                    package=package_name
+                )
+                # Añadir entrada para archivo faltante en el resumen
+                files_summary_data.append({
+                    'archivo': catalog.filename,
+                    'catalogo': catalog_name,
+                    'registros': 0,
+                    'errores': 1,
+                    'advertencias': 0,
+                    'estado': 'Faltante'
+                })
+                continue
+
             try:
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(temp_dir)
-            except Exception as e:
-                raise FileProcessingError(f"Error extracting ZIP file: {str(e)}")
+                # Store initial error and warning counts
+                initial_errors = self.error_count
+                initial_warnings = self.warning_count
 
-            # Process each catalog in the package
-            for catalog_name in package.catalogs:
-                catalog = self.config.catalogs.get(catalog_name)
-                if not catalog:
-                    raise FileProcessingError(f"Catalog '{catalog_name}' not found in configuration")
-
-                file_path = os.path.join(temp_dir, catalog.filename)
-                if not os.path.exists(file_path):
-                    # Registrar el archivo faltante en el logger
-                    self.logger.register_missing_file(catalog.filename, package_name)
-                    # Lanzar la excepción pero continuar con otros archivos
-                    self.error_count += 1
-                    self.logger.error(
-                        f"Required file '{catalog.filename}' not found in ZIP package",
-                        file=catalog.filename,
-                        package=package_name
+                if catalog_name in futures:
+                    # Catálogo validado en un proceso de trabajo: integrar su resultado
+                    df, file_records = self._merge_catalog_result(futures[catalog_name].result())
+                else:
+                    df, file_records = self._validate_zip_catalog(
+                        file_path, catalog_name, catalog, stream_catalogs
                     )
-                    # Añadir entrada para archivo faltante en el resumen
-                    files_summary_data.append({
-                        'archivo': catalog.filename,
-                        'catalogo': catalog_name,
-                        'registros': 0,
-                        'errores': 1,
-                        'advertencias': 0,
-                        'estado': 'Faltante'
-                    })
-                    continue
-
-                try:
-                    df = self._read_file(file_path, catalog)
-                    self.logger.message(f"Processing catalog: {catalog_name}")
-
-                    # Store initial error and warning counts
-                    initial_errors = self.error_count
-                    initial_warnings = self.warning_count
-
-                    self.validate_catalog(df, catalog)
 
-                    # Calculate records and errors/warnings for this file
-                    file_records = len(df)
-                    file_errors = self.error_count - initial_errors
-                    file_warnings = self.warning_count - initial_warnings
+                # Calculate records and errors/warnings for this file
+                file_errors = self.error_count - initial_errors
+                file_warnings = self.warning_count - initial_warnings
 
-                    # Log summary for this file in a clean format
-                    success_rate = ((file_records - file_errors) / file_records * 100) if file_records > 0 else 0
-                    summary = f"""Summary for {catalog.filename}:
+                # Log summary for this file in a clean format
+                success_rate = ((file_records - file_errors) / file_records * 100) if file_records > 0 else 0
+                summary = f"""Summary for {catalog.filename}:
 Total records: {file_records}
 Errors: {file_errors}
 Warnings: {file_warnings}
 Success rate: {success_rate:.2f}%
 
 """
-                    self.logger.message(summary)
-
-                    # Registrar estadísticas de este archivo para el reporte
-                    self.logger.register_file_stats(
-                        catalog.filename, 
-                        file_records, 
-                        file_errors, 
-                        file_warnings
-                    )
+                self.logger.message(summary)
+
+                # Registrar estadísticas de este archivo para el reporte
+                self.logger.register_file_stats(
+                    catalog.filename, 
+                    file_records, 
+                    file_errors, 
+                    file_warnings
+                )
 
-                    # Añadir información a la lista para el DataFrame resumen
-                    files_summary_data.append({
-                        'archivo': catalog.filename,
-                        'catalogo': catalog_name,
-                        'registros': file_records,
-                        'errores': file_errors,
-                        'advertencias': file_warnings,
-                        'estado': 'Procesado'
-                    })
+                # Añadir información a la lista para el DataFrame resumen
+                files_summary_data.append({
+                    'archivo': catalog.filename,
+                    'catalogo': catalog_name,
+                    'registros': file_records,
+                    'errores': file_errors,
+                    'advertencias': file_warnings,
+                    'estado': 'Procesado'
+                })
 
-                    total_records += file_records
+                total_records += file_records
 
-                    # Store DataFrame for package-level validations
+                # Store DataFrame for package-level validations
+                if df is not None:
                     self.dataframes[catalog_name] = df
 
-                except Exception as e:
-                    # Registrar el error pero continuar con otros archivos
-                    self.error_count += 1
-                    error_msg = f"Error processing catalog '{catalog_name}': {str(e)}"
-                    self.logger.error(error_msg, file=catalog.filename, exception=e)
-
-                    # Registrar estadísticas con 0 registros procesados correctamente
-                    self.logger.register_file_stats(
-                        catalog.filename, 
-                        0,  # ningún registro procesado correctamente
-                        1,  # un error crítico
-                        0   # sin advertencias
-                    )
-                    
-                    # Añadir información a la lista para el DataFrame resumen
-                    files_summary_data.append({
-                        'archivo': catalog.filename,
-                        'catalogo': catalog_name,
-                        'registros': 0,
-                        'errores': 1,
-                        'advertencias': 0,
-                        'estado': 'Error'
-                    })
-                    continue  # Continuar con el siguiente catálogo
-
-            # Apply package-level validations
+            except Exception as e:
+                # Registrar el error pero continuar con otros archivos
+                self.error_count += 1
+                error_msg = f"Error processing catalog '{catalog_name}': {str(e)}"
+                self.logger.error(error_msg, file=catalog.filename, exception=e)
+
+                status = 'Rechazado' if isinstance(e, ValidationBudgetExceeded) else 'Error'
+
+                # Registrar estadísticas con 0 registros procesados correctamente
+                self.logger.register_file_stats(
+                    catalog.filename, 
+                    0,  # ningún registro procesado correctamente
+                    1,  # un error crítico
+                    0,  # sin advertencias
+                    status=status
+                )
+                
+                # Añadir información a la lista para el DataFrame resumen
+                files_summary_data.append({
+                    'archivo': catalog.filename,
+                    'catalogo': catalog_name,
+                    'registros': 0,
+                    'errores': 1,
+                    'advertencias': 0,
+                    'estado': status
+                })
+                continue  # Continuar con el siguiente catálogo
+
+        if executor:
+            executor.shutdown()
+
+        # Apply package-level validations
+        with self.metrics.stage('package_validation'):
             self.validate_package(package)
 
-            # Log global summary
-            global_summary = f"""Global Summary:
+        # Log global summary
+        global_summary = f"""Global Summary:
 Total records: {total_records}
 Errors: {self.error_count}
 Warnings: {self.warning_count}
 
 """
-            self.logger.message(global_summary)
+        self.logger.message(global_summary)
 
-            # Mostrar resumen de reglas omitidas para archivos grandes
-            self._log_skipped_rules_summary()
-            
-            # Crear DataFrame de resumen y asignarlo a last_processed_df
-            import pandas as pd
-            # Convertir tipos numpy a tipos nativos de Python para evitar problemas de serialización JSON
-            summary_data = []
-            for item in files_summary_data:
-                summary_data.append({
-                    'archivo': item['archivo'],
-                    'catalogo': item['catalogo'],
-                    'registros': int(item['registros']),
-                    'errores': int(item['errores']),
-                    'advertencias': int(item['advertencias']),
-                    'estado': item['estado']
-                })
-            self.last_processed_df = pd.DataFrame(summary_data)
-            
-            # Loguear el DataFrame creado
-            self.logger.message(f"Created summary DataFrame with {len(summary_data)} files information")
+        # Mostrar resumen de reglas omitidas para archivos grandes
+        self._log_skipped_rules_summary()
+        
+        # Crear DataFrame de resumen y asignarlo a last_processed_df
+        import pandas as pd
+        # Convertir tipos numpy a tipos nativos de Python para evitar problemas de serialización JSON
+        summary_data = []
+        for item in files_summary_data:
+            summary_data.append({
+                'archivo': item['archivo'],
+                'catalogo': item['catalogo'],
+                'registros': int(item['registros']),
+                'errores': int(item['errores']),
+                'advertencias': int(item['advertencias']),
+                'estado': item['estado']
+            })
+        self.last_processed_df = pd.DataFrame(summary_data)
+        
+        # Loguear el DataFrame creado
+        self.logger.message(f"Created summary DataFrame with {len(summary_data)} files information")
 
         return self.error_count, self.warning_count
 
+    def _zip_member_key(self, name: str) -> str:
+        """Normaliza un nombre de archivo para buscarlo entre los miembros de un ZIP"""
+        return posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+
+    def _index_zip_members(self, zip_path: str) -> Dict[str, ZipMember]:
+        """Obtiene los archivos de un ZIP indexados por nombre normalizado, sin leer su contenido"""
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            return {
+                self._zip_member_key(info.filename): ZipMember.from_info(zip_path, info)
+                for info in zip_ref.infolist()
+                if not info.is_dir()
+            }
+
+    def _check_zip_member(self, member: ZipMember) -> None:
+        """Rechaza miembros de un ZIP demasiado grandes o con una compresión sospechosa"""
+        if member.file_size > self.MAX_ZIP_MEMBER_SIZE:
+            raise FileProcessingError(
+                f"El archivo {os.path.basename(member)} ocupa {member.file_size} bytes descomprimido, "
+                f"más que el máximo permitido ({self.MAX_ZIP_MEMBER_SIZE} bytes)"
+            )
+        if member.file_size > self.ZIP_RATIO_MIN_SIZE and member.compression_ratio > self.MAX_ZIP_COMPRESSION_RATIO:
+            raise FileProcessingError(
+                f"El archivo {os.path.basename(member)} tiene una relación de compresión de "
+                f"{member.compression_ratio:.0f}:1, mayor que el máximo permitido "
+                f"({self.MAX_ZIP_COMPRESSION_RATIO}:1)"
+            )
+
+    def _validate_zip_catalog(self, file_path: str, catalog_name: str, catalog: Catalog,
+                              allow_streaming: bool) -> Tuple[Optional[pd.DataFrame], int]:
+        """
+        Lee y valida un catálogo de un paquete ZIP
+
+        Returns:
+            Tuple con el DataFrame leído (None en modo streaming) y el número de registros
+        """
+        if isinstance(file_path, ZipMember):
+            self._check_zip_member(file_path)
+        with self.metrics.stage('validation_budget'):
+            self._check_validation_budget(file_path, catalog)
+
+        stream_catalog = allow_streaming and bool(self._get_chunksize(catalog))
+        df = None
+        if not stream_catalog:
+            df = self._read_file_measured(file_path, catalog)
+        self.logger.message(f"Processing catalog: {catalog_name}")
+
+        if stream_catalog:
+            return None, self._validate_catalog_streaming(file_path, catalog)
+
+        self.validate_catalog(df, catalog)
+        return df, len(df)
+
+    def _get_worker_count(self, tasks: int) -> int:
+        """Número de procesos a usar para validar tasks catálogos (1 = secuencial)"""
+        if self.workers is None or tasks < 2:
+            return 1
+        workers = self.workers if self.workers > 0 else (os.cpu_count() or 1)
+        return max(1, min(workers, tasks))
+
+    def _submit_catalog_validations(self, package: Package, members: Dict[str, ZipMember],
+                                    allow_streaming: bool):
+        """
+        Envía a un pool de procesos la validación de los catálogos presentes en el paquete
+
+        Returns:
+            Tuple (executor, {catalog_name: future}); (None, {}) si se valida secuencialmente
+        """
+        tasks = []
+        for catalog_name in package.catalogs:
+            catalog = self.config.catalogs.get(catalog_name)
+            member = members.get(self._zip_member_key(catalog.filename)) if catalog else None
+            if member is not None:
+                tasks.append((catalog_name, member))
+
+        workers = self._get_worker_count(len(tasks))
+        if workers < 2:
+            return None, {}
+
+        self.logger.message(f"Validating {len(tasks)} catalogs in parallel with {workers} processes")
+        # Vaciar los búferes del log antes de crear los procesos
+        if hasattr(self.logger, 'flush'):
+            self.logger.flush()
+        # Se usa 'spawn' y no 'fork': los llamadores (workers del daemon, pollers) tienen
+        # hilos activos y un fork puede heredar locks tomados por otros hilos
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context('spawn'))
+        futures = {
+            catalog_name: executor.submit(
+                _validate_catalog_worker, self.config, catalog_name, file_path,
+                allow_streaming, self.chunksize
+            )
+            for catalog_name, file_path in tasks
+        }
+        return executor, futures
+
+    def _merge_catalog_result(self, result: Dict) -> Tuple[Optional[pd.DataFrame], int]:
+        """
+        Integra el resultado de un proceso de trabajo en este procesador
+
+        Los eventos registrados por el proceso se reproducen en el logger real y se
+        acumulan los contadores, de modo que el resultado es el mismo que en modo secuencial.
+        """
+        for method, args, kwargs in result['calls']:
+            getattr(self.logger, method)(*args, **kwargs)
+
+        self.error_count += result['error_count']
+        self.warning_count += result['warning_count']
+        for attr in ('field_rules_skipped', 'row_rules_skipped', 'catalog_rules_skipped'):
+            skipped = getattr(self, attr)
+            for scope, rules in result[attr].items():
+                skipped.setdefault(scope, {}).update(rules)
+        self.rule_failure_counts.update(result['rule_failure_counts'])
+        self.metrics.merge(result['metrics'])
+
+        if result['error'] is not None:
+            if result['rejected']:
+                raise ValidationBudgetExceeded(result['error'])
+            raise FileProcessingError(result['error'])
+        return result['df'], result['records']
+
     def _log_skipped_rules_summary(self) -> None:
         """Registra un resumen de las reglas que fueron omitidas durante el procesamiento"""
         any_rules_skipped = (
@@ -1046,24 +1699,39 @@ Warnings: {self.warning_count}
     def _process_single_file(self, file_path: str, catalog) -> Tuple[int, int]:
         """Procesa un archivo individual usando un catálogo específico"""
         try:
-            df = self._read_file(file_path, catalog)
-            self.last_processed_df = df
-            cols_count = len(df.columns)
-            column_names = ", ".join(df.columns.tolist())
+            with self.metrics.stage('validation_budget'):
+                self._check_validation_budget(file_path, catalog)
+
+            if self._get_chunksize(catalog) and self._get_file_type(file_path) == 'CSV':
+                # Modo streaming: el archivo nunca se carga completo, por lo que no queda
+                # un DataFrame disponible para materializaciones
+                self.logger.message(f"Processing file: {file_path}")
+                self.last_processed_df = None
+
+                initial_errors = self.error_count
+                initial_warnings = self.warning_count
+
+                file_records = self._validate_catalog_streaming(file_path, catalog)
+                self.total_records = file_records
+            else:
+                df = self._read_file_measured(file_path, catalog)
+                self.last_processed_df = df
+                cols_count = len(df.columns)
+                column_names = ", ".join(df.columns.tolist())
 
-            # Información detallada sobre el archivo y su estructura
-            self.logger.message(f"Processing file: {file_path}")
-            self.logger.message(f"DataFrame columns count: {cols_count}")
-            self.logger.message(f"DataFrame columns: {column_names}")
+                # Información detallada sobre el archivo y su estructura
+                self.logger.message(f"Processing file: {file_path}")
+                self.logger.message(f"DataFrame columns count: {cols_count}")
+                self.logger.message(f"DataFrame columns: {column_names}")
 
-            # Store initial error and warning counts
-            initial_errors = self.error_count
-            initial_warnings = self.warning_count
+                # Store initial error and warning counts
+                initial_errors = self.error_count
+                initial_warnings = self.warning_count
 
-            self.validate_catalog(df, catalog)
+                self.validate_catalog(df, catalog)
+                file_records = len(df)
 
             # Calculate records and errors/warnings for this file
-            file_records = len(df)
             file_errors = self.error_count - initial_errors
             file_warnings = self.warning_count - initial_warnings
 
@@ -1097,12 +1765,125 @@ Success rate: {success_rate:.2f}%
             error_msg = f"Error processing file {file_path}: {str(e)}"
             self.logger.error(error_msg, file=os.path.basename(file_path), exception=e)
 
-            # Registrar estadísticas con 0 registros procesados correctamente
+            # Registrar estadísticas con 0 registros procesados correctamente; el estado
+            # distingue un archivo rechazado por el presupuesto de un error, igual que en un ZIP
             self.logger.register_file_stats(
                 os.path.basename(file_path), 
                 0,  # ningún registro procesado correctamente
                 1,  # un error crítico
-                0   # sin advertencias
+                0,  # sin advertencias
+                status='Rechazado' if isinstance(e, ValidationBudgetExceeded) else 'Error'
             )
 
-            return self.error_count, self.warning_count
\ No newline at end of file
+            return self.error_count, self.warning_count
+
+
+class _Utf8OrLatin1Stream(io.RawIOBase):
+    """
+    Flujo binario que entrega el CSV como UTF-8 válido en una sola lectura
+
+    Los bytes pasan sin cambios mientras sean UTF-8; desde el primer byte inválido el
+    resto del archivo se decodifica como latin1 y se vuelve a codificar en UTF-8. El
+    resultado coincide con el de la lectura completa (UTF-8 o, si falla, latin1) salvo
+    en archivos latin1 con secuencias UTF-8 válidas antes del primer byte inválido.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._pending = b''  # Secuencia UTF-8 incompleta al final del bloque anterior
+        self.fallback = False
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            block = self._raw.read(size)
+            data, self._pending = self._pending + block, b''
+            if self.fallback:
+                return data.decode('latin1').encode('utf-8')
+            try:
+                data.decode('utf-8')
+                return data
+            except UnicodeDecodeError as e:
+                if block and e.reason == 'unexpected end of data':
+                    # El bloque cortó un carácter multibyte: se completa en la siguiente lectura
+                    self._pending = data[e.start:]
+                    if e.start == 0:
+                        continue
+                    return data[:e.start]
+                self.fallback = True
+                return data[:e.start] + data[e.start:].decode('latin1').encode('utf-8')
+
+
+class _RecordingLogger:
+    """
+    Sustituto de SageLogger para los procesos de trabajo
+
+    Guarda las llamadas en orden para reproducirlas en el logger del proceso principal.
+    """
+    METHODS = (
+        "log", "log_batch", "error", "warning", "message", "success", "validation",
+        "register_file_stats", "register_format_error", "register_missing_file"
+    )
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name not in self.METHODS:
+            raise AttributeError(name)
+
+        def record(*args, **kwargs):
+            exception = kwargs.get('exception')
+            if exception is not None:
+                try:
+                    pickle.dumps(exception)
+                except Exception:
+                    kwargs['exception'] = FileProcessingError(f"{type(exception).__name__}: {exception}")
+            self.calls.append((name, args, kwargs))
+        return record
+
+    def failing_checks(self) -> Set[Tuple]:
+        """
+        Verificaciones distintas con errores, identificadas por (campo, regla)
+
+        Los requeridos, únicos y errores de tipo no tienen regla: se identifican por su
+        mensaje, que ya nombra el campo o el tipo verificado.
+        """
+        checks = set()
+        for name, args, kwargs in self.calls:
+            if name in ("log", "log_batch"):
+                severity = args[1] if len(args) > 1 else kwargs.get("severity")
+            else:
+                severity = name
+            if severity == "error" and args:
+                checks.add((kwargs.get("field"), kwargs.get("rule") or args[0]))
+        return checks
+
+
+def _validate_catalog_worker(config: SageConfig, catalog_name: str, file_path: str,
+                             allow_streaming: bool, chunksize: Optional[int]) -> Dict:
+    """Valida un catálogo en un proceso de trabajo y devuelve el estado a integrar"""
+    recorder = _RecordingLogger()
+    processor = FileProcessor(config, recorder, chunksize=chunksize)
+    result = {'df': None, 'records': 0, 'error': None, 'rejected': False}
+    try:
+        result['df'], result['records'] = processor._validate_zip_catalog(
+            file_path, catalog_name, config.catalogs[catalog_name], allow_streaming
+        )
+    except Exception as e:
+        result['error'] = str(e)
+        result['rejected'] = isinstance(e, ValidationBudgetExceeded)
+
+    result.update({
+        'calls': recorder.calls,
+        'error_count': processor.error_count,
+        'warning_count': processor.warning_count,
+        'field_rules_skipped': processor.field_rules_skipped,
+        'row_rules_skipped': processor.row_rules_skipped,
+        'catalog_rules_skipped': processor.catalog_rules_skipped,
+        'rule_failure_counts': processor.rule_failure_counts,
+        'metrics': processor.metrics.to_dict(),
+    })
+    return result
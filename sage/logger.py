@@ -1,15 +1,22 @@
 """Logging functionality for SAGE"""
 import os
 import json
+import time
+import threading
 import traceback
 from datetime import datetime
 import uuid
+from itertools import islice
 from typing import Optional, Dict, List, Any
 from urllib.parse import urlparse
 from rich.console import Console
 from rich.theme import Theme
 from rich.text import Text
 from rich.traceback import Traceback
+from .event_store import EventStore
+from .metrics import ExecutionMetrics
+from .execution_records import record_execution, reference_exists
+from .report_writer import StreamedArray, write_json_report
 
 class SageLogger:
     ICONS = {
@@ -29,7 +36,24 @@ class SageLogger:
         "rule": "📏"
     }
 
-    def __init__(self, log_dir: str, casilla_id: Optional[int] = None, emisor_id: Optional[int] = None, metodo_envio: Optional[str] = None):
+    # Búfer de report.html y output.log: se vuelcan a disco al superar este tamaño,
+    # cuando pasan LOG_FLUSH_INTERVAL segundos desde el último volcado, en summary()
+    # y al cerrar el logger
+    LOG_BUFFER_SIZE = 256 * 1024
+    LOG_FLUSH_INTERVAL = 2.0
+
+    # Eventos y fallos que se conservan completos en memoria (y en report.json);
+    # el detalle completo queda en events.jsonl y validation_failures.jsonl
+    EVENT_SAMPLE_SIZE = 1000
+
+    def __init__(self, log_dir: str, casilla_id: Optional[int] = None, emisor_id: Optional[int] = None, metodo_envio: Optional[str] = None,
+                 console_output: Optional[str] = None):
+        """
+        Args:
+            console_output: Salida de eventos por consola: 'on' (por defecto), 'off' o
+                un número máximo de eventos por segundo. Si no se indica se toma de la
+                variable de entorno SAGE_CONSOLE_OUTPUT (útil en ejecuciones del daemon)
+        """
         self.log_dir = log_dir
         self.report_html = os.path.join(log_dir, "report.html")  # HTML para navegador (renombrado de output.log)
         self.output_log = os.path.join(log_dir, "output.log")    # Log de sistema en texto plano
@@ -48,8 +72,17 @@ class SageLogger:
         self.catalog_rules_skipped = {}  # {catalog_name: {rule_name: error_count}}
 
         # Estructuras de datos para el reporte JSON
-        self.events = []  # Lista de todos los eventos (errores, advertencias, mensajes)
-        self.validation_failures = []  # Lista detallada de fallos en validaciones
+        sample_size = int(os.environ.get('SAGE_EVENT_SAMPLE', self.EVENT_SAMPLE_SIZE))
+        # Lista de todos los eventos (errores, advertencias, mensajes)
+        self.events = EventStore(os.path.join(log_dir, "events.jsonl"), sample_size)
+        # Lista detallada de fallos en validaciones
+        self.validation_failures = EventStore(os.path.join(log_dir, "validation_failures.jsonl"), sample_size)
+
+        # Tiempos por etapa y contadores de la ejecución (los registra FileProcessor)
+        self.metrics = ExecutionMetrics()
+
+        # log() se llama también desde hilos (materializaciones en paralelo)
+        self._lock = threading.RLock()
 
         # Inicializar el log de sistema (texto plano)
         with open(self.output_log, "w", encoding="utf-8") as f:
@@ -72,13 +105,81 @@ class SageLogger:
             "detail": "dim"
         }))
 
+        self._configure_console_output(console_output or os.environ.get('SAGE_CONSOLE_OUTPUT', 'on'))
+
         # Initialize log file with HTML structure
         self._initialize_log_file()
 
+        # Mantener ambos logs abiertos durante toda la ejecución en lugar de abrirlos por evento
+        self._html_file = open(self.report_html, "a", encoding="utf-8", buffering=self.LOG_BUFFER_SIZE)
+        self._text_file = open(self.output_log, "a", encoding="utf-8", buffering=self.LOG_BUFFER_SIZE)
+        self._last_flush = time.monotonic()
+
     def __del__(self):
         """Ensure HTML structure is closed when logger is destroyed"""
         self._close_log_file()
 
+    def _configure_console_output(self, mode: str) -> None:
+        """Interpreta el modo de salida por consola ('on', 'off' o eventos por segundo)"""
+        mode = str(mode).strip().lower()
+        self.console_enabled = mode not in ('off', 'false', 'no', '0')
+        self.console_rate = None
+        if self.console_enabled and mode not in ('on', 'true', 'yes', 'si', 'sí', ''):
+            try:
+                self.console_rate = max(float(mode), 0.0) or None
+            except ValueError:
+                pass  # Valor no reconocido: salida completa
+        self._console_window = time.monotonic()
+        self._console_count = 0
+        self._console_suppressed = 0
+
+    def _console_allowed(self) -> bool:
+        """Indica si el evento actual debe mostrarse por consola según el modo configurado"""
+        if not self.console_enabled:
+            return False
+        if self.console_rate is None:
+            return True
+
+        now = time.monotonic()
+        if now - self._console_window >= 1.0:
+            if self._console_suppressed:
+                self.console.print(f"\n… {self._console_suppressed} eventos omitidos en la consola (ver output.log)",
+                                   style="detail")
+            self._console_window = now
+            self._console_count = 0
+            self._console_suppressed = 0
+
+        if self._console_count < self.console_rate:
+            self._console_count += 1
+            return True
+        self._console_suppressed += 1
+        return False
+
+    def _write_logs(self, html: str, text: str) -> None:
+        """Escribe en report.html y output.log a través de los archivos abiertos"""
+        if self._html_file is None:
+            # Logger ya cerrado (p.ej. mensajes posteriores al resumen): anexar directamente
+            with open(self.report_html, "a", encoding="utf-8") as f:
+                f.write(html)
+            with open(self.output_log, "a", encoding="utf-8") as f:
+                f.write(text)
+            return
+
+        self._html_file.write(html)
+        self._text_file.write(text)
+        if time.monotonic() - self._last_flush >= self.LOG_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        """Vuelca a disco el contenido pendiente de report.html y output.log"""
+        for log_file in (getattr(self, '_html_file', None), getattr(self, '_text_file', None)):
+            if log_file is not None:
+                log_file.flush()
+        for store in (getattr(self, 'events', None), getattr(self, 'validation_failures', None)):
+            if store is not None:
+                store.flush()
+        self._last_flush = time.monotonic()
+
     def _initialize_log_file(self):
         """Initialize the log file with HTML structure"""
         html_header = """<!DOCTYPE html>
@@ -213,19 +314,28 @@ class SageLogger:
 
     def _close_log_file(self):
         """Close the HTML structure in the log file"""
+        # Solo la primera llamada escribe los cierres (summary, errores en main y __del__)
+        html_file = getattr(self, '_html_file', None)
+        text_file = getattr(self, '_text_file', None)
+        if html_file is None or text_file is None:
+            return
+        self.events.close()
+        self.validation_failures.close()
+        self._html_file = self._text_file = None
+
         try:
-            with open(self.report_html, "a", encoding="utf-8") as f:
-                f.write("\n</div>\n</body>\n</html>")
+            html_file.write("\n</div>\n</body>\n</html>")
+            html_file.close()
         except:
             pass  # Ignore errors when closing file during cleanup
 
         # También cerrar el log de texto
         try:
             elapsed_time = datetime.now() - self.start_time
-            with open(self.output_log, "a", encoding="utf-8") as f:
-                f.write(f"\n=== SAGE Log Fin: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n")
-                f.write(f"Tiempo transcurrido: {elapsed_time}\n")
-                f.write("=" * 60 + "\n")
+            text_file.write(f"\n=== SAGE Log Fin: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n")
+            text_file.write(f"Tiempo transcurrido: {elapsed_time}\n")
+            text_file.write("=" * 60 + "\n")
+            text_file.close()
         except:
             pass
 
@@ -300,161 +410,131 @@ class SageLogger:
 
     def log(self, message: str, severity: str, **kwargs):
         """Log a message with severity and details"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        timestamp_iso = datetime.now().isoformat()
+        with self._lock:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            timestamp_iso = datetime.now().isoformat()
 
-        # Format message and any file paths in kwargs
-        formatted_message = self._format_message(message)
-        if 'file' in kwargs:
-            kwargs['file'] = self._format_file_path(kwargs['file'])
+            # Format message and any file paths in kwargs
+            formatted_message = self._format_message(message)
+            if 'file' in kwargs:
+                kwargs['file'] = self._format_file_path(kwargs['file'])
 
-        # Write to report HTML
-        with open(self.report_html, "a", encoding="utf-8") as f:
+            # Write to report HTML y también al log de texto plano
             message_block = self._format_message_block(formatted_message, severity, timestamp, **kwargs)
-            f.write(message_block)
-
-        # También escribir al log de texto plano
-        with open(self.output_log, "a", encoding="utf-8") as f:
-            f.write(f"{timestamp} [{severity.upper()}] {message}\n")
+            text_lines = [f"{timestamp} [{severity.upper()}] {message}\n"]
             if kwargs:
                 for key, value in kwargs.items():
                     if value is not None:
-                        f.write(f"  {key}: {value}\n")
-                f.write("\n")
-
-        # Print to console with rich formatting
-        icon = self.ICONS.get(severity, "")
-        self.console.print(f"\n{timestamp} {icon} {severity.upper()}")
-        self.console.print(formatted_message)
-
-        if kwargs:
-            for key, value in kwargs.items():
-                if value is not None:
-                    self.console.print(f"  {key}: {value}")
-
-        # Capturar el evento para el reporte JSON
-        event_data = {
-            "timestamp": timestamp_iso,
-            "severity": severity,
-            "message": message,  # Guardamos el mensaje original sin formato
-            "details": {k: v for k, v in kwargs.items() if v is not None}
-        }
-        self.events.append(event_data)
-
-        # Si es un error de validación o formato, capturarlo específicamente
-        if severity in ["error", "warning"] and any(k in kwargs for k in ["rule", "field", "row", "column"]):
-            validation_data = {
+                        text_lines.append(f"  {key}: {value}\n")
+                text_lines.append("\n")
+            self._write_logs(message_block, "".join(text_lines))
+
+            # Print to console with rich formatting
+            if self._console_allowed():
+                icon = self.ICONS.get(severity, "")
+                self.console.print(f"\n{timestamp} {icon} {severity.upper()}")
+                self.console.print(formatted_message)
+
+                if kwargs:
+                    for key, value in kwargs.items():
+                        if value is not None:
+                            self.console.print(f"  {key}: {value}")
+
+            # Capturar el evento para el reporte JSON
+            event_data = {
                 "timestamp": timestamp_iso,
                 "severity": severity,
-                "message": message,
-                "type": "validation_error",
-                **{k: v for k, v in kwargs.items() if v is not None and k in ["file", "line", "column", "field", "rule", "value", "expected", "found", "row"]}
+                "message": message,  # Guardamos el mensaje original sin formato
+                "details": {k: v for k, v in kwargs.items() if v is not None}
             }
-            self.validation_failures.append(validation_data)
+            self.events.append(event_data)
+
+            # Si es un error de validación o formato, capturarlo específicamente
+            if severity in ["error", "warning"] and any(k in kwargs for k in ["rule", "field", "row", "column"]):
+                validation_data = {
+                    "timestamp": timestamp_iso,
+                    "severity": severity,
+                    "message": message,
+                    "type": "validation_error",
+                    **{k: v for k, v in kwargs.items() if v is not None and k in ["file", "line", "lines", "column", "field", "rule", "value", "values", "total", "expected", "found", "row"]}
+                }
+                self.validation_failures.append(validation_data)
+
+    def log_batch(self, message: str, severity: str, lines: List[int], values: Optional[List[Any]] = None,
+                  total: Optional[int] = None, **kwargs):
+        """
+        Registra en un único evento un lote de fallos de una misma regla
+
+        Args:
+            message: Mensaje descriptivo de la regla que falló
+            severity: Severidad del lote ('error' o 'warning')
+            lines: Números de línea de los fallos detallados (solo una muestra)
+            values: Valores correspondientes a cada línea, si aplica
+            total: Número total de fallos de la regla (puede ser mayor que len(lines))
+        """
+        total = len(lines) if total is None else total
+        self.log(message, severity, total=total, lines=lines, values=values, **kwargs)
 
     def _log_execution_to_db(self, total_records: int, errors: int, warnings: int) -> None:
             try:
-                import os
-                from psycopg2 import pool
-
                 # Extract execution details
                 yaml_path = os.path.join(self.log_dir, "input.yaml")
                 data_path = os.path.join(self.log_dir, "data")
 
-                # Get database URL from environment
-                database_url = os.environ['DATABASE_URL']
+                # Sin base de datos configurada no se registra la ejecución
+                if 'DATABASE_URL' not in os.environ:
+                    raise KeyError('DATABASE_URL')
 
-                # Create connection pool
-                connection_pool = pool.SimpleConnectionPool(1, 3, database_url)
-
-                # Inicializar variables
-                conn = None
-                cur = None
-
-                try:
-                    conn = connection_pool.getconn()
-                    cur = conn.cursor()
-
-                    # Determine estado
-                    if errors > 0:
-                        estado = 'Fallido'
-                    elif warnings > 0:
-                        estado = 'Parcial'
+                # Determine estado
+                if errors > 0:
+                    estado = 'Fallido'
+                elif warnings > 0:
+                    estado = 'Parcial'
+                else:
+                    estado = 'Éxito'
+
+                # Para todas las ejecuciones, validar siempre los IDs contra la BD
+                # para respetar las restricciones de clave foránea (con caché entre ejecuciones)
+                validated_casilla_id = None
+                validated_emisor_id = None
+                id_warnings = 0  # Contador de advertencias para IDs inválidos
+
+                # Validar casilla_id si fue proporcionado
+                if self.casilla_id is not None:
+                    if reference_exists('casillas', self.casilla_id):
+                        validated_casilla_id = self.casilla_id
                     else:
-                        estado = 'Éxito'
-
-                    # Para todas las ejecuciones, validar siempre los IDs contra la BD
-                    # para respetar las restricciones de clave foránea
-                    validated_casilla_id = None
-                    validated_emisor_id = None
-                    id_warnings = 0  # Contador de advertencias para IDs inválidos
-
-                    # Validar casilla_id si fue proporcionado
-                    if self.casilla_id is not None:
-                        cur.execute("SELECT id FROM casillas WHERE id = %s", (self.casilla_id,))
-                        if cur.fetchone():
-                            validated_casilla_id = self.casilla_id
-                        else:
-                            # Registrar advertencia si el ID no existe
-                            self.warning(f"Casilla con ID {self.casilla_id} no encontrada en la base de datos")
-                            id_warnings += 1
-
-                    # Validar emisor_id si fue proporcionado
-                    if self.emisor_id is not None:
-                        cur.execute("SELECT id FROM emisores WHERE id = %s", (self.emisor_id,))
-                        if cur.fetchone():
-                            validated_emisor_id = self.emisor_id
-                        else:
-                            # Registrar advertencia si el ID no existe
-                            self.warning(f"Emisor con ID {self.emisor_id} no encontrado en la base de datos")
-                            id_warnings += 1
-
-                    # Actualizar estado si hay advertencias de IDs
-                    if id_warnings > 0 and estado == 'Éxito':
-                        estado = 'Parcial'  # Cambiar a "Parcial" si hay problemas con los IDs
-
-                    # Insert execution record con IDs (validados o no, según el estado)
-                    cur.execute("""
-                        INSERT INTO ejecuciones_yaml 
-                            (nombre_yaml, archivo_datos, estado, 
-                             errores_detectados, warnings_detectados, ruta_directorio,
-                             casilla_id, emisor_id, metodo_envio)
-                        VALUES 
-                            (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (
-                            os.path.basename(yaml_path),
-                            os.path.basename(data_path),
-                            estado,
-                            errors,
-                            warnings,
-                            self.log_dir,
-                            validated_casilla_id,
-                            validated_emisor_id,
-                            self.metodo_envio
-                        ))
-
-                    conn.commit()
-
-                finally:
-                    # Cerrar cursor y devolver conexión solo si fueron creados
-                    if cur is not None:
-                        try:
-                            cur.close()
-                        except Exception:
-                            pass
-
-                    if conn is not None:
-                        try:
-                            connection_pool.putconn(conn)
-                        except Exception:
-                            pass
-
-                    if connection_pool is not None:
-                        try:
-                            connection_pool.closeall()
-                        except Exception:
-                            pass
+                        # Registrar advertencia si el ID no existe
+                        self.warning(f"Casilla con ID {self.casilla_id} no encontrada en la base de datos")
+                        id_warnings += 1
+
+                # Validar emisor_id si fue proporcionado
+                if self.emisor_id is not None:
+                    if reference_exists('emisores', self.emisor_id):
+                        validated_emisor_id = self.emisor_id
+                    else:
+                        # Registrar advertencia si el ID no existe
+                        self.warning(f"Emisor con ID {self.emisor_id} no encontrado en la base de datos")
+                        id_warnings += 1
+
+                # Actualizar estado si hay advertencias de IDs
+                if id_warnings > 0 and estado == 'Éxito':
+                    estado = 'Parcial'  # Cambiar a "Parcial" si hay problemas con los IDs
+
+                # Registrar la ejecución; se inserta en el momento (o por lotes con
+                # SAGE_DB_BATCH_SIZE > 1) y los errores llegan al except de abajo
+                record_execution({
+                    'nombre_yaml': os.path.basename(yaml_path),
+                    'archivo_datos': os.path.basename(data_path),
+                    'estado': estado,
+                    'errores_detectados': errors,
+                    'warnings_detectados': warnings,
+                    'ruta_directorio': self.log_dir,
+                    'casilla_id': validated_casilla_id,
+                    'emisor_id': validated_emisor_id,
+                    'metodo_envio': self.metodo_envio,
+                    'metricas': self.metrics.to_dict()
+                })
 
             except Exception as e:
                 self.warning(f"No se pudo registrar la ejecución: {str(e)}")
@@ -513,17 +593,15 @@ class SageLogger:
         </div>
         """
 
-        with open(self.report_html, "a", encoding="utf-8") as f:
-            f.write(summary_html)
-
         # También escribir la información del resumen al log de texto
-        with open(self.output_log, "a", encoding="utf-8") as f:
-            f.write(f"\n=== RESUMEN FINAL ===\n")
-            f.write(f"Registros totales: {total_records}\n")
-            f.write(f"Errores: {errors}\n")
-            f.write(f"Advertencias: {warnings}\n")
-            f.write(f"Tasa de éxito: {success_rate:.1f}%\n")
-            f.write("=" * 30 + "\n")
+        self._write_logs(summary_html,
+                         f"\n=== RESUMEN FINAL ===\n"
+                         f"Registros totales: {total_records}\n"
+                         f"Errores: {errors}\n"
+                         f"Advertencias: {warnings}\n"
+                         f"Tasa de éxito: {success_rate:.1f}%\n" +
+                         "=" * 30 + "\n")
+        self.flush()
 
         # Log execution to database before closing HTML
         self._log_execution_to_db(total_records, errors, warnings)
@@ -534,12 +612,13 @@ class SageLogger:
         self._close_log_file()  # Close HTML structure after summary
 
         # Also print to console
-        self.console.print("\n🎯 Resumen Final")
-        self.console.print(f"  📝 Registros Totales: {total_records}")
-        self.console.print(f"  ❌ Errores: {errors}")
-        self.console.print(f"  ⚠️ Advertencias: {warnings}")
-        if total_records > 0:
-            self.console.print(f"  ✨ Tasa de Éxito: {success_rate:.1f}%")
+        if self.console_enabled:
+            self.console.print("\n🎯 Resumen Final")
+            self.console.print(f"  📝 Registros Totales: {total_records}")
+            self.console.print(f"  ❌ Errores: {errors}")
+            self.console.print(f"  ⚠️ Advertencias: {warnings}")
+            if total_records > 0:
+                self.console.print(f"  ✨ Tasa de Éxito: {success_rate:.1f}%")
 
         # Generar el archivo results.txt y report.json
         self.generate_results_txt(total_records, errors, warnings)
@@ -660,13 +739,21 @@ class SageLogger:
 
         return " ".join(words)
 
-    def register_file_stats(self, filename: str, records: int, errors: int, warnings: int):
-        """Registra estadísticas de un archivo procesado"""
+    def register_file_stats(self, filename: str, records: int, errors: int, warnings: int,
+                            status: Optional[str] = None):
+        """
+        Registra estadísticas de un archivo procesado
+
+        Args:
+            status: Estado del archivo si no pudo validarse ('Rechazado' o 'Error')
+        """
         self.file_stats[filename] = {
             'records': records,
             'errors': errors,
             'warnings': warnings
         }
+        if status is not None:
+            self.file_stats[filename]['status'] = status
 
     def register_format_error(self, message: str, file: str = None, expected: str = None, found: str = None):
         """Registra un error de formato específico (como discrepancia de columnas)"""
@@ -742,7 +829,7 @@ class SageLogger:
         """
 
         # Añadir errores detectados (limitados a 20 para no sobrecargar el correo)
-        errors_list = [e for e in self.events if e.get('severity') == 'error'][:20]
+        errors_list = list(islice((e for e in self.events if e.get('severity') == 'error'), 20))
         if errors_list:
             html += f"""
                 <div style="margin-bottom: 20px;">
@@ -759,6 +846,9 @@ class SageLogger:
                 bg_color = "#ffffff" if idx % 2 == 0 else "#f8f8f8"
                 file_name = error.get('details', {}).get('file', 'N/A')
                 line_num = error.get('details', {}).get('line', 'N/A')
+                if 'lines' in error.get('details', {}):
+                    # Evento en lote: mostrar las primeras líneas detalladas
+                    line_num = ", ".join(str(line) for line in error['details']['lines'][:5]) or 'N/A'
                 html += f"""
                         <tr style="background-color: {bg_color};">
                             <td style="padding: 8px; border-bottom: 1px solid #ddd;">{file_name}</td>
@@ -792,7 +882,8 @@ class SageLogger:
 
         return email_html_path
 
-    def generate_report_json(self, total_records: int, errors: int, warnings: int):
+    def generate_report_json(self, total_records: int, errors: int, warnings: int,
+                             compress: Optional[bool] = None):
         """
         Genera un archivo report.json con información detallada de la ejecución
 
@@ -800,7 +891,17 @@ class SageLogger:
         errores y advertencias capturados durante la ejecución del procesamiento.
         Incluye información adicional sobre validaciones, errores de formato y archivos
         faltantes en un formato que facilita su procesamiento automático.
+
+        Los eventos y fallos se escriben uno a uno leyéndolos del almacén de eventos,
+        sin copiarlos en memoria.
+
+        Args:
+            compress: Si es True también se genera report.json.gz (para archivado).
+                Por defecto se toma de la variable de entorno SAGE_REPORT_GZIP
         """
+        if compress is None:
+            compress = os.environ.get('SAGE_REPORT_GZIP', '').strip().lower() in ('1', 'true', 'on', 'yes', 'si', 'sí')
+
         end_time = datetime.now()
         duration = end_time - self.start_time
 
@@ -838,53 +939,35 @@ class SageLogger:
                 "success_rate": round(success_rate, 2),
                 "status": status
             },
+            "metrics": self.metrics.to_dict(),
             "files": {
                 "statistics": self.file_stats,
                 "missing_files": self.missing_files,
                 "format_errors": self.format_errors
             },
             "validation": {
-                "failures": self.validation_failures,
+                "failures": StreamedArray(self.validation_failures.iter_json(), encoded=True),
+                "failures_summary": self._store_summary(self.validation_failures),
                 "skipped_rules": {
                     "field_rules": self.field_rules_skipped,
                     "row_rules": self.row_rules_skipped,
                     "catalog_rules": self.catalog_rules_skipped
                 }
             },
-            "events": self.events
+            "events": StreamedArray(self.events.iter_json(), encoded=True),
+            "events_summary": self._store_summary(self.events)
         }
 
-        # Procesamos eventos para garantizar serialización
-        processed_events = []
-        for event in self.events:
-            # Crear una copia del evento para no modificar el original
-            processed_event = {}
-            for key, value in event.items():
-                if key == 'exception' and hasattr(value, 'to_dict'):
-                    # Si es una excepción con método to_dict, usarlo
-                    processed_event[key] = value.to_dict()
-                elif isinstance(value, (str, int, float, bool)) or value is None:
-                    # Tipos básicos van directamente
-                    processed_event[key] = value
-                else:
-                    # Cualquier otro objeto, convertir a string
-                    processed_event[key] = str(value)
-            processed_events.append(processed_event)
-
-        # Reemplazar eventos originales con versión procesada
-        report["events"] = processed_events
-
         # Escribimos el informe en formato JSON
         try:
-            with open(self.report_json, "w", encoding="utf-8") as f:
-                json.dump(report, f, ensure_ascii=False, indent=2)
-        except TypeError as e:
+            write_json_report(self.report_json, report, compress=compress)
+        except (TypeError, ValueError) as e:
             # Si hay error de serialización, crear un informe mínimo
             self.error(f"Error al serializar el reporte JSON: {str(e)}")
 
             # Versión simplificada que seguro funciona
             simplified_report = {
-                "execution_uuid": self.execution_uuid,
+                "execution_uuid": getattr(self, 'execution_uuid', None),
                 "errors": errors,
                 "warnings": warnings
             }
@@ -892,6 +975,14 @@ class SageLogger:
             with open(self.report_json, "w", encoding="utf-8") as f:
                 json.dump(simplified_report, f, ensure_ascii=False, indent=2)
 
+    @staticmethod
+    def _store_summary(store: EventStore) -> Dict[str, Any]:
+        """Contadores de un almacén de eventos y referencia al archivo con el detalle completo"""
+        return {
+            **store.counters(),
+            "file": store.file_name
+        }
+
     def generate_results_txt(self, total_records: int, errors: int, warnings: int):
         """Genera un archivo results.txt con un resumen estructurado de la ejecución"""
         end_time = datetime.now()
@@ -932,6 +1023,8 @@ class SageLogger:
                 for filename, stats in self.file_stats.items():
                     file_success_rate = ((stats['records'] - stats['errors']) / stats['records'] * 100) if stats['records'] > 0 else 0
                     f.write(f"Archivo: {filename}\n")
+                    if 'status' in stats:
+                        f.write(f"  Estado: {stats['status']}\n")
                     f.write(f"  Registros: {stats['records']}\n")
                     f.write(f"  Errores: {stats['errors']}\n")
                     f.write(f"  Advertencias: {stats['warnings']}\n")
@@ -6,10 +6,11 @@ from typing import Tuple, Optional
 from .yaml_validator import YAMLValidator
 from .file_processor import FileProcessor
 from .logger import SageLogger
+from .metrics import ExecutionProfiler
 from .utils import create_execution_directory, copy_input_files
 from .exceptions import SAGEError
 
-def process_files(yaml_path: str, data_path: str, casilla_id: Optional[int] = None, emisor_id: Optional[int] = None, metodo_envio: Optional[str] = "direct_upload") -> Tuple[str, int, int]:
+def process_files(yaml_path: str, data_path: str, casilla_id: Optional[int] = None, emisor_id: Optional[int] = None, metodo_envio: Optional[str] = "direct_upload", chunksize: Optional[int] = None, workers: Optional[int] = None, profile: Optional[str] = None) -> Tuple[str, int, int]:
     """
     Process files according to YAML configuration
     
@@ -19,6 +20,10 @@ def process_files(yaml_path: str, data_path: str, casilla_id: Optional[int] = No
         casilla_id: Optional ID of the mailbox (casilla)
         emisor_id: Optional ID of the sender (emisor)
         metodo_envio: Method used to send the file ('sftp', 'email', 'direct_upload', 'portal_upload', 'api')
+        chunksize: Optional number of rows per chunk to validate CSV files in streaming mode
+        workers: Optional number of processes to validate the catalogs of a ZIP package in parallel (0 = all cores)
+        profile: Optional profiler ('cprofile' or 'pyinstrument') whose output is saved in the execution directory
+            (defaults to the SAGE_PROFILE environment variable)
         
     Returns: 
         Tuple containing (execution_uuid, error_count, warning_count)
@@ -27,6 +32,8 @@ def process_files(yaml_path: str, data_path: str, casilla_id: Optional[int] = No
     execution_dir, execution_uuid = create_execution_directory()
     logger = SageLogger(execution_dir, casilla_id, emisor_id, metodo_envio)
     logger.message(f"Starting SAGE execution {execution_uuid}")
+    profiler = ExecutionProfiler(profile)
+    profiler.start(logger)
 
     try:
         # Copy input files
@@ -34,11 +41,12 @@ def process_files(yaml_path: str, data_path: str, casilla_id: Optional[int] = No
 
         # Validate YAML
         yaml_validator = YAMLValidator()
-        config = yaml_validator.load_and_validate(yaml_dest)
+        with logger.metrics.stage('yaml_validation'):
+            config = yaml_validator.load_and_validate(yaml_dest)
         logger.success("YAML validation successful")
 
         # Process file
-        processor = FileProcessor(config, logger)
+        processor = FileProcessor(config, logger, chunksize=chunksize, workers=workers)
 
         # Determine which package or catalog to use based on file type and YAML configuration
         file_extension = os.path.splitext(data_dest.lower())[1]
@@ -145,7 +153,8 @@ def process_files(yaml_path: str, data_path: str, casilla_id: Optional[int] = No
             )
                 
 
-        error_count, warning_count = processor.process_file(data_dest, package_name)
+        with logger.metrics.stage('file_processing'):
+            error_count, warning_count = processor.process_file(data_dest, package_name)
 
         # Log summary
         # Para archivos ZIP, no podemos contar líneas directamente - usamos el contador de registros del procesador
@@ -178,11 +187,12 @@ def process_files(yaml_path: str, data_path: str, casilla_id: Optional[int] = No
                 logger.warning(f"No se pudieron contar registros en {data_dest}: {str(e)}")
                 total_records = 0
 
-        logger.summary(
-            total_records=total_records,
-            errors=error_count,
-            warnings=warning_count
-        )
+        with logger.metrics.stage('summary'):
+            logger.summary(
+                total_records=total_records,
+                errors=error_count,
+                warnings=warning_count
+            )
         
         # Procesar materializaciones si hay un dataframe válido, un ID de casilla y no hay errores en el procesamiento YAML
         if casilla_id and hasattr(processor, 'last_processed_df') and processor.last_processed_df is not None and error_count == 0:
@@ -192,24 +202,25 @@ def process_files(yaml_path: str, data_path: str, casilla_id: Optional[int] = No
                 
                 # Si tenemos un dataframe de resumen y hay múltiples dataframes específicos por catálogo,
                 # pasar ambos a process_materializations
-                if hasattr(processor, 'dataframes') and processor.dataframes:
-                    logger.message(f"Detectados {len(processor.dataframes)} dataframes por catálogo para materializaciones: {', '.join(processor.dataframes.keys())}")
-                    process_materializations(
-                        casilla_id=casilla_id,
-                        execution_id=execution_uuid,
-                        dataframe=processor.last_processed_df,
-                        logger=logger,
-                        dataframes_by_catalog=processor.dataframes
-                    )
-                else:
-                    # Si no hay dataframes específicos, usar solo el dataframe principal
-                    logger.message("No se detectaron dataframes específicos por catálogo, usando dataframe único")
-                    process_materializations(
-                        casilla_id=casilla_id,
-                        execution_id=execution_uuid,
-                        dataframe=processor.last_processed_df,
-                        logger=logger
-                    )
+                with logger.metrics.stage('materializations'):
+                    if hasattr(processor, 'dataframes') and processor.dataframes:
+                        logger.message(f"Detectados {len(processor.dataframes)} dataframes por catálogo para materializaciones: {', '.join(processor.dataframes.keys())}")
+                        process_materializations(
+                            casilla_id=casilla_id,
+                            execution_id=execution_uuid,
+                            dataframe=processor.last_processed_df,
+                            logger=logger,
+                            dataframes_by_catalog=processor.dataframes
+                        )
+                    else:
+                        # Si no hay dataframes específicos, usar solo el dataframe principal
+                        logger.message("No se detectaron dataframes específicos por catálogo, usando dataframe único")
+                        process_materializations(
+                            casilla_id=casilla_id,
+                            execution_id=execution_uuid,
+                            dataframe=processor.last_processed_df,
+                            logger=logger
+                        )
             except Exception as e:
                 # No interrumpir el flujo principal si falla la materialización
                 logger.warning(f"Error al procesar materializaciones: {str(e)}")
@@ -244,6 +255,18 @@ def process_files(yaml_path: str, data_path: str, casilla_id: Optional[int] = No
             
         return execution_uuid, 1, 0
 
+    finally:
+        # Guardar el perfil (si se pidió) y las métricas completas, incluidas las etapas
+        # posteriores al resumen (materializaciones)
+        try:
+            profile_path = profiler.stop(execution_dir)
+            if profile_path:
+                logger.message(f"Perfil de la ejecución guardado en {profile_path}")
+            logger.metrics.write(os.path.join(execution_dir, "metrics.json"),
+                                 execution_uuid=execution_uuid, casilla_id=casilla_id)
+        except Exception as e:
+            print(f"Error al guardar las métricas de la ejecución: {str(e)}")
+
 def main():
     parser = argparse.ArgumentParser(description="SAGE - Sistema de Análisis y Gestión de Errores")
     parser.add_argument("yaml_path", help="Path to YAML configuration file")
@@ -252,6 +275,12 @@ def main():
     parser.add_argument("--emisor-id", type=int, help="ID del emisor asociado con esta ejecución")
     parser.add_argument("--metodo-envio", choices=["email", "sftp", "direct_upload", "portal_upload", "api"], 
                        help="Método de envío utilizado (email, sftp, direct_upload, portal_upload, api)")
+    parser.add_argument("--chunksize", type=int,
+                       help="Validar archivos CSV en modo streaming leyendo bloques de N filas")
+    parser.add_argument("--workers", type=int, nargs="?", const=0,
+                       help="Validar los catálogos de un ZIP en paralelo con N procesos (sin valor: todos los núcleos)")
+    parser.add_argument("--profile", choices=list(ExecutionProfiler.MODES),
+                       help="Guardar un perfil de la ejecución (cprofile o pyinstrument) en el directorio de la ejecución")
 
     args = parser.parse_args()
 
@@ -261,7 +290,10 @@ def main():
             args.data_path,
             casilla_id=args.casilla_id,
             emisor_id=args.emisor_id,
-            metodo_envio=args.metodo_envio
+            metodo_envio=args.metodo_envio,
+            chunksize=args.chunksize,
+            workers=args.workers,
+            profile=args.profile
         )
         print(f"\nExecution completed!")
         print(f"Execution UUID: {execution_uuid}")
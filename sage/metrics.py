@@ -0,0 +1,164 @@
+"""Métricas de ejecución de SAGE: tiempos por etapa, contadores y perfilado opcional"""
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+# Longitud máxima de la expresión de una regla guardada en las métricas
+RULE_EXPRESSION_LIMIT = 200
+
+
+class ExecutionMetrics:
+    """
+    Tiempos por etapa y contadores de una ejecución
+
+    Las etapas pueden anidarse (p.ej. 'type_conversion' dentro de 'read'); cada una
+    acumula su tiempo de reloj y el número de veces que se ejecutó. Cuando los
+    catálogos de un ZIP se validan en paralelo se suman los tiempos de todos los
+    procesos, por lo que una etapa puede superar la duración total.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}  # {etapa: {'seconds': s, 'calls': n}}
+        self.counters = Counter()  # rows_read, bytes_read, rules_evaluated, rule_seconds, ...
+        # Costo por regla: {(tipo, catálogo, campo, regla): {'expression', 'evaluations', 'seconds', ...}}
+        self.rules: Dict[Tuple, Dict[str, Any]] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mide el tiempo de reloj del bloque y lo acumula en la etapa name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name: str, seconds: float, calls: int = 1) -> None:
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        stage['seconds'] += seconds
+        stage['calls'] += calls
+
+    def count(self, name: str, value: float = 1) -> None:
+        self.counters[name] += value
+
+    def record_rule(self, kind: str, catalog: Optional[str], field: Optional[str], name: str,
+                    expression: str, seconds: float, rows: int, evaluations: int = 1,
+                    max_seconds: Optional[float] = None) -> None:
+        """
+        Acumula el tiempo y las filas evaluadas de una regla
+
+        Args:
+            kind: 'campo', 'fila', 'catalogo' o 'paquete'
+            catalog: Catálogo (o paquete) de la regla
+            field: Campo de la regla (solo para reglas de campo)
+            rows: Filas sobre las que se evaluó la regla
+        """
+        stats = self.rules.get((kind, catalog, field, name))
+        if stats is None:
+            stats = self.rules[(kind, catalog, field, name)] = {
+                'expression': str(expression)[:RULE_EXPRESSION_LIMIT],
+                'evaluations': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0
+            }
+        stats['evaluations'] += evaluations
+        stats['seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds if max_seconds is None else max_seconds)
+        stats['rows'] += rows
+
+    def merge(self, data: Dict[str, Any]) -> None:
+        """Acumula las métricas serializadas con to_dict() (p.ej. de un proceso de trabajo)"""
+        for name, stage in data.get('stages', {}).items():
+            self.add_stage(name, stage['seconds'], stage['calls'])
+        self.counters.update(data.get('counters', {}))
+        for rule in data.get('rules', []):
+            self.record_rule(rule['kind'], rule['catalog'], rule['field'], rule['rule'], rule['expression'],
+                             rule['seconds'], rule['rows'], rule['evaluations'], rule['max_seconds'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stages': {
+                name: {'seconds': round(stage['seconds'], 6), 'calls': stage['calls']}
+                for name, stage in self.stages.items()
+            },
+            'counters': {
+                name: round(value, 6) if isinstance(value, float) else value
+                for name, value in self.counters.items()
+            },
+            # Ordenadas de la más lenta a la más rápida
+            'rules': [
+                {
+                    'kind': kind, 'catalog': catalog, 'field': field, 'rule': name,
+                    'expression': stats['expression'],
+                    'evaluations': stats['evaluations'],
+                    'seconds': round(stats['seconds'], 6),
+                    'max_seconds': round(stats['max_seconds'], 6),
+                    'rows': stats['rows']
+                }
+                for (kind, catalog, field, name), stats in sorted(
+                    self.rules.items(), key=lambda item: item[1]['seconds'], reverse=True
+                )
+            ]
+        }
+
+    def write(self, path: str, **info) -> None:
+        """Guarda las métricas en path junto con datos de la ejecución (casilla_id, ...)"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**info, **self.to_dict()}, f, ensure_ascii=False, indent=2)
+
+
+class ExecutionProfiler:
+    """
+    Captura opcional de un perfil de la ejecución completa
+
+    mode puede ser 'cprofile' (genera profile.prof, legible con pstats o snakeviz) o
+    'pyinstrument' (genera profile.html; requiere tener instalado pyinstrument).
+    Si no se indica se toma de la variable de entorno SAGE_PROFILE; vacío desactiva
+    el perfilado.
+    """
+
+    MODES = ('cprofile', 'pyinstrument')
+
+    def __init__(self, mode: Optional[str] = None):
+        mode = (mode if mode is not None else os.environ.get('SAGE_PROFILE', '')).strip().lower()
+        self.mode = mode or None
+        self._profiler = None
+
+    def start(self, logger=None) -> None:
+        if self.mode is None:
+            return
+        if self.mode not in self.MODES:
+            if logger is not None:
+                logger.warning(f"Modo de perfilado desconocido '{self.mode}' (opciones: {', '.join(self.MODES)})")
+            return
+
+        if self.mode == 'cprofile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                if logger is not None:
+                    logger.warning("pyinstrument no está instalado; no se generará el perfil de la ejecución")
+                return
+            self._profiler = Profiler()
+            self._profiler.start()
+
+    def stop(self, output_dir: str) -> Optional[str]:
+        """Detiene el perfilado y guarda el resultado en output_dir; devuelve la ruta del archivo"""
+        if self._profiler is None:
+            return None
+
+        profiler, self._profiler = self._profiler, None
+        if self.mode == 'cprofile':
+            profiler.disable()
+            path = os.path.join(output_dir, "profile.prof")
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            path = os.path.join(output_dir, "profile.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        return path
@@ -1,5 +1,6 @@
 """Data models for SAGE"""
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from types import CodeType
 from typing import List, Dict, Any, Optional
 from enum import Enum
 
@@ -43,11 +44,18 @@ class ValidationRule:
     description: str
     rule: str
     severity: Severity
+    compiled: Optional[CodeType] = field(default=None, repr=False, compare=False)  # Expresión precompilada
     
     def __repr__(self) -> str:
         """Representación más limpia para logs"""
         return f"ValidationRule(name='{self.name}', severity={self.severity.name})"
 
+    def __getstate__(self):
+        """El código compilado no se puede serializar; se recompila en destino desde la caché"""
+        state = self.__dict__.copy()
+        state['compiled'] = None
+        return state
+
 @dataclass
 class Field:
     name: str
@@ -55,6 +63,7 @@ class Field:
     required: bool
     unique: bool
     validation_rules: List[ValidationRule]
+    date_format: Optional[str] = None  # Formato explícito para campos de tipo fecha (p.ej. '%d/%m/%Y')
     
     def __repr__(self) -> str:
         """Representación más limpia para logs"""
@@ -65,6 +74,8 @@ class FileFormat:
     type: str
     delimiter: Optional[str] = None
     header: bool = False
+    chunksize: Optional[int] = None  # Filas por bloque para validación en streaming (solo CSV)
+    engine: Optional[str] = None  # Lector de CSV: 'pandas' (por defecto) o 'pyarrow'
     
     def __repr__(self) -> str:
         """Representación más limpia para logs"""
@@ -72,6 +83,12 @@ class FileFormat:
             return f"FileFormat(type='{self.type}', delimiter='{self.delimiter}', header={self.header})"
         return f"FileFormat(type='{self.type}', header={self.header})"
 
+@dataclass
+class ValidationBudget:
+    sample_rows: int = 1000                     # Filas iniciales que se validan antes de procesar el archivo
+    max_error_ratio: Optional[float] = None     # Máximo de errores por fila en la muestra (0.5 = 50%)
+    max_failing_checks: Optional[int] = None    # Máximo de verificaciones distintas con errores en la muestra
+
 @dataclass
 class Catalog:
     name: str
@@ -82,11 +99,27 @@ class Catalog:
     fields: List[Field]
     row_validation: List[ValidationRule]
     catalog_validation: List[ValidationRule]
+    unique_keys: List[List[str]] = field(default_factory=list)  # Claves únicas compuestas por varios campos
+    validation_budget: Optional[ValidationBudget] = None  # Rechazo anticipado de archivos sin remedio
     
     def __repr__(self) -> str:
         """Representación más limpia para logs"""
         return f"Catalog(name='{self.name}', filename='{self.filename}', fields={len(self.fields)})"
 
+@dataclass
+class ForeignKey:
+    name: str
+    catalog: str                 # Catálogo que contiene la referencia
+    fields: List[str]            # Campos de la referencia (uno o varios)
+    ref_catalog: str             # Catálogo referenciado
+    ref_fields: List[str]        # Campos de la clave referenciada, en el mismo orden
+    severity: Severity = Severity.ERROR
+    description: str = ""
+
+    def __repr__(self) -> str:
+        """Representación más limpia para logs"""
+        return f"ForeignKey(name='{self.name}', {self.catalog}{self.fields} -> {self.ref_catalog}{self.ref_fields})"
+
 @dataclass
 class Package:
     name: str
@@ -94,6 +127,7 @@ class Package:
     file_format: FileFormat
     catalogs: List[str]
     package_validation: List[ValidationRule]
+    foreign_keys: List[ForeignKey] = field(default_factory=list)  # Integridad referencial entre catálogos
     
     def __repr__(self) -> str:
         """Representación más limpia para logs"""
@@ -13,6 +13,7 @@ from email.mime.multipart import MIMEMultipart
 from typing import Dict, List, Any, Optional, Union, Sequence
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from sage import db_pool
 
 # Importar adaptador de plantillas si está disponible
 try:
@@ -33,6 +34,7 @@ class Notificador:
             db_connection: Conexión a la base de datos PostgreSQL (opcional)
         """
         self.db_connection = db_connection
+        self._pooled_connection = False  # True si la conexión se tomó del pool compartido
         self.smtp_config = self._get_smtp_config()
         
         # Inicializar el adaptador de plantillas si está disponible
@@ -122,10 +124,24 @@ class Notificador:
                 logger.error("No se ha configurado DATABASE_URL")
                 raise ValueError("No se ha configurado DATABASE_URL")
             
-            self.db_connection = psycopg2.connect(conn_string)
+            self.db_connection = db_pool.acquire(conn_string)
+            self._pooled_connection = True
         
         return self.db_connection
     
+    def close(self):
+        """Devuelve al pool la conexión tomada por el notificador (las conexiones recibidas no se cierran)"""
+        if self._pooled_connection and self.db_connection is not None:
+            db_pool.release(self.db_connection)
+            self.db_connection = None
+            self._pooled_connection = False
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+    
     def obtener_suscripciones(self, filtros: Optional[Dict[str, Any]] = None) -> Sequence[Dict[str, Any]]:
         """Obtiene suscripciones según los filtros especificados
         
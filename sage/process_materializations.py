@@ -8,7 +8,6 @@ import os
 import sys
 import json
 import datetime
-import math
 import pandas as pd
 import psycopg2
 import boto3
@@ -16,9 +15,11 @@ import io
 import tempfile
 import time
 import uuid
+import threading
 import zipfile
 import paramiko
 from paramiko import SSHClient, SFTPClient
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from typing import Optional, Dict, List, Any, Tuple, Union
 from urllib.parse import urlparse, quote_plus
 from azure.storage.blob import BlobServiceClient, ContentSettings, ContainerClient
@@ -26,6 +27,10 @@ import re
 from google.cloud.storage import Client as GCPStorageClient
 from google.oauth2 import service_account
 from .logger import SageLogger
+from . import db_pool
+from .bulk_loaders import bulk_load, DuckDBArrowLoader
+from .bulk_upsert import staged_upsert, staged_delete, UPSERT_DIALECTS
+from .change_detection import FingerprintStore, detect_changes
 
 # Formatos de archivo soportados para la materialización
 SUPPORTED_FORMATS = {
@@ -47,26 +52,41 @@ SUPPORTED_OPERATIONS = {
     'delete': 'Eliminar registros según condición'
 }
 
-# Tamaño de lote para operaciones de inserción en bases de datos
-# Aumentado de 1000 a 50000 para optimizar el rendimiento de inserciones masivas
-DATABASE_BATCH_SIZE = 50000
+# Materializaciones de una ejecución que se procesan a la vez; se puede ajustar con SAGE_MATERIALIZATION_WORKERS
+DEFAULT_MATERIALIZATION_WORKERS = 4
+
+# Tiempo máximo (segundos, incluyendo reintentos) y reintentos por tipo de destino.
+# Cada materialización puede fijar los suyos con 'timeout'/'tiempoMaximo' y 'retries'/'reintentos';
+# SAGE_MATERIALIZATION_TIMEOUT y SAGE_MATERIALIZATION_RETRIES cambian los valores por defecto
+DESTINATION_POLICIES = {
+    'db': {'timeout': 1800, 'retries': 1},
+    'cloud': {'timeout': 900, 'retries': 2},
+}
+RETRY_BACKOFF_SECONDS = 5
+
+# Errores de configuración o de datos: reintentar no cambia el resultado
+NON_RETRYABLE_ERRORS = (ValueError, TypeError, KeyError, ImportError)
 
 class MaterializationProcessor:
     """
     Procesa materializaciones configuradas para un dataframe ya procesado por SAGE.
     """
     
-    def __init__(self, logger: SageLogger):
+    def __init__(self, logger: SageLogger, max_workers: Optional[int] = None):
         """
         Inicializa el procesador de materializaciones.
         
         Args:
             logger: Logger de SAGE para registrar eventos
+            max_workers: Materializaciones que se procesan a la vez
         """
         self.logger = logger
-        self.db_connection = None
+        self.max_workers = max(1, int(max_workers or os.environ.get('SAGE_MATERIALIZATION_WORKERS',
+                                                                   DEFAULT_MATERIALIZATION_WORKERS)))
+        self._local = threading.local()  # Conexión a la base de datos de SAGE de cada hilo
         self.cloud_clients = {}  # Caché de clientes para proveedores cloud
         self.casilla_id = None  # ID de la casilla actual que se está procesando
+        self.fingerprints = FingerprintStore()  # Huellas de las materializaciones incrementales
         
     def _clean_server_string(self, server: str) -> str:
         """
@@ -100,14 +120,23 @@ class MaterializationProcessor:
         """
         Obtiene una conexión a la base de datos
         
+        Cada hilo usa su propia conexión: las materializaciones en paralelo no
+        comparten transacciones.
+        
         Returns:
             conexión activa a PostgreSQL
         """
-        if self.db_connection is None:
-            self.db_connection = psycopg2.connect(
-                os.environ.get('DATABASE_URL')
-            )
-        return self.db_connection
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = self._local.connection = db_pool.acquire(os.environ.get('DATABASE_URL'))
+        return conn
+    
+    def _release_database_connection(self) -> None:
+        """Devuelve al pool la conexión del hilo actual, si tiene una"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            db_pool.release(conn)
+            self._local.connection = None
         
     def _get_clean_connection_params(self, connection_info: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -144,6 +173,7 @@ class MaterializationProcessor:
             self.logger.message("No hay datos para materializar")
             return
             
+        orphans = []
         try:
             # Almacenar la casilla_id actual para su uso en la búsqueda de prefijos de bucket
             self.casilla_id = casilla_id
@@ -161,22 +191,9 @@ class MaterializationProcessor:
                 
             self.logger.message(f"Procesando {len(materializations)} materializaciones para la casilla {casilla_id}")
             
-            # Procesar cada materialización
-            for materialization in materializations:
-                try:
-                    self._process_materialization(materialization, dataframe, execution_id)
-                except Exception as e:
-                    self.logger.error(
-                        f"Error al procesar materialización {materialization['id']}: {str(e)}",
-                        execution=execution_id
-                    )
-                    # Registrar el error en la base de datos
-                    self._register_materialization_execution(
-                        materialization['id'], 
-                        execution_id, 
-                        'error', 
-                        f"Error: {str(e)}"
-                    )
+            # Las materializaciones son independientes: se procesan en paralelo y la
+            # ejecución tarda lo que el destino más lento
+            orphans = self._run_materializations(materializations, dataframe, execution_id)
                     
         except Exception as e:
             self.logger.error(
@@ -184,15 +201,208 @@ class MaterializationProcessor:
                 execution=execution_id
             )
         finally:
-            # Cerrar conexión si existe
-            if self.db_connection:
-                self.db_connection.close()
-                self.db_connection = None
-                
-            # Cerrar cualquier cliente cloud que se haya creado
-            for client in self.cloud_clients.values():
-                if hasattr(client, 'close'):
-                    client.close()
+            # Devolver la conexión al pool si existe
+            self._release_database_connection()
+                
+            # Cerrar cualquier cliente cloud que se haya creado; si quedan intentos con el
+            # tiempo agotado en curso, cuando terminen
+            if orphans:
+                self._close_cloud_clients_when_done(orphans)
+            else:
+                self._close_cloud_clients()
+    
+    def _close_cloud_clients(self) -> None:
+        """Cierra los clientes cloud creados durante el procesamiento"""
+        for client in list(self.cloud_clients.values()):
+            if hasattr(client, 'close'):
+                client.close()
+    
+    def _close_cloud_clients_when_done(self, futures: List[Any]) -> None:
+        """Cierra los clientes cloud cuando terminan las tareas de futures"""
+        remaining = {'count': len(futures)}
+        lock = threading.Lock()
+        
+        def task_done(_future):
+            with lock:
+                remaining['count'] -= 1
+                last = remaining['count'] == 0
+            if last:
+                self._close_cloud_clients()
+        
+        for future in futures:
+            future.add_done_callback(task_done)
+    
+    def _run_materializations(self, materializations: List[Dict[str, Any]], dataframe: pd.DataFrame,
+                              execution_id: str) -> List[Any]:
+        """
+        Procesa las materializaciones en un pool de hasta max_workers hilos.
+        
+        Todas leen el mismo DataFrame (cada una prepara su propia copia). Cada tarea
+        registra un único resultado final en materializaciones_ejecuciones. El tiempo
+        máximo empieza a contar cuando arranca su hilo; si se agota se registra el
+        error y no se hacen más reintentos. El intento en curso no se puede
+        interrumpir: termina en segundo plano sin registrar nada.
+        
+        Args:
+            materializations: Materializaciones configuradas para la casilla
+            dataframe: DataFrame resultante del procesamiento (o DataFrame resumen para ZIP)
+            execution_id: ID de la ejecución
+            
+        Returns:
+            List: Futures de los intentos que agotaron su tiempo y siguen en curso
+        """
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(materializations)),
+                                      thread_name_prefix="materializacion")
+        tasks = {}
+        orphans = []
+        try:
+            for materialization in materializations:
+                timeout, retries = self._destination_policy(materialization.get('config') or {})
+                task = {'materialization': materialization, 'timeout': timeout, 'started': None,
+                        'cancelled': threading.Event(), 'lock': threading.Lock(), 'finished': False}
+                future = executor.submit(self._run_materialization, task, retries, dataframe, execution_id)
+                tasks[future] = task
+            
+            pending = set(tasks)
+            while pending:
+                deadlines = [tasks[future]['started'] + tasks[future]['timeout']
+                             for future in pending if tasks[future]['started'] is not None]
+                wait_time = max(0.0, min(deadlines) - time.monotonic()) if deadlines else 1.0
+                done, pending = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    materialization = tasks[future]['materialization']
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # El resultado ya lo registró la tarea
+                        self.logger.error(
+                            f"Error al procesar materialización {materialization['id']}: {str(e)}",
+                            execution=execution_id
+                        )
+                
+                now = time.monotonic()
+                for future in list(pending):
+                    task = tasks[future]
+                    if task['started'] is None or now < task['started'] + task['timeout']:
+                        continue
+                    with task['lock']:
+                        if task['finished']:
+                            continue  # Terminó justo ahora: se recoge en la próxima vuelta
+                        task['finished'] = True
+                    task['cancelled'].set()
+                    pending.discard(future)
+                    orphans.append(future)
+                    self.logger.error(
+                        f"Tiempo agotado ({task['timeout']:g}s) en la materialización {task['materialization']['id']}",
+                        execution=execution_id
+                    )
+                    self._register_materialization_execution(
+                        task['materialization']['id'],
+                        execution_id,
+                        'error',
+                        f"Error: tiempo máximo de {task['timeout']:g}s agotado"
+                    )
+        finally:
+            # No se espera a los intentos que agotaron su tiempo
+            executor.shutdown(wait=False, cancel_futures=True)
+        return orphans
+    
+    def _run_materialization(self, task: Dict[str, Any], retries: int, dataframe: pd.DataFrame,
+                             execution_id: str) -> None:
+        """
+        Procesa una materialización en un hilo del pool, con reintentos.
+        
+        Los registros de materializaciones_ejecuciones de cada intento se retienen y al
+        final se guarda solo el último. No se reintenta si el error no es transitorio
+        o si la operación no es idempotente (append) y ya se empezó a escribir.
+        
+        Args:
+            task: Materialización, tiempo máximo e indicador de cancelación
+            retries: Reintentos ante errores de conexión o del destino
+            dataframe: DataFrame compartido (solo lectura)
+            execution_id: ID de la ejecución
+        """
+        task['started'] = time.monotonic()
+        materialization = task['materialization']
+        idempotent = self._is_idempotent(materialization.get('config') or {})
+        self._local.outcome = []
+        try:
+            for attempt in range(retries + 1):
+                self._local.outcome.clear()
+                self._local.writing = False
+                try:
+                    self._process_materialization(materialization, dataframe, execution_id)
+                    if not self._local.outcome:
+                        self._local.outcome.append((materialization['id'], execution_id, 'completado',
+                                                    "Materialización completada", None))
+                    return
+                except Exception as e:
+                    if not self._local.outcome:
+                        self._local.outcome.append((materialization['id'], execution_id, 'error',
+                                                    f"Error: {str(e)}", None))
+                    if isinstance(e, NON_RETRYABLE_ERRORS) or attempt >= retries or task['cancelled'].is_set():
+                        raise
+                    if self._local.writing and not idempotent:
+                        self.logger.warning(
+                            f"No se reintenta la materialización {materialization['nombre']}: la operación "
+                            f"no es idempotente y pudo haber escrito datos"
+                        )
+                        raise
+                    delay = RETRY_BACKOFF_SECONDS * (2 ** attempt)
+                    self.logger.warning(
+                        f"Reintentando materialización {materialization['nombre']} en {delay}s "
+                        f"(intento {attempt + 2} de {retries + 1}): {str(e)}"
+                    )
+                    if task['cancelled'].wait(delay):
+                        raise
+        finally:
+            outcome = self._local.outcome
+            self._local.outcome = None
+            with task['lock']:
+                register = not task['finished']
+                task['finished'] = True
+            if register and outcome:
+                self._insert_materialization_execution(*outcome[-1])
+            self._release_database_connection()
+    
+    def _is_idempotent(self, config: Dict[str, Any]) -> bool:
+        """
+        Indica si repetir la materialización tras una escritura parcial deja el mismo resultado.
+        
+        Los destinos cloud sobrescriben sus archivos; en bases de datos solo append
+        acumula filas.
+        """
+        try:
+            destination_type, _ = self._resolve_destination(config, warn=False)
+        except ValueError:
+            return False
+        if destination_type == 'cloud':
+            return True
+        operation = config.get('operation') or config.get('estrategiaActualizacion')
+        return operation in ('overwrite', 'reemplazar', 'upsert', 'actualizar', 'full_uuid')
+    
+    def _destination_policy(self, config: Dict[str, Any]) -> Tuple[float, int]:
+        """
+        Obtiene el tiempo máximo y los reintentos de una materialización.
+        
+        Args:
+            config: Configuración de la materialización
+            
+        Returns:
+            Tuple: (tiempo máximo en segundos, reintentos)
+        """
+        try:
+            destination_type, _ = self._resolve_destination(config, warn=False)
+        except ValueError:
+            destination_type = None
+        defaults = DESTINATION_POLICIES.get(destination_type, DESTINATION_POLICIES['db'])
+        timeout = (config.get('timeout') or config.get('tiempoMaximo')
+                   or os.environ.get('SAGE_MATERIALIZATION_TIMEOUT') or defaults['timeout'])
+        retries = config.get('retries', config.get('reintentos'))
+        if retries is None:
+            retries = os.environ.get('SAGE_MATERIALIZATION_RETRIES', defaults['retries'])
+        return float(timeout), max(0, int(retries))
     
     def _get_materializations_for_casilla(self, casilla_id: int) -> List[Dict[str, Any]]:
         """
@@ -266,63 +476,20 @@ class MaterializationProcessor:
                 dataframe = self.dataframes_by_catalog[catalogo]
                 self.logger.message(f"Usando DataFrame específico para el catálogo '{catalogo}' con {len(dataframe)} filas en lugar del DataFrame resumen con {len(original_dataframe)} filas")
             
-            # Determinar el tipo de destino y el ID, compatibles con ambos formatos
-            destination_type = None
-            destination_id = None
-            
-            # Formato 1: destination_type y destination_id directamente
-            if 'destination_type' in config:
-                destination_type = config.get('destination_type')
-                destination_id = config.get('destination_id')
-            
-            # Formato 2: tipoProveedor y proveedorId
-            elif 'tipoProveedor' in config:
-                # Mapear tipoProveedor a destination_type
-                tipo_proveedor = config.get('tipoProveedor')
-                if tipo_proveedor == 'cloud':
-                    destination_type = 'cloud'
-                elif tipo_proveedor == 'db' or tipo_proveedor == 'database':
-                    destination_type = 'db'
-                
-                # Obtener el ID del proveedor
-                destination_id = config.get('proveedorId')
-                
-            # Formato 3: destino "archivo" o "base_datos" 
-            elif 'destino' in config:
-                if config.get('destino') == 'archivo':
-                    # Cuando el destino es "archivo", asumimos que es un destino de tipo cloud
-                    destination_type = 'cloud'
-                    
-                    # Buscar el destino_id en los diferentes campos posibles
-                    destination_id = config.get('destino_id') or config.get('destino_cloud_id') or config.get('cloud_provider_id')
-                    
-                    # Si no encontramos un ID explícito, verificamos si hay un error en los logs
-                    if not destination_id:
-                        self.logger.warning(f"Configuración con destino='archivo' pero sin especificar el ID del proveedor cloud. Recomendamos agregar 'destino_id' a la configuración.")
-                
-                elif config.get('destino') == 'base_datos':
-                    # Cuando el destino es "base_datos", asumimos que es un destino de tipo db
-                    destination_type = 'db'
-                    
-                    # Buscar el ID de la conexión de base de datos
-                    destination_id = config.get('proveedorId')
-                    
-                    # Si no encontramos un ID explícito, verificamos si hay un error en los logs
-                    if not destination_id:
-                        self.logger.warning(f"Configuración con destino='base_datos' pero sin especificar el ID del proveedor. Recomendamos agregar 'proveedorId' a la configuración.")
-            
-            # Verificar que se haya podido determinar el destino
-            if not destination_type:
-                raise ValueError("No se ha podido determinar el tipo de destino. Configuración: " + json.dumps(config))
-                
-            if not destination_id:
-                raise ValueError("No se ha podido determinar el ID del destino. Configuración: " + json.dumps(config))
+            # Determinar el tipo de destino y el ID
+            destination_type, destination_id = self._resolve_destination(config)
             
             self.logger.message(f"Destino determinado: tipo={destination_type}, id={destination_id}")
             
             # Preparar el DataFrame según la configuración
             prepared_df = self._prepare_dataframe(dataframe, config)
             
+            # En modo incremental solo se envían los cambios desde la última carga
+            if self._is_incremental(config):
+                self._materialize_incremental(prepared_df, destination_type, destination_id, config,
+                                              materialization['id'], execution_id)
+                return
+            
             # Materializar según el tipo de destino
             if destination_type == 'db':
                 self._materialize_to_database(prepared_df, destination_id, config, materialization['id'], execution_id)
@@ -342,6 +509,135 @@ class MaterializationProcessor:
             )
             raise
     
+    def _resolve_destination(self, config: Dict[str, Any], warn: bool = True) -> Tuple[str, Any]:
+        """
+        Determina el tipo ('db' o 'cloud') y el ID del destino de una materialización.
+        
+        Args:
+            config: Configuración de la materialización
+            warn: Si se advierte en el log de los campos que faltan
+            
+        Returns:
+            Tuple: (tipo de destino, ID del destino)
+        """
+        destination_type = None
+        destination_id = None
+        
+        # Formato 1: destination_type y destination_id directamente
+        if 'destination_type' in config:
+            destination_type = config.get('destination_type')
+            destination_id = config.get('destination_id')
+        
+        # Formato 2: tipoProveedor y proveedorId
+        elif 'tipoProveedor' in config:
+            # Mapear tipoProveedor a destination_type
+            tipo_proveedor = config.get('tipoProveedor')
+            if tipo_proveedor == 'cloud':
+                destination_type = 'cloud'
+            elif tipo_proveedor == 'db' or tipo_proveedor == 'database':
+                destination_type = 'db'
+            
+            # Obtener el ID del proveedor
+            destination_id = config.get('proveedorId')
+            
+        # Formato 3: destino "archivo" o "base_datos" 
+        elif 'destino' in config:
+            if config.get('destino') == 'archivo':
+                # Cuando el destino es "archivo", asumimos que es un destino de tipo cloud
+                destination_type = 'cloud'
+                
+                # Buscar el destino_id en los diferentes campos posibles
+                destination_id = config.get('destino_id') or config.get('destino_cloud_id') or config.get('cloud_provider_id')
+                
+                # Si no encontramos un ID explícito, verificamos si hay un error en los logs
+                if not destination_id and warn:
+                    self.logger.warning(f"Configuración con destino='archivo' pero sin especificar el ID del proveedor cloud. Recomendamos agregar 'destino_id' a la configuración.")
+            
+            elif config.get('destino') == 'base_datos':
+                # Cuando el destino es "base_datos", asumimos que es un destino de tipo db
+                destination_type = 'db'
+                
+                # Buscar el ID de la conexión de base de datos
+                destination_id = config.get('proveedorId')
+                
+                # Si no encontramos un ID explícito, verificamos si hay un error en los logs
+                if not destination_id and warn:
+                    self.logger.warning(f"Configuración con destino='base_datos' pero sin especificar el ID del proveedor. Recomendamos agregar 'proveedorId' a la configuración.")
+        
+        # Verificar que se haya podido determinar el destino
+        if not destination_type:
+            raise ValueError("No se ha podido determinar el tipo de destino. Configuración: " + json.dumps(config))
+            
+        if not destination_id:
+            raise ValueError("No se ha podido determinar el ID del destino. Configuración: " + json.dumps(config))
+        
+        return destination_type, destination_id
+    
+    def _is_incremental(self, config: Dict[str, Any]) -> bool:
+        """Indica si la materialización está configurada en modo incremental"""
+        if not (config.get('incremental') or config.get('modoIncremental')):
+            return False
+        operation = config.get('operation') or config.get('estrategiaActualizacion')
+        if operation == 'full_uuid':
+            self.logger.warning("El modo incremental no aplica a la estrategia FULL con UUID, se materializan todos los datos")
+            return False
+        return True
+    
+    def _materialize_incremental(self, df: pd.DataFrame, destination_type: str, destination_id: int,
+                                 config: Dict[str, Any], materialization_id: int, execution_id: str) -> None:
+        """
+        Materializa solo las filas nuevas, modificadas y eliminadas desde la última carga.
+        
+        La primera carga (sin huella guardada) usa la operación configurada con todos los
+        datos. La huella se guarda solo si la escritura en el destino termina bien.
+        
+        Args:
+            df: DataFrame preparado
+            destination_type: 'db' o 'cloud'
+            destination_id: ID de la conexión o del proveedor cloud
+            config: Configuración de la materialización
+            materialization_id: ID de la materialización
+            execution_id: ID de la ejecución
+        """
+        pk_columns = config.get('primary_key') or config.get('primaryKey', [])
+        if not pk_columns:
+            raise ValueError("El modo incremental requiere especificar clave primaria (primaryKey)")
+        if isinstance(pk_columns, str):
+            pk_columns = [pk_columns]
+        include_deletes = config.get('incremental_deletes', config.get('eliminarAusentes', True))
+        
+        previous = self.fingerprints.load(materialization_id)
+        change_set = detect_changes(df, pk_columns, previous, include_deletes=include_deletes)
+        
+        if previous is None:
+            self.logger.message(f"Primera carga incremental: se materializan las {len(df)} filas")
+            if destination_type == 'db':
+                self._materialize_to_database(df, destination_id, config, materialization_id, execution_id)
+            elif destination_type == 'cloud':
+                self._materialize_to_cloud(df, destination_id, config, materialization_id, execution_id)
+            else:
+                raise ValueError(f"Tipo de destino no soportado: {destination_type}")
+        else:
+            self.logger.message(f"Cambios desde la última carga: {change_set.summary()}")
+            if change_set.empty:
+                self._register_materialization_execution(
+                    materialization_id,
+                    execution_id,
+                    'completado',
+                    "Sin cambios desde la última carga"
+                )
+            elif destination_type == 'db':
+                delta_config = dict(config, operation='upsert', primary_key=pk_columns)
+                self._materialize_to_database(change_set.changed, destination_id, delta_config,
+                                              materialization_id, execution_id, deleted_keys=change_set.deletes)
+            elif destination_type == 'cloud':
+                self._materialize_to_cloud(change_set.to_delta_frame(), destination_id, config,
+                                           materialization_id, execution_id, delta=True)
+            else:
+                raise ValueError(f"Tipo de destino no soportado: {destination_type}")
+        
+        self.fingerprints.save(materialization_id, change_set.state)
+    
     def _prepare_dataframe(self, df: pd.DataFrame, config: Dict[str, Any]) -> pd.DataFrame:
         """
         Prepara el DataFrame para la materialización según la configuración.
@@ -455,7 +751,8 @@ class MaterializationProcessor:
         return result_df
     
     def _materialize_to_database(self, df: pd.DataFrame, db_conn_id: int, config: Dict[str, Any], 
-                              materialization_id: int, execution_id: str) -> None:
+                              materialization_id: int, execution_id: str,
+                              deleted_keys: Optional[pd.DataFrame] = None) -> None:
         """
         Materializa el DataFrame a una base de datos.
         
@@ -465,8 +762,10 @@ class MaterializationProcessor:
             config: Configuración de la materialización
             materialization_id: ID de la materialización
             execution_id: ID de la ejecución
+            deleted_keys: Claves a eliminar tras el upsert (modo incremental)
         """
-        if df.empty:
+        has_deletes = deleted_keys is not None and not deleted_keys.empty
+        if df.empty and not has_deletes:
             self.logger.warning("No hay datos para materializar a la base de datos")
             self._register_materialization_execution(
                 materialization_id, 
@@ -522,7 +821,7 @@ class MaterializationProcessor:
             operation = 'append'
         elif operation == 'actualizar':
             operation = 'upsert'
-        else:
+        elif operation not in ('append', 'overwrite', 'upsert'):
             operation = 'append'  # valor por defecto
         
         # Conectar a la base de datos de destino
@@ -630,6 +929,7 @@ class MaterializationProcessor:
                             "charset": "utf8mb4",
                             "autocommit": False,
                             "connect_timeout": 10,
+                            "local_infile": True,  # Carga masiva con LOAD DATA LOCAL INFILE
                         }
                         
                         # Si hay opciones de conexión adicionales, incorporarlas
@@ -710,9 +1010,31 @@ class MaterializationProcessor:
                 # Sin opciones adicionales
                 engine = sqlalchemy.create_engine(conn_string)
             
+            # A partir de aquí un error puede dejar datos escritos (ver _run_materialization)
+            self._local.writing = True
+            
+            if operation == 'upsert':
+                # El upsert usa tabla de staging en todos los motores; va antes que las ramas de
+                # conexión directa, que solo implementan append y overwrite
+                pk_columns = config.get('primary_key') or config.get('primaryKey', [])
+                if not pk_columns:
+                    raise ValueError("Para operación upsert se requiere especificar clave primaria (primaryKey)")
+                
+                inserted, updated = 0, 0
+                if not df.empty:
+                    inserted, updated = self._staged_upsert(engine, db_connection_info['tipo'], df, table_name,
+                                                            schema_name, pk_columns)
+                rows_affected = inserted + updated
+                self.logger.message(f"Se insertaron {inserted} y actualizaron {updated} filas en la tabla {schema_name}.{table_name}")
+                
+                if has_deletes:
+                    deleted = self._staged_delete(engine, db_connection_info['tipo'], deleted_keys, table_name, schema_name)
+                    rows_affected += deleted
+                    self.logger.message(f"Se eliminaron {deleted} filas de la tabla {schema_name}.{table_name}")
+                
             # Materializar según la operación y tipo de base de datos
             # Para SQL Server y MySQL, usar conexión directa en lugar de SQLAlchemy
-            if db_connection_info['tipo'] == 'mysql':
+            elif db_connection_info['tipo'] == 'mysql':
                 self.logger.message(f"Usando conexión directa pymysql para MySQL en operación {operation}")
                 try:
                     # Implementar método inline para evitar atributos faltantes
@@ -733,7 +1055,8 @@ class MaterializationProcessor:
                         connect_options = {
                             "charset": "utf8mb4",
                             "autocommit": False, # Controlamos explícitamente las transacciones
-                            "connect_timeout": 10
+                            "connect_timeout": 10,
+                            "local_infile": True # Necesario para LOAD DATA LOCAL INFILE en la carga masiva
                         }
                         
                         # Crear conexión directa
@@ -757,7 +1080,8 @@ class MaterializationProcessor:
                             database=database,
                             charset=connect_options["charset"],
                             connect_timeout=connect_options["connect_timeout"],
-                            autocommit=connect_options["autocommit"]
+                            autocommit=connect_options["autocommit"],
+                            local_infile=connect_options["local_infile"]
                         )
                         
                         try:
@@ -783,75 +1107,9 @@ class MaterializationProcessor:
                             # Insertar datos
                             self.logger.message(f"Insertando {len(df)} filas en {schema_name}.{table_name}")
                             
-                            # Obtener lista de columnas
-                            columns = ", ".join([f"`{col}`" for col in df.columns])
-                            placeholders = ", ".join(["%s"] * len(df.columns))
-                            
-                            # Crear SQL para inserción
-                            schema_prefix = f"`{schema_name}`." if schema_name else ""
-                            insert_sql = f"INSERT INTO {schema_prefix}`{table_name}` ({columns}) VALUES ({placeholders})"
-                            self.logger.message(f"SQL Inserción: {insert_sql}")
-                            
-                            # Convertir DataFrame a lista de tuplas
-                            records = df.to_records(index=False)
-                            tuples = [tuple(x) for x in records]
-                            
-                            # Ejecutar inserción por lotes (batch)
-                            batch_size = DATABASE_BATCH_SIZE  # Usando tamaño de lote global
-                            for i in range(0, len(tuples), batch_size):
-                                batch = tuples[i:i+batch_size]
-                                try:
-                                    # Vamos a limpiar los datos para asegurar compatibilidad con pymysql
-                                    cleaned_batch = []
-                                    for row in batch:
-                                        cleaned_row = []
-                                        for val in row:
-                                            # None pasa directamente
-                                            if val is None:
-                                                cleaned_row.append(None)
-                                            # float('nan') debe convertirse a NULL
-                                            elif isinstance(val, float) and math.isnan(val):
-                                                cleaned_row.append(None)
-                                            # Para otros tipos, usar str() si no es un tipo básico
-                                            elif not isinstance(val, (int, float, str, bool, datetime.datetime, datetime.date)):
-                                                cleaned_row.append(str(val))
-                                            else:
-                                                cleaned_row.append(val)
-                                        cleaned_batch.append(tuple(cleaned_row))
-                                    
-                                    # Log para el primer registro (para debug)
-                                    if i == 0:
-                                        self.logger.message(f"Ejemplo primer registro limpiado: {cleaned_batch[0]}")
-                                    
-                                    cursor.executemany(insert_sql, cleaned_batch)
-                                    conn.commit()
-                                    self.logger.message(f"Insertado lote {i//batch_size + 1} de {(len(tuples) + batch_size - 1) // batch_size}")
-                                except Exception as batch_error:
-                                    self.logger.error(f"Error procesando lote {i//batch_size + 1}: {str(batch_error)}")
-                                    # Intentar inserción registro por registro como último recurso
-                                    for j, row in enumerate(batch):
-                                        try:
-                                            # Limpiar cada fila individualmente
-                                            cleaned_row = []
-                                            for val in row:
-                                                if val is None:
-                                                    cleaned_row.append(None)
-                                                elif isinstance(val, float) and math.isnan(val):
-                                                    cleaned_row.append(None)
-                                                elif not isinstance(val, (int, float, str, bool, datetime.datetime, datetime.date)):
-                                                    cleaned_row.append(str(val))
-                                                else:
-                                                    cleaned_row.append(val)
-                                            
-                                            cursor.execute(insert_sql, tuple(cleaned_row))
-                                            conn.commit()
-                                        except Exception as row_error:
-                                            self.logger.error(f"Error insertando fila {i+j} (valores: {row}): {str(row_error)}")
-                                            # Continuar con la siguiente fila
-                                            continue
-                            
-                            rows_affected = len(df)
-                            self.logger.message(f"Se {'agregaron' if operation == 'append' else 'sobrescribieron'} {rows_affected} filas a la tabla {schema_name}.{table_name}")
+                            qualified_table_name = f"`{schema_name}`.`{table_name}`" if schema_name else f"`{table_name}`"
+                            rows_affected, strategy = bulk_load('mysql', conn, df, qualified_table_name, self.logger)
+                            self.logger.message(f"Se {'agregaron' if operation == 'append' else 'sobrescribieron'} {rows_affected} filas a la tabla {schema_name}.{table_name} (carga '{strategy}')")
                         finally:
                             conn.close()
                     else:
@@ -984,75 +1242,9 @@ class MaterializationProcessor:
                             # Insertar datos
                             self.logger.message(f"Insertando {len(df)} filas en {schema_name}.{table_name}")
                             
-                            # Convertir DataFrame a lista de tuplas
-                            records = df.to_records(index=False)
-                            tuples = [tuple(x) for x in records]
-                            
-                            # Construir SQL de inserción
-                            columns = ", ".join([f"[{col}]" for col in df.columns])
-                            placeholders = ", ".join(["%s"] * len(df.columns))
-                            
-                            # Adaptar el esquema nuevamente para la inserción
-                            schema_name_insert = 'dbo' if schema_name == 'public' else schema_name
-                            insert_sql = f"INSERT INTO {schema_name_insert}.{table_name} ({columns}) VALUES ({placeholders})"
-                            self.logger.message(f"SQL Inserción: {insert_sql} (primeros valores)")
-                            
-                            # Ejecutar inserción por lotes (batch)
-                            batch_size = DATABASE_BATCH_SIZE  # Usando tamaño de lote global
-                            for i in range(0, len(tuples), batch_size):
-                                batch = tuples[i:i+batch_size]
-                                try:
-                                    # Vamos a limpiar los datos para asegurar compatibilidad con pymssql
-                                    cleaned_batch = []
-                                    for row in batch:
-                                        cleaned_row = []
-                                        for val in row:
-                                            # None pasa directamente
-                                            if val is None:
-                                                cleaned_row.append(None)
-                                            # float('nan') debe convertirse a NULL
-                                            elif isinstance(val, float) and math.isnan(val):
-                                                cleaned_row.append(None)
-                                            # Para otros tipos, usar str() si no es un tipo básico
-                                            elif not isinstance(val, (int, float, str, bool, datetime.datetime, datetime.date)):
-                                                cleaned_row.append(str(val))
-                                            else:
-                                                cleaned_row.append(val)
-                                        cleaned_batch.append(tuple(cleaned_row))
-                                    
-                                    # Log para el primer registro (para debug)
-                                    if i == 0:
-                                        self.logger.message(f"Ejemplo primer registro limpiado: {cleaned_batch[0]}")
-                                    
-                                    cursor.executemany(insert_sql, cleaned_batch)
-                                    conn.commit()
-                                    self.logger.message(f"Insertado lote {i//batch_size + 1} de {(len(tuples) + batch_size - 1) // batch_size}")
-                                except Exception as batch_error:
-                                    self.logger.error(f"Error procesando lote {i//batch_size + 1}: {str(batch_error)}")
-                                    # Intentar inserción registro por registro como último recurso
-                                    for j, row in enumerate(batch):
-                                        try:
-                                            # Limpiar cada fila individualmente
-                                            cleaned_row = []
-                                            for val in row:
-                                                if val is None:
-                                                    cleaned_row.append(None)
-                                                elif isinstance(val, float) and math.isnan(val):
-                                                    cleaned_row.append(None)
-                                                elif not isinstance(val, (int, float, str, bool, datetime.datetime, datetime.date)):
-                                                    cleaned_row.append(str(val))
-                                                else:
-                                                    cleaned_row.append(val)
-                                            
-                                            cursor.execute(insert_sql, tuple(cleaned_row))
-                                            conn.commit()
-                                        except Exception as row_error:
-                                            self.logger.error(f"Error insertando fila {i+j} (valores: {row}): {str(row_error)}")
-                                            # Continuar con la siguiente fila
-                                            continue
-                                    
-                            rows_affected = len(df)
-                            self.logger.message(f"Se {'agregaron' if operation == 'append' else 'sobrescribieron'} {rows_affected} filas a la tabla {schema_name}.{table_name}")
+                            # qualified_table_name ya tiene el esquema adaptado ('public' -> 'dbo')
+                            rows_affected, strategy = bulk_load('mssql', conn, df, qualified_table_name, self.logger)
+                            self.logger.message(f"Se {'agregaron' if operation == 'append' else 'sobrescribieron'} {rows_affected} filas a la tabla {schema_name}.{table_name} (carga '{strategy}')")
                         finally:
                             conn.close()
                     else:
@@ -1175,145 +1367,9 @@ class MaterializationProcessor:
                             # Ahora insertamos los datos
                             self.logger.message(f"Insertando {len(df)} filas en {schema_name}.{table_name}")
                             
-                            # Obtener lista de columnas
-                            column_list = ", ".join([f'"{col}"' for col in df.columns])
-                            placeholders = ", ".join(["%s"] * len(df.columns))
-                            
-                            # Crear SQL para inserción
-                            schema_prefix = f'"{schema_name}".' if schema_name else ""
-                            insert_sql = f'INSERT INTO {schema_prefix}"{table_name}" ({column_list}) VALUES ({placeholders})'
-                            self.logger.message(f"SQL Inserción: {insert_sql}")
-                            
-                            # Convertir DataFrame a lista de tuplas
-                            records = df.to_records(index=False)
-                            tuples = [tuple(x) for x in records]
-                            
-                            # Usar método COPY de PostgreSQL para carga masiva de datos
-                            # Esta es una optimización para PostgreSQL que es mucho más rápida que executemany
-                            try:
-                                # En PostgreSQL, COPY FROM es mucho más eficiente que INSERT
-                                self.logger.message(f"Usando método COPY para carga masiva de datos (mucho más rápido)")
-                                
-                                # Preparar los datos para COPY
-                                # Limpiamos los datos primero para asegurar compatibilidad
-                                from io import StringIO
-                                import csv
-                                
-                                # Crear un archivo en memoria con formato CSV
-                                buffer = StringIO()
-                                csv_writer = csv.writer(buffer, delimiter='\t', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-                                
-                                # Iterar por lotes grandes para no sobrecargar la memoria
-                                batch_size = DATABASE_BATCH_SIZE * 5  # Usando un lote más grande para COPY
-                                total_batches = (len(tuples) + batch_size - 1) // batch_size
-                                
-                                for i in range(0, len(tuples), batch_size):
-                                    # Limpiar el buffer para cada lote
-                                    buffer.truncate(0)
-                                    buffer.seek(0)
-                                    
-                                    # Preparar este lote
-                                    batch = tuples[i:i+batch_size]
-                                    
-                                    for row in batch:
-                                        cleaned_row = []
-                                        for val in row:
-                                            # None se representa como \N en formato COPY
-                                            if val is None:
-                                                cleaned_row.append(None)
-                                            # float('nan') debe convertirse a NULL
-                                            elif isinstance(val, float) and math.isnan(val):
-                                                cleaned_row.append(None)
-                                            # Para otros tipos, usar str() si no es un tipo básico
-                                            elif not isinstance(val, (int, float, str, bool, datetime.datetime, datetime.date)):
-                                                cleaned_row.append(str(val))
-                                            else:
-                                                cleaned_row.append(val)
-                                        csv_writer.writerow(cleaned_row)
-                                    
-                                    # Log para el primer registro (para debug)
-                                    if i == 0:
-                                        buffer.seek(0)
-                                        first_line = buffer.readline().strip()
-                                        self.logger.message(f"Ejemplo primer registro para COPY: {first_line}")
-                                        buffer.seek(0)
-                                    
-                                    # Ejecutar COPY
-                                    schema_prefix = f'"{schema_name}".' if schema_name else ""
-                                    copy_sql = f'COPY {schema_prefix}"{table_name}" FROM STDIN WITH CSV DELIMITER E\'\\t\' QUOTE E\'"\'NULL AS \'\''
-                                    
-                                    buffer.seek(0)
-                                    cursor.copy_expert(copy_sql, buffer)
-                                    conn.commit()
-                                    
-                                    self.logger.message(f"Cargado lote {i//batch_size + 1} de {total_batches} con COPY ({batch_size} registros por lote)")
-                            
-                            except Exception as copy_error:
-                                self.logger.error(f"Error en carga COPY: {str(copy_error)}")
-                                conn.rollback()
-                                
-                                # Si COPY falla, volvemos al método tradicional con executemany como respaldo
-                                self.logger.message("Volviendo al método estándar de inserción por lotes como respaldo")
-                                
-                                batch_size = DATABASE_BATCH_SIZE  # Restablecer al tamaño de lote normal
-                                for i in range(0, len(tuples), batch_size):
-                                    batch = tuples[i:i+batch_size]
-                                    try:
-                                        # Vamos a limpiar los datos para asegurar compatibilidad
-                                        cleaned_batch = []
-                                        for row in batch:
-                                            cleaned_row = []
-                                            for val in row:
-                                                # None pasa directamente
-                                                if val is None:
-                                                    cleaned_row.append(None)
-                                                # float('nan') debe convertirse a NULL
-                                                elif isinstance(val, float) and math.isnan(val):
-                                                    cleaned_row.append(None)
-                                                # Para otros tipos, usar str() si no es un tipo básico
-                                                elif not isinstance(val, (int, float, str, bool, datetime.datetime, datetime.date)):
-                                                    cleaned_row.append(str(val))
-                                                else:
-                                                    cleaned_row.append(val)
-                                            cleaned_batch.append(tuple(cleaned_row))
-                                        
-                                        # Log para el primer registro (para debug)
-                                        if i == 0:
-                                            self.logger.message(f"Ejemplo primer registro limpiado: {cleaned_batch[0]}")
-                                        
-                                        # Ejecutar la inserción en lote
-                                        cursor.executemany(insert_sql, cleaned_batch)
-                                        conn.commit()
-                                        self.logger.message(f"Insertado lote {i//batch_size + 1} de {(len(tuples) + batch_size - 1) // batch_size}")
-                                    except Exception as batch_error:
-                                        self.logger.error(f"Error procesando lote {i//batch_size + 1}: {str(batch_error)}")
-                                        conn.rollback()
-                                        
-                                        # Intentar inserción registro por registro como último recurso
-                                        for j, row in enumerate(batch):
-                                            try:
-                                                # Limpiar cada fila individualmente
-                                                cleaned_row = []
-                                                for val in row:
-                                                    if val is None:
-                                                        cleaned_row.append(None)
-                                                    elif isinstance(val, float) and math.isnan(val):
-                                                        cleaned_row.append(None)
-                                                    elif not isinstance(val, (int, float, str, bool, datetime.datetime, datetime.date)):
-                                                        cleaned_row.append(str(val))
-                                                    else:
-                                                        cleaned_row.append(val)
-                                                
-                                                cursor.execute(insert_sql, tuple(cleaned_row))
-                                                conn.commit()
-                                            except Exception as row_error:
-                                                self.logger.error(f"Error insertando fila {i+j} (valores: {row}): {str(row_error)}")
-                                                conn.rollback()
-                                                # Continuar con la siguiente fila
-                                                continue
-                            
-                            rows_affected = len(df)
-                            self.logger.message(f"Se {'agregaron' if operation == 'append' else 'sobrescribieron'} {rows_affected} filas a la tabla {schema_name}.{table_name}")
+                            qualified_table_name = f'"{schema_name}"."{table_name}"' if schema_name else f'"{table_name}"'
+                            rows_affected, strategy = bulk_load('postgresql', conn, df, qualified_table_name, self.logger)
+                            self.logger.message(f"Se {'agregaron' if operation == 'append' else 'sobrescribieron'} {rows_affected} filas a la tabla {schema_name}.{table_name} (carga '{strategy}')")
                         finally:
                             conn.close()
                     else:
@@ -1332,7 +1388,36 @@ class MaterializationProcessor:
                     )
                     rows_affected = len(df)
                     self.logger.message(f"Se {'agregaron' if operation == 'append' else 'sobrescribieron'} {rows_affected} filas a la tabla {schema_name}.{table_name} (usando SQLAlchemy)")
-                    
+
+            # Para DuckDB, cargar desde Arrow con la conexión nativa en lugar de INSERT por fila
+            elif db_connection_info['tipo'] == 'duckdb' and operation in ('append', 'overwrite'):
+                # DuckDB usa 'main' como esquema por defecto
+                use_schema = schema_name and schema_name != 'main'
+                qualified_table_name = f'"{schema_name}"."{table_name}"' if use_schema else f'"{table_name}"'
+                try:
+                    raw_conn = engine.raw_connection()
+                    try:
+                        native_conn = getattr(raw_conn, 'driver_connection', None) or raw_conn.connection
+                        if use_schema:
+                            native_conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}"')
+                        loader = DuckDBArrowLoader(self.logger, replace=operation == 'overwrite')
+                        rows_affected, strategy = bulk_load('duckdb', native_conn, df, qualified_table_name,
+                                                            self.logger, loaders=[loader])
+                    finally:
+                        raw_conn.close()
+                    self.logger.message(f"Se {'agregaron' if operation == 'append' else 'sobrescribieron'} {rows_affected} filas a la tabla {qualified_table_name} (carga '{strategy}')")
+                except Exception as e:
+                    self.logger.error(f"Error en carga Arrow a DuckDB: {str(e)}, intentando con SQLAlchemy")
+                    df.to_sql(
+                        name=table_name,
+                        schema=schema_name,
+                        con=engine,
+                        if_exists='append' if operation == 'append' else 'replace',
+                        index=False
+                    )
+                    rows_affected = len(df)
+                    self.logger.message(f"Se {'agregaron' if operation == 'append' else 'sobrescribieron'} {rows_affected} filas a la tabla {schema_name}.{table_name} (usando SQLAlchemy)")
+
             # Para otras bases de datos, usar SQLAlchemy normalmente
             elif operation == 'append':
                 df.to_sql(
@@ -1356,189 +1441,6 @@ class MaterializationProcessor:
                 rows_affected = len(df)
                 self.logger.message(f"Se sobrescribió la tabla {schema_name}.{table_name} con {rows_affected} filas")
                 
-            elif operation == 'upsert':
-                # Para upsert, necesitamos la clave primaria
-                pk_columns = config.get('primary_key') or config.get('primaryKey', [])
-                if not pk_columns:
-                    raise ValueError("Para operación upsert se requiere especificar clave primaria (primaryKey)")
-                
-                # Implementación de upsert dependiente del tipo de base de datos
-                if db_connection_info['tipo'] == 'postgresql':
-                    self._postgres_upsert(engine, df, table_name, schema_name, pk_columns)
-                elif db_connection_info['tipo'] == 'mysql':
-                    self._mysql_upsert(engine, df, table_name, schema_name, pk_columns)
-                elif db_connection_info['tipo'] == 'duckdb':
-                    self._duckdb_upsert(engine, df, table_name, schema_name, pk_columns)
-                elif db_connection_info['tipo'] == 'mssql':
-                    # Implementar el método upsert_direct inline para evitar problemas de atributos
-                    self.logger.message(f"Implementando método upsert directo para SQL Server")
-                    
-                    # Datos de conexión
-                    server = db_connection_info['servidor']
-                    port = int(db_connection_info['puerto'] or 1433)
-                    database = db_connection_info['basedatos']
-                    user = db_connection_info['usuario']
-                    password = db_connection_info['contrasena']
-                    
-                    # Configuración de opciones avanzadas
-                    connect_options = {
-                        "charset": "utf8",
-                        "autocommit": True,
-                        "timeout": 10,
-                        "tds_version": "7.3"
-                    }
-                    
-                    # Crear conexión directa
-                    import pymssql
-                    conn = pymssql.connect(
-                        server=server,
-                        port=port,
-                        user=user,
-                        password=password,
-                        database=database,
-                        charset=connect_options["charset"],
-                        timeout=connect_options["timeout"],
-                        tds_version=connect_options["tds_version"],
-                        autocommit=connect_options["autocommit"]
-                    )
-                    
-                    try:
-                        cursor = conn.cursor()
-                        
-                        # Adaptar el esquema: SQL Server no usa 'public' como esquema por defecto
-                        schema_name_adjusted = 'dbo' if schema_name == 'public' else schema_name
-                        
-                        if schema_name == 'public':
-                            self.logger.message(f"Adaptando esquema 'public' a 'dbo' para SQL Server en upsert")
-                            
-                        qualified_table_name = f"{schema_name_adjusted}.{table_name}" if schema_name_adjusted else table_name
-                        
-                        # Verificar si la tabla existe
-                        check_sql = f"SELECT OBJECT_ID('{qualified_table_name}', 'U') as obj_id"
-                        cursor.execute(check_sql)
-                        result = cursor.fetchone()
-                        table_exists = result[0] is not None
-                        
-                        if not table_exists:
-                            # Crear tabla si no existe
-                            self.logger.message(f"Creando nueva tabla {qualified_table_name} para upsert")
-                            
-                            # Mapeo de tipos de datos de pandas a SQL Server
-                            type_map = {
-                                'int64': 'INT',
-                                'int32': 'INT',
-                                'float64': 'FLOAT',
-                                'float32': 'FLOAT',
-                                'object': 'NVARCHAR(MAX)',
-                                'bool': 'BIT',
-                                'datetime64[ns]': 'DATETIME2',
-                                'category': 'NVARCHAR(MAX)',
-                                'string': 'NVARCHAR(MAX)'
-                            }
-                            
-                            # Generar SQL para crear tabla
-                            columns = []
-                            for col in df.columns:
-                                col_type = df[col].dtype.name
-                                sql_type = type_map.get(col_type, 'NVARCHAR(MAX)')
-                                columns.append(f"[{col}] {sql_type}")
-                            
-                            column_defs = ", ".join(columns)
-                            create_table_sql = f"CREATE TABLE {qualified_table_name} ({column_defs})"
-                            cursor.execute(create_table_sql)
-                            conn.commit()
-                        
-                        # Crear tabla temporal para el MERGE
-                        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-                        temp_table = f"{table_name}_temp_{timestamp}"
-                        
-                        # Usar el schema ajustado también para la tabla temporal
-                        temp_table_qualified = f"{schema_name_adjusted}.{temp_table}" if schema_name_adjusted else temp_table
-                        self.logger.message(f"Usando esquema ajustado para tabla temporal: {temp_table_qualified}")
-                        
-                        self.logger.message(f"Creando tabla temporal {temp_table_qualified}")
-                        
-                        # Copiar estructura de tabla original para tabla temporal
-                        cursor.execute(f"SELECT TOP 0 * INTO {temp_table_qualified} FROM {qualified_table_name}")
-                        conn.commit()
-                        
-                        # Insertar datos en tabla temporal
-                        self.logger.message(f"Insertando {len(df)} filas en tabla temporal")
-                        
-                        # Convertir DataFrame a lista de tuplas
-                        records = df.to_records(index=False)
-                        tuples = [tuple(x) for x in records]
-                        
-                        # Construir SQL de inserción
-                        columns = ", ".join([f"[{col}]" for col in df.columns])
-                        placeholders = ", ".join(["%s"] * len(df.columns))
-                        insert_sql = f"INSERT INTO {temp_table_qualified} ({columns}) VALUES ({placeholders})"
-                        
-                        # Ejecutar inserción por lotes (batch)
-                        batch_size = DATABASE_BATCH_SIZE  # Usando tamaño de lote global
-                        for i in range(0, len(tuples), batch_size):
-                            batch = tuples[i:i+batch_size]
-                            cursor.executemany(insert_sql, batch)
-                            conn.commit()
-                            self.logger.message(f"Insertado lote {i//batch_size + 1} de {(len(tuples) + batch_size - 1) // batch_size}")
-                        
-                        # Construir la cláusula MERGE (equivalente al UPSERT)
-                        # Identificar columnas PK
-                        join_conditions = []
-                        for col in pk_columns:
-                            join_conditions.append(f"Target.[{col}] = Source.[{col}]")
-                        join_condition = " AND ".join(join_conditions)
-                        
-                        # Columnas a actualizar (todas menos las PK)
-                        update_columns = [col for col in df.columns if col not in pk_columns]
-                        update_stmt = ", ".join([f"Target.[{col}] = Source.[{col}]" for col in update_columns])
-                        
-                        # Construir la lista de columnas para INSERT
-                        insert_columns = ", ".join([f"[{col}]" for col in df.columns])
-                        insert_values = ", ".join([f"Source.[{col}]" for col in df.columns])
-                        
-                        merge_sql = f"""
-                        MERGE {qualified_table_name} AS Target
-                        USING {temp_table_qualified} AS Source
-                        ON {join_condition}
-                        WHEN MATCHED THEN
-                            UPDATE SET {update_stmt}
-                        WHEN NOT MATCHED THEN
-                            INSERT ({insert_columns})
-                            VALUES ({insert_values});
-                        """
-                        
-                        # Ejecutar MERGE
-                        self.logger.message(f"Ejecutando MERGE para upsert en {qualified_table_name}")
-                        cursor.execute(merge_sql)
-                        conn.commit()
-                        
-                        # Eliminar tabla temporal
-                        self.logger.message("Eliminando tabla temporal")
-                        cursor.execute(f"IF OBJECT_ID('{temp_table_qualified}', 'U') IS NOT NULL DROP TABLE {temp_table_qualified}")
-                        conn.commit()
-                        
-                        self.logger.message(f"Upsert directo en SQL Server completado exitosamente para tabla {qualified_table_name}")
-                    except Exception as e:
-                        self.logger.error(f"Error en upsert directo de SQL Server: {str(e)}")
-                        try:
-                            # Intentar eliminar la tabla temporal si existe
-                            cursor.execute(f"IF OBJECT_ID('{temp_table_qualified}', 'U') IS NOT NULL DROP TABLE {temp_table_qualified}")
-                            conn.commit()
-                        except:
-                            pass
-                        
-                        # Si falla el método directo, intentar con SQLAlchemy como fallback
-                        self.logger.warning("Fallback a método SQLAlchemy para upsert")
-                        self._mssql_upsert(engine, df, table_name, schema_name, pk_columns)
-                    finally:
-                        conn.close()
-                else:
-                    raise ValueError(f"Operación upsert no soportada para {db_connection_info['tipo']}")
-                
-                rows_affected = len(df)
-                self.logger.message(f"Se actualizaron/insertaron {rows_affected} filas en la tabla {schema_name}.{table_name}")
-                
             else:
                 raise ValueError(f"Operación no soportada: {operation}")
                 
@@ -1564,7 +1466,8 @@ class MaterializationProcessor:
             if target_conn:
                 target_conn.close()
     
-    def _mysql_create_table_sql(self, df: pd.DataFrame, table_name: str, schema_name: str = None) -> str:
+    def _mysql_create_table_sql(self, df: pd.DataFrame, table_name: str, schema_name: str = None,
+                                key_columns: List[str] = None) -> str:
         """
         Genera SQL para crear una tabla en MySQL basada en el DataFrame.
         
@@ -1572,6 +1475,8 @@ class MaterializationProcessor:
             df: DataFrame con los datos
             table_name: Nombre de la tabla a crear
             schema_name: Nombre del esquema (opcional en MySQL)
+            key_columns: Columnas de la clave de upsert; las de texto se crean como
+                VARCHAR(255) porque MySQL no permite indexar TEXT sin longitud
             
         Returns:
             SQL para crear la tabla
@@ -1594,6 +1499,8 @@ class MaterializationProcessor:
         for col in df.columns:
             col_type = df[col].dtype.name
             sql_type = type_map.get(col_type, 'TEXT')
+            if key_columns and col in key_columns and sql_type == 'TEXT':
+                sql_type = 'VARCHAR(255)'
             columns.append(f"`{col}` {sql_type}")
         
         # Combinar definiciones de columnas
@@ -1612,503 +1519,77 @@ class MaterializationProcessor:
             
         return create_table_sql
         
-    def _postgres_upsert(self, engine, df: pd.DataFrame, table_name: str, 
-                      schema_name: str, pk_columns: List[str]) -> None:
-        """
-        Implementa la operación UPSERT para PostgreSQL.
-        
-        Args:
-            engine: Conexión SQLAlchemy
-            df: DataFrame a materializar
-            table_name: Nombre de la tabla
-            schema_name: Nombre del esquema
-            pk_columns: Lista de columnas que forman la clave primaria
-        """
-        import sqlalchemy
-        import io
-        from sqlalchemy import text
-        
-        # Crear tabla si no existe
-        df.head(0).to_sql(
-            name=table_name,
-            schema=schema_name,
-            con=engine,
-            if_exists='append',
-            index=False
-        )
-        
-        # Generar SQL para UPSERT
-        temp_table = f"temp_{table_name}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        # Crear tabla temporal con los datos a insertar/actualizar
-        df.to_sql(temp_table, engine, index=False, if_exists='replace')
-        
-        # Construir la cláusula ON CONFLICT
-        pk_list = ", ".join(pk_columns)
-        update_columns = [col for col in df.columns if col not in pk_columns]
-        update_stmt = ", ".join([f"{col} = EXCLUDED.{col}" for col in update_columns])
-        
-        # SQL para UPSERT
-        sql = f"""
-        INSERT INTO {schema_name}.{table_name}
-        SELECT * FROM {temp_table}
-        ON CONFLICT ({pk_list})
-        DO UPDATE SET {update_stmt}
-        """
-        
-        # Ejecutar la sentencia
-        with engine.begin() as conn:
-            conn.execute(text(sql))
-            conn.execute(text(f"DROP TABLE {temp_table}"))
-    
-    def _mysql_upsert(self, engine, df: pd.DataFrame, table_name: str, 
-                     schema_name: str, pk_columns: List[str]) -> None:
+    def _staged_upsert(self, engine, db_type: str, df: pd.DataFrame, table_name: str,
+                       schema_name: str, pk_columns: List[str]) -> Tuple[int, int]:
         """
-        Implementa la operación UPSERT para MySQL.
+        Implementa la operación UPSERT con tabla de staging para todos los motores.
         
         Args:
             engine: Conexión SQLAlchemy
+            db_type: Tipo de base de datos
             df: DataFrame a materializar
             table_name: Nombre de la tabla
-            schema_name: Nombre del esquema (puede ser ignorado en MySQL si no es necesario)
+            schema_name: Nombre del esquema (se adapta a cada motor)
             pk_columns: Lista de columnas que forman la clave primaria
+            
+        Returns:
+            Tuple: (filas insertadas, filas actualizadas)
         """
-        self.logger.message(f"Ejecutando upsert en MySQL para tabla {schema_name}.{table_name}")
+        if db_type not in UPSERT_DIALECTS:
+            raise ValueError(f"Operación upsert no soportada para {db_type}")
+        schema = UPSERT_DIALECTS[db_type].adjust_schema(schema_name)
+        self.logger.message(f"Ejecutando upsert en {db_type} para tabla {schema or ''}{'.' if schema else ''}{table_name}")
         
-        try:
-            # Conexión directa con pymysql para mejor control
-            server = engine.url.host
-            server = self._clean_server_string(server)
-            port = int(engine.url.port or 3306)
-            database = engine.url.database
-            user = engine.url.username
-            password = engine.url.password
-            
-            # Configuración de opciones avanzadas
-            connect_options = {
-                "charset": "utf8mb4",
-                "autocommit": False, # Controlamos explícitamente las transacciones
-                "connect_timeout": 10
-            }
-            
-            # Crear conexión directa
-            import pymysql
-            
-            # Log para depuración
-            self.logger.message(f"Conectando a MySQL: {server}:{port}/{database}")
-            
-            conn = pymysql.connect(
-                host=server,
-                port=port,
-                user=user,
-                password=password,
-                database=database,
-                charset=connect_options["charset"],
-                connect_timeout=connect_options["connect_timeout"],
-                autocommit=connect_options["autocommit"]
-            )
-            
-            try:
-                cursor = conn.cursor()
-                
-                # Verificar si la tabla existe
-                schema_prefix = f"{schema_name}." if schema_name else ""
-                full_table_name = f"{schema_prefix}`{table_name}`"
-                
-                # Crear tabla si no existe
-                create_table_sql = self._mysql_create_table_sql(df, table_name, schema_name)
-                self.logger.message(f"Verificando si existe la tabla y creándola si no: {create_table_sql}")
-                cursor.execute(create_table_sql)
-                conn.commit()
-                
-                # MySQL no tiene una sentencia UPSERT como tal, pero podemos usar INSERT ... ON DUPLICATE KEY UPDATE
-                # Para eso, necesitamos que las columnas PK estén definidas como PRIMARY KEY o UNIQUE
-                # Verificamos si las columnas PK están definidas como clave
-                try:
-                    # Obtener información sobre las claves de la tabla
-                    cursor.execute(f"SHOW KEYS FROM {full_table_name} WHERE Key_name = 'PRIMARY'")
-                    primary_keys = cursor.fetchall()
-                    
-                    # Si no hay clave primaria, intentamos crearla
-                    if not primary_keys:
-                        self.logger.message(f"No se encontró clave primaria en {full_table_name}, creando...")
-                        pk_cols_quoted = ", ".join([f"`{col}`" for col in pk_columns])
-                        alter_sql = f"ALTER TABLE {full_table_name} ADD PRIMARY KEY ({pk_cols_quoted})"
-                        try:
-                            cursor.execute(alter_sql)
-                            conn.commit()
-                            self.logger.message(f"Clave primaria creada exitosamente: {pk_cols_quoted}")
-                        except Exception as pk_error:
-                            self.logger.warning(f"No se pudo crear clave primaria: {str(pk_error)}. El upsert podría no funcionar correctamente.")
-                except Exception as keys_error:
-                    self.logger.warning(f"Error al verificar/crear clave primaria: {str(keys_error)}")
-                
-                # Generar SQL para INSERT ... ON DUPLICATE KEY UPDATE
-                # Crear la parte de INSERT
-                columns = ", ".join([f"`{col}`" for col in df.columns])
-                placeholders = ", ".join(["%s"] * len(df.columns))
-                
-                # Crear la parte de ON DUPLICATE KEY UPDATE
-                # Excluir las columnas PK de la actualización
-                update_stmts = []
-                for col in df.columns:
-                    if col not in pk_columns:
-                        update_stmts.append(f"`{col}` = VALUES(`{col}`)")
-                
-                update_clause = ", ".join(update_stmts)
-                
-                # SQL completo para upsert
-                upsert_sql = f"""
-                INSERT INTO {full_table_name} ({columns})
-                VALUES ({placeholders})
-                ON DUPLICATE KEY UPDATE {update_clause}
-                """
-                
-                self.logger.message(f"SQL para upsert: {upsert_sql}")
-                
-                # Convertir DataFrame a lista de tuplas
-                records = df.to_records(index=False)
-                tuples = [tuple(x) for x in records]
-                
-                # Ejecutar inserción por lotes (batch)
-                batch_size = DATABASE_BATCH_SIZE  # Usando tamaño de lote global
-                for i in range(0, len(tuples), batch_size):
-                    batch = tuples[i:i+batch_size]
-                    try:
-                        # Vamos a limpiar los datos para asegurar compatibilidad con pymysql
-                        cleaned_batch = []
-                        for row in batch:
-                            cleaned_row = []
-                            for val in row:
-                                # None pasa directamente
-                                if val is None:
-                                    cleaned_row.append(None)
-                                # float('nan') debe convertirse a NULL
-                                elif isinstance(val, float) and math.isnan(val):
-                                    cleaned_row.append(None)
-                                # Para otros tipos, usar str() si no es un tipo básico
-                                elif not isinstance(val, (int, float, str, bool, datetime.datetime, datetime.date)):
-                                    cleaned_row.append(str(val))
-                                else:
-                                    cleaned_row.append(val)
-                            cleaned_batch.append(tuple(cleaned_row))
-                        
-                        # Log para el primer registro (para debug)
-                        if i == 0:
-                            self.logger.message(f"Ejemplo primer registro limpiado: {cleaned_batch[0]}")
-                        
-                        cursor.executemany(upsert_sql, cleaned_batch)
-                        conn.commit()
-                        self.logger.message(f"Procesado lote {i//batch_size + 1} de {(len(tuples) + batch_size - 1) // batch_size}")
-                    except Exception as batch_error:
-                        self.logger.error(f"Error procesando lote {i//batch_size + 1}: {str(batch_error)}")
-                        conn.rollback()
-                        
-                        # Intentar inserción registro por registro como último recurso
-                        for j, row in enumerate(batch):
-                            try:
-                                # Limpiar cada fila individualmente
-                                cleaned_row = []
-                                for val in row:
-                                    if val is None:
-                                        cleaned_row.append(None)
-                                    elif isinstance(val, float) and math.isnan(val):
-                                        cleaned_row.append(None)
-                                    elif not isinstance(val, (int, float, str, bool, datetime.datetime, datetime.date)):
-                                        cleaned_row.append(str(val))
-                                    else:
-                                        cleaned_row.append(val)
-                                
-                                cursor.execute(upsert_sql, tuple(cleaned_row))
-                                conn.commit()
-                            except Exception as row_error:
-                                self.logger.error(f"Error insertando fila {i+j} (valores: {row}): {str(row_error)}")
-                                conn.rollback()
-                                # Continuar con la siguiente fila
-                                continue
-                
-                self.logger.message(f"Upsert en MySQL completado exitosamente para tabla {full_table_name}")
-            finally:
-                conn.close()
-                
-        except Exception as e:
-            self.logger.error(f"Error en upsert directo de MySQL: {str(e)}")
-            # Fallar con el enfoque directo, intentar el enfoque de SQLAlchemy
-            self.logger.warning("Fallback a SQLAlchemy para MySQL upsert")
-            
-            # Usar un enfoque alternativo basado en SQLAlchemy
-            import sqlalchemy
-            from sqlalchemy import text
-            
-            # Crear tabla si no existe
+        # Crear tabla destino si no existe
+        if db_type != 'mysql':
             df.head(0).to_sql(
                 name=table_name,
-                schema=schema_name,
+                schema=schema,
                 con=engine,
                 if_exists='append',
                 index=False
             )
-            
-            # Crear tabla temporal
-            temp_table = f"temp_{table_name}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
-            
-            # Insertar datos en tabla temporal
-            df.to_sql(temp_table, engine, index=False, if_exists='replace')
-            
-            # Construir SQL para INSERT ... ON DUPLICATE KEY UPDATE
-            columns = ", ".join([f"`{col}`" for col in df.columns])
-            
-            # Excluir las columnas PK de la actualización
-            update_stmts = []
-            for col in df.columns:
-                if col not in pk_columns:
-                    update_stmts.append(f"`{col}` = t2.`{col}`")
-            
-            update_clause = ", ".join(update_stmts)
-            
-            # Construir SQL para upsert usando INSERT ... ON DUPLICATE KEY UPDATE
-            schema_prefix = f"`{schema_name}`." if schema_name else ""
-            sql = f"""
-            INSERT INTO {schema_prefix}`{table_name}` ({columns})
-            SELECT {columns} FROM `{temp_table}` AS t2
-            ON DUPLICATE KEY UPDATE {update_clause}
-            """
-            
-            # Ejecutar la sentencia
-            with engine.begin() as conn:
-                conn.execute(text(sql))
-                conn.execute(text(f"DROP TABLE `{temp_table}`"))
-            
-            self.logger.message(f"Upsert completado para MySQL usando SQLAlchemy")
-            
-    def _mssql_upsert(self, engine, df: pd.DataFrame, table_name: str, 
-                     schema_name: str, pk_columns: List[str]) -> None:
-        """
-        Implementa la operación UPSERT para SQL Server usando MERGE.
-        
-        Args:
-            engine: Conexión SQLAlchemy
-            df: DataFrame a materializar
-            table_name: Nombre de la tabla
-            schema_name: Nombre del esquema
-            pk_columns: Lista de columnas que forman la clave primaria
-        """
-        import sqlalchemy
-        from sqlalchemy import text
-        
-        self.logger.message(f"Ejecutando upsert en SQL Server para tabla {schema_name}.{table_name}")
-        
-        # Adaptar esquema para SQL Server (public -> dbo)
-        schema_name_adjusted = 'dbo' if schema_name == 'public' else schema_name
-        
-        if schema_name == 'public':
-            self.logger.message(f"Adaptando esquema 'public' a 'dbo' para SQL Server en método SQLAlchemy")
-            
-        # Nombre cualificado de la tabla
-        qualified_table_name = f"{schema_name_adjusted}.{table_name}" if schema_name_adjusted else table_name
-        
-        # Para SQL Server, usaremos un nombre de tabla normal en lugar de una tabla temporal
-        # Las tablas temporales con # pueden dar problemas con pandas/SQLAlchemy
-        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-        temp_table = f"{table_name}_temp_{timestamp}"
         
+        raw_conn = engine.raw_connection()
         try:
-            # Crear tabla si no existe
-            self.logger.message(f"Verificando si existe la tabla {qualified_table_name}")
-            df.head(0).to_sql(
-                name=table_name,
-                schema=schema_name_adjusted,  # Usar el schema ajustado para SQL Server
-                con=engine,
-                if_exists='append',
-                index=False
-            )
-            
-            # Crear tabla temporal para los nuevos datos (sin # para mejor compatibilidad)
-            self.logger.message(f"Creando tabla temporal {temp_table}")
-            
-            # Insertar datos en la tabla temporal
-            self.logger.message(f"Insertando {len(df)} filas en tabla temporal")
-            
-            # Usar pandas directamente para crear la tabla temporal e insertar datos
-            # Esto evita problemas de compatibilidad con pymssql
-            df.to_sql(
-                name=temp_table,
-                schema=schema_name_adjusted,  # Usar el schema ajustado para SQL Server
-                con=engine,
-                if_exists='replace',  # Crear o reemplazar la tabla temporal
-                index=False,
-                method='multi'  # Usar método multi para mejor rendimiento
-            )
-            
-            # Construir la cláusula MERGE (equivalente al UPSERT)
-            # Identificar columnas PK
-            join_conditions = []
-            for col in pk_columns:
-                join_conditions.append(f"Target.[{col}] = Source.[{col}]")
-            join_condition = " AND ".join(join_conditions)
-            
-            # Columnas a actualizar (todas menos las PK)
-            update_columns = [col for col in df.columns if col not in pk_columns]
-            update_stmt = ", ".join([f"Target.[{col}] = Source.[{col}]" for col in update_columns])
-            
-            # Construir la lista de columnas para INSERT
-            insert_columns = ", ".join([f"[{col}]" for col in df.columns])
-            insert_values = ", ".join([f"Source.[{col}]" for col in df.columns])
-            
-            # Crear sentencia MERGE (usando el nombre cualificado de la tabla temporal)
-            # También adaptamos el esquema para la tabla temporal
-            temp_table_qualified = f"{schema_name_adjusted}.{temp_table}" if schema_name_adjusted else temp_table
-            self.logger.message(f"Usando esquema ajustado para tabla temporal SQLAlchemy: {temp_table_qualified}")
-            
-            merge_sql = f"""
-            MERGE {qualified_table_name} AS Target
-            USING {temp_table_qualified} AS Source
-            ON {join_condition}
-            WHEN MATCHED THEN
-                UPDATE SET {update_stmt}
-            WHEN NOT MATCHED THEN
-                INSERT ({insert_columns})
-                VALUES ({insert_values});
-            """
-            
-            # Ejecutar MERGE
-            self.logger.message(f"Ejecutando MERGE para upsert en {qualified_table_name}")
-            with engine.begin() as conn:
-                conn.execute(text(merge_sql))
-                
-                # Eliminar tabla temporal
-                self.logger.message("Eliminando tabla temporal")
-                conn.execute(text(f"DROP TABLE {temp_table_qualified}"))
-            
-            self.logger.message(f"Upsert en SQL Server completado exitosamente para tabla {qualified_table_name}")
-            
-        except Exception as e:
-            self.logger.error(f"Error en upsert de SQL Server: {str(e)}")
-            with engine.begin() as conn:
-                try:
-                    # Intentar eliminar la tabla temporal si existe usando nombre calificado
-                    conn.execute(text(f"IF OBJECT_ID('{temp_table_qualified}', 'U') IS NOT NULL DROP TABLE {temp_table_qualified}"))
-                except:
-                    pass
-            raise
-            
-    def _duckdb_upsert(self, engine, df: pd.DataFrame, table_name: str, 
-                     schema_name: str, pk_columns: List[str]) -> None:
+            conn = getattr(raw_conn, 'driver_connection', None) or raw_conn.connection
+            if db_type == 'mysql':
+                # Las columnas de la clave se crean como VARCHAR para poder indexarlas
+                cursor = conn.cursor()
+                cursor.execute(self._mysql_create_table_sql(df, table_name, schema, key_columns=pk_columns))
+                conn.commit()
+            return staged_upsert(db_type, conn, df, schema, table_name, pk_columns, self.logger)
+        finally:
+            raw_conn.close()
+    
+    def _staged_delete(self, engine, db_type: str, keys_df: pd.DataFrame, table_name: str,
+                       schema_name: str) -> int:
         """
-        Implementa la operación UPSERT para DuckDB.
+        Elimina de la tabla las filas cuyas claves están en keys_df usando una tabla de staging.
         
         Args:
             engine: Conexión SQLAlchemy
-            df: DataFrame a materializar
+            db_type: Tipo de base de datos
+            keys_df: DataFrame con las columnas de la clave primaria
             table_name: Nombre de la tabla
-            schema_name: Nombre del esquema (puede ser ignorado en DuckDB)
-            pk_columns: Lista de columnas que forman la clave primaria
+            schema_name: Nombre del esquema (se adapta a cada motor)
+            
+        Returns:
+            int: Filas eliminadas
         """
-        import sqlalchemy
-        from sqlalchemy import text
-        
-        self.logger.message(f"Ejecutando upsert en DuckDB para tabla {table_name}")
+        if db_type not in UPSERT_DIALECTS:
+            raise ValueError(f"Eliminación incremental no soportada para {db_type}")
+        schema = UPSERT_DIALECTS[db_type].adjust_schema(schema_name)
         
-        # Manejo específico para DuckDB con SQLAlchemy
+        raw_conn = engine.raw_connection()
         try:
-            # Crear tabla si no existe (DuckDB normalmente ignora el schema)
-            qualified_table_name = f"{table_name}"
-            if schema_name and schema_name != 'main':
-                qualified_table_name = f"{schema_name}.{table_name}"
-                
-            # Log para depuración
-            self.logger.message(f"Tabla destino para upsert: {qualified_table_name}")
-            
-            # Generar tabla temporal
-            temp_table = f"temp_{table_name}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
-            
-            # Crear tabla temporal con los datos a insertar/actualizar
-            self.logger.message(f"Creando tabla temporal {temp_table} con {len(df)} filas")
-            df.to_sql(temp_table, engine, index=False, if_exists='replace')
-            
-            # Verificar si la tabla destino existe
-            check_table_sql = f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'"
-            
-            with engine.connect() as conn:
-                result = conn.execute(text(check_table_sql))
-                table_exists = bool(result.fetchone())
-                
-                if not table_exists:
-                    self.logger.message(f"La tabla {qualified_table_name} no existe, creándola...")
-                    # Crear la tabla destino a partir del dataframe
-                    df.head(0).to_sql(
-                        name=table_name,
-                        con=engine,
-                        if_exists='append',
-                        index=False
-                    )
-            
-            # Construir la lista de columnas PK para la condición de join
-            join_conditions = []
-            for col in pk_columns:
-                join_conditions.append(f"a.{col} = b.{col}")
-            join_condition = " AND ".join(join_conditions)
-            
-            # Columnas a actualizar (todas menos las PK)
-            update_columns = [col for col in df.columns if col not in pk_columns]
-            
-            # Sentencias SQL para realizar el upsert en DuckDB
-            if update_columns:
-                # 1. Actualizar registros existentes
-                update_sets = ", ".join([f"a.{col} = b.{col}" for col in update_columns])
-                update_sql = f"""
-                UPDATE {qualified_table_name} AS a
-                SET {update_sets}
-                FROM {temp_table} AS b
-                WHERE {join_condition}
-                """
-                
-                # 2. Insertar registros nuevos
-                not_exists_condition = " AND ".join([f"a.{col} IS NULL" for col in pk_columns])
-                insert_sql = f"""
-                INSERT INTO {qualified_table_name}
-                SELECT b.*
-                FROM {temp_table} AS b
-                LEFT JOIN {qualified_table_name} AS a ON {join_condition}
-                WHERE {not_exists_condition} OR a.{pk_columns[0]} IS NULL
-                """
-                
-                # Ejecutar las sentencias
-                with engine.begin() as conn:
-                    # Primero actualizar registros existentes
-                    self.logger.message(f"Actualizando registros existentes en {qualified_table_name}")
-                    conn.execute(text(update_sql))
-                    
-                    # Luego insertar los nuevos
-                    self.logger.message(f"Insertando nuevos registros en {qualified_table_name}")
-                    conn.execute(text(insert_sql))
-                    
-                    # Eliminar tabla temporal
-                    self.logger.message("Eliminando tabla temporal")
-                    conn.execute(text(f"DROP TABLE {temp_table}"))
-            else:
-                # Si no hay columnas a actualizar, simplemente insertamos los registros que no existen
-                not_exists_sql = f"""
-                INSERT INTO {qualified_table_name}
-                SELECT b.*
-                FROM {temp_table} AS b
-                LEFT JOIN {qualified_table_name} AS a ON {join_condition}
-                WHERE a.{pk_columns[0]} IS NULL
-                """
-                
-                with engine.begin() as conn:
-                    self.logger.message(f"Insertando sólo nuevos registros en {qualified_table_name}")
-                    conn.execute(text(not_exists_sql))
-                    conn.execute(text(f"DROP TABLE {temp_table}"))
-                    
-            self.logger.message(f"Upsert en DuckDB completado exitosamente para tabla {qualified_table_name}")
-                
-        except Exception as e:
-            self.logger.error(f"Error en upsert de DuckDB: {str(e)}")
-            raise
+            conn = getattr(raw_conn, 'driver_connection', None) or raw_conn.connection
+            return staged_delete(db_type, conn, keys_df, schema, table_name, self.logger)
+        finally:
+            raw_conn.close()
     
     def _materialize_to_cloud(self, df: pd.DataFrame, cloud_provider_id: int, config: Dict[str, Any], 
-                           materialization_id: int, execution_id: str) -> None:
+                           materialization_id: int, execution_id: str, delta: bool = False) -> None:
         """
         Materializa el DataFrame a un almacenamiento en la nube.
         
@@ -2118,6 +1599,7 @@ class MaterializationProcessor:
             config: Configuración de la materialización
             materialization_id: ID de la materialización
             execution_id: ID de la ejecución
+            delta: Si df contiene solo los cambios de una carga incremental
         """
         if df.empty:
             self.logger.warning("No hay datos para materializar al almacenamiento en la nube")
@@ -2171,6 +1653,15 @@ class MaterializationProcessor:
                 
             self.logger.message(f"Usando estrategia FULL con UUID. Destino original: {original_destination_path}, Destino con UUID: {destination_path}")
         
+        elif delta and destination_path:
+            # Los cambios se escriben en un archivo aparte para no pisar la carga completa
+            change_prefix = f"_cambios_{execution_id if execution_id else uuid.uuid4()}"
+            if isinstance(destination_path, str) and '/' in destination_path:
+                destination_path = f"{os.path.dirname(destination_path)}/{change_prefix}.{os.path.basename(destination_path)}"
+            elif isinstance(destination_path, str):
+                destination_path = f"{change_prefix}.{destination_path}"
+            self.logger.message(f"Materialización incremental: escribiendo cambios en {destination_path}")
+        
         if not destination_path:
             raise ValueError("No se ha especificado la ruta de destino ni tablaDestino")
             
@@ -3693,6 +3184,27 @@ class MaterializationProcessor:
         """
         Registra la ejecución de una materialización.
         
+        Dentro de una tarea del pool (_run_materialization) el registro se retiene y
+        solo se guarda el resultado final de la tarea.
+        
+        Args:
+            materialization_id: ID de la materialización
+            execution_id: ID de la ejecución SAGE
+            status: Estado de la materialización (pendiente, completado, error)
+            message: Mensaje descriptivo
+            records_count: Número de registros procesados (opcional)
+        """
+        outcome = getattr(self._local, 'outcome', None)
+        if outcome is not None:
+            outcome.append((materialization_id, execution_id, status, message, records_count))
+            return
+        self._insert_materialization_execution(materialization_id, execution_id, status, message, records_count)
+    
+    def _insert_materialization_execution(self, materialization_id: int, execution_id: str,
+                                          status: str, message: str, records_count: int = None) -> None:
+        """
+        Inserta la ejecución de una materialización en materializaciones_ejecuciones.
+        
         Args:
             materialization_id: ID de la materialización
             execution_id: ID de la ejecución SAGE
@@ -0,0 +1,122 @@
+"""Escritura incremental de reportes JSON de gran tamaño"""
+import gzip
+import json
+import os
+from typing import Any, Dict, Iterable, List
+
+
+def json_default(obj: Any) -> Any:
+    """Conversión para objetos que json no serializa (excepciones con to_dict, fechas, ...)"""
+    if hasattr(obj, 'to_dict') and callable(obj.to_dict):
+        return obj.to_dict()
+    if hasattr(obj, 'isoformat') and callable(obj.isoformat):
+        return obj.isoformat()
+    try:
+        return str(obj)
+    except Exception:
+        return f"<Objeto no serializable: {type(obj).__name__}>"
+
+
+class StreamedArray:
+    """
+    Marca un iterable que debe escribirse elemento a elemento como array JSON
+
+    Con encoded=True los elementos ya son cadenas JSON y se copian sin volver a
+    serializarlos.
+    """
+
+    def __init__(self, items: Iterable[Any], encoded: bool = False):
+        self.items = items
+        self.encoded = encoded
+
+
+class StreamingJSONWriter:
+    """
+    Escribe un objeto JSON sin construirlo completo en memoria
+
+    Los valores normales se serializan directamente con indentación. Los valores
+    envueltos en StreamedArray se recorren una sola vez y cada elemento se escribe
+    en una línea compacta, de modo que un array de cientos de miles de eventos no
+    necesita estar materializado.
+    """
+
+    INDENT = "  "
+
+    def __init__(self, streams: List):
+        self.streams = streams
+        self._encoder = json.JSONEncoder(ensure_ascii=False, default=json_default,
+                                         separators=(",", ":"))
+        self._pretty = json.JSONEncoder(ensure_ascii=False, default=json_default, indent=2)
+        self._pending: List[str] = []
+        self._pending_size = 0
+
+    def _write(self, text: str) -> None:
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= 256 * 1024:
+            self.flush()
+
+    def flush(self) -> None:
+        chunk = "".join(self._pending)
+        for stream in self.streams:
+            stream.write(chunk)
+        self._pending = []
+        self._pending_size = 0
+
+    def write_object(self, obj: Dict[str, Any], level: int = 0) -> None:
+        """Escribe un diccionario; los valores pueden ser diccionarios anidados o StreamedArray"""
+        inner = self.INDENT * (level + 1)
+        self._write("{")
+        for position, (key, value) in enumerate(obj.items()):
+            self._write(("," if position else "") + "\n" + inner + self._encoder.encode(str(key)) + ": ")
+            self._write_value(value, level + 1)
+        self._write("\n" + self.INDENT * level + "}" if obj else "}")
+
+    def _write_value(self, value: Any, level: int) -> None:
+        if isinstance(value, StreamedArray):
+            self._write_array(value.items, level, value.encoded)
+        elif isinstance(value, dict) and any(isinstance(v, (dict, StreamedArray)) for v in value.values()):
+            self.write_object(value, level)
+        else:
+            text = self._pretty.encode(value)
+            self._write(text.replace("\n", "\n" + self.INDENT * level))
+
+    def _write_array(self, items: Iterable[Any], level: int, encoded: bool = False) -> None:
+        inner = self.INDENT * (level + 1)
+        empty = True
+        self._write("[")
+        for item in items:
+            self._write(("\n" if empty else ",\n") + inner + (item if encoded else self._encoder.encode(item)))
+            empty = False
+        self._write("]" if empty else "\n" + self.INDENT * level + "]")
+
+
+def write_json_report(path: str, report: Dict[str, Any], compress: bool = False) -> None:
+    """
+    Escribe report en path de forma incremental (ver StreamingJSONWriter)
+
+    El archivo se escribe primero en un temporal y se renombra al terminar, así un
+    error a mitad de la escritura nunca deja un JSON truncado. Con compress=True se
+    genera en la misma pasada una copia comprimida en path + '.gz' para archivado.
+    """
+    targets = [path] + ([path + ".gz"] if compress else [])
+    temporaries = [target + ".tmp" for target in targets]
+    streams = [open(temporaries[0], "w", encoding="utf-8")]
+    try:
+        if compress:
+            streams.append(gzip.open(temporaries[1], "wt", encoding="utf-8", compresslevel=6))
+        writer = StreamingJSONWriter(streams)
+        writer.write_object(report)
+        writer.flush()
+    except BaseException:
+        for stream in streams:
+            stream.close()
+        for temporary in temporaries:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        raise
+
+    for stream in streams:
+        stream.close()
+    for temporary, target in zip(temporaries, targets):
+        os.replace(temporary, target)
@@ -0,0 +1,84 @@
+"""Compilación y caché de expresiones de reglas de validación para SAGE"""
+import ast
+import builtins
+from functools import lru_cache
+from types import CodeType
+from typing import Set
+
+# Nombres que el entorno de evaluación de FileProcessor pone a disposición de las reglas
+RULE_GLOBALS = {"df", "np", "pd", "str"}
+
+# Tamaño máximo de la caché de reglas compiladas (compartida por todo el proceso)
+RULE_CACHE_SIZE = 4096
+
+
+def _free_names(tree: ast.AST) -> Set[str]:
+    """
+    Obtiene los nombres leídos por la expresión que no están definidos dentro de ella
+
+    Los argumentos de lambdas y las variables de comprensiones se consideran locales.
+    """
+    loaded = set()
+    bound = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                loaded.add(node.id)
+            else:
+                bound.add(node.id)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+    return loaded - bound
+
+
+def _check_rule_tree(tree: ast.AST) -> None:
+    """Verificaciones estáticas sobre el árbol sintáctico de una regla"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr.startswith("__"):
+            raise ValueError(f"acceso no permitido al atributo '{node.attr}'")
+        if isinstance(node, ast.Name) and node.id.startswith("__"):
+            raise ValueError(f"uso no permitido del nombre '{node.id}'")
+
+    unknown = sorted(
+        name for name in _free_names(tree)
+        if name not in RULE_GLOBALS and not hasattr(builtins, name)
+    )
+    if unknown:
+        raise ValueError(
+            f"nombres no definidos: {', '.join(unknown)}. "
+            f"Las reglas solo pueden usar: {', '.join(sorted(RULE_GLOBALS))}"
+        )
+
+
+@lru_cache(maxsize=RULE_CACHE_SIZE)
+def compile_rule(rule_text: str) -> CodeType:
+    """
+    Compila la expresión de una regla a un objeto de código reutilizable
+
+    El resultado se guarda en una caché a nivel de proceso indexada por el texto de
+    la regla, así que un mismo YAML procesado muchas veces solo se compila una vez.
+
+    Args:
+        rule_text: Expresión Python de la regla tal como aparece en el YAML
+
+    Returns:
+        CodeType: Código compilado listo para pasar a eval()
+
+    Raises:
+        ValueError: Si la expresión no es válida o usa nombres no permitidos
+    """
+    if not isinstance(rule_text, str):
+        raise ValueError(f"la regla debe ser un texto, se recibió {type(rule_text).__name__}")
+
+    try:
+        tree = ast.parse(rule_text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"error de sintaxis en la expresión '{rule_text}': {e.msg}")
+
+    _check_rule_tree(tree)
+    return compile(tree, "<sage-rule>", "eval")
+
+
+def clear_rule_cache() -> None:
+    """Vacía la caché de reglas compiladas"""
+    compile_rule.cache_clear()
@@ -0,0 +1,159 @@
+"""Reporte de las reglas de validación más costosas por casilla"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from rich.console import Console
+from rich.table import Table
+
+
+def aggregate_rule_costs(executions: Iterable[Tuple[Optional[int], Dict[str, Any]]],
+                         top: Optional[int] = 20) -> List[Dict[str, Any]]:
+    """
+    Acumula el costo de cada regla entre ejecuciones
+
+    Args:
+        executions: Pares (casilla_id, métricas) con las métricas de cada ejecución
+            (sección 'metrics' de report.json, metrics.json o ejecuciones_yaml.metricas)
+        top: Número de reglas a devolver (None para todas)
+
+    Returns:
+        List: Reglas ordenadas por tiempo total descendente
+    """
+    totals = {}
+    for casilla_id, metrics in executions:
+        for rule in (metrics or {}).get('rules', []):
+            key = (casilla_id, rule['kind'], rule['catalog'], rule['field'], rule['rule'])
+            stats = totals.get(key)
+            if stats is None:
+                stats = totals[key] = {
+                    'casilla_id': casilla_id, 'kind': rule['kind'], 'catalog': rule['catalog'],
+                    'field': rule['field'], 'rule': rule['rule'], 'expression': rule['expression'],
+                    'executions': 0, 'evaluations': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0
+                }
+            stats['executions'] += 1
+            stats['evaluations'] += rule['evaluations']
+            stats['seconds'] += rule['seconds']
+            stats['max_seconds'] = max(stats['max_seconds'], rule['max_seconds'])
+            stats['rows'] += rule['rows']
+
+    ranking = sorted(totals.values(), key=lambda stats: stats['seconds'], reverse=True)
+    for stats in ranking:
+        stats['avg_seconds'] = stats['seconds'] / stats['executions']
+        # Segundos por millón de filas: permite comparar reglas de catálogos de distinto tamaño
+        stats['seconds_per_million_rows'] = stats['seconds'] / stats['rows'] * 1_000_000 if stats['rows'] else None
+    return ranking[:top] if top else ranking
+
+
+def load_from_database(casilla_id: Optional[int] = None, days: int = 30) -> List[Tuple[Optional[int], Dict]]:
+    """Lee las métricas registradas en ejecuciones_yaml (requiere DATABASE_URL)"""
+    from . import db_pool
+
+    query = """
+        SELECT casilla_id, metricas
+        FROM ejecuciones_yaml
+        WHERE metricas IS NOT NULL
+          AND fecha_ejecucion >= NOW() - (%s * INTERVAL '1 day')
+    """
+    params = [days]
+    if casilla_id is not None:
+        query += " AND casilla_id = %s"
+        params.append(casilla_id)
+
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return [
+                (row[0], row[1] if isinstance(row[1], dict) else json.loads(row[1]))
+                for row in cur.fetchall()
+            ]
+
+
+def load_from_directory(executions_dir: str, casilla_id: Optional[int] = None,
+                        days: int = 30) -> List[Tuple[Optional[int], Dict]]:
+    """Lee los metrics.json de los directorios de ejecución (sin base de datos)"""
+    since = time.time() - days * 86400
+    executions = []
+    for path in glob.glob(os.path.join(executions_dir, "*", "metrics.json")):
+        if os.path.getmtime(path) < since:
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                metrics = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if casilla_id is not None and metrics.get('casilla_id') != casilla_id:
+            continue
+        executions.append((metrics.get('casilla_id'), metrics))
+    return executions
+
+
+def print_report(ranking: List[Dict[str, Any]], console: Optional[Console] = None) -> None:
+    """Muestra el ranking de reglas como tabla"""
+    console = console or Console()
+    if not ranking:
+        console.print("No hay métricas de reglas para el período indicado")
+        return
+
+    table = Table(title="Reglas más lentas")
+    for column, justify in (("Casilla", "right"), ("Tipo", "left"), ("Catálogo", "left"), ("Campo", "left"),
+                            ("Regla", "left"), ("Ejec.", "right"), ("Total (s)", "right"),
+                            ("Prom. (s)", "right"), ("Máx. (s)", "right"), ("s / M filas", "right"),
+                            ("Expresión", "left")):
+        table.add_column(column, justify=justify, overflow="fold")
+
+    for stats in ranking:
+        per_million = stats['seconds_per_million_rows']
+        table.add_row(
+            str(stats['casilla_id'] if stats['casilla_id'] is not None else '-'),
+            stats['kind'],
+            stats['catalog'] or '-',
+            stats['field'] or '-',
+            stats['rule'],
+            str(stats['executions']),
+            f"{stats['seconds']:.3f}",
+            f"{stats['avg_seconds']:.3f}",
+            f"{stats['max_seconds']:.3f}",
+            f"{per_million:.3f}" if per_million is not None else '-',
+            stats['expression']
+        )
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="SAGE - Reglas de validación más costosas por casilla",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+🎯 Ejemplos de uso:
+  python -m sage.rule_costs --casilla-id 45 --top 10
+  python -m sage.rule_costs --executions-dir executions --days 7 --json
+        """
+    )
+    parser.add_argument("--casilla-id", type=int, help="Limitar el reporte a una casilla")
+    parser.add_argument("--top", type=int, default=20, help="Número de reglas a mostrar (por defecto 20)")
+    parser.add_argument("--days", type=int, default=30, help="Ejecuciones de los últimos N días (por defecto 30)")
+    parser.add_argument("--executions-dir",
+                        help="Leer metrics.json de los directorios de ejecución en lugar de la base de datos")
+    parser.add_argument("--json", action="store_true", help="Mostrar el resultado en formato JSON")
+
+    args = parser.parse_args()
+
+    if args.executions_dir:
+        executions = load_from_directory(args.executions_dir, args.casilla_id, args.days)
+    else:
+        executions = load_from_database(args.casilla_id, args.days)
+
+    ranking = aggregate_rule_costs(executions, args.top)
+    if args.json:
+        print(json.dumps(ranking, ensure_ascii=False, indent=2))
+    else:
+        print_report(ranking)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ import os
 import time
 import psycopg2
 from psycopg2.extras import DictCursor
+from sage import db_pool
 import json
 from typing import Dict, Any, List, Optional, Tuple, Union
 
@@ -49,14 +50,16 @@ class TemplateManager:
             if not database_url:
                 raise ValueError("No se ha configurado DATABASE_URL en el entorno")
                 
-            self.db_connection = psycopg2.connect(database_url)
+            if self.db_connection:
+                db_pool.release(self.db_connection, discard=True)
+            self.db_connection = db_pool.acquire(database_url)
             
         return self.db_connection
     
     def _close_db_connection(self):
-        """Cierra la conexión a la base de datos"""
-        if self.db_connection and not self.db_connection.closed:
-            self.db_connection.close()
+        """Devuelve la conexión al pool compartido"""
+        if self.db_connection:
+            db_pool.release(self.db_connection)
             self.db_connection = None
     
     def _get_from_cache(self, key: str) -> Optional[Dict[str, Any]]:
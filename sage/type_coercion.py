@@ -0,0 +1,107 @@
+"""Conversión y detección vectorizada de tipos de datos para SAGE"""
+from typing import Optional
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+# Literales aceptados para campos booleanos (comparación sin distinguir mayúsculas)
+BOOL_LITERALS = ["true", "false", "1", "0"]
+_BOOL_LITERAL_VARIANTS = BOOL_LITERALS + [literal.capitalize() for literal in BOOL_LITERALS[:2]] + \
+    [literal.upper() for literal in BOOL_LITERALS[:2]]
+
+
+def _is_integer_value(value, bools: bool, coerce: bool) -> bool:
+    """Versión elemento a elemento de integer_mask, usada solo para columnas de tipo object"""
+    if isinstance(value, bool):
+        return bools
+    if isinstance(value, (int, float)):
+        return float(value).is_integer()
+    if coerce:
+        return float(value).is_integer()
+    return False
+
+
+def integer_mask(series: pd.Series, bools: bool = False, coerce: bool = False) -> pd.Series:
+    """
+    Máscara de valores no nulos que representan un número entero (5, 5.0, ...)
+
+    Para columnas numéricas la comprobación se hace sobre el array completo con NumPy.
+    Las columnas de tipo object (valores mezclados) se recorren una sola vez.
+
+    Args:
+        series: Columna a evaluar
+        bools: Si es True, los booleanos se consideran enteros
+        coerce: Si es True, los valores no numéricos (p.ej. cadenas) se interpretan con
+            float() y un valor no convertible lanza ValueError; si es False nunca son enteros
+
+    Returns:
+        pd.Series: Máscara booleana con el mismo índice que series
+    """
+    notna = series.notna()
+
+    if is_bool_dtype(series):
+        return notna if bools else pd.Series(False, index=series.index)
+
+    if is_numeric_dtype(series):
+        values = series.to_numpy(dtype="float64", na_value=np.nan)
+        with np.errstate(invalid="ignore"):
+            integral = np.isfinite(values) & (np.floor(values) == values)
+        return notna & integral
+
+    values = series.to_numpy(dtype=object)
+    not_null = notna.to_numpy()
+    result = np.zeros(len(values), dtype=bool)
+    for position in np.flatnonzero(not_null):
+        result[position] = _is_integer_value(values[position], bools, coerce)
+    return pd.Series(result, index=series.index)
+
+
+def invalid_boolean_mask(series: pd.Series) -> pd.Series:
+    """
+    Máscara de valores que no son un booleano válido
+
+    Se aceptan True/False, los números 0 y 1 y los literales "true", "false", "1" y "0"
+    (sin distinguir mayúsculas). Los nulos se consideran inválidos.
+    """
+    if is_bool_dtype(series):
+        return series.isna()
+
+    if is_numeric_dtype(series):
+        return ~series.isin([0, 1])
+
+    # Resolver primero con una búsqueda hash las variantes más comunes de los literales
+    invalid = ~series.isin(_BOOL_LITERAL_VARIANTS).to_numpy()
+    rest = series[invalid]
+    if rest.empty:
+        return pd.Series(invalid, index=series.index)
+
+    try:
+        lowered = rest.str.lower()
+    except AttributeError:
+        # Ningún valor restante es una cadena
+        lowered = pd.Series(np.nan, index=rest.index, dtype=object)
+
+    is_string = lowered.notna()
+    valid_string = is_string & lowered.isin(BOOL_LITERALS)
+
+    # Los valores que no son cadenas (bool, int, float) son válidos si equivalen a 0 o 1
+    numeric = pd.to_numeric(rest.where(~is_string), errors="coerce")
+    valid_number = ~is_string & numeric.isin([0, 1])
+
+    positions = np.flatnonzero(invalid)
+    invalid[positions[(valid_string | valid_number).to_numpy()]] = False
+    return pd.Series(invalid, index=series.index)
+
+
+def parse_dates(series: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """
+    Convierte una columna a fechas; los valores no convertibles quedan como NaT
+
+    Args:
+        series: Columna a convertir
+        date_format: Formato strftime explícito (p.ej. '%d/%m/%Y'). Con formato explícito
+            pandas usa el parser rápido y no necesita inferirlo a partir de los datos
+    """
+    if date_format:
+        return pd.to_datetime(series, errors="coerce", format=date_format)
+    return pd.to_datetime(series, errors="coerce")
@@ -1,9 +1,12 @@
 """YAML validation functionality for SAGE"""
 import yaml
-from typing import Dict, List, Any
-from sage.models import SageConfig, Catalog, Package, Field, ValidationRule, FileFormat, Severity
+from typing import Dict, List, Any, Optional
+from sage.models import (
+    SageConfig, Catalog, Package, Field, ValidationRule, FileFormat, Severity, ForeignKey, ValidationBudget
+)
 from sage.exceptions import YAMLValidationError
 from sage.file_processor import FileProcessor  # Importamos para usar las constantes
+from sage.rule_compiler import compile_rule
 
 class YAMLValidator:
     REQUIRED_ROOT_KEYS = {"sage_yaml", "catalogs", "packages"}
@@ -66,7 +69,24 @@ class YAMLValidator:
                 )
 
             header = file_format_data.get("header", False)
-            return FileFormat(type=file_type, delimiter=delimiter, header=header)
+
+            # Tamaño de bloque opcional para validar archivos grandes en modo streaming
+            chunksize = file_format_data.get("chunksize")
+            if chunksize is not None and (isinstance(chunksize, bool) or not isinstance(chunksize, int) or chunksize <= 0):
+                raise YAMLValidationError(
+                    f"¡Ojo! 👀 El valor de 'chunksize' en {context} debe ser un número entero positivo.\n"
+                    "Indica cuántas filas leer por bloque, por ejemplo: chunksize: 100000"
+                )
+
+            # Motor de lectura opcional: 'pyarrow' usa el lector columnar multihilo de Apache Arrow
+            engine = file_format_data.get("engine")
+            if engine is not None and engine not in ("pandas", "pyarrow"):
+                raise YAMLValidationError(
+                    f"¡Ojo! 👀 El valor de 'engine' en {context} no es válido: '{engine}'.\n"
+                    "Los motores disponibles son: pandas, pyarrow"
+                )
+
+            return FileFormat(type=file_type, delimiter=delimiter, header=header, chunksize=chunksize, engine=engine)
 
         # For Excel files in catalogs
         if file_type == "EXCEL":
@@ -135,6 +155,130 @@ class YAMLValidator:
                 "• catalogs: La lista de catálogos que incluye"
             )
 
+    def parse_unique_keys(self, catalog_name: str, keys_data: Any, fields: List[Field]) -> List[List[str]]:
+        """Parse composite unique keys (lists of field names) of a catalog"""
+        field_names = {field.name for field in fields}
+        if not isinstance(keys_data, list) or not all(isinstance(key, list) and key for key in keys_data):
+            raise YAMLValidationError(
+                f"¡Ojo! 👀 'unique_keys' en el catálogo '{catalog_name}' debe ser una lista de claves, "
+                "y cada clave una lista con uno o más nombres de campo.\n"
+                "Por ejemplo:\n"
+                "unique_keys:\n"
+                "  - [cliente_id, fecha]"
+            )
+
+        for key in keys_data:
+            unknown = [name for name in key if name not in field_names]
+            if unknown:
+                raise YAMLValidationError(
+                    f"¡Ojo! 👀 La clave única {key} del catálogo '{catalog_name}' usa campos que no existen: "
+                    f"{', '.join(map(str, unknown))}"
+                )
+        return [list(key) for key in keys_data]
+
+    def parse_validation_budget(self, catalog_name: str, budget_data: Any) -> Optional[ValidationBudget]:
+        """Parse the optional early-rejection budget of a catalog"""
+        if budget_data is None:
+            return None
+
+        example = (
+            "Por ejemplo:\n"
+            "validation_budget:\n"
+            "  sample_rows: 1000\n"
+            "  max_error_ratio: 0.5\n"
+            "  max_failing_checks: 5"
+        )
+        if not isinstance(budget_data, dict):
+            raise YAMLValidationError(
+                f"¡Ojo! 👀 'validation_budget' en el catálogo '{catalog_name}' debe ser un diccionario.\n{example}"
+            )
+
+        def is_number(value: Any) -> bool:
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+        sample_rows = budget_data.get("sample_rows", ValidationBudget.sample_rows)
+        max_error_ratio = budget_data.get("max_error_ratio")
+        max_failing_checks = budget_data.get("max_failing_checks")
+
+        problems = []
+        if not isinstance(sample_rows, int) or isinstance(sample_rows, bool) or sample_rows <= 0:
+            problems.append("'sample_rows' debe ser un número entero positivo")
+        if max_error_ratio is not None and (not is_number(max_error_ratio) or max_error_ratio < 0):
+            problems.append("'max_error_ratio' debe ser un número mayor o igual a 0")
+        if max_failing_checks is not None and (
+            not isinstance(max_failing_checks, int) or isinstance(max_failing_checks, bool) or max_failing_checks < 0
+        ):
+            problems.append("'max_failing_checks' debe ser un número entero mayor o igual a 0")
+        if max_error_ratio is None and max_failing_checks is None:
+            problems.append("indica al menos 'max_error_ratio' o 'max_failing_checks'")
+
+        if problems:
+            raise YAMLValidationError(
+                f"¡Ojo! 👀 El 'validation_budget' del catálogo '{catalog_name}' no es válido: "
+                f"{'; '.join(problems)}.\n{example}"
+            )
+
+        return ValidationBudget(
+            sample_rows=sample_rows,
+            max_error_ratio=max_error_ratio,
+            max_failing_checks=max_failing_checks
+        )
+
+    def parse_foreign_keys(self, package_name: str, package_data: Dict[str, Any],
+                           catalogs: Dict[str, Catalog]) -> List[ForeignKey]:
+        """Parse foreign key declarations between the catalogs of a package"""
+        example = (
+            "Por ejemplo:\n"
+            "foreign_keys:\n"
+            "  - name: venta_cliente\n"
+            "    catalog: ventas\n"
+            "    fields: [cliente_id]\n"
+            "    references:\n"
+            "      catalog: clientes\n"
+            "      fields: [id]"
+        )
+
+        def as_field_list(value: Any) -> List[str]:
+            fields = [value] if isinstance(value, str) else value
+            if not isinstance(fields, list) or not fields or not all(isinstance(f, str) for f in fields):
+                raise ValueError("'fields' debe ser un nombre de campo o una lista de nombres")
+            return fields
+
+        def check_fields(catalog_name: str, fields: List[str]) -> None:
+            if catalog_name not in package_data.get("catalogs", []) or catalog_name not in catalogs:
+                raise ValueError(f"el catálogo '{catalog_name}' no forma parte del paquete")
+            known = {field.name for field in catalogs[catalog_name].fields}
+            unknown = [name for name in fields if name not in known]
+            if unknown:
+                raise ValueError(f"el catálogo '{catalog_name}' no tiene los campos: {', '.join(unknown)}")
+
+        foreign_keys = []
+        for fk_data in package_data.get("foreign_keys", []) or []:
+            try:
+                references = fk_data["references"]
+                fields = as_field_list(fk_data["fields"])
+                ref_fields = as_field_list(references["fields"])
+                if len(fields) != len(ref_fields):
+                    raise ValueError("'fields' y 'references.fields' deben tener el mismo número de campos")
+                check_fields(fk_data["catalog"], fields)
+                check_fields(references["catalog"], ref_fields)
+
+                foreign_keys.append(ForeignKey(
+                    name=fk_data["name"],
+                    catalog=fk_data["catalog"],
+                    fields=fields,
+                    ref_catalog=references["catalog"],
+                    ref_fields=ref_fields,
+                    severity=Severity.from_string(fk_data.get("severity", "error")),
+                    description=fk_data.get("description", "")
+                ))
+            except (KeyError, TypeError, ValueError) as e:
+                detail = f"falta la clave {e}" if isinstance(e, KeyError) else str(e)
+                raise YAMLValidationError(
+                    f"¡Ojo! 👀 Hay una clave foránea no válida en el paquete '{package_name}': {detail}\n\n{example}"
+                )
+        return foreign_keys
+
     def parse_validation_rules(self, rules_data: List[Dict[str, Any]]) -> List[ValidationRule]:
         """Parse validation rules from YAML data"""
         rules = []
@@ -147,11 +291,18 @@ class YAMLValidator:
                 except ValueError as e:
                     raise ValueError(f"'{severity_str}' is not a valid Severity. Must be 'error', 'warning', or 'message' (case insensitive)")
                 
+                # Compilar la expresión al cargar el YAML para detectar errores antes de procesar datos
+                try:
+                    compiled = compile_rule(rule_data["rule"])
+                except ValueError as e:
+                    raise ValueError(f"la regla '{rule_data['name']}' no es válida: {str(e)}")
+
                 rule = ValidationRule(
                     name=rule_data["name"],
                     description=rule_data["description"],
                     rule=rule_data["rule"],
-                    severity=severity
+                    severity=severity,
+                    compiled=compiled
                 )
                 rules.append(rule)
             except (KeyError, ValueError) as e:
@@ -196,7 +347,8 @@ class YAMLValidator:
                     type=field_data["type"],
                     required=field_data.get("required", False),
                     unique=field_data.get("unique", False),
-                    validation_rules=validation_rules
+                    validation_rules=validation_rules,
+                    date_format=field_data.get("date_format")
                 ))
 
             file_format = self._create_file_format(catalog_data["file_format"], f"catalog {catalog_name}", yaml_content)
@@ -209,7 +361,9 @@ class YAMLValidator:
                 file_format=file_format,
                 fields=fields,
                 row_validation=self.parse_validation_rules(catalog_data.get("row_validation", [])),
-                catalog_validation=self.parse_validation_rules(catalog_data.get("catalog_validation", []))
+                catalog_validation=self.parse_validation_rules(catalog_data.get("catalog_validation", [])),
+                unique_keys=self.parse_unique_keys(catalog_name, catalog_data.get("unique_keys", []), fields),
+                validation_budget=self.parse_validation_budget(catalog_name, catalog_data.get("validation_budget"))
             )
 
         # Parse packages
@@ -223,7 +377,8 @@ class YAMLValidator:
                 description=package_data["description"],
                 file_format=file_format,
                 catalogs=package_data["catalogs"],
-                package_validation=self.parse_validation_rules(package_data.get("package_validation", []))
+                package_validation=self.parse_validation_rules(package_data.get("package_validation", [])),
+                foreign_keys=self.parse_foreign_keys(package_name, package_data, catalogs)
             )
 
         # Create and return SageConfig
@@ -0,0 +1,46 @@
+"""Lectura de archivos contenidos en un ZIP sin extraerlos a disco"""
+import io
+import zipfile
+from contextlib import contextmanager
+
+
+class ZipMember(str):
+    """
+    Archivo dentro de un paquete ZIP, leído directamente desde el ZIP
+
+    Se comporta como el nombre del miembro dentro del ZIP (para obtener la extensión
+    y en los mensajes) y guarda la ruta del ZIP, de modo que puede abrirse desde
+    cualquier proceso.
+    """
+
+    def __new__(cls, name: str, zip_path: str, file_size: int = 0, compress_size: int = 0):
+        member = super().__new__(cls, name)
+        member.zip_path = zip_path
+        member.file_size = file_size          # Tamaño descomprimido declarado en el ZIP
+        member.compress_size = compress_size  # Tamaño comprimido dentro del ZIP
+        return member
+
+    def __getnewargs__(self):
+        return str(self), self.zip_path, self.file_size, self.compress_size
+
+    @classmethod
+    def from_info(cls, zip_path: str, info: zipfile.ZipInfo) -> "ZipMember":
+        """Crea el miembro a partir de la entrada del índice del ZIP"""
+        return cls(info.filename, zip_path, info.file_size, info.compress_size)
+
+    @property
+    def compression_ratio(self) -> float:
+        """Relación entre el tamaño descomprimido y el comprimido"""
+        return self.file_size / max(self.compress_size, 1)
+
+    @contextmanager
+    def open(self):
+        """Abre el miembro como flujo binario de solo lectura"""
+        with zipfile.ZipFile(self.zip_path) as zip_ref:
+            with zip_ref.open(str(self)) as member_file:
+                yield member_file
+
+    def read_buffer(self) -> io.BytesIO:
+        """Lee el miembro completo en memoria (para lectores que necesitan acceso aleatorio)"""
+        with self.open() as member_file:
+            return io.BytesIO(member_file.read())
@@ -16,7 +16,9 @@ import imaplib
 import email
 import smtplib
 import tempfile
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
@@ -36,6 +38,10 @@ from sage.file_processor import FileProcessor
 from sage.logger import SageLogger 
 from sage.utils import create_execution_directory
 from sage.exceptions import SAGEError
+from sage import db_pool
+from .job_queue import JobQueue, LeaseLost
+from .imap_watcher import MailboxWatcher
+from .imap_fetch import fetch_overview, download_part
 
 # Para compatibilidad con las ediciones anteriores del código
 # (algunos lugares usan SAGEError y otros SageError)
@@ -64,10 +70,10 @@ class DatabaseManager:
     
     def connect(self):
         """Establece conexión con la base de datos"""
-        # Cerrar la conexión previa si existe
+        # Descartar la conexión previa si existe (se cierra en lugar de devolverla al pool)
         if self.connection:
             try:
-                self.connection.close()
+                db_pool.release(self.connection, discard=True)
                 self.logger.info("Conexión previa cerrada")
             except Exception as e:
                 self.logger.error(f"Error al cerrar conexión previa: {str(e)}")
@@ -79,7 +85,8 @@ class DatabaseManager:
                 self.logger.error("Variable de entorno DATABASE_URL no encontrada")
                 return False
             
-            self.connection = psycopg2.connect(db_url)
+            # Conexión del pool compartido del proceso (logger, notificaciones, plantillas, ...)
+            self.connection = db_pool.acquire(db_url)
             self.connection.autocommit = False  # Aseguramos que no esté en modo autocommit
             self.logger.info("Conexión a base de datos establecida")
             return True
@@ -193,6 +200,41 @@ class DatabaseManager:
         
         return authorized_emails
     
+    def get_email_configuration(self, config_id):
+        """
+        Obtiene una configuración de email por su ID (sin filtrar por estado)
+        
+        Args:
+            config_id (int): ID de email_configuraciones
+            
+        Returns:
+            dict: Configuración de email o None si no existe
+        """
+        query = """
+        SELECT ec.id, ec.servidor_entrada, ec.puerto_entrada, ec.usuario, 
+               ec.password, ec.usar_ssl_entrada, c.id as casilla_id, 
+               c.yaml_contenido, c.nombre, ec.servidor_salida, ec.puerto_salida,
+               ec.usar_tls_salida
+        FROM email_configuraciones ec
+        JOIN casillas c ON ec.casilla_id = c.id
+        WHERE ec.id = %s
+        """
+        
+        result = self.execute_query(query, (config_id,))
+        return result[0] if result else None
+    
+    def get_sftp_configuration(self, casilla_id, emisor_id):
+        """
+        Obtiene la configuración SFTP de un emisor en una casilla
+        
+        Returns:
+            dict: Configuración SFTP (ver get_sftp_configurations) o None si no existe
+        """
+        for config in self.get_sftp_configurations():
+            if config.get('casilla_id') == casilla_id and config.get('emisor_id') == emisor_id:
+                return config
+        return None
+    
     def get_sftp_configurations(self):
         """
         Obtiene las configuraciones SFTP desde la tabla emisores_por_casilla.
@@ -277,7 +319,8 @@ class DatabaseManager:
     def close(self):
         """Cierra la conexión a la base de datos"""
         if self.connection:
-            self.connection.close()
+            db_pool.release(self.connection)
+            self.connection = None
             self.logger.info("Conexión a base de datos cerrada")
 
 class EmailProcessor:
@@ -285,15 +328,18 @@ class EmailProcessor:
     Procesa correos electrónicos entrantes y envía respuestas
     """
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, job_queue=None):
         """
         Inicializa el procesador de emails
         
         Args:
             db_manager (DatabaseManager): Gestor de base de datos
+            job_queue (JobQueue, optional): Cola de validaciones; si se indica, los
+                adjuntos se encolan en lugar de validarse con la sesión IMAP abierta
         """
         self.logger = logging.getLogger("SAGE_Daemon2.EmailProcessor")
         self.db_manager = db_manager
+        self.job_queue = job_queue
         self.casilla_id = None  # Se establecerá cuando se procese una casilla
     
     def get_reply_address(self, email_message):
@@ -358,44 +404,42 @@ class EmailProcessor:
         
         return False
     
-    def save_attachment(self, part):
+    def download_attachments(self, mail, email_id, attachment_parts, target_dir=None):
         """
-        Guarda un adjunto en un archivo temporal
+        Descarga a disco las partes adjuntas de un mensaje
         
         Args:
-            part (email.message.Message): Parte del mensaje con el adjunto
+            mail (imaplib.IMAP4): Conexión IMAP
+            email_id (str): UID del mensaje
+            attachment_parts (list): Adjuntos obtenidos de BODYSTRUCTURE (ver fetch_overview)
+            target_dir (str, optional): Directorio donde guardarlos (por defecto el temporal del sistema)
             
         Returns:
-            tuple: (ruta del archivo, nombre del archivo) o (None, None)
+            list: [{'name': nombre del archivo, 'path': ruta local}] de los adjuntos descargados
         """
-        if part.get_content_disposition() is None:
-            return None, None
-            
-        filename = part.get_filename()
-        if not filename:
-            return None, None
-            
-        try:
-            # Crear archivo temporal para el adjunto
-            fd, path = tempfile.mkstemp(suffix=f'_{filename}')
-            os.close(fd)
-            
-            with open(path, 'wb') as f:
-                f.write(part.get_payload(decode=True))
-                
-            self.logger.info(f"Adjunto guardado: {filename} en {path}")
-            return path, filename
-        except Exception as e:
-            self.logger.error(f"Error al guardar adjunto {filename}: {str(e)}")
-            return None, None
+        attachments = []
+        for part in attachment_parts:
+            filename = part['filename']
+            try:
+                fd, path = tempfile.mkstemp(suffix=f'_{os.path.basename(filename)}', dir=target_dir)
+                os.close(fd)
+                size = download_part(mail, email_id, part, path)
+                self.logger.info(f"Adjunto guardado: {filename} en {path} ({size} bytes descargados)")
+                attachments.append({'name': filename, 'path': path})
+            except Exception as e:
+                self.logger.error(f"Error al guardar adjunto {filename}: {str(e)}")
+        return attachments
     
-    def process_email(self, email_config, authorized_senders):
+    def process_email(self, email_config, authorized_senders, mail=None):
         """
         Procesa los correos electrónicos de una configuración
         
         Args:
             email_config (dict): Configuración de correo
             authorized_senders (list): Lista de remitentes autorizados
+            mail (imaplib.IMAP4, optional): Conexión ya autenticada con INBOX seleccionado
+                (ver MailboxWatcher); no se cierra al terminar y los errores de
+                conexión se propagan para que quien la mantiene pueda reconectar
             
         Returns:
             int: Número de correos procesados
@@ -418,35 +462,36 @@ class EmailProcessor:
         # Establecer el casilla_id para esta operación
         self.casilla_id = casilla_id
         
+        own_connection = mail is None
         try:
             # Conexión IMAP
-            if usar_ssl:
-                mail = imaplib.IMAP4_SSL(servidor, puerto)
-            else:
-                mail = imaplib.IMAP4(servidor, puerto)
-                
-            mail.login(usuario, password)
-            mail.select('INBOX')
+            if own_connection:
+                if usar_ssl:
+                    mail = imaplib.IMAP4_SSL(servidor, puerto)
+                else:
+                    mail = imaplib.IMAP4(servidor, puerto)
+                    
+                mail.login(usuario, password)
+                mail.select('INBOX')
             
-            # Buscar mensajes no leídos
-            _, data = mail.search(None, 'UNSEEN')
+            # Buscar mensajes no leídos (por UID, estable aunque se borren mensajes)
+            _, data = mail.uid('SEARCH', None, 'UNSEEN')
             email_ids = data[0].split()
             
             if not email_ids:
                 self.logger.info(f"No hay mensajes sin leer para {usuario}")
-                mail.logout()
+                if own_connection:
+                    mail.logout()
                 return 0
                 
             self.logger.info(f"Se encontraron {len(email_ids)} mensajes sin leer para {usuario}")
             
             processed_count = 0
-            for email_id in email_ids:
+            # Encabezados y estructura de todos los mensajes en una consulta; los cuerpos no se descargan
+            for email_id, headers, attachment_parts in fetch_overview(mail, email_ids):
                 try:
-                    _, msg_data = mail.fetch(email_id, '(RFC822)')
-                    raw_email = msg_data[0][1]
-                    
-                    # Parsear mensaje
-                    email_message = email.message_from_bytes(raw_email)
+                    # Parsear encabezados (las respuestas solo usan From, Subject, Message-ID, ...)
+                    email_message = email.message_from_bytes(headers)
                     
                     # Obtener dirección del remitente
                     from_header = email_message.get('From', '')
@@ -466,40 +511,44 @@ class EmailProcessor:
                     # Verificar si el remitente está autorizado
                     is_authorized = self.is_sender_authorized(sender_email, authorized_senders)
                     
-                    if is_authorized:
+                    if is_authorized and self.job_queue is not None:
+                        self.logger.info(f"Remitente autorizado: {sender_email} - Encolando mensaje")
+                        file_dir = self.job_queue.new_file_dir()
+                        attachments = self.download_attachments(mail, email_id, attachment_parts, file_dir)
+                        if attachments:
+                            self.enqueue_message(email_message, email_config, sender_email, reply_to_address,
+                                                 attachments, file_dir)
+                        else:
+                            shutil.rmtree(file_dir, ignore_errors=True)
+                            # No hay adjuntos, enviar respuesta indicando que se necesita un archivo
+                            self.logger.info(f"No se encontraron adjuntos, enviando solicitud a {reply_to_address}")
+                            self.send_attachment_request(
+                                email_message,
+                                reply_to_address,
+                                email_config
+                            )
+                    elif is_authorized:
                         self.logger.info(f"Remitente autorizado: {sender_email} - Procesando mensaje")
                         
-                        # Buscar adjuntos en el mensaje
-                        has_attachments = False
+                        # Descargar solo las partes adjuntas
                         attachments_info = []
+                        for attachment in self.download_attachments(mail, email_id, attachment_parts):
+                            # Procesar el adjunto con el yaml_contenido de la casilla
+                            self.logger.info(f"Procesando adjunto: {attachment['name']}")
+                            processing_result = self.process_attachment(
+                                attachment['path'], 
+                                attachment['name'], 
+                                email_config.get('yaml_contenido', ''),
+                                sender_email  # Pasamos el email del remitente
+                            )
+                            
+                            attachments_info.append({
+                                'name': attachment['name'],
+                                'path': attachment['path'],
+                                'result': processing_result
+                            })
                         
-                        for part in email_message.walk():
-                            if part.get_content_maintype() == 'multipart':
-                                continue
-                                
-                            if part.get_content_disposition() is not None and 'attachment' in part.get_content_disposition():
-                                # Guardar el adjunto en un archivo temporal
-                                attachment_path, attachment_name = self.save_attachment(part)
-                                
-                                if attachment_path and attachment_name:
-                                    has_attachments = True
-                                    
-                                    # Procesar el adjunto con el yaml_contenido de la casilla
-                                    self.logger.info(f"Procesando adjunto: {attachment_name}")
-                                    processing_result = self.process_attachment(
-                                        attachment_path, 
-                                        attachment_name, 
-                                        email_config.get('yaml_contenido', ''),
-                                        sender_email  # Pasamos el email del remitente
-                                    )
-                                    
-                                    attachments_info.append({
-                                        'name': attachment_name,
-                                        'path': attachment_path,
-                                        'result': processing_result
-                                    })
-                        
-                        if has_attachments:
+                        if attachments_info:
                             # Enviar resultado del procesamiento al remitente
                             self.logger.info(f"Enviando resultado del procesamiento a {reply_to_address}")
                             self.send_processing_results(
@@ -530,15 +579,99 @@ class EmailProcessor:
                 except Exception as e:
                     self.logger.error(f"Error al procesar email {email_id}: {str(e)}")
                     self.logger.error(traceback.format_exc())
+                finally:
+                    # BODY.PEEK no marca el mensaje como leído: marcarlo una vez atendido
+                    try:
+                        mail.uid('STORE', email_id, '+FLAGS', '(\\Seen)')
+                    except Exception as e:
+                        self.logger.error(f"No se pudo marcar como leído el email {email_id}: {str(e)}")
             
-            mail.logout()
+            if own_connection:
+                mail.logout()
             return processed_count
             
         except Exception as e:
+            if not own_connection:
+                raise
             self.logger.error(f"Error en conexión IMAP: {str(e)}")
             self.logger.error(traceback.format_exc())
             return 0
     
+    def enqueue_message(self, email_message, email_config, sender_email, reply_address, attachments, file_dir):
+        """
+        Encola la validación de los adjuntos ya descargados de un mensaje
+        
+        La respuesta con los resultados la envía el worker que procesa el trabajo
+        (ver process_job), así la sesión IMAP no espera a la validación.
+        
+        Args:
+            attachments (list): Adjuntos descargados en file_dir (ver download_attachments)
+            file_dir (str): Directorio del trabajo creado con JobQueue.new_file_dir
+        """
+        message_id = email_message.get('Message-ID')
+        job_id = self.job_queue.enqueue(
+            'email',
+            email_config.get('casilla_id'),
+            {
+                'email_config_id': email_config.get('id'),
+                'sender_email': sender_email,
+                'reply_address': reply_address,
+                'message_id': message_id,
+                'subject': email_message.get('Subject'),
+                'file_dir': file_dir,
+                'attachments': attachments
+            },
+            dedupe_key=f"email:{email_config.get('casilla_id')}:{message_id}" if message_id else None
+        )
+        if job_id is None:
+            # El mensaje ya estaba encolado (p.ej. se volvió a marcar como no leído)
+            shutil.rmtree(file_dir, ignore_errors=True)
+    
+    def process_job(self, job, job_queue):
+        """
+        Valida los adjuntos de un trabajo de email y envía los resultados
+        
+        Si un intento anterior ya validó los adjuntos pero no pudo responder, se
+        reutiliza el resultado guardado y solo se reintenta el envío.
+        
+        Args:
+            job (Job): Trabajo tomado de la cola
+            job_queue (JobQueue): Cola donde guardar el resultado
+        """
+        payload = job.payload
+        email_config = self.db_manager.get_email_configuration(payload['email_config_id'])
+        if not email_config:
+            raise SAGEError(f"No existe la configuración de email {payload['email_config_id']}")
+        self.casilla_id = email_config.get('casilla_id')
+        
+        if job.result is None:
+            attachments_info = []
+            for attachment in payload['attachments']:
+                self.logger.info(f"Procesando adjunto: {attachment['name']}")
+                attachments_info.append({
+                    'name': attachment['name'],
+                    'path': attachment['path'],
+                    'result': self.process_attachment(
+                        attachment['path'],
+                        attachment['name'],
+                        email_config.get('yaml_contenido', ''),
+                        payload['sender_email']
+                    )
+                })
+            job_queue.save_result(job, attachments_info)
+        
+        # Solo se usan los encabezados del mensaje original para responder en el mismo hilo
+        original_email = email.message.Message()
+        if payload.get('message_id'):
+            original_email['Message-ID'] = payload['message_id']
+        if payload.get('subject'):
+            original_email['Subject'] = payload['subject']
+        
+        job_queue.check_lease(job)
+        self.logger.info(f"Enviando resultado del procesamiento a {payload['reply_address']}")
+        if not self.send_processing_results(original_email, payload['reply_address'], email_config, job.result):
+            raise SAGEError(f"No se pudo enviar el resultado a {payload['reply_address']}")
+    
     def get_emisor_id_by_email(self, email_address):
         """
         Obtiene el ID de un emisor a partir de su dirección de correo electrónico
@@ -1949,15 +2082,18 @@ class SFTPProcessor:
     Procesa archivos recibidos por SFTP
     """
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, job_queue=None):
         """
         Inicializa el procesador SFTP
         
         Args:
             db_manager (DatabaseManager): Gestor de base de datos
+            job_queue (JobQueue, optional): Cola de validaciones; si se indica, los
+                archivos se encolan en lugar de validarse con la sesión SFTP abierta
         """
         self.logger = logging.getLogger("SAGE_Daemon2.SFTPProcessor")
         self.db_manager = db_manager
+        self.job_queue = job_queue
         self.casilla_id = None
         
     def process_sftp(self, sftp_config):
@@ -2014,22 +2150,7 @@ class SFTPProcessor:
                 self.logger.info(f"Servidor identificado como entorno de pruebas: {servidor}")
                 self.logger.info(f"Usando timeout reducido de {connection_timeout} segundos")
             
-            # Conectar al servidor SFTP con timeout para evitar bloqueos
-            transport = paramiko.Transport((servidor, int(puerto)))
-            transport.banner_timeout = connection_timeout
-            transport.handshake_timeout = connection_timeout
-            
-            if key_path and os.path.exists(key_path):
-                # Autenticación con clave privada
-                key = paramiko.RSAKey.from_private_key_file(key_path)
-                transport.connect(username=usuario, pkey=key)
-                self.logger.info(f"Conexión SFTP establecida con clave privada para {usuario}@{servidor}")
-            else:
-                # Autenticación con contraseña
-                transport.connect(username=usuario, password=password)
-                self.logger.info(f"Conexión SFTP establecida con contraseña para {usuario}@{servidor}")
-                
-            sftp = paramiko.SFTPClient.from_transport(transport)
+            transport, sftp = self._connect(config, connection_timeout)
             
             # Verificar existencia del directorio data
             try:
@@ -2173,6 +2294,13 @@ class SFTPProcessor:
                         sftp.get(remote_path, local_path)
                         self.logger.info(f"Archivo {filename} descargado a {local_path}")
                     
+                    # Con cola de validaciones: encolar y mover el original sin esperar a la validación
+                    if self.job_queue is not None:
+                        self._enqueue_file(sftp, sftp_config, local_path, filename, remote_path, processed_dir)
+                        shutil.rmtree(temp_dir, ignore_errors=True)
+                        processed_count += 1
+                        continue
+                    
                     # Procesar el archivo
                     yaml_contenido = sftp_config.get('yaml_contenido', '')
                     processing_result = self.process_file(
@@ -2195,36 +2323,10 @@ class SFTPProcessor:
                         sftp.put(local_path, remote_processed_path)
                         
                         # También copiar los archivos de resultado generados por main.py
-                        if 'execution_dir' in processing_result and os.path.exists(processing_result['execution_dir']):
-                            execution_dir = processing_result['execution_dir']
-                            result_files = [
-                                "email_report.html", 
-                                "report.html", 
-                                "report.json", 
-                                "output.log", 
-                                "results.txt"
-                            ]
-                            
-                            # Copiar todos los archivos del directorio de ejecución al directorio procesado
-                            try:
-                                # Obtener la lista completa de archivos en el directorio de ejecución
-                                all_result_files = os.listdir(execution_dir)
-                                
-                                # Copiar todos los archivos de resultados directamente al directorio procesado
-                                for result_file in all_result_files:
-                                    local_result_path = os.path.join(execution_dir, result_file)
-                                    if os.path.isfile(local_result_path):  # Solo copiar archivos, no directorios
-                                        # Agregar timestamp al nombre del archivo para evitar sobreescrituras
-                                        filename_with_timestamp = f"{processed_timestamp}_{result_file}"
-                                        remote_result_path = os.path.join(processed_dir, filename_with_timestamp)
-                                        sftp.put(local_result_path, remote_result_path)
-                                        self.logger.info(f"Archivo de resultados {result_file} copiado a {remote_result_path}")
-                                
-                                self.logger.info(f"Todos los archivos de resultados copiados a {results_dir}")
-                            except Exception as e:
-                                self.logger.error(f"Error copiando archivos de resultados: {str(e)}")
-                        else:
-                            self.logger.warning(f"No se encontró directorio de ejecución para copiar archivos de resultados")
+                        try:
+                            self._upload_results(sftp, processing_result, processed_dir, processed_timestamp)
+                        except Exception as e:
+                            self.logger.error(f"Error copiando archivos de resultados: {str(e)}")
                         
                         # Eliminar el archivo original
                         sftp.remove(remote_path)
@@ -2252,6 +2354,137 @@ class SFTPProcessor:
             self.logger.error(traceback.format_exc())
             return 0
     
+    def _connect(self, config, connection_timeout=30):
+        """
+        Abre una sesión SFTP
+        
+        Args:
+            config (dict): Sección 'configuracion' de la configuración SFTP
+            connection_timeout (int): Timeout de banner y handshake en segundos
+            
+        Returns:
+            tuple: (transport, cliente SFTP)
+        """
+        servidor = config.get('servidor', '')
+        usuario = config.get('usuario', '')
+        key_path = config.get('key_path')
+        
+        # Conectar al servidor SFTP con timeout para evitar bloqueos
+        transport = paramiko.Transport((servidor, int(config.get('puerto', 22))))
+        transport.banner_timeout = connection_timeout
+        transport.handshake_timeout = connection_timeout
+        
+        if key_path and os.path.exists(key_path):
+            # Autenticación con clave privada
+            key = paramiko.RSAKey.from_private_key_file(key_path)
+            transport.connect(username=usuario, pkey=key)
+            self.logger.info(f"Conexión SFTP establecida con clave privada para {usuario}@{servidor}")
+        else:
+            # Autenticación con contraseña
+            transport.connect(username=usuario, password=config.get('password', ''))
+            self.logger.info(f"Conexión SFTP establecida con contraseña para {usuario}@{servidor}")
+            
+        return transport, paramiko.SFTPClient.from_transport(transport)
+    
+    def _upload_results(self, sftp, processing_result, processed_dir, processed_timestamp):
+        """Copia al directorio procesado los archivos del directorio de ejecución"""
+        execution_dir = processing_result.get('execution_dir')
+        if not execution_dir or not os.path.exists(execution_dir):
+            self.logger.warning(f"No se encontró directorio de ejecución para copiar archivos de resultados")
+            return
+        
+        # Copiar todos los archivos de resultados directamente al directorio procesado
+        for result_file in os.listdir(execution_dir):
+            local_result_path = os.path.join(execution_dir, result_file)
+            if os.path.isfile(local_result_path):  # Solo copiar archivos, no directorios
+                # Agregar timestamp al nombre del archivo para evitar sobreescrituras
+                filename_with_timestamp = f"{processed_timestamp}_{result_file}"
+                remote_result_path = os.path.join(processed_dir, filename_with_timestamp)
+                sftp.put(local_result_path, remote_result_path)
+                self.logger.info(f"Archivo de resultados {result_file} copiado a {remote_result_path}")
+        
+        self.logger.info(f"Todos los archivos de resultados copiados a {processed_dir}")
+    
+    def _enqueue_file(self, sftp, sftp_config, local_path, filename, remote_path, processed_dir):
+        """
+        Encola la validación de un archivo descargado y lo mueve a procesado en el servidor
+        
+        El trabajo se encola antes de mover el original: si el daemon se detiene entre
+        ambos pasos el archivo se vuelve a descargar en el siguiente ciclo y la clave
+        de deduplicación evita encolarlo dos veces.
+        """
+        try:
+            remote_stat = sftp.stat(remote_path)
+            dedupe_key = (f"sftp:{sftp_config.get('casilla_id')}:{sftp_config.get('emisor_id')}:"
+                          f"{remote_path}:{remote_stat.st_size}:{remote_stat.st_mtime}")
+        except Exception:
+            dedupe_key = None
+        
+        file_dir = self.job_queue.new_file_dir()
+        queued_path = os.path.join(file_dir, filename)
+        shutil.move(local_path, queued_path)
+        processed_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        
+        job_id = self.job_queue.enqueue(
+            'sftp',
+            sftp_config.get('casilla_id'),
+            {
+                'emisor_id': sftp_config.get('emisor_id'),
+                'file_name': filename,
+                'path': queued_path,
+                'file_dir': file_dir,
+                'processed_dir': processed_dir,
+                'processed_timestamp': processed_timestamp
+            },
+            dedupe_key=dedupe_key
+        )
+        
+        # Algunos servidores SFTP no soportan rename entre directorios diferentes
+        remote_processed_path = os.path.join(processed_dir, f"{processed_timestamp}_{filename}")
+        try:
+            sftp.put(queued_path, remote_processed_path)
+            sftp.remove(remote_path)
+            self.logger.info(f"Archivo {filename} movido a {remote_processed_path}")
+        except Exception as e:
+            self.logger.error(f"Error moviendo archivo {filename}: {str(e)}")
+        
+        if job_id is None:
+            shutil.rmtree(file_dir, ignore_errors=True)
+    
+    def process_job(self, job, job_queue):
+        """
+        Valida el archivo de un trabajo SFTP y sube los resultados al directorio procesado
+        
+        Si un intento anterior ya validó el archivo pero no pudo subir los resultados,
+        se reutiliza el resultado guardado y solo se reintenta la subida.
+        
+        Args:
+            job (Job): Trabajo tomado de la cola
+            job_queue (JobQueue): Cola donde guardar el resultado
+        """
+        payload = job.payload
+        sftp_config = self.db_manager.get_sftp_configuration(job.casilla_id, payload['emisor_id'])
+        if not sftp_config:
+            raise SAGEError(f"No existe la configuración SFTP de la casilla {job.casilla_id} "
+                            f"para el emisor {payload['emisor_id']}")
+        self.casilla_id = job.casilla_id
+        
+        if job.result is None:
+            job_queue.save_result(job, self.process_file(
+                payload['path'],
+                payload['file_name'],
+                sftp_config.get('yaml_contenido', ''),
+                payload['emisor_id']
+            ))
+        
+        job_queue.check_lease(job)
+        transport, sftp = self._connect(sftp_config.get('configuracion', {}))
+        try:
+            self._upload_results(sftp, job.result, payload['processed_dir'], payload['processed_timestamp'])
+        finally:
+            sftp.close()
+            transport.close()
+    
     def _process_local_files(self, data_dir, processed_dir, sftp_config, emisor_id):
         """
         Método obsoleto - no se debe usar en producción.
@@ -2562,18 +2795,245 @@ class SageDaemon2:
     Daemon principal que gestiona el monitoreo de emails y SFTP
     """
     
-    def __init__(self):
-        """Inicializa el daemon"""
+    # Casillas que se revisan en paralelo; se puede ajustar con SAGE_DAEMON_WORKERS
+    DEFAULT_WORKERS = 4
+    # Hilos que validan los trabajos encolados; se puede ajustar con SAGE_VALIDATION_WORKERS
+    DEFAULT_VALIDATION_WORKERS = 2
+    
+    def __init__(self, max_workers=None, validation_workers=None):
+        """
+        Inicializa el daemon
+        
+        Args:
+            max_workers (int, optional): Número de casillas que se revisan a la vez
+            validation_workers (int, optional): Número de validaciones simultáneas
+        """
         self.logger = logging.getLogger("SAGE_Daemon2.Main")
         self.db_manager = DatabaseManager()
-        self.email_processor = EmailProcessor(self.db_manager)
-        self.sftp_processor = SFTPProcessor(self.db_manager)
+        self.max_workers = max(1, int(max_workers or os.environ.get('SAGE_DAEMON_WORKERS', self.DEFAULT_WORKERS)))
+        self.validation_workers = max(1, int(
+            validation_workers or os.environ.get('SAGE_VALIDATION_WORKERS', self.DEFAULT_VALIDATION_WORKERS)
+        ))
+        self.job_queue = JobQueue()
+        self._stop_event = threading.Event()
+        
+        # Modo por eventos: conexiones IMAP permanentes con IDLE (SAGE_IMAP_IDLE=0 vuelve a consultar por ciclo)
+        self.use_idle = os.environ.get('SAGE_IMAP_IDLE', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        self.watchers = {}  # {id de email_configuraciones: MailboxWatcher}
         
         # Inicializar gestor de notificaciones
         from .notificaciones import NotificacionesManager
         self.notificaciones_manager = NotificacionesManager(self.db_manager)
         self.running = False
     
+    # Campos de la configuración de email que obligan a reabrir la conexión IMAP
+    IMAP_CONNECTION_FIELDS = ('servidor_entrada', 'puerto_entrada', 'usuario', 'password', 'usar_ssl_entrada')
+    
+    def _process_mailbox(self, mail, email_config):
+        """Procesa los correos no leídos de un buzón con la conexión de su watcher"""
+        db_manager = DatabaseManager()
+        try:
+            authorized_senders = db_manager.get_authorized_senders(email_config.get('casilla_id'))
+            return EmailProcessor(db_manager, self.job_queue).process_email(email_config, authorized_senders, mail=mail)
+        finally:
+            db_manager.close()
+    
+    def _sync_watchers(self, email_configs):
+        """Arranca, actualiza o detiene los watchers IMAP según las configuraciones activas"""
+        active = {}
+        for config in email_configs or []:
+            config_id = config.get('id')
+            watcher = self.watchers.get(config_id)
+            if watcher is not None and watcher.is_alive():
+                old = watcher.email_config
+                if all(old.get(field) == config.get(field) for field in self.IMAP_CONNECTION_FIELDS):
+                    # Sin cambios de conexión: solo actualizar YAML, nombre, SMTP, ...
+                    watcher.email_config = config
+                    active[config_id] = watcher
+                    continue
+                self.logger.info(f"Configuración IMAP modificada para casilla {config.get('casilla_id')}; se reconecta")
+                watcher.stop()
+            watcher = MailboxWatcher(config, self._process_mailbox)
+            watcher.start()
+            active[config_id] = watcher
+        
+        for config_id, watcher in self.watchers.items():
+            if active.get(config_id) is not watcher:
+                watcher.stop()
+        self.watchers = active
+    
+    def _stop_watchers(self):
+        for watcher in self.watchers.values():
+            watcher.stop()
+        for watcher in self.watchers.values():
+            watcher.join(timeout=5)
+        self.watchers = {}
+    
+    def _collect_casilla_tasks(self, watch_email=False):
+        """
+        Agrupa por casilla las configuraciones de email y SFTP activas
+        
+        Args:
+            watch_email (bool): Monitorear los buzones con watchers IMAP en lugar de
+                incluirlos en las tareas del ciclo
+        
+        Returns:
+            dict: {casilla_id: [('email', config), ('sftp', config), ...]}
+        """
+        tasks = {}
+        
+        # Obtener configuraciones de email
+        email_configs = self.db_manager.get_email_configurations()
+        
+        if not email_configs:
+            self.logger.warning("No se encontraron configuraciones de email activas")
+        else:
+            self.logger.info(f"Se encontraron {len(email_configs)} configuraciones de email")
+            if not watch_email:
+                for config in email_configs:
+                    tasks.setdefault(config.get('casilla_id'), []).append(('email', config))
+        
+        if watch_email and email_configs is not None:
+            # None indica un error de consulta: se mantienen los watchers actuales
+            self._sync_watchers(email_configs)
+        
+        # Obtener configuraciones SFTP
+        sftp_configs = self.db_manager.get_sftp_configurations()
+        
+        if not sftp_configs:
+            self.logger.warning("No se encontraron configuraciones SFTP activas")
+        else:
+            self.logger.info(f"Se encontraron {len(sftp_configs)} configuraciones SFTP")
+            for config in sftp_configs:
+                tasks.setdefault(config.get('casilla_id'), []).append(('sftp', config))
+        
+        return tasks
+    
+    def _poll_casilla(self, casilla_id, tasks):
+        """
+        Revisa el correo y los SFTP de una casilla
+        
+        Se ejecuta en un hilo de trabajo con su propia conexión a la base de datos y
+        sus propios procesadores, de modo que un fallo o una casilla lenta no afecta
+        a las demás.
+        
+        Args:
+            casilla_id (int): ID de la casilla
+            tasks (list): Pares (tipo, configuración) de la casilla
+        """
+        db_manager = DatabaseManager()
+        try:
+            for kind, config in tasks:
+                try:
+                    if kind == 'email':
+                        # Obtener remitentes autorizados y procesar correos
+                        authorized_senders = db_manager.get_authorized_senders(casilla_id)
+                        EmailProcessor(db_manager, self.job_queue).process_email(config, authorized_senders)
+                    else:
+                        casilla_nombre = config.get('casilla_nombre', 'Sin nombre')
+                        self.logger.info(f"Procesando SFTP para casilla {casilla_id} - {casilla_nombre}")
+                        SFTPProcessor(db_manager, self.job_queue).process_sftp(config)
+                except Exception as e:
+                    self.logger.error(f"Error al procesar {kind} de la casilla {casilla_id}: {str(e)}")
+                    self.logger.error(traceback.format_exc())
+        finally:
+            db_manager.close()
+    
+    def _run_job(self, job, worker):
+        """Procesa un trabajo de la cola; si falla se reintenta según la política de la cola"""
+        self.logger.info(f"{worker} procesando trabajo {job.id} ({job.kind}, casilla {job.casilla_id}, "
+                         f"intento {job.attempts})")
+        db_manager = DatabaseManager()
+        try:
+            with self.job_queue.keep_alive(job, worker):
+                if job.kind == 'email':
+                    EmailProcessor(db_manager).process_job(job, self.job_queue)
+                else:
+                    SFTPProcessor(db_manager).process_job(job, self.job_queue)
+            self.job_queue.complete(job)
+        except LeaseLost as e:
+            # Otro worker tiene el trabajo: no se registra el fallo ni se tocan sus archivos
+            self.logger.warning(str(e))
+        except Exception as e:
+            self.logger.error(traceback.format_exc())
+            self.job_queue.fail(job, e)
+        finally:
+            db_manager.close()
+    
+    def _validation_worker(self, worker, drain=False):
+        """
+        Consume trabajos de la cola hasta que se detiene el daemon
+        
+        Args:
+            worker (str): Nombre del worker (se registra en el arriendo)
+            drain (bool): Terminar en cuanto no haya trabajos disponibles
+        """
+        while not self._stop_event.is_set():
+            try:
+                job = self.job_queue.claim(worker)
+            except Exception as e:
+                self.logger.error(f"Error al leer la cola de validaciones: {str(e)}")
+                job = None
+            
+            if job is None:
+                if drain:
+                    return
+                self._stop_event.wait(5)
+                continue
+            self._run_job(job, worker)
+    
+    def _start_validation_workers(self, drain=False):
+        prefix = f"validacion-{os.getpid()}"
+        threads = [
+            threading.Thread(target=self._validation_worker, args=(f"{prefix}-{n}", drain),
+                             name=f"{prefix}-{n}", daemon=True)
+            for n in range(self.validation_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+    
+    def drain_queue(self):
+        """Valida todos los trabajos disponibles en la cola y espera a que terminen"""
+        for thread in self._start_validation_workers(drain=True):
+            thread.join()
+    
+    def run_cycle(self, executor=None, watch_email=False):
+        """
+        Ejecuta un ciclo de verificación de todas las casillas
+        
+        Cada casilla se revisa en un hilo del pool (hasta max_workers a la vez), por lo
+        que la duración del ciclo depende de la casilla más lenta y no de la suma de todas.
+        
+        Args:
+            executor (ThreadPoolExecutor, optional): Pool de hilos a reutilizar
+            watch_email (bool): Los buzones los atienden watchers IMAP; el ciclo solo revisa SFTP
+        """
+        cycle_start = time.monotonic()
+        tasks = self._collect_casilla_tasks(watch_email)
+        
+        if tasks:
+            own_executor = executor is None
+            if own_executor:
+                executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks)),
+                                              thread_name_prefix="casilla")
+            try:
+                futures = {
+                    executor.submit(self._poll_casilla, casilla_id, casilla_tasks): casilla_id
+                    for casilla_id, casilla_tasks in tasks.items()
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.logger.error(f"Error al revisar la casilla {futures[future]}: {str(e)}")
+            finally:
+                if own_executor:
+                    executor.shutdown(wait=True)
+        
+        self.logger.info(f"Revisadas {len(tasks)} casillas en {time.monotonic() - cycle_start:.1f}s "
+                         f"({self.max_workers} en paralelo)")
+    
     def run(self, single_execution=False):
         """
         Ejecuta el daemon
@@ -2582,47 +3042,29 @@ class SageDaemon2:
             single_execution (bool): Si debe ejecutar solo una vez o en bucle
         """
         self.running = True
+        self._stop_event.clear()
         self.logger.info("Iniciando SAGE Daemon 2")
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="casilla")
+        
+        # En modo continuo las validaciones corren en paralelo a los ciclos de revisión
+        validation_threads = [] if single_execution else self._start_validation_workers()
+        watch_email = self.use_idle and not single_execution
         
         try:
             while self.running:
                 self.logger.info("Iniciando ciclo de verificación")
                 
-                # Obtener configuraciones de email
-                email_configs = self.db_manager.get_email_configurations()
+                # Revisar email y SFTP de todas las casillas en paralelo (solo descargan y encolan)
+                self.run_cycle(executor, watch_email)
                 
-                if not email_configs:
-                    self.logger.warning("No se encontraron configuraciones de email activas")
-                else:
-                    self.logger.info(f"Se encontraron {len(email_configs)} configuraciones de email")
-                    
-                    # Procesar cada configuración de email
-                    for config in email_configs:
-                        casilla_id = config.get('casilla_id')
-                        
-                        # Obtener remitentes autorizados
-                        authorized_senders = self.db_manager.get_authorized_senders(casilla_id)
-                        
-                        # Procesar correos
-                        self.email_processor.process_email(config, authorized_senders)
-                
-                # Obtener configuraciones SFTP
-                sftp_configs = self.db_manager.get_sftp_configurations()
+                if single_execution:
+                    self.drain_queue()
+                self.logger.info(f"Trabajos pendientes en la cola: {self.job_queue.pending_count()}")
                 
-                if not sftp_configs:
-                    self.logger.warning("No se encontraron configuraciones SFTP activas")
-                else:
-                    self.logger.info(f"Se encontraron {len(sftp_configs)} configuraciones SFTP")
-                    
-                    # Procesar cada configuración SFTP
-                    for config in sftp_configs:
-                        # Registrar en log el inicio de procesamiento SFTP
-                        casilla_id = config.get('casilla_id')
-                        casilla_nombre = config.get('nombre', 'Sin nombre')
-                        self.logger.info(f"Procesando SFTP para casilla {casilla_id} - {casilla_nombre}")
-                        
-                        # Procesar archivos SFTP
-                        self.sftp_processor.process_sftp(config)
+                try:
+                    self.job_queue.purge()
+                except Exception as e:
+                    self.logger.error(f"Error al limpiar la cola de validaciones: {str(e)}")
                 
                 # Procesar notificaciones
                 try:
@@ -2641,7 +3083,7 @@ class SageDaemon2:
                     break
                     
                 # Esperar para el siguiente ciclo
-                time.sleep(60)  # 1 minuto entre verificaciones
+                self._stop_event.wait(60)  # 1 minuto entre verificaciones
                 
         except KeyboardInterrupt:
             self.logger.info("Detenido por interrupción de usuario")
@@ -2649,12 +3091,19 @@ class SageDaemon2:
             self.logger.error(f"Error en el daemon: {str(e)}")
             self.logger.error(traceback.format_exc())
         finally:
+            # Los trabajos en curso terminan; los que queden pendientes se retoman al reiniciar
+            self._stop_event.set()
+            self._stop_watchers()
+            executor.shutdown(wait=True)
+            for thread in validation_threads:
+                thread.join()
             self.db_manager.close()
             self.logger.info("SAGE Daemon 2 finalizado")
     
     def stop(self):
         """Detiene el daemon"""
         self.running = False
+        self._stop_event.set()
         self.logger.info("Deteniendo SAGE Daemon 2")
 
 def main():
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Descarga selectiva de mensajes IMAP para SAGE Daemon 2
+
+En lugar de descargar cada mensaje completo (RFC822), se piden en una sola
+consulta los encabezados y la estructura (BODYSTRUCTURE) de todos los mensajes
+no leídos. Con eso se decide si el remitente está autorizado y si hay adjuntos,
+y solo se descargan las partes adjuntas necesarias, por bloques y decodificadas
+directamente a disco.
+"""
+
+import re
+import binascii
+import logging
+from email.header import decode_header, make_header
+from email.utils import collapse_rfc2231_value, decode_params, unquote
+
+logger = logging.getLogger("SAGE_Daemon2.IMAPFetch")
+
+# Mensajes por comando FETCH de encabezados y bytes por bloque al descargar un adjunto
+OVERVIEW_BATCH_SIZE = 200
+PART_CHUNK_SIZE = 1024 * 1024
+
+_TOKEN_RE = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|\{\d+\}|[^\s()"]+')
+
+
+def _text(value):
+    """Valor de BODYSTRUCTURE como texto (los literales llegan como bytes)"""
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return '' if value is None else str(value)
+
+
+def _tokens(data):
+    """Convierte la respuesta de imaplib (bytes y tuplas con literales) en tokens"""
+    for item in data:
+        if item is None:
+            continue
+        text, literal = (item[0], item[1]) if isinstance(item, tuple) else (item, None)
+        for match in _TOKEN_RE.finditer(text):
+            token = match.group()
+            if token.startswith(b'{') and token.endswith(b'}'):
+                continue  # El literal llega como segundo elemento de la tupla
+            yield token
+        if literal is not None:
+            yield ('literal', literal)
+
+
+def _parse(tokens):
+    """Arma listas anidadas a partir de los tokens; los literales quedan como bytes"""
+    stack = [[]]
+    for token in tokens:
+        if isinstance(token, tuple):
+            stack[-1].append(token[1])
+        elif token == b'(':
+            stack.append([])
+        elif token == b')':
+            if len(stack) > 1:
+                closed = stack.pop()
+                stack[-1].append(closed)
+        elif token.startswith(b'"'):
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', token[1:-1]).decode('utf-8', errors='replace'))
+        elif token.upper() == b'NIL':
+            stack[-1].append(None)
+        else:
+            stack[-1].append(token.decode('utf-8', errors='replace'))
+    return stack[0]
+
+
+def parse_fetch_response(data):
+    """
+    Interpreta la respuesta de un comando UID FETCH
+
+    Returns:
+        dict: {uid (str): {elemento en mayúsculas: valor}}, p.ej. 'BODYSTRUCTURE' o 'BODY[HEADER]'
+    """
+    messages = {}
+    for item in _parse(_tokens(data)):
+        if not isinstance(item, list):
+            continue  # Número de secuencia del mensaje
+        fields = {_text(item[i]).upper(): item[i + 1] for i in range(0, len(item) - 1, 2)}
+        if 'UID' in fields:
+            messages[_text(fields['UID'])] = fields
+    return messages
+
+
+def _params(values):
+    """Lista de parámetros de BODYSTRUCTURE -> dict (decodifica RFC 2231 y RFC 2047)"""
+    if not isinstance(values, list):
+        return {}
+    pairs = [(_text(values[i]).lower(), '"%s"' % _text(values[i + 1])) for i in range(0, len(values) - 1, 2)
+             if values[i + 1] is not None]
+    params = {}
+    for name, value in decode_params([('', '')] + pairs)[1:]:
+        value = unquote(collapse_rfc2231_value(value))
+        try:
+            value = str(make_header(decode_header(value)))
+        except Exception:
+            pass
+        params[name] = value
+    return params
+
+
+def find_attachments(structure, section=''):
+    """
+    Recorre un BODYSTRUCTURE y devuelve las partes adjuntas
+
+    Se consideran adjuntos las partes con Content-Disposition 'attachment' y nombre
+    de archivo, el mismo criterio que se aplicaba al recorrer el mensaje completo.
+
+    Returns:
+        list: [{'section': '2', 'filename': ..., 'encoding': 'base64', 'size': n}, ...]
+    """
+    if not isinstance(structure, list) or not structure:
+        return []
+
+    if isinstance(structure[0], list):
+        # multipart: partes seguidas del subtipo y las extensiones
+        attachments = []
+        number = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            number += 1
+            attachments.extend(find_attachments(child, f"{section}.{number}" if section else str(number)))
+        return attachments
+
+    main_type = _text(structure[0]).lower()
+    sub_type = _text(structure[1]).lower() if len(structure) > 1 else ''
+    # Posición de la disposición según el tipo (RFC 3501, body-type-1part)
+    if main_type == 'text':
+        disposition_index = 9
+    elif main_type == 'message' and sub_type == 'rfc822':
+        disposition_index = 11
+    else:
+        disposition_index = 8
+
+    # Mensaje adjunto (p.ej. reenviado como adjunto): se recorren también sus partes,
+    # como hacía email_message.walk(). Las partes del cuerpo se numeran N.1, N.2...
+    nested = []
+    if main_type == 'message' and sub_type == 'rfc822' and len(structure) > 8:
+        body = structure[8]
+        if isinstance(body, list) and body:
+            message_section = section or '1'
+            nested = find_attachments(body, message_section if isinstance(body[0], list) else f"{message_section}.1")
+
+    disposition = structure[disposition_index] if len(structure) > disposition_index else None
+    if not isinstance(disposition, list) or not disposition or _text(disposition[0]).lower() != 'attachment':
+        return nested
+
+    filename = _params(disposition[1] if len(disposition) > 1 else None).get('filename') \
+        or _params(structure[2]).get('name')
+    if not filename:
+        return nested
+
+    size = structure[6] if len(structure) > 6 else None
+    return [{
+        'section': section or '1',
+        'filename': filename,
+        'encoding': (_text(structure[5]) or '7bit').lower() if len(structure) > 5 else '7bit',
+        'size': int(size) if str(size).isdigit() else None
+    }] + nested
+
+
+def fetch_overview(mail, uids, batch_size=OVERVIEW_BATCH_SIZE):
+    """
+    Obtiene encabezados y adjuntos de los mensajes sin descargar sus cuerpos
+
+    BODY.PEEK no marca los mensajes como leídos.
+
+    Yields:
+        tuple: (uid, encabezados en bytes, lista de adjuntos de find_attachments)
+    """
+    uids = [uid.decode() if isinstance(uid, bytes) else str(uid) for uid in uids]
+    for start in range(0, len(uids), batch_size):
+        batch = uids[start:start + batch_size]
+        typ, data = mail.uid('FETCH', ','.join(batch), '(UID BODYSTRUCTURE BODY.PEEK[HEADER])')
+        if typ != 'OK':
+            raise RuntimeError(f"Error en FETCH de encabezados: {data}")
+        messages = parse_fetch_response(data)
+        for uid in batch:
+            fields = messages.get(uid)
+            if fields is None:
+                logger.warning(f"El servidor no devolvió el mensaje UID {uid}")
+                continue
+            headers = fields.get('BODY[HEADER]') or b''
+            if isinstance(headers, str):
+                headers = headers.encode('utf-8')
+            yield uid, headers, find_attachments(fields.get('BODYSTRUCTURE'))
+
+
+class _PartDecoder:
+    """Decodifica por bloques el contenido de una parte (base64, quoted-printable o sin codificar)"""
+
+    def __init__(self, encoding, output):
+        self.encoding = encoding
+        self.output = output
+        self.pending = b''
+
+    def write(self, data):
+        if self.encoding == 'base64':
+            data = self.pending + re.sub(rb'\s+', b'', data)
+            complete = len(data) // 4 * 4
+            self.output.write(binascii.a2b_base64(data[:complete]))
+            self.pending = data[complete:]
+        elif self.encoding == 'quoted-printable':
+            data = self.pending + data
+            end = data.rfind(b'\n') + 1
+            self.output.write(binascii.a2b_qp(data[:end]))
+            self.pending = data[end:]
+        else:
+            self.output.write(data)
+
+    def close(self):
+        if not self.pending:
+            return
+        if self.encoding == 'base64':
+            self.output.write(binascii.a2b_base64(self.pending + b'=' * (-len(self.pending) % 4)))
+        else:
+            self.output.write(binascii.a2b_qp(self.pending))
+        self.pending = b''
+
+
+def download_part(mail, uid, attachment, path, chunk_size=PART_CHUNK_SIZE):
+    """
+    Descarga una parte adjunta a path por bloques de chunk_size bytes
+
+    Cada bloque se pide con un FETCH parcial (BODY.PEEK[sección]<inicio.longitud>)
+    y se decodifica al vuelo, así un adjunto de muchos MB no se carga completo en memoria.
+
+    Returns:
+        int: Bytes descargados (sin decodificar)
+    """
+    offset = 0
+    with open(path, 'wb') as output:
+        decoder = _PartDecoder(attachment['encoding'], output)
+        while True:
+            typ, data = mail.uid('FETCH', uid, f"(BODY.PEEK[{attachment['section']}]<{offset}.{chunk_size}>)")
+            if typ != 'OK':
+                raise RuntimeError(f"Error al descargar la parte {attachment['section']} del mensaje {uid}: {data}")
+            chunk = next((item[1] for item in data if isinstance(item, tuple)), b'')
+            if chunk:
+                decoder.write(chunk)
+                offset += len(chunk)
+            if len(chunk) < chunk_size:
+                break
+        decoder.close()
+    return offset
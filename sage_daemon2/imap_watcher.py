@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Monitoreo de buzones IMAP por eventos para SAGE Daemon 2
+
+Cada buzón mantiene una conexión autenticada propia. Si el servidor soporta
+IDLE (RFC 2177) el watcher espera a que el servidor avise de mensajes nuevos;
+si no, consulta el buzón con un intervalo adaptativo que se alarga mientras no
+llegan correos y vuelve al mínimo en cuanto aparece uno. Así los archivos se
+reciben en segundos sin iniciar sesión en cada ciclo.
+"""
+
+import os
+import ssl
+import time
+import select
+import imaplib
+import logging
+import threading
+
+# Intervalos en segundos; se pueden ajustar con las variables SAGE_IMAP_*
+IDLE_RENEW_SECONDS = 25 * 60  # RFC 2177: renovar IDLE antes de 29 minutos
+POLL_MIN_SECONDS = 10
+POLL_MAX_SECONDS = 300
+RECONNECT_MAX_SECONDS = 300
+
+
+def _has_buffered_data(mail):
+    """Indica, sin bloquear, si hay datos ya recibidos pendientes de leer en la conexión"""
+    sock = mail.sock
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        # peek devuelve lo que ya está en el buffer o lo que el socket tiene disponible
+        return bool(mail.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+def idle(mail, timeout, stop_event=None):
+    """
+    Ejecuta IDLE hasta que el servidor informa de cambios o vence timeout
+
+    imaplib no implementa IDLE antes de Python 3.14, por lo que el comando se envía
+    con las primitivas de la conexión.
+
+    Args:
+        mail (imaplib.IMAP4): Conexión autenticada con un buzón seleccionado
+        timeout (float): Segundos máximos en IDLE
+        stop_event (threading.Event, optional): Permite interrumpir la espera
+
+    Returns:
+        bool: True si el servidor informó de mensajes nuevos (EXISTS/RECENT)
+    """
+    tag = mail._new_tag()
+    mail.send(tag + b' IDLE\r\n')
+    line = mail.readline()
+    if not line.startswith(b'+'):
+        mail.tagged_commands.pop(tag, None)
+        raise imaplib.IMAP4.error(f"El servidor rechazó IDLE: {line!r}")
+
+    changed = False
+    deadline = time.monotonic() + timeout
+    while not changed and time.monotonic() < deadline:
+        if stop_event is not None and stop_event.is_set():
+            break
+        if not _has_buffered_data(mail):
+            wait = min(1.0, max(0.0, deadline - time.monotonic()))
+            if not select.select([mail.sock], [], [], wait)[0]:
+                continue
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Conexión cerrada por el servidor durante IDLE")
+        if line.startswith(b'* BYE'):
+            raise imaplib.IMAP4.abort(line.decode(errors='replace').strip())
+        if line.startswith(b'*') and (line.rstrip().endswith(b'EXISTS') or line.rstrip().endswith(b'RECENT')):
+            changed = True
+
+    # Terminar IDLE y consumir el resto de respuestas hasta la respuesta etiquetada
+    mail.send(b'DONE\r\n')
+    while True:
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Conexión cerrada por el servidor al terminar IDLE")
+        if line.startswith(tag):
+            break
+        if line.startswith(b'*') and (line.rstrip().endswith(b'EXISTS') or line.rstrip().endswith(b'RECENT')):
+            changed = True
+    mail.tagged_commands.pop(tag, None)
+    return changed
+
+
+class MailboxWatcher(threading.Thread):
+    """
+    Hilo que mantiene abierta la conexión IMAP de una casilla
+
+    process_callback(mail, email_config) procesa los mensajes no leídos usando la
+    conexión del watcher y devuelve el número de mensajes procesados.
+    """
+
+    def __init__(self, email_config, process_callback):
+        casilla_id = email_config.get('casilla_id')
+        super().__init__(name=f"imap-{casilla_id}", daemon=True)
+        self.logger = logging.getLogger("SAGE_Daemon2.IMAPWatcher")
+        self.email_config = email_config
+        self.process_callback = process_callback
+        self.stop_event = threading.Event()
+        self.idle_seconds = float(os.environ.get('SAGE_IMAP_IDLE_SECONDS', IDLE_RENEW_SECONDS))
+        self.poll_min = float(os.environ.get('SAGE_IMAP_POLL_MIN', POLL_MIN_SECONDS))
+        self.poll_max = float(os.environ.get('SAGE_IMAP_POLL_MAX', POLL_MAX_SECONDS))
+        self.logins = 0
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _connect(self):
+        config = self.email_config
+        if config.get('usar_ssl_entrada', True):
+            mail = imaplib.IMAP4_SSL(config.get('servidor_entrada', ''), config.get('puerto_entrada', 993))
+        else:
+            mail = imaplib.IMAP4(config.get('servidor_entrada', ''), config.get('puerto_entrada', 993))
+        mail.login(config.get('usuario', ''), config.get('password', ''))
+        mail.select('INBOX')
+        self.logins += 1
+        return mail
+
+    @staticmethod
+    def _supports_idle(mail):
+        # Algunos servidores solo anuncian IDLE después de autenticar
+        if 'IDLE' in mail.capabilities:
+            return True
+        typ, data = mail.capability()
+        return typ == 'OK' and bool(data and data[0]) and b'IDLE' in data[0].upper().split()
+
+    def run(self):
+        usuario = self.email_config.get('usuario', '')
+        reconnect_delay = 5
+        while not self.stop_event.is_set():
+            mail = None
+            try:
+                mail = self._connect()
+                supports_idle = self._supports_idle(mail)
+                self.logger.info(f"Conexión IMAP abierta para {usuario} "
+                                 f"({'IDLE' if supports_idle else 'consulta adaptativa'})")
+                reconnect_delay = 5
+                self._watch(mail, supports_idle)
+            except Exception as e:
+                self.logger.error(f"Error en la conexión IMAP de {usuario}: {str(e)}; "
+                                  f"reintento en {reconnect_delay}s")
+                self.stop_event.wait(reconnect_delay)
+                reconnect_delay = min(reconnect_delay * 2, RECONNECT_MAX_SECONDS)
+            finally:
+                if mail is not None:
+                    try:
+                        mail.logout()
+                    except Exception:
+                        pass
+        self.logger.info(f"Monitoreo IMAP de {usuario} detenido")
+
+    def _watch(self, mail, supports_idle):
+        # Procesar lo que llegó mientras no había conexión
+        self.process_callback(mail, self.email_config)
+        interval = self.poll_min
+        while not self.stop_event.is_set():
+            if supports_idle:
+                if idle(mail, self.idle_seconds, self.stop_event):
+                    self.process_callback(mail, self.email_config)
+                else:
+                    # Renovación periódica: mantiene viva la sesión en servidores con timeout corto
+                    mail.noop()
+            else:
+                if self.stop_event.wait(interval):
+                    break
+                mail.noop()
+                processed = self.process_callback(mail, self.email_config)
+                # Sin correo nuevo se espacian las consultas; con actividad se vuelve al mínimo
+                interval = self.poll_min if processed else min(interval * 2, self.poll_max)
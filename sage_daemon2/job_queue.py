@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cola persistente de validaciones para SAGE Daemon 2
+
+Los pollers de email y SFTP solo descargan los archivos y encolan un trabajo;
+los hilos de validación toman los trabajos de la cola, ejecutan process_files,
+guardan el resultado y envían la respuesta. La cola vive en un archivo SQLite
+local junto a los archivos descargados, por lo que sobrevive a un reinicio del
+daemon: un trabajo en curso cuyo arriendo (lease) vence sin heartbeat vuelve a
+entregarse (entrega al menos una vez).
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+# Directorio de la cola y de los archivos pendientes; se puede ajustar con SAGE_JOB_QUEUE_DIR
+DEFAULT_QUEUE_DIR = "daemon_queue"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    casilla_id INTEGER,
+    dedupe_key TEXT UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, available_at);
+"""
+
+
+class LeaseLost(Exception):
+    """El arriendo del trabajo venció y la cola se lo entregó a otro worker"""
+
+
+class Job:
+    """Trabajo tomado de la cola"""
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.kind = row['kind']
+        self.casilla_id = row['casilla_id']
+        self.payload = json.loads(row['payload'])
+        self.attempts = row['attempts']
+        self.worker = row['worker']
+        self.result = json.loads(row['result']) if row['result'] else None
+        self.lease_lost = False  # Lo marca keep_alive si un heartbeat encuentra otro dueño
+
+
+class JobQueue:
+    """
+    Cola de trabajos con arriendo y heartbeat sobre SQLite
+
+    Estados: 'pending' (listo o esperando reintento), 'running' (arrendado por un
+    worker hasta lease_until), 'done' y 'failed' (agotó max_attempts).
+    """
+
+    def __init__(self, queue_dir=None, lease_seconds=None, max_attempts=None, retry_delay=None):
+        """
+        Inicializa la cola
+
+        Args:
+            queue_dir (str, optional): Directorio de la cola (SAGE_JOB_QUEUE_DIR)
+            lease_seconds (int, optional): Duración del arriendo sin heartbeat (SAGE_JOB_LEASE_SECONDS)
+            max_attempts (int, optional): Intentos antes de marcar el trabajo como fallido (SAGE_JOB_MAX_ATTEMPTS)
+            retry_delay (int, optional): Espera base entre reintentos, se duplica en cada intento
+        """
+        self.logger = logging.getLogger("SAGE_Daemon2.JobQueue")
+        self.queue_dir = queue_dir or os.environ.get('SAGE_JOB_QUEUE_DIR', DEFAULT_QUEUE_DIR)
+        self.lease_seconds = int(lease_seconds or os.environ.get('SAGE_JOB_LEASE_SECONDS', 300))
+        self.max_attempts = int(max_attempts or os.environ.get('SAGE_JOB_MAX_ATTEMPTS', 3))
+        self.retry_delay = int(retry_delay if retry_delay is not None else 30)
+        self.files_dir = os.path.join(self.queue_dir, "files")
+        os.makedirs(self.files_dir, exist_ok=True)
+        self.path = os.path.join(self.queue_dir, "jobs.sqlite3")
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connection(self):
+        # Una conexión por operación: los hilos de pollers y workers no comparten conexiones
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def new_file_dir(self):
+        """Crea un directorio persistente para los archivos de un trabajo"""
+        path = os.path.join(self.files_dir, uuid.uuid4().hex)
+        os.makedirs(path)
+        return path
+
+    def enqueue(self, kind, casilla_id, payload, dedupe_key=None):
+        """
+        Encola un trabajo
+
+        Args:
+            kind (str): 'email' o 'sftp'
+            casilla_id (int): ID de la casilla
+            payload (dict): Datos del trabajo (serializables a JSON)
+            dedupe_key (str, optional): Clave única; si ya existe no se encola de nuevo
+
+        Returns:
+            int: ID del trabajo o None si ya estaba encolado
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, casilla_id, dedupe_key, payload, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, casilla_id, dedupe_key, json.dumps(payload, ensure_ascii=False), now, now, now)
+            )
+            job_id = cursor.lastrowid if cursor.rowcount else None
+
+        if job_id is None:
+            self.logger.info(f"Trabajo {dedupe_key} ya estaba en la cola")
+        else:
+            self.logger.info(f"Trabajo {job_id} ({kind}) encolado para casilla {casilla_id}")
+        return job_id
+
+    def claim(self, worker):
+        """
+        Toma el siguiente trabajo disponible, incluidos los de arriendo vencido
+
+        Returns:
+            Job: Trabajo arrendado a worker o None si no hay trabajos
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs "
+                "WHERE (status = 'pending' AND available_at <= ?) OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY available_at, id LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                return None
+            if row['status'] == 'running':
+                self.logger.warning(f"Arriendo vencido del trabajo {row['id']} (worker {row['worker']}); se reintenta")
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_until = ?, "
+                "updated_at = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row['id'])
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+        return Job(row)
+
+    def heartbeat(self, job, worker):
+        """Extiende el arriendo de un trabajo en curso; False si lo perdió"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (now + self.lease_seconds, now, job.id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def check_lease(self, job):
+        """
+        Lanza LeaseLost si el trabajo ya no pertenece a este worker
+
+        Se llama antes de los efectos visibles (enviar la respuesta, subir resultados)
+        para que un worker con el arriendo vencido no los repita junto al nuevo dueño.
+        """
+        if job.lease_lost:
+            raise LeaseLost(f"El trabajo {job.id} ya no pertenece a {job.worker}")
+
+    @contextmanager
+    def keep_alive(self, job, worker):
+        """
+        Envía heartbeats en segundo plano mientras se procesa el trabajo
+
+        Si un heartbeat encuentra que el trabajo tiene otro dueño se marca job.lease_lost
+        y se dejan de enviar heartbeats; check_lease() aborta entonces el procesamiento.
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    if not self.heartbeat(job, worker):
+                        job.lease_lost = True
+                        self.logger.warning(f"El trabajo {job.id} ya no pertenece a {worker}; se abandona")
+                        return
+                except sqlite3.Error as e:
+                    self.logger.error(f"Error en heartbeat del trabajo {job.id}: {str(e)}")
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{job.id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def save_result(self, job, result):
+        """
+        Guarda el resultado de la validación para no repetirla si la respuesta falla
+
+        Raises:
+            LeaseLost: Si el trabajo ya pertenece a otro worker
+        """
+        job.result = result
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET result = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), job.id, job.worker)
+            )
+            if cursor.rowcount != 1:
+                job.lease_lost = True
+        self.check_lease(job)
+
+    def complete(self, job):
+        """
+        Marca el trabajo como terminado y borra sus archivos
+
+        Solo el worker que tiene el arriendo puede completarlo: si venció y otro worker
+        lo tomó, no se cambia nada ni se borran los archivos que el nuevo dueño usa.
+
+        Returns:
+            bool: True si el trabajo se marcó como terminado
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', lease_until = NULL, error = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), job.id, job.worker)
+            )
+            completed = cursor.rowcount == 1
+
+        if completed:
+            self._remove_files(job)
+        else:
+            self.logger.warning(f"El trabajo {job.id} ya no pertenece a {job.worker}; no se marca como terminado")
+        return completed
+
+    def fail(self, job, error):
+        """
+        Registra un intento fallido
+
+        El trabajo vuelve a 'pending' con espera exponencial hasta agotar
+        max_attempts; después queda en 'failed' para revisión manual. Igual que en
+        complete(), un worker que perdió el arriendo no cambia nada.
+
+        Returns:
+            bool: True si se registró el fallo
+        """
+        now = time.time()
+        if job.attempts < self.max_attempts:
+            delay = self.retry_delay * 2 ** (job.attempts - 1)
+            status, available_at = 'pending', now + delay
+        else:
+            delay, status, available_at = None, 'failed', now
+
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_until = NULL, error = ?, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, available_at, str(error), now, job.id, job.worker)
+            )
+            failed = cursor.rowcount == 1
+
+        if not failed:
+            self.logger.warning(f"El trabajo {job.id} ya no pertenece a {job.worker}; se ignora su fallo: {error}")
+        elif status == 'pending':
+            self.logger.warning(f"Trabajo {job.id} falló (intento {job.attempts}/{self.max_attempts}), "
+                                f"se reintenta en {delay}s: {error}")
+        else:
+            self.logger.error(f"Trabajo {job.id} falló tras {job.attempts} intentos: {error}")
+        return failed
+
+    def pending_count(self):
+        """Número de trabajos pendientes o en curso"""
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')").fetchone()[0]
+
+    def purge(self, older_than_days=7):
+        """Elimina los trabajos terminados hace más de older_than_days días"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status = 'done' AND updated_at < ?",
+                (time.time() - older_than_days * 86400,)
+            )
+            return cursor.rowcount
+
+    def _remove_files(self, job):
+        file_dir = job.payload.get('file_dir')
+        if file_dir and os.path.abspath(file_dir).startswith(os.path.abspath(self.files_dir)):
+            shutil.rmtree(file_dir, ignore_errors=True)
@@ -0,0 +1,9 @@
+-- Migración para registrar las métricas de rendimiento de cada ejecución
+-- Guarda los tiempos por etapa (lectura, conversión de tipos, validaciones, ...) y los
+-- contadores de la ejecución (filas y bytes leídos, reglas evaluadas, tiempo en reglas)
+
+ALTER TABLE ejecuciones_yaml
+ADD COLUMN IF NOT EXISTS metricas JSONB;
+
+-- Comentarios en la tabla
+COMMENT ON COLUMN ejecuciones_yaml.metricas IS 'Tiempos por etapa y contadores de la ejecución (mismo contenido que la sección metrics de report.json)';
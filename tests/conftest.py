@@ -0,0 +1,44 @@
+"""Utilidades compartidas por los tests de SAGE"""
+import os
+import tempfile
+
+import pytest
+
+# sage_daemon2.daemon abre sage_daemon2_log.txt en el directorio actual al importarse:
+# se importa desde un directorio temporal para no dejar el log en la raíz del repositorio
+_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix='sage-tests-'))
+try:
+    import sage_daemon2.daemon  # noqa: F401
+finally:
+    os.chdir(_cwd)
+
+
+class RecordingLogger:
+    """Logger mínimo con la interfaz de SageLogger que guarda los mensajes"""
+
+    def __init__(self):
+        self.records = []
+
+    def log(self, message, severity, **kwargs):
+        self.records.append((severity, message, kwargs))
+
+    def message(self, message, **kwargs):
+        self.log(message, 'message', **kwargs)
+
+    def warning(self, message, **kwargs):
+        self.log(message, 'warning', **kwargs)
+
+    def error(self, message, exception=None, **kwargs):
+        self.log(message, 'error', **kwargs)
+
+    def success(self, message, **kwargs):
+        self.log(message, 'success', **kwargs)
+
+    def messages(self, severity=None):
+        return [message for level, message, _ in self.records if severity is None or level == severity]
+
+
+@pytest.fixture
+def logger():
+    return RecordingLogger()
@@ -0,0 +1,81 @@
+"""Estrategias de carga masiva y respaldo entre ellas"""
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sage.bulk_loaders import BulkLoader, BulkLoadUnsupported, bulk_load, column_values
+
+
+class SQLiteLoader(BulkLoader):
+    placeholder = '?'
+
+
+class UnsupportedLoader(BulkLoader):
+    name = 'no_disponible'
+
+    def load(self, conn, df, table):
+        raise BulkLoadUnsupported("sin soporte en el servidor")
+
+
+class BrokenLoader(BulkLoader):
+    name = 'rota'
+
+    def load(self, conn, df, table):
+        conn.execute(f"INSERT INTO {table} VALUES (-1, 'parcial')")
+        raise RuntimeError("fallo a mitad de la carga")
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE "t" (id INTEGER CHECK (id >= 0), nombre TEXT)')
+    yield conn
+    conn.close()
+
+
+def _rows(conn):
+    return conn.execute('SELECT id, nombre FROM "t" ORDER BY id').fetchall()
+
+
+def test_unsupported_strategy_falls_back_to_next(conn, logger):
+    df = pd.DataFrame({'id': [1, 2], 'nombre': ['a', 'b']})
+    rows, strategy = bulk_load('postgresql', conn, df, '"t"', logger,
+                               loaders=[UnsupportedLoader(logger), SQLiteLoader(logger)])
+    assert (rows, strategy) == (2, 'executemany')
+    assert _rows(conn) == [(1, 'a'), (2, 'b')]
+    assert any("no disponible" in message for message in logger.messages('message'))
+
+
+def test_failed_strategy_is_rolled_back_before_fallback(conn, logger):
+    df = pd.DataFrame({'id': [1], 'nombre': ['a']})
+    rows, strategy = bulk_load('postgresql', conn, df, '"t"', logger,
+                               loaders=[BrokenLoader(logger), SQLiteLoader(logger)])
+    assert (rows, strategy) == (1, 'executemany')
+    assert _rows(conn) == [(1, 'a')]
+    assert logger.messages('warning')
+
+
+def test_last_strategy_error_is_raised(conn, logger):
+    df = pd.DataFrame({'id': [1], 'nombre': ['a']})
+    with pytest.raises(BulkLoadUnsupported):
+        bulk_load('postgresql', conn, df, '"t"', logger, loaders=[UnsupportedLoader(logger)])
+
+
+def test_executemany_isolates_invalid_rows(conn, logger):
+    ids = list(range(100))
+    ids[10] = ids[57] = -5
+    df = pd.DataFrame({'id': ids, 'nombre': [f"n{i}" for i in range(100)]})
+    rows = SQLiteLoader(logger, batch_size=32).load(conn, df, '"t"')
+    assert rows == 98
+    assert len(_rows(conn)) == 98
+    assert len(logger.messages('error')) == 2
+
+
+def test_column_values_converts_missing_and_numpy_types():
+    assert column_values(pd.Series([1.5, np.nan])) == [1.5, None]
+    assert column_values(pd.Series([1, None], dtype='Int64')) == [1, None]
+    assert column_values(pd.Series(pd.to_datetime(['2024-01-02', None])))[1] is None
+    assert column_values(pd.Series(['x', None], dtype='category')) == ['x', None]
+    assert type(column_values(pd.Series([np.int64(3)], dtype=object))[0]) is int
@@ -0,0 +1,120 @@
+"""UPSERT y DELETE por tabla de staging"""
+import pandas as pd
+import pytest
+
+from sage.bulk_upsert import UPSERT_DIALECTS, staged_delete, staged_upsert
+
+
+class RecordingCursor:
+    """Cursor DB-API que guarda las sentencias y devuelve resultados fijos"""
+
+    rowcount = 2
+
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+
+    def executemany(self, sql, rows):
+        self.statements.append(" ".join(sql.split()))
+
+    def copy_expert(self, sql, stream, size=None):
+        stream.read()
+        self.statements.append(sql)
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return (1, 1)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return RecordingCursor(self.statements)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+@pytest.mark.parametrize('db_type, expected', [
+    ('postgresql', 'ON CONFLICT ("id") DO UPDATE SET "valor" = EXCLUDED."valor"'),
+    ('mysql', 'ON DUPLICATE KEY UPDATE `valor` = s.`valor`'),
+    ('mssql', 'WHEN MATCHED THEN UPDATE SET t.[valor] = s.[valor]'),
+])
+def test_staged_upsert_sql_per_dialect(db_type, expected, logger):
+    conn = RecordingConnection()
+    df = pd.DataFrame({'id': [1, 2], 'valor': ['a', 'b']})
+    schema = UPSERT_DIALECTS[db_type].adjust_schema('public')
+    staged_upsert(db_type, conn, df, schema, 'clientes', ['id'], logger)
+
+    statements = conn.statements
+    assert any(sql.startswith('CREATE UNIQUE INDEX') for sql in statements)
+    merge = next(sql for sql in statements if expected in sql)
+    assert 'sage_stage_' in merge
+    # La tabla de staging se elimina siempre al final
+    assert 'DROP' in statements[-1] and 'sage_stage_' in statements[-1]
+
+
+def test_staged_upsert_rejects_missing_key_columns(logger):
+    with pytest.raises(ValueError):
+        staged_upsert('postgresql', RecordingConnection(), pd.DataFrame({'valor': [1]}), None, 't', ['id'], logger)
+
+
+@pytest.fixture
+def duck():
+    duckdb = pytest.importorskip('duckdb')
+    conn = duckdb.connect()
+    yield conn
+    conn.close()
+
+
+def test_duckdb_upsert_with_composite_key(duck, logger):
+    duck.execute("CREATE TABLE ventas (tienda INTEGER, sku VARCHAR, unidades INTEGER)")
+    duck.execute("INSERT INTO ventas VALUES (1, 'A', 5), (1, 'B', 7), (2, 'A', 1)")
+    df = pd.DataFrame({'tienda': [1, 2, 2, 2], 'sku': ['B', 'A', 'C', 'C'], 'unidades': [70, 10, 3, 4]})
+
+    inserted, updated = staged_upsert('duckdb', duck, df, None, 'ventas', ['tienda', 'sku'], logger)
+
+    assert (inserted, updated) == (1, 2)
+    assert duck.execute("SELECT * FROM ventas ORDER BY tienda, sku").fetchall() == [
+        (1, 'A', 5), (1, 'B', 70), (2, 'A', 10), (2, 'C', 4)]
+    # Clave repetida en los datos: se conserva la última fila
+    assert any('clave repetida' in message for message in logger.messages('warning'))
+    assert not duck.execute("SELECT * FROM duckdb_tables() WHERE table_name LIKE 'sage_stage_%'").fetchall()
+
+
+def test_duckdb_staged_delete(duck, logger):
+    duck.execute("CREATE TABLE clientes AS SELECT range AS id, 'x' AS valor FROM range(10)")
+    deleted = staged_delete('duckdb', duck, pd.DataFrame({'id': [2, 3, 3, 99]}), None, 'clientes', logger)
+    assert deleted == 2
+    assert duck.execute("SELECT count(*) FROM clientes").fetchone()[0] == 8
+
+
+def test_staged_upsert_fails_when_staging_load_skips_rows(monkeypatch, logger):
+    # executemany descarta las filas rechazadas y devuelve cuántas cargó sin lanzar error
+    monkeypatch.setattr('sage.bulk_upsert.bulk_load', lambda db_type, conn, df, table, logger: (1, 'executemany'))
+    conn = RecordingConnection()
+    df = pd.DataFrame({'id': [1, 2], 'valor': ['a', 'b']})
+
+    with pytest.raises(ValueError, match='Solo se cargaron 1 de 2 filas'):
+        staged_upsert('postgresql', conn, df, 'public', 'clientes', ['id'], logger)
+    assert not any('ON CONFLICT' in sql for sql in conn.statements)
+    assert 'DROP' in conn.statements[-1]
@@ -0,0 +1,144 @@
+"""Detección de cambios y materialización incremental"""
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from sage.change_detection import CHANGE_COLUMN, FingerprintStore, detect_changes
+
+
+def _catalog():
+    return pd.DataFrame({'id': [1, 2, 3, 4], 'nombre': ['a', 'b', 'c', 'd'], 'saldo': [10.0, 20.0, 30.0, 40.0]})
+
+
+def test_first_load_reports_everything_as_new():
+    changes = detect_changes(_catalog(), ['id'], None)
+    assert changes.summary() == "4 nuevas, 0 modificadas, 0 eliminadas"
+
+
+def test_detects_inserts_updates_and_deletes():
+    previous = detect_changes(_catalog(), ['id'], None).state
+    current = pd.concat([_catalog().iloc[1:], pd.DataFrame({'id': [5], 'nombre': ['e'], 'saldo': [50.0]})])
+    current.loc[current['id'] == 3, 'saldo'] = 33.0
+
+    changes = detect_changes(current, ['id'], previous)
+
+    assert changes.inserts['id'].tolist() == [5]
+    assert changes.updates['id'].tolist() == [3]
+    assert changes.deletes['id'].tolist() == [1]
+    delta = changes.to_delta_frame()
+    assert delta.groupby(CHANGE_COLUMN).size().to_dict() == {'delete': 1, 'insert': 1, 'update': 1}
+
+
+def test_identical_snapshot_with_numeric_dtype_drift_has_no_changes():
+    previous = detect_changes(_catalog(), ['id'], None).state
+    drifted = _catalog().astype({'id': 'float64'})
+    assert detect_changes(drifted, ['id'], previous).empty
+
+
+def test_keys_still_present_are_never_deleted():
+    previous = detect_changes(_catalog(), ['id'], None).state
+    # Huella con hashes de otra versión: las claves siguen estando en los datos
+    previous['_sage_key_hash'] = previous['_sage_key_hash'] + 1
+    changes = detect_changes(_catalog(), ['id'], previous)
+    assert changes.deletes.empty
+
+
+def test_composite_keys_and_disabled_deletes():
+    df = pd.DataFrame({'tienda': [1, 1, 2], 'sku': ['A', 'B', 'A'], 'unidades': [1, 2, 3]})
+    previous = detect_changes(df, ['tienda', 'sku'], None).state
+    current = df.iloc[:2].assign(unidades=[1, 5])
+    changes = detect_changes(current, ['tienda', 'sku'], previous, include_deletes=False)
+    assert changes.updates[['tienda', 'sku']].values.tolist() == [[1, 'B']]
+    assert changes.deletes.empty
+
+
+def test_fingerprint_store_roundtrip(tmp_path):
+    store = FingerprintStore(str(tmp_path))
+    assert store.load(7) is None
+    state = detect_changes(_catalog(), ['id'], None).state
+    store.save(7, state)
+    pd.testing.assert_frame_equal(store.load(7), state)
+    store.clear(7)
+    assert store.load(7) is None
+
+
+@pytest.fixture
+def processor(logger, monkeypatch, tmp_path):
+    pm = pytest.importorskip('sage.process_materializations')
+    processor = pm.MaterializationProcessor(logger)
+    processor.fingerprints = FingerprintStore(str(tmp_path / 'estado'))
+    processor.registered = []
+    monkeypatch.setattr(processor, '_register_materialization_execution',
+                        lambda mat_id, exec_id, status, message, *args: processor.registered.append((status, message)))
+    return processor
+
+
+def _materialization(**config):
+    base = {'destination_type': 'db', 'destination_id': 1, 'tablaDestino': 'clientes', 'esquema': 'main',
+            'operation': 'append', 'primaryKey': ['id'], 'incremental': True}
+    return {'id': 42, 'nombre': 'clientes', 'config': dict(base, **config)}
+
+
+def test_two_incremental_loads_keep_unchanged_rows_in_duckdb(processor, monkeypatch, tmp_path):
+    pytest.importorskip('duckdb_engine')
+    import sqlalchemy
+    path = str(tmp_path / 'destino.duckdb')
+    monkeypatch.setattr(processor, '_get_db_connection_info', lambda _id: {
+        'tipo': 'duckdb', 'servidor': path, 'puerto': None, 'usuario': '', 'contrasena': '', 'basedatos': ''})
+
+    processor._process_materialization(_materialization(), _catalog(), 'e1')
+    second = _catalog().iloc[1:].copy()
+    second.loc[second['id'] == 3, 'saldo'] = 33.0
+    processor._process_materialization(_materialization(), second, 'e2')
+
+    with sqlalchemy.create_engine(f"duckdb:///{path}").connect() as conn:
+        rows = conn.exec_driver_sql('SELECT id, saldo FROM clientes ORDER BY id').fetchall()
+    assert [tuple(row) for row in rows] == [(2, 20.0), (3, 33.0), (4, 40.0)]
+    assert [status for status, _ in processor.registered] == ['completado', 'completado']
+
+
+def test_incremental_load_on_postgres_only_sends_the_delta(processor, monkeypatch):
+    monkeypatch.setattr(processor, '_get_db_connection_info', lambda _id: {
+        'tipo': 'postgresql', 'servidor': 'db', 'puerto': None, 'usuario': 'u', 'contrasena': 'p', 'basedatos': 'd'})
+    monkeypatch.setattr('sqlalchemy.create_engine', mock.MagicMock())
+    monkeypatch.setattr('psycopg2.connect', mock.MagicMock())
+    to_sql = mock.MagicMock()
+    monkeypatch.setattr(pd.DataFrame, 'to_sql', to_sql)
+    bulk_load = mock.MagicMock(return_value=(4, 'copy'))
+    monkeypatch.setattr('sage.process_materializations.bulk_load', bulk_load)
+    staged_upsert = mock.MagicMock(return_value=(0, 1))
+    staged_delete = mock.MagicMock(return_value=1)
+    monkeypatch.setattr(processor, '_staged_upsert', staged_upsert)
+    monkeypatch.setattr(processor, '_staged_delete', staged_delete)
+
+    processor._process_materialization(_materialization(esquema='public'), _catalog(), 'e1')
+    second = _catalog().iloc[1:].copy()
+    second.loc[second['id'] == 3, 'saldo'] = 33.0
+    processor._process_materialization(_materialization(esquema='public'), second, 'e2')
+
+    # Primera carga completa con la operación configurada
+    assert len(bulk_load.call_args.args[2]) == 4
+    # Segunda carga: solo la fila modificada y la clave eliminada
+    assert staged_upsert.call_args.args[2]['id'].tolist() == [3]
+    assert staged_delete.call_args.args[2]['id'].tolist() == [1]
+    assert all(call.kwargs.get('if_exists') != 'replace' for call in to_sql.call_args_list)
+
+
+def test_partial_staging_load_keeps_previous_fingerprint(processor, monkeypatch, tmp_path):
+    pytest.importorskip('duckdb_engine')
+    path = str(tmp_path / 'destino.duckdb')
+    monkeypatch.setattr(processor, '_get_db_connection_info', lambda _id: {
+        'tipo': 'duckdb', 'servidor': path, 'puerto': None, 'usuario': '', 'contrasena': '', 'basedatos': ''})
+    processor._process_materialization(_materialization(), _catalog(), 'e1')
+    first_state = processor.fingerprints.load(42)
+
+    monkeypatch.setattr('sage.bulk_upsert.bulk_load',
+                        lambda db_type, conn, df, table, logger, loaders=None: (len(df) - 1, 'executemany'))
+    second = _catalog()
+    second['saldo'] = second['saldo'] + 1
+    with pytest.raises(ValueError, match='Solo se cargaron 3 de 4 filas'):
+        processor._process_materialization(_materialization(), second, 'e2')
+
+    # La fila omitida no llegó al destino: la próxima carga debe volver a enviarla
+    pd.testing.assert_frame_equal(processor.fingerprints.load(42), first_state)
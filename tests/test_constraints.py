@@ -0,0 +1,90 @@
+"""Tests de requeridos, claves únicas compuestas y claves foráneas"""
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from sage.constraints import HashSet, KeyIndex, check_constraints, key_hashes
+from test_file_processor import load_config, run
+
+
+def test_check_constraints_composite_unique_key():
+    df = pd.DataFrame({
+        'region': ['N', 'N', 'S', 'N', None, None],
+        'id': [1, 2, 1, 1, 3, 3],
+    })
+    results = check_constraints(df, required=['region'], unique_keys=[('id',), ('region', 'id')])
+
+    assert results[('requerido', ('region',))].tolist() == [False, False, False, False, True, True]
+    assert results[('unico', ('id',))].tolist() == [False, False, True, True, False, True]
+    # La combinación (None, 3) se repite: los nulos cuentan como un valor más
+    assert results[('unico', ('region', 'id'))].tolist() == [False, False, False, True, False, True]
+
+
+def test_key_hashes_ignore_numeric_dtype():
+    ints = pd.DataFrame({'id': pd.Series([1, 2], dtype='int64'), 'cod': ['a', 'b']})
+    floats = pd.DataFrame({'id': pd.Series([1.0, 2.0]), 'cod': ['a', 'b']})
+    nullable = pd.DataFrame({'id': pd.Series([1, 2], dtype='Int64'), 'cod': ['a', 'b']})
+
+    expected = key_hashes(ints, ['id', 'cod']).tolist()
+    assert key_hashes(floats, ['id', 'cod']).tolist() == expected
+    assert key_hashes(nullable, ['id', 'cod']).tolist() == expected
+
+
+def test_key_index_composite_missing_mask():
+    ref = pd.DataFrame({'region': ['N', 'S', 'N'], 'id': [1, 1, 2]})
+    index = KeyIndex(ref, ['region', 'id'])
+    df = pd.DataFrame({'reg': ['N', 'S', 'S', None], 'cli': [2, 1, 2, 9]})
+
+    # Las filas con algún valor nulo en la clave no se consideran huérfanas
+    assert index.missing_mask(df, ['reg', 'cli']).tolist() == [False, False, True, False]
+    assert len(index) == 3
+
+
+def test_hash_set_matches_python_set():
+    rng = np.random.default_rng(7)
+    seen, expected = HashSet(), set()
+    for _ in range(200):
+        hashes = rng.integers(0, 3000, size=rng.integers(0, 80)).astype(np.uint64)
+        found = seen.contains(hashes)
+        assert found.tolist() == [value in expected for value in hashes.tolist()]
+        new = np.unique(hashes[~found])
+        seen.add(new)
+        expected.update(new.tolist())
+    assert len(seen) == len(expected)
+
+
+def test_composite_foreign_key_reports_orphans(tmp_path):
+    csv_format = {'type': 'CSV', 'delimiter': ',', 'header': True}
+    catalogs = {
+        'clientes': {
+            'name': 'clientes', 'description': 'c', 'filename': 'clientes.csv', 'file_format': csv_format,
+            'fields': [{'name': 'region', 'type': 'texto'}, {'name': 'id', 'type': 'entero'}],
+            'unique_keys': [['region', 'id']],
+        },
+        'ventas': {
+            'name': 'ventas', 'description': 'v', 'filename': 'ventas.csv', 'file_format': csv_format,
+            'fields': [{'name': 'vid', 'type': 'entero'}, {'name': 'reg', 'type': 'texto'},
+                       {'name': 'cliente', 'type': 'entero'}],
+        },
+    }
+    packages = {'pk': {
+        'name': 'pk', 'description': 'p', 'catalogs': ['clientes', 'ventas'], 'file_format': {'type': 'ZIP'},
+        'foreign_keys': [{'name': 'venta_cliente', 'catalog': 'ventas', 'fields': ['reg', 'cliente'],
+                          'references': {'catalog': 'clientes', 'fields': ['region', 'id']}}],
+    }}
+    config = load_config(tmp_path, catalogs, packages)
+    data_path = tmp_path / 'pk.zip'
+    with zipfile.ZipFile(data_path, 'w') as zf:
+        zf.writestr('clientes.csv', 'region,id\nN,1\nS,1\nN,2\nN,2\n')
+        zf.writestr('ventas.csv', 'vid,reg,cliente\n1,N,1\n2,S,2\n3,N,2\n4,N,\n5,S,1\n6,N,3\n')
+
+    _, logger, errors, _ = run(config, data_path, 'pk', tmp_path)
+
+    fk_events = [event for event in logger.events
+                 if event['message'].startswith('Foreign key validation failed')]
+    assert [event['details']['lines'] for event in fk_events] == [[3, 7]]
+    duplicate_events = [event for event in logger.events
+                        if event['message'] == 'Fields (region, id) must be unique together']
+    assert [event['details']['lines'] for event in duplicate_events] == [[5]]
+    assert errors == 3
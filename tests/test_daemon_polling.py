@@ -0,0 +1,118 @@
+"""Revisión concurrente de casillas por ciclo (SageDaemon2.run_cycle)"""
+import logging
+import threading
+
+import pytest
+
+from sage_daemon2 import daemon, notificaciones
+
+
+class FakeDatabaseManager:
+    """Sustituye la conexión del daemon; cada hilo de casilla abre la suya"""
+
+    email_configs = []
+    sftp_configs = []
+    closed = []
+
+    def get_email_configurations(self):
+        return self.email_configs
+
+    def get_sftp_configurations(self):
+        return self.sftp_configs
+
+    def get_authorized_senders(self, casilla_id):
+        return [f'remitente-{casilla_id}']
+
+    def close(self):
+        self.closed.append(threading.current_thread().name)
+
+
+@pytest.fixture
+def polled(monkeypatch):
+    """Procesadores falsos: guardan (tipo, casilla) y ejecutan la acción configurada para cada par"""
+    calls, actions = [], {}
+
+    def process(kind, config):
+        casilla_id = config['casilla_id']
+        calls.append((kind, casilla_id))
+        action = actions.get((kind, casilla_id))
+        if action is not None:
+            action()
+
+    class FakeEmailProcessor:
+        def __init__(self, db_manager, job_queue=None):
+            pass
+
+        def process_email(self, config, authorized_senders, mail=None):
+            assert authorized_senders == [f"remitente-{config['casilla_id']}"]
+            process('email', config)
+
+    class FakeSFTPProcessor:
+        def __init__(self, db_manager, job_queue=None):
+            pass
+
+        def process_sftp(self, config):
+            process('sftp', config)
+
+    FakeDatabaseManager.closed = []
+    monkeypatch.setattr(daemon, 'DatabaseManager', FakeDatabaseManager)
+    monkeypatch.setattr(daemon, 'JobQueue', lambda: None)
+    monkeypatch.setattr(daemon, 'EmailProcessor', FakeEmailProcessor)
+    monkeypatch.setattr(daemon, 'SFTPProcessor', FakeSFTPProcessor)
+    monkeypatch.setattr(notificaciones, 'NotificacionesManager', lambda db_manager: None)
+    return calls, actions
+
+
+def configure(email=(), sftp=()):
+    FakeDatabaseManager.email_configs = [{'id': n, 'casilla_id': casilla_id} for n, casilla_id in enumerate(email)]
+    FakeDatabaseManager.sftp_configs = [{'id': n, 'casilla_id': casilla_id} for n, casilla_id in enumerate(sftp)]
+
+
+def test_slow_casilla_does_not_block_the_others(polled):
+    calls, actions = polled
+    configure(email=[1, 2], sftp=[3])
+    release, others_done = threading.Event(), threading.Event()
+    actions[('email', 1)] = lambda: release.wait(10)
+    actions[('sftp', 3)] = others_done.set
+
+    cycle = threading.Thread(target=daemon.SageDaemon2(max_workers=3).run_cycle)
+    cycle.start()
+    try:
+        # Las casillas 2 y 3 terminan mientras la 1 sigue bloqueada
+        assert others_done.wait(5)
+        assert cycle.is_alive()
+        assert set(calls) == {('email', 1), ('email', 2), ('sftp', 3)}
+    finally:
+        release.set()
+        cycle.join(10)
+    assert not cycle.is_alive()
+    # Cada casilla abre y cierra su propia conexión
+    assert len(FakeDatabaseManager.closed) == 3
+
+
+def test_failures_are_isolated_and_reported_per_casilla(polled, monkeypatch, caplog):
+    calls, actions = polled
+    configure(email=[1, 2], sftp=[1, 2])
+
+    def imap_down():
+        raise ConnectionError("IMAP no disponible")
+    actions[('email', 1)] = imap_down
+
+    sage_daemon = daemon.SageDaemon2(max_workers=2)
+    poll_casilla = sage_daemon._poll_casilla
+
+    def poll(casilla_id, tasks):
+        poll_casilla(casilla_id, tasks)
+        if casilla_id == 2:
+            raise RuntimeError("conexión a la base de datos perdida")
+    monkeypatch.setattr(sage_daemon, '_poll_casilla', poll)
+
+    with caplog.at_level(logging.ERROR, logger='SAGE_Daemon2.Main'):
+        sage_daemon.run_cycle()
+
+    # El fallo del correo no impide revisar el SFTP de la misma casilla
+    assert sorted(calls) == [('email', 1), ('email', 2), ('sftp', 1), ('sftp', 2)]
+    errors = [record.getMessage() for record in caplog.records if record.levelno == logging.ERROR]
+    assert "Error al procesar email de la casilla 1: IMAP no disponible" in errors
+    assert "Error al revisar la casilla 2: conexión a la base de datos perdida" in errors
+    assert not any('casilla 2' in message and 'email' in message for message in errors)
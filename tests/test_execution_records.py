@@ -0,0 +1,107 @@
+"""Registro de ejecuciones en ejecuciones_yaml"""
+from contextlib import contextmanager
+from unittest import mock
+
+import psycopg2
+import pytest
+
+from sage import execution_records
+from sage.execution_records import ExecutionRecorder
+
+
+@pytest.fixture
+def database(monkeypatch):
+    state = {'fail': False, 'inserted': [], 'error': None}
+    conn = mock.MagicMock()
+
+    @contextmanager
+    def connection(dsn=None):
+        if state['fail']:
+            raise RuntimeError("base de datos no disponible")
+        yield conn
+
+    monkeypatch.setattr(execution_records.db_pool, 'connection', connection)
+    def insert(self, conn, rows):
+        error = state['error']
+        if error is not None and any(row['estado'] == 'rechazada' for row in rows):
+            raise error
+        state['inserted'].extend(rows)
+
+    monkeypatch.setattr(ExecutionRecorder, '_insert', insert)
+    return state
+
+
+def test_rows_are_inserted_synchronously_by_default(database, monkeypatch):
+    monkeypatch.delenv('SAGE_DB_BATCH_SIZE', raising=False)
+    recorder = ExecutionRecorder()
+    recorder.add({'estado': 'Éxito'})
+    assert database['inserted'] == [{'estado': 'Éxito'}]
+    assert recorder._timer is None
+
+
+def test_insert_errors_propagate_and_rows_are_retried(database):
+    recorder = ExecutionRecorder(batch_size=1)
+    database['fail'] = True
+    with pytest.raises(RuntimeError):
+        recorder.add({'estado': 'Fallido'})
+
+    database['fail'] = False
+    recorder.add({'estado': 'Éxito'})
+    assert [row['estado'] for row in database['inserted']] == ['Fallido', 'Éxito']
+
+
+def test_batches_when_configured(database):
+    recorder = ExecutionRecorder(batch_size=3, flush_interval=60)
+    recorder.add({'estado': 'a'})
+    recorder.add({'estado': 'b'})
+    assert database['inserted'] == []
+    recorder.add({'estado': 'c'})
+    assert len(database['inserted']) == 3
+
+
+def test_rejected_row_is_dropped_without_blocking_the_batch(database):
+    recorder = ExecutionRecorder(batch_size=3, flush_interval=60)
+    database['error'] = psycopg2.DataError("valor fuera de rango")
+    recorder.add({'estado': 'a'})
+    recorder.add({'estado': 'rechazada'})
+    with pytest.raises(psycopg2.DataError):
+        recorder.add({'estado': 'c'})
+    assert [row['estado'] for row in database['inserted']] == ['a', 'c']
+    assert recorder._pending == []
+
+    recorder.add({'estado': 'd'})
+    assert recorder.flush() == 1
+
+
+def test_connection_lost_during_insert_keeps_rows(database):
+    recorder = ExecutionRecorder(batch_size=2, flush_interval=60)
+    database['error'] = psycopg2.OperationalError("conexión cerrada")
+    recorder.add({'estado': 'a'})
+    with pytest.raises(psycopg2.OperationalError):
+        recorder.add({'estado': 'rechazada'})
+    assert [row['estado'] for row in recorder._pending] == ['a', 'rechazada']
+
+
+def test_reference_exists_only_caches_found_records(monkeypatch):
+    found = {'casillas': set()}
+    queries = []
+
+    @contextmanager
+    def connection(dsn=None):
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value = cursor
+        cursor.execute.side_effect = lambda sql, params: queries.append(params[0])
+        cursor.fetchone.side_effect = lambda: (1,) if queries[-1] in found['casillas'] else None
+        conn = mock.MagicMock()
+        conn.cursor.return_value = cursor
+        yield conn
+
+    monkeypatch.setattr(execution_records.db_pool, 'connection', connection)
+    monkeypatch.setattr(execution_records, '_reference_cache', {})
+
+    assert not execution_records.reference_exists('casillas', 5)
+    # Una casilla dada de alta después se encuentra en la siguiente consulta
+    found['casillas'].add(5)
+    assert execution_records.reference_exists('casillas', 5)
+    assert execution_records.reference_exists('casillas', 5)
+    assert queries == [5, 5]
@@ -0,0 +1,310 @@
+"""Tests de FileProcessor: modo streaming y validación en paralelo de paquetes ZIP"""
+import io
+import zipfile
+
+import pytest
+import yaml
+
+from sage.file_processor import FileProcessor, _Utf8OrLatin1Stream
+from sage.logger import SageLogger
+from sage.yaml_validator import YAMLValidator
+
+
+def catalog(name, filename, **extra):
+    definition = {
+        'name': name,
+        'description': name,
+        'filename': filename,
+        'file_format': {'type': 'CSV', 'delimiter': ',', 'header': True},
+        'fields': [
+            {'name': 'id', 'type': 'entero', 'required': True, 'unique': True},
+            {'name': 'monto', 'type': 'decimal', 'validation_rules': [
+                {'name': 'positivo', 'description': 'monto positivo',
+                 'rule': "df['monto'] > 0", 'severity': 'error'},
+            ]},
+            {'name': 'nombre', 'type': 'texto', 'required': True},
+        ],
+    }
+    definition.update(extra)
+    return definition
+
+
+def load_config(tmp_path, catalogs, packages=None):
+    document = {
+        'sage_yaml': {'name': 't', 'description': 't', 'version': '1', 'author': 't'},
+        'catalogs': catalogs,
+        'packages': packages or {'pk': {'name': 'pk', 'description': 'p', 'catalogs': list(catalogs),
+                                        'file_format': {'type': 'ZIP'}}},
+    }
+    path = tmp_path / 'config.yaml'
+    path.write_text(yaml.safe_dump(document, allow_unicode=True), encoding='utf-8')
+    return YAMLValidator().load_and_validate(str(path))
+
+
+def sample_rows(rows, offset=0, repeat_every=None):
+    lines = ['id,monto,nombre']
+    for i in range(rows):
+        monto = -1 if i % 7 == 0 else i + 0.5
+        nombre = '' if i % 11 == 0 else f'n{i}'
+        # Repetir claves de filas muy anteriores para cruzar límites de bloque
+        key = i % repeat_every if repeat_every and i % 13 == 0 else i + offset
+        lines.append(f'{key},{monto},{nombre}')
+    return '\n'.join(lines) + '\n'
+
+
+def run(config, data_path, package, tmp_path, **kwargs):
+    log_dir = tmp_path / f'log_{len(list(tmp_path.iterdir()))}'
+    log_dir.mkdir()
+    logger = SageLogger(str(log_dir), console_output='off')
+    processor = FileProcessor(config, logger, **kwargs)
+    errors, warnings = processor.process_file(str(data_path), package)
+    return processor, logger, errors, warnings
+
+
+def event_signature(logger):
+    return [
+        (event['severity'], event['message'],
+         {k: v for k, v in event['details'].items() if k != 'exception'})
+        for event in logger.events
+        if not event['message'].startswith('Validating ')
+    ]
+
+
+@pytest.fixture
+def zip_package(tmp_path):
+    catalogs = {name: catalog(name, f'{name}.csv') for name in ('a', 'b', 'c')}
+    packages = {'pk': {
+        'name': 'pk', 'description': 'p', 'catalogs': list(catalogs),
+        'file_format': {'type': 'ZIP'},
+        'package_validation': [{'name': 'cross', 'description': 'x',
+                                'rule': "len(df['a']) == len(df['b'])", 'severity': 'error'}],
+    }}
+    config = load_config(tmp_path, catalogs, packages)
+    data_path = tmp_path / 'pk.zip'
+    with zipfile.ZipFile(data_path, 'w') as zf:
+        for i, name in enumerate(catalogs):
+            zf.writestr(f'{name}.csv', sample_rows(200 + i * 10))
+    return config, data_path
+
+
+def test_parallel_zip_validation_matches_sequential(tmp_path, zip_package):
+    config, data_path = zip_package
+    sequential, seq_logger, seq_errors, seq_warnings = run(config, data_path, 'pk', tmp_path)
+    parallel, par_logger, par_errors, par_warnings = run(config, data_path, 'pk', tmp_path, workers=2)
+
+    assert (par_errors, par_warnings) == (seq_errors, seq_warnings)
+    assert seq_errors > 0
+    assert event_signature(par_logger) == event_signature(seq_logger)
+    assert list(parallel.dataframes) == list(sequential.dataframes)
+    assert parallel.rule_failure_counts == sequential.rule_failure_counts
+    assert any(event['message'].startswith('Validating 3 catalogs in parallel')
+               for event in par_logger.events)
+
+
+def detailed_errors(logger):
+    """Líneas detalladas por verificación; en streaming cada bloque reporta su propio lote"""
+    lines = {}
+    for severity, message, details in event_signature(logger):
+        if severity == 'error':
+            lines.setdefault(message, []).extend(details.get('lines', []))
+    return lines
+
+
+def test_streaming_matches_full_validation(tmp_path):
+    config = load_config(tmp_path, {'ventas': catalog('ventas', 'ventas.csv', unique_keys=[['id', 'nombre']])})
+    data_path = tmp_path / 'ventas.csv'
+    data_path.write_text(sample_rows(500, repeat_every=40), encoding='utf-8')
+
+    full, full_logger, full_errors, full_warnings = run(config, data_path, 'ventas', tmp_path)
+    streamed, stream_logger, stream_errors, stream_warnings = run(
+        config, data_path, 'ventas', tmp_path, chunksize=64
+    )
+
+    assert full.last_processed_df is not None
+    assert streamed.last_processed_df is None
+    assert (stream_errors, stream_warnings) == (full_errors, full_warnings)
+    assert detailed_errors(stream_logger) == detailed_errors(full_logger)
+    assert streamed.rule_failure_counts == full.rule_failure_counts
+    assert any('modo streaming' in message and 'materializaciones' in message
+               for message in (event['message'] for event in stream_logger.events
+                               if event['severity'] == 'warning'))
+
+
+def test_streaming_short_last_chunk_keeps_error_limit(tmp_path):
+    config = load_config(tmp_path, {'ventas': catalog('ventas', 'ventas.csv')})
+    data_path = tmp_path / 'ventas.csv'
+    data_path.write_text(sample_rows(110), encoding='utf-8')
+
+    full, full_logger, _, _ = run(config, data_path, 'ventas', tmp_path)
+    streamed, stream_logger, _, _ = run(config, data_path, 'ventas', tmp_path, chunksize=50)
+
+    # El último bloque tiene 10 filas y un monto negativo: no debe detallarse por encima del límite
+    expected = detailed_errors(full_logger)
+    assert len(expected['Field validation failed: monto positivo']) == FileProcessor.MAX_ERRORS_PER_RULE
+    assert detailed_errors(stream_logger) == expected
+    assert streamed.rule_failure_counts == full.rule_failure_counts
+
+
+def test_streaming_detects_latin1_after_first_chunk(tmp_path):
+    config = load_config(tmp_path, {'ventas': catalog('ventas', 'ventas.csv')})
+    data_path = tmp_path / 'ventas.csv'
+    text = sample_rows(300) + '300,5.5,Muñoz\n'
+    data_path.write_bytes(text.encode('latin1'))
+
+    full, full_logger, full_errors, full_warnings = run(config, data_path, 'ventas', tmp_path)
+    streamed, stream_logger, stream_errors, stream_warnings = run(
+        config, data_path, 'ventas', tmp_path, chunksize=64
+    )
+
+    assert full.last_processed_df['nombre'].iloc[-1] == 'Muñoz'
+    assert (stream_errors, stream_warnings) == (full_errors, full_warnings)
+    assert detailed_errors(stream_logger) == detailed_errors(full_logger)
+
+
+def test_streaming_zip_matches_full_validation(tmp_path, zip_package):
+    config, data_path = zip_package
+    full, full_logger, full_errors, full_warnings = run(config, data_path, 'pk', tmp_path)
+    # El modo streaming solo se usa en paquetes sin reglas de paquete
+    config.packages['pk'].package_validation = []
+    streamed, stream_logger, stream_errors, stream_warnings = run(
+        config, data_path, 'pk', tmp_path, chunksize=64
+    )
+
+    assert streamed.dataframes == {}
+    assert (stream_errors, stream_warnings) == (full_errors - 1, full_warnings)
+    assert detailed_errors(stream_logger) == {
+        message: lines for message, lines in detailed_errors(full_logger).items()
+        if not message.startswith('Package validation')
+    }
+
+
+def test_catalog_rules_disable_streaming(tmp_path):
+    rules = [{'name': 'filas', 'description': 'al menos 300 filas',
+              'rule': 'len(df) >= 300', 'severity': 'error'}]
+    config = load_config(tmp_path, {'ventas': catalog('ventas', 'ventas.csv', catalog_validation=rules)})
+    data_path = tmp_path / 'ventas.csv'
+    data_path.write_text(sample_rows(400), encoding='utf-8')
+
+    full, full_logger, full_errors, _ = run(config, data_path, 'ventas', tmp_path)
+    streamed, stream_logger, stream_errors, _ = run(config, data_path, 'ventas', tmp_path, chunksize=64)
+
+    # Por bloques len(df) >= 300 fallaría; el catálogo se valida completo
+    assert stream_errors == full_errors
+    assert streamed.last_processed_df is not None
+    assert not any(event['message'].startswith('Catalog validation failed')
+                   for event in stream_logger.events)
+    assert any('reglas de catálogo' in event['message'] for event in stream_logger.events
+               if event['severity'] == 'warning')
+
+
+@pytest.mark.parametrize('read_size', [1, 2, 5, 4096])
+def test_utf8_or_latin1_stream(read_size):
+    utf8 = 'año,ñu\n'.encode('utf-8') * 3
+    stream = _Utf8OrLatin1Stream(io.BytesIO(utf8))
+    assert b''.join(iter(lambda: stream.read(read_size), b'')) == utf8
+    assert not stream.fallback
+
+    latin1 = 'abc\nMuñoz,é\n'.encode('latin1')
+    stream = _Utf8OrLatin1Stream(io.BytesIO(latin1))
+    assert b''.join(iter(lambda: stream.read(read_size), b'')).decode('utf-8') == 'abc\nMuñoz,é\n'
+    assert stream.fallback
+
+
+def engine_catalog(engine):
+    return {
+        'name': 'ventas', 'description': 'v', 'filename': 'ventas.csv',
+        'file_format': {'type': 'CSV', 'delimiter': ',', 'header': True, 'engine': engine},
+        'fields': [
+            {'name': 'id', 'type': 'entero', 'required': True, 'unique': True},
+            {'name': 'nombre', 'type': 'texto', 'required': True, 'validation_rules': [
+                {'name': 'corto', 'description': 'nombre corto',
+                 'rule': "df['nombre'].str.len() < 6", 'severity': 'error'},
+            ]},
+            {'name': 'alta', 'type': 'fecha'},
+            {'name': 'monto', 'type': 'decimal'},
+        ],
+    }
+
+
+@pytest.mark.parametrize('content', [
+    # Texto vacío o con marcadores de nulo en un campo requerido
+    'id,nombre,alta,monto\n1,ana,2024-01-01,1.5\n2,,2024-01-02,2\n3,None,,3\n4,<NA>,2024-13-01,\n'
+    '5,larguisimo,2024-01-05,NA\n',
+    # Filas cortas: pandas las rellena con nulos
+    'id,nombre,alta,monto\n1,ana,2024-01-01,1.5\n2,larguisimo\n3,eva,2024-01-03\n',
+])
+def test_pyarrow_engine_matches_pandas(tmp_path, content):
+    data_path = tmp_path / 'ventas.csv'
+    data_path.write_text(content, encoding='utf-8')
+    results = {}
+    for engine in ('pandas', 'pyarrow'):
+        config = load_config(tmp_path, {'ventas': engine_catalog(engine)})
+        processor, logger, errors, warnings = run(config, data_path, 'ventas', tmp_path)
+        results[engine] = (errors, warnings, detailed_errors(logger),
+                           processor.last_processed_df['nombre'].tolist())
+
+    assert results['pyarrow'] == results['pandas']
+    assert results['pandas'][0] > 0
+
+
+def test_pyarrow_engine_keeps_numeric_text_as_written(tmp_path):
+    """Diferencia documentada: pandas infiere números en columnas texto y los reescribe"""
+    data_path = tmp_path / 'ventas.csv'
+    data_path.write_text('id,nombre,alta,monto\n1,007,2024-01-01,1\n2,1.50,2024-01-02,2\n', encoding='utf-8')
+    names = {}
+    for engine in ('pandas', 'pyarrow'):
+        config = load_config(tmp_path, {'ventas': engine_catalog(engine)})
+        processor, _, _, _ = run(config, data_path, 'ventas', tmp_path)
+        names[engine] = processor.last_processed_df['nombre'].tolist()
+
+    assert names == {'pandas': ['7.0', '1.5'], 'pyarrow': ['007', '1.50']}
+
+
+def budget_catalog(max_failing_checks):
+    positive = lambda column: {'name': 'positivo', 'description': 'valor inválido',
+                               'rule': f"df['{column}'] > 0", 'severity': 'error'}
+    return {
+        'name': 'ventas', 'description': 'v', 'filename': 'ventas.csv',
+        'file_format': {'type': 'CSV', 'delimiter': ',', 'header': True},
+        'fields': [
+            {'name': 'id', 'type': 'entero'},
+            {'name': 'a', 'type': 'decimal', 'validation_rules': [positive('a')]},
+            {'name': 'b', 'type': 'decimal', 'validation_rules': [positive('b')]},
+        ],
+        'validation_budget': {'sample_rows': 50, 'max_failing_checks': max_failing_checks},
+    }
+
+
+BUDGET_ROWS = 'id,a,b\n' + ''.join(f'{i},-1,-2\n' for i in range(100))
+
+
+def test_budget_counts_checks_by_field_and_rule(tmp_path):
+    # Dos reglas con la misma descripción en campos distintos son dos verificaciones
+    data_path = tmp_path / 'ventas.csv'
+    data_path.write_text(BUDGET_ROWS, encoding='utf-8')
+
+    config = load_config(tmp_path, {'ventas': budget_catalog(max_failing_checks=2)})
+    _, logger, errors, _ = run(config, data_path, 'ventas', tmp_path)
+    assert errors == 200
+    assert 'status' not in logger.file_stats['ventas.csv']
+
+    config = load_config(tmp_path, {'ventas': budget_catalog(max_failing_checks=1)})
+    processor, logger, errors, _ = run(config, data_path, 'ventas', tmp_path)
+    assert errors == 1
+    assert logger.file_stats['ventas.csv'] == {'records': 0, 'errors': 1, 'warnings': 0, 'status': 'Rechazado'}
+    assert any('2 verificaciones con errores' in event['message'] for event in logger.events)
+
+
+def test_budget_rejection_status_in_zip(tmp_path):
+    packages = {'pk': {'name': 'pk', 'description': 'p', 'catalogs': ['ventas'],
+                       'file_format': {'type': 'ZIP'}}}
+    config = load_config(tmp_path, {'ventas': budget_catalog(max_failing_checks=1)}, packages)
+    data_path = tmp_path / 'pk.zip'
+    with zipfile.ZipFile(data_path, 'w') as zf:
+        zf.writestr('ventas.csv', BUDGET_ROWS)
+
+    processor, logger, errors, _ = run(config, data_path, 'pk', tmp_path)
+
+    assert errors == 1
+    assert processor.last_processed_df['estado'].tolist() == ['Rechazado']
+    assert logger.file_stats['ventas.csv']['status'] == 'Rechazado'
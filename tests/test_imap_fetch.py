@@ -0,0 +1,68 @@
+"""Interpretación de BODYSTRUCTURE y descarga por partes (sage_daemon2.imap_fetch)"""
+import base64
+
+from sage_daemon2.imap_fetch import download_part, find_attachments, parse_fetch_response
+
+TEXT_PART = b'("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 10 1 NIL NIL NIL NIL)'
+CSV_PART = (b'("TEXT" "CSV" ("NAME" "ventas.csv") NIL NIL "BASE64" 120 2 NIL '
+            b'("ATTACHMENT" ("FILENAME" "ventas.csv")) NIL NIL)')
+
+
+def _structure(uid, body):
+    messages = parse_fetch_response([b'* 1 FETCH (UID ' + uid + b' BODYSTRUCTURE ' + body + b')'])
+    return messages[uid.decode()]['BODYSTRUCTURE']
+
+
+def test_finds_attachment_in_multipart_message():
+    structure = _structure(b'7', b'(' + TEXT_PART + CSV_PART + b' "MIXED" ("BOUNDARY" "b1") NIL NIL NIL)')
+    assert find_attachments(structure) == [
+        {'section': '2', 'filename': 'ventas.csv', 'encoding': 'base64', 'size': 120}]
+
+
+def test_finds_attachment_inside_forwarded_message():
+    envelope = b'("Mon, 1 Jan 2024 00:00:00 +0000" "Fwd" NIL NIL NIL NIL NIL NIL NIL "<id@x>")'
+    inner = b'(' + TEXT_PART + CSV_PART + b' "MIXED" ("BOUNDARY" "b2") NIL NIL NIL)'
+    forwarded = (b'("MESSAGE" "RFC822" NIL NIL NIL "7BIT" 500 ' + envelope + b' ' + inner
+                 + b' 20 NIL ("ATTACHMENT" NIL) NIL NIL)')
+    structure = _structure(b'18', b'(' + TEXT_PART + forwarded + b' "MIXED" ("BOUNDARY" "b1") NIL NIL NIL)')
+
+    assert find_attachments(structure) == [
+        {'section': '2.2', 'filename': 'ventas.csv', 'encoding': 'base64', 'size': 120}]
+
+
+def test_single_part_forwarded_message_body_is_section_n_1():
+    envelope = b'(NIL "Fwd" NIL NIL NIL NIL NIL NIL NIL NIL)'
+    forwarded = b'("MESSAGE" "RFC822" NIL NIL NIL "7BIT" 500 ' + envelope + b' ' + CSV_PART + b' 20 NIL NIL NIL NIL)'
+    structure = _structure(b'19', b'(' + TEXT_PART + forwarded + b' "MIXED" ("BOUNDARY" "b1") NIL NIL NIL)')
+    assert [part['section'] for part in find_attachments(structure)] == ['2.1']
+
+
+def test_decodes_rfc2231_filenames_and_literals():
+    part = (b'("APPLICATION" "OCTET-STREAM" NIL NIL NIL "BASE64" 10 NIL '
+            b'("ATTACHMENT" ("FILENAME*" "utf-8\'\'informe%20a%C3%B1o.csv")) NIL NIL)')
+    response = [(b'* 1 FETCH (UID 3 BODY[HEADER] {9}', b'From: a\r\n'), b' BODYSTRUCTURE ' + part + b')']
+    fields = parse_fetch_response(response)['3']
+    assert fields['BODY[HEADER]'] == b'From: a\r\n'
+    assert find_attachments(fields['BODYSTRUCTURE'])[0]['filename'] == 'informe año.csv'
+
+
+class FakeMail:
+    def __init__(self, payload):
+        self.payload = payload
+        self.fetches = 0
+
+    def uid(self, command, uid, spec):
+        self.fetches += 1
+        start, length = map(int, spec.split('<')[1].rstrip('>)').split('.'))
+        return 'OK', [(b'* 1 FETCH (BODY[2]<%d> {%d}' % (start, length), self.payload[start:start + length]), b')']
+
+
+def test_download_part_decodes_base64_by_chunks(tmp_path):
+    content = bytes(range(256)) * 40
+    encoded = base64.encodebytes(content)
+    mail = FakeMail(encoded)
+    path = tmp_path / 'adjunto.bin'
+    size = download_part(mail, '7', {'section': '2', 'encoding': 'base64'}, str(path), chunk_size=1000)
+    assert size == len(encoded)
+    assert path.read_bytes() == content
+    assert mail.fetches > 1
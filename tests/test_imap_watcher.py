@@ -0,0 +1,149 @@
+"""IDLE y monitoreo de buzones (sage_daemon2.imap_watcher) con una conexión IMAP falsa"""
+import imaplib
+import socket
+import threading
+
+import pytest
+
+from sage_daemon2 import imap_watcher
+from sage_daemon2.imap_watcher import MailboxWatcher, idle
+
+
+class FakeIMAP:
+    """
+    Conexión con la parte de la interfaz de imaplib.IMAP4 que usan idle() y el watcher
+
+    Las respuestas del servidor se escriben en el otro extremo de un par de sockets,
+    de modo que idle() espera con select() igual que con una conexión real.
+    """
+
+    def __init__(self, idle_reply=b'+ idling\r\n', done_reply=b'A1 OK IDLE terminated\r\n',
+                 capabilities=('IMAP4REV1', 'IDLE')):
+        self.sock, self.server = socket.socketpair()
+        self.file = self.sock.makefile('rb')
+        self.idle_reply = idle_reply
+        self.done_reply = done_reply
+        self.capabilities = capabilities
+        self.tagged_commands = {}
+        self.sent = []
+        self.noops = 0
+        self.logged_out = False
+
+    def _new_tag(self):
+        self.tagged_commands[b'A1'] = None
+        return b'A1'
+
+    def send(self, data):
+        self.sent.append(data)
+        self.server.sendall(self.idle_reply if data.endswith(b' IDLE\r\n') else self.done_reply)
+
+    def readline(self):
+        return self.file.readline()
+
+    def capability(self):
+        return 'OK', [' '.join(self.capabilities).encode()]
+
+    def noop(self):
+        self.noops += 1
+        return 'OK', [b'']
+
+    def logout(self):
+        self.logged_out = True
+        self.file.close()
+        self.sock.close()
+        self.server.close()
+
+
+def test_idle_reports_new_messages():
+    mail = FakeIMAP(idle_reply=b'+ idling\r\n* 4 EXISTS\r\n')
+
+    assert idle(mail, timeout=5)
+    assert mail.sent == [b'A1 IDLE\r\n', b'DONE\r\n']
+    assert mail.tagged_commands == {}
+
+
+def test_idle_times_out_without_changes():
+    mail = FakeIMAP()
+    assert not idle(mail, timeout=0.2)
+    assert mail.sent[-1] == b'DONE\r\n'
+
+
+def test_idle_counts_messages_announced_while_finishing():
+    mail = FakeIMAP(done_reply=b'* 5 EXISTS\r\nA1 OK IDLE terminated\r\n')
+    stop_event = threading.Event()
+    stop_event.set()
+
+    assert idle(mail, timeout=60, stop_event=stop_event)
+
+
+def test_idle_rejected_by_server():
+    mail = FakeIMAP(idle_reply=b'A1 BAD Unknown command\r\n')
+    with pytest.raises(imaplib.IMAP4.error):
+        idle(mail, timeout=5)
+    assert mail.tagged_commands == {}
+
+
+def make_watcher(monkeypatch, mail, callback):
+    watcher = MailboxWatcher({'casilla_id': 1, 'usuario': 'buzon@example.com'}, callback)
+    monkeypatch.setattr(watcher, '_connect', lambda: mail)
+    return watcher
+
+
+def test_watcher_processes_mail_announced_by_idle(monkeypatch):
+    mail = FakeIMAP(idle_reply=b'+ idling\r\n* 1 EXISTS\r\n')
+    calls = []
+
+    def process(connection, email_config):
+        calls.append(connection)
+        if len(calls) == 3:
+            watcher.stop()
+        return 1
+
+    watcher = make_watcher(monkeypatch, mail, process)
+    watcher.start()
+    watcher.join(5)
+
+    assert not watcher.is_alive()
+    # Una revisión al conectar y una por cada aviso del servidor, con la misma conexión
+    assert calls == [mail, mail, mail]
+    assert mail.sent.count(b'A1 IDLE\r\n') == 2
+    assert mail.logged_out
+
+
+def test_watcher_polls_when_server_lacks_idle(monkeypatch):
+    mail = FakeIMAP(capabilities=('IMAP4REV1', 'AUTH=PLAIN'))
+    monkeypatch.setattr(imap_watcher, 'idle', lambda *args: pytest.fail("IDLE no soportado"))
+    monkeypatch.setenv('SAGE_IMAP_POLL_MIN', '0.01')
+    calls = []
+
+    def process(connection, email_config):
+        calls.append(connection)
+        if len(calls) == 3:
+            watcher.stop()
+        return 0
+
+    watcher = make_watcher(monkeypatch, mail, process)
+    watcher.start()
+    watcher.join(5)
+
+    assert not watcher.is_alive()
+    assert len(calls) == 3
+    assert mail.noops == 2
+    assert mail.sent == []
+    assert mail.logged_out
+
+
+def test_stop_interrupts_the_wait(monkeypatch):
+    mail = FakeIMAP(capabilities=('IMAP4REV1',))
+    monkeypatch.setenv('SAGE_IMAP_POLL_MIN', '60')
+    connected = threading.Event()
+
+    watcher = make_watcher(monkeypatch, mail, lambda connection, email_config: connected.set())
+    watcher.start()
+    assert connected.wait(5)
+    watcher.stop()
+    watcher.join(5)
+
+    assert not watcher.is_alive()
+    assert mail.noops == 0
+    assert mail.logged_out
@@ -0,0 +1,147 @@
+"""Tests del ciclo de arriendo, heartbeat y reintentos de la cola de validaciones"""
+import os
+import time
+
+import pytest
+
+from sage_daemon2 import job_queue
+from sage_daemon2.job_queue import JobQueue, LeaseLost
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_queue.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(str(tmp_path / 'queue'), lease_seconds=60, max_attempts=3, retry_delay=10)
+
+
+def status(queue, job_id):
+    with queue._connection() as conn:
+        return conn.execute("SELECT status, attempts, worker FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_enqueue_deduplicates(queue):
+    job_id = queue.enqueue('email', 7, {'file': 'a.csv'}, dedupe_key='msg-1')
+
+    assert job_id is not None
+    assert queue.enqueue('email', 7, {'file': 'a.csv'}, dedupe_key='msg-1') is None
+    assert queue.pending_count() == 1
+
+
+def test_expired_lease_is_claimed_again(queue, clock):
+    job_id = queue.enqueue('sftp', 3, {'file': 'a.csv'})
+    job = queue.claim('w1')
+    assert (job.id, job.attempts) == (job_id, 1)
+    assert queue.claim('w2') is None
+
+    # Con heartbeat el arriendo no vence
+    clock.now += 50
+    assert queue.heartbeat(job, 'w1')
+    clock.now += 50
+    assert queue.claim('w2') is None
+
+    # Sin heartbeat vuelve a entregarse a otro worker
+    clock.now += 61
+    retried = queue.claim('w2')
+    assert (retried.id, retried.attempts) == (job_id, 2)
+    assert not queue.heartbeat(job, 'w1')
+    assert tuple(status(queue, job_id)) == ('running', 2, 'w2')
+
+
+def test_failed_job_is_retried_with_backoff_until_max_attempts(queue, clock):
+    job_id = queue.enqueue('email', 1, {})
+
+    job = queue.claim('w1')
+    queue.fail(job, 'smtp caído')
+    assert tuple(status(queue, job_id))[:2] == ('pending', 1)
+    assert queue.claim('w1') is None
+    clock.now += 10
+    job = queue.claim('w1')
+    assert job.attempts == 2
+
+    queue.fail(job, 'smtp caído')
+    clock.now += 10
+    assert queue.claim('w1') is None  # La espera se duplica en cada intento
+    clock.now += 10
+    job = queue.claim('w1')
+    assert job.attempts == 3
+
+    queue.fail(job, 'smtp caído')
+    clock.now += 1000
+    assert queue.claim('w1') is None
+    assert tuple(status(queue, job_id))[:2] == ('failed', 3)
+    assert queue.pending_count() == 0
+
+
+def test_saved_result_survives_retry_and_complete_removes_files(queue, clock):
+    file_dir = queue.new_file_dir()
+    with open(os.path.join(file_dir, 'a.csv'), 'w') as f:
+        f.write('id\n1\n')
+    queue.enqueue('email', 1, {'file_dir': file_dir})
+
+    job = queue.claim('w1')
+    assert job.result is None
+    queue.save_result(job, {'errors': 0, 'execution_uuid': 'abc'})
+    queue.fail(job, 'respuesta no enviada')
+
+    clock.now += 10
+    job = queue.claim('w1')
+    # El reintento solo reenvía la respuesta: la validación ya está guardada
+    assert job.result == {'errors': 0, 'execution_uuid': 'abc'}
+
+    queue.complete(job)
+    assert tuple(status(queue, job.id))[0] == 'done'
+    assert not os.path.exists(file_dir)
+    assert queue.purge(older_than_days=0) == 0
+    clock.now += 86400 * 8
+    assert queue.purge() == 1
+
+
+def test_stale_worker_cannot_complete_or_fail_reassigned_job(queue, clock):
+    file_dir = queue.new_file_dir()
+    job_id = queue.enqueue('sftp', 3, {'file_dir': file_dir})
+    stale = queue.claim('w1')
+    clock.now += 61
+    current = queue.claim('w2')
+    assert current.id == stale.id == job_id
+
+    assert not queue.complete(stale)
+    assert os.path.exists(file_dir)
+    assert not queue.fail(stale, 'timeout')
+    with pytest.raises(LeaseLost):
+        queue.save_result(stale, {'errors': 1})
+    assert tuple(status(queue, job_id)) == ('running', 2, 'w2')
+
+    assert queue.complete(current)
+    assert tuple(status(queue, job_id))[0] == 'done'
+    assert not os.path.exists(file_dir)
+
+
+def test_keep_alive_flags_lost_lease(queue, clock):
+    queue.enqueue('email', 1, {})
+    job = queue.claim('w1')
+    clock.now += 61
+    queue.claim('w2')
+
+    queue.lease_seconds = 0.03
+    with queue.keep_alive(job, 'w1'):
+        for _ in range(100):
+            if job.lease_lost:
+                break
+            time.sleep(0.01)
+    assert job.lease_lost
+    with pytest.raises(LeaseLost):
+        queue.check_lease(job)
@@ -0,0 +1,124 @@
+"""Materializaciones en paralelo: reintentos, tiempo máximo y registro del resultado"""
+import threading
+import time
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+pm = pytest.importorskip('sage.process_materializations')
+
+
+class FakeProcessor(pm.MaterializationProcessor):
+    """Procesador con destinos simulados por process_hook"""
+
+    def __init__(self, logger, materializations, process_hook):
+        super().__init__(logger, max_workers=4)
+        self.materializations = materializations
+        self.process_hook = process_hook
+        self.inserted = []
+        self.attempts = {}
+
+    def _get_database_connection(self):
+        return None
+
+    def _release_database_connection(self):
+        pass
+
+    def _get_materializations_for_casilla(self, casilla_id):
+        return self.materializations
+
+    def _insert_materialization_execution(self, materialization_id, execution_id, status, message, records_count=None):
+        self.inserted.append((materialization_id, status, message))
+
+    def _process_materialization(self, materialization, dataframe, execution_id):
+        attempt = self.attempts[materialization['id']] = self.attempts.get(materialization['id'], 0) + 1
+        try:
+            self.process_hook(self, materialization, attempt)
+        except Exception as e:
+            self._register_materialization_execution(materialization['id'], execution_id, 'error', f"Error: {e}")
+            raise
+        self._register_materialization_execution(materialization['id'], execution_id, 'completado', 'ok')
+
+
+def _materialization(mat_id, **config):
+    base = {'destination_type': 'cloud', 'destination_id': 1}
+    return {'id': mat_id, 'nombre': f"mat{mat_id}", 'config': dict(base, **config)}
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(pm, 'RETRY_BACKOFF_SECONDS', 0.01)
+
+
+def _run(processor):
+    processor.process(1, 'exec-1', pd.DataFrame({'a': [1]}))
+
+
+def test_destinations_run_in_parallel(logger):
+    def slow(processor, materialization, attempt):
+        time.sleep(0.3)
+
+    processor = FakeProcessor(logger, [_materialization(i) for i in range(1, 4)], slow)
+    start = time.monotonic()
+    _run(processor)
+    assert time.monotonic() - start < 0.6
+    assert sorted(processor.inserted) == [(i, 'completado', 'ok') for i in range(1, 4)]
+
+
+def test_transient_failure_then_success_registers_one_outcome(logger):
+    def flaky(processor, materialization, attempt):
+        if attempt == 1:
+            raise ConnectionError("conexión reiniciada")
+
+    processor = FakeProcessor(logger, [_materialization(1, reintentos=2)], flaky)
+    _run(processor)
+    assert processor.attempts[1] == 2
+    assert processor.inserted == [(1, 'completado', 'ok')]
+
+
+def test_configuration_errors_are_not_retried(logger):
+    def invalid(processor, materialization, attempt):
+        raise ValueError("configuración inválida")
+
+    processor = FakeProcessor(logger, [_materialization(1, reintentos=3)], invalid)
+    _run(processor)
+    assert processor.attempts[1] == 1
+    assert processor.inserted == [(1, 'error', 'Error: configuración inválida')]
+
+
+def test_append_is_not_retried_after_writing(logger):
+    def partial_write(processor, materialization, attempt):
+        processor._local.writing = True
+        raise ConnectionError("conexión perdida a mitad de la carga")
+
+    materialization = _materialization(1, destination_type='db', operation='append', reintentos=3)
+    processor = FakeProcessor(logger, [materialization], partial_write)
+    _run(processor)
+    assert processor.attempts[1] == 1
+    assert [status for _, status, _ in processor.inserted] == ['error']
+
+
+def test_timeout_registers_once_and_defers_client_cleanup(logger):
+    release = threading.Event()
+
+    def hang(processor, materialization, attempt):
+        release.wait(5)
+
+    client = mock.MagicMock()
+    processor = FakeProcessor(logger, [_materialization(1, timeout=0.2)], hang)
+    processor.cloud_clients['s3'] = client
+    _run(processor)
+
+    assert processor.inserted == [(1, 'error', 'Error: tiempo máximo de 0.2s agotado')]
+    assert any('(0.2s)' in message for message in logger.messages('error'))
+    client.close.assert_not_called()
+
+    release.set()
+    for _ in range(100):
+        if client.close.called:
+            break
+        time.sleep(0.02)
+    client.close.assert_called_once()
+    # El intento que terminó tarde no registra otro resultado
+    assert len(processor.inserted) == 1
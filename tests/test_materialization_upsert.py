@@ -0,0 +1,64 @@
+"""Despacho de la operación upsert en _materialize_to_database"""
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('sqlalchemy')
+from sage import process_materializations as pm  # noqa: E402
+
+
+@pytest.fixture
+def processor(logger, monkeypatch):
+    processor = pm.MaterializationProcessor(logger)
+    processor.registered = []
+    monkeypatch.setattr(processor, '_register_materialization_execution',
+                        lambda mat_id, exec_id, status, message, *args: processor.registered.append((status, message)))
+    return processor
+
+
+def _connection_info(db_type, server='db.example.com'):
+    return {'tipo': db_type, 'servidor': server, 'puerto': None, 'usuario': 'sage',
+            'contrasena': 'secreto', 'basedatos': 'sage'}
+
+
+@pytest.mark.parametrize('db_type', ['postgresql', 'mysql', 'mssql'])
+def test_upsert_uses_staged_upsert_for_direct_connection_engines(processor, monkeypatch, db_type):
+    monkeypatch.setattr(processor, '_get_db_connection_info', lambda _id: _connection_info(db_type))
+    monkeypatch.setattr('sqlalchemy.create_engine', mock.MagicMock())
+    monkeypatch.setattr('psycopg2.connect', mock.MagicMock())
+    for driver in ('pymysql', 'pymssql'):
+        module = pytest.importorskip(driver)
+        monkeypatch.setattr(module, 'connect', mock.MagicMock())
+    staged_upsert = mock.MagicMock(return_value=(1, 1))
+    staged_delete = mock.MagicMock(return_value=2)
+    monkeypatch.setattr(processor, '_staged_upsert', staged_upsert)
+    monkeypatch.setattr(processor, '_staged_delete', staged_delete)
+    to_sql = mock.MagicMock()
+    monkeypatch.setattr(pd.DataFrame, 'to_sql', to_sql)
+
+    df = pd.DataFrame({'id': [1, 2], 'valor': ['a', 'b']})
+    config = {'tablaDestino': 'clientes', 'operation': 'upsert', 'primaryKey': ['id']}
+    processor._materialize_to_database(df, 1, config, 10, 'exec-1', deleted_keys=pd.DataFrame({'id': [3, 4]}))
+
+    staged_upsert.assert_called_once()
+    assert staged_upsert.call_args.args[1] == db_type
+    staged_delete.assert_called_once()
+    to_sql.assert_not_called()
+    assert processor.registered == [('completado', "Materialización completada: 4 filas procesadas")]
+
+
+def test_upsert_into_duckdb_updates_existing_rows(processor, monkeypatch, tmp_path):
+    pytest.importorskip('duckdb_engine')
+    import sqlalchemy
+    path = str(tmp_path / 'destino.duckdb')
+    monkeypatch.setattr(processor, '_get_db_connection_info', lambda _id: _connection_info('duckdb', path))
+    config = {'tablaDestino': 'clientes', 'esquema': 'main', 'operation': 'upsert', 'primaryKey': ['id']}
+
+    processor._materialize_to_database(pd.DataFrame({'id': [1, 2], 'valor': ['a', 'b']}), 1, config, 10, 'e1')
+    processor._materialize_to_database(pd.DataFrame({'id': [2, 3], 'valor': ['B', 'c']}), 1, config, 10, 'e2')
+
+    with sqlalchemy.create_engine(f"duckdb:///{path}").connect() as conn:
+        rows = conn.exec_driver_sql('SELECT id, valor FROM clientes ORDER BY id').fetchall()
+    assert [tuple(row) for row in rows] == [(1, 'a'), (2, 'B'), (3, 'c')]
+    assert [status for status, _ in processor.registered] == ['completado', 'completado']
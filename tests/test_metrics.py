@@ -0,0 +1,56 @@
+"""Tiempos por etapa y costo por regla (sage.metrics)"""
+from sage.metrics import RULE_EXPRESSION_LIMIT, ExecutionMetrics
+from test_file_processor import catalog, load_config, run, sample_rows
+
+
+def test_stages_accumulate_time_and_calls():
+    metrics = ExecutionMetrics()
+    with metrics.stage('read'):
+        with metrics.stage('type_conversion'):
+            pass
+        with metrics.stage('type_conversion'):
+            pass
+    metrics.add_stage('read', 1.5, calls=2)
+    metrics.count('rows_read', 10)
+    metrics.count('rows_read', 5)
+
+    assert metrics.stages['type_conversion']['calls'] == 2
+    assert metrics.stages['read']['calls'] == 3
+    # La etapa externa incluye el tiempo de las anidadas
+    assert metrics.stages['read']['seconds'] >= 1.5 + metrics.stages['type_conversion']['seconds']
+    assert metrics.counters['rows_read'] == 15
+
+
+def test_rules_are_accumulated_ranked_and_merged():
+    metrics = ExecutionMetrics()
+    metrics.record_rule('campo', 'ventas.csv', 'monto', 'positivo', "df['monto'] > 0", 0.2, rows=100)
+    metrics.record_rule('campo', 'ventas.csv', 'monto', 'positivo', "df['monto'] > 0", 0.5, rows=50)
+    metrics.record_rule('fila', 'ventas.csv', None, 'larga', 'x' * 500, 0.4, rows=150)
+
+    rules = metrics.to_dict()['rules']
+    assert [rule['rule'] for rule in rules] == ['positivo', 'larga']
+    assert {k: rules[0][k] for k in ('evaluations', 'seconds', 'max_seconds', 'rows')} == {
+        'evaluations': 2, 'seconds': 0.7, 'max_seconds': 0.5, 'rows': 150}
+    assert len(rules[1]['expression']) == RULE_EXPRESSION_LIMIT
+
+    # Un proceso de trabajo envía sus métricas serializadas; se suman a las del principal
+    merged = ExecutionMetrics()
+    merged.record_rule('campo', 'ventas.csv', 'monto', 'positivo', "df['monto'] > 0", 0.9, rows=10)
+    merged.merge(metrics.to_dict())
+    positivo = merged.rules[('campo', 'ventas.csv', 'monto', 'positivo')]
+    assert (positivo['evaluations'], positivo['rows'], positivo['max_seconds']) == (3, 160, 0.9)
+    assert round(positivo['seconds'], 6) == 1.6
+
+
+def test_streaming_records_rule_cost_per_chunk(tmp_path):
+    config = load_config(tmp_path, {'ventas': catalog('ventas', 'ventas.csv')})
+    data_path = tmp_path / 'ventas.csv'
+    data_path.write_text(sample_rows(300), encoding='utf-8')
+
+    processor, _, _, _ = run(config, data_path, 'ventas', tmp_path, chunksize=100)
+
+    metrics = processor.metrics
+    assert metrics.counters['rows_read'] == 300
+    assert metrics.stages['field_validation']['calls'] == 3 * 3  # 3 campos por bloque
+    rule = metrics.rules[('campo', 'ventas.csv', 'monto', 'positivo')]
+    assert (rule['evaluations'], rule['rows']) == (3, 300)
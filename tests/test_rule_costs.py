@@ -0,0 +1,73 @@
+"""Ranking de las reglas más costosas (sage.rule_costs)"""
+import json
+import os
+from contextlib import contextmanager
+from unittest import mock
+
+from sage import db_pool
+from sage.metrics import ExecutionMetrics
+from sage.rule_costs import aggregate_rule_costs, load_from_database, load_from_directory
+
+
+def _metrics(*rules):
+    metrics = ExecutionMetrics()
+    for name, seconds, rows in rules:
+        metrics.record_rule('campo', 'ventas.csv', 'monto', name, f"df['monto'] > {name}", seconds, rows)
+    return metrics.to_dict()
+
+
+def test_ranking_sums_executions_per_casilla():
+    executions = [
+        (1, _metrics(('a', 1.0, 1000), ('b', 0.5, 1000))),
+        (1, _metrics(('a', 2.0, 3000))),
+        (2, _metrics(('a', 2.5, 0))),
+        (3, None),
+    ]
+
+    ranking = aggregate_rule_costs(executions, top=None)
+
+    assert [(stats['casilla_id'], stats['rule']) for stats in ranking] == [(1, 'a'), (2, 'a'), (1, 'b')]
+    first = ranking[0]
+    assert (first['executions'], first['seconds'], first['max_seconds'], first['rows']) == (2, 3.0, 2.0, 4000)
+    assert first['avg_seconds'] == 1.5
+    assert first['seconds_per_million_rows'] == 750.0
+    # Sin filas evaluadas no se puede normalizar por tamaño
+    assert ranking[1]['seconds_per_million_rows'] is None
+    assert [stats['rule'] for stats in aggregate_rule_costs(executions, top=1)] == ['a']
+
+
+def test_load_from_directory_filters_casilla_and_age(tmp_path):
+    for name, casilla_id in (('e1', 1), ('e2', 2), ('viejo', 1)):
+        os.mkdir(tmp_path / name)
+        (tmp_path / name / 'metrics.json').write_text(
+            json.dumps({'casilla_id': casilla_id, **_metrics((name, 1.0, 10))}), encoding='utf-8')
+    old = tmp_path / 'viejo' / 'metrics.json'
+    os.utime(old, (0, 0))
+    (tmp_path / 'roto').mkdir()
+    (tmp_path / 'roto' / 'metrics.json').write_text('{', encoding='utf-8')
+
+    executions = load_from_directory(str(tmp_path), casilla_id=1, days=7)
+
+    assert [(casilla_id, metrics['rules'][0]['rule']) for casilla_id, metrics in executions] == [(1, 'e1')]
+
+
+def test_load_from_database_filters_by_casilla(monkeypatch):
+    cursor = mock.MagicMock()
+    cursor.__enter__.return_value = cursor
+    cursor.fetchall.return_value = [(4, json.dumps(_metrics(('a', 1.0, 10)))), (4, _metrics(('b', 2.0, 10)))]
+    conn = mock.MagicMock()
+    conn.cursor.return_value = cursor
+
+    @contextmanager
+    def connection(dsn=None):
+        yield conn
+
+    monkeypatch.setattr(db_pool, 'connection', connection)
+
+    executions = load_from_database(casilla_id=4, days=7)
+
+    query, params = cursor.execute.call_args.args
+    assert 'metricas IS NOT NULL' in query and 'casilla_id = %s' in query
+    assert params == [7, 4]
+    # La columna puede llegar como JSON serializado o ya decodificada por el driver
+    assert [stats['rule'] for stats in aggregate_rule_costs(executions)] == ['b', 'a']